@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+#
+# benchmark for the whole hardware controller on simulated drivers: sensor edge latency from the gpio
+# callback to an armed-loop style reader, sensor event throughput, and gps fix throughput into the kalman
+# filter, all on a normal Linux host
+#
+# run from the repository root:
+#   python -m benchmarks.bench_drivers
+#
+
+import logging
+import threading
+import time
+
+from securityclientpy.drivers import SimulatedDrivers, QUIET_PATTERNS
+from securityclientpy.hwcontroller import HardwareController
+
+
+class driversBenchmark(object):
+
+    SECONDS = 3.0
+
+    def _controller(self, patterns, speed=1.0):
+        patterns = dict(QUIET_PATTERNS, **patterns)
+        return HardwareController(False, None, drivers=SimulatedDrivers(patterns, speed=speed, seed=0))
+
+    def edge_latency(self):
+        """motion pulses every 20 ms, timed from the gpio edge callback to the waiting reader
+
+        returns:
+            [float] (seconds)
+        """
+        controller = self._controller({'motion': {'pattern': 'periodic', 'period': 0.02, 'duration': 0.01}})
+        reader = controller.sensor_bus.subscribe()
+        latencies = []
+        deadline = time.time() + self.SECONDS
+        while time.time() < deadline:
+            for event in reader.wait(0.1):
+                latencies.append(time.time() - event.timestamp)
+        controller.cleanup()
+        return latencies
+
+    def event_throughput(self):
+        """vibration pulses as fast as the simulator can produce them
+
+        returns:
+            float (events produced per second), float (events read per second), int (events the reader
+            missed when the ring buffer lapped it)
+        """
+        controller = self._controller({'vibration': {'pattern': 'periodic', 'period': 0.001, 'duration': 0.0005}},
+                                      speed=1000.0)
+        reader = controller.sensor_bus.subscribe()
+        received = [0]
+        stopped = threading.Event()
+
+        def consume():
+            while not stopped.is_set():
+                received[0] += len(reader.wait(0.1))
+
+        thread = threading.Thread(target=consume)
+        thread.start()
+        start = time.time()
+        time.sleep(self.SECONDS)
+        elapsed = time.time() - start
+        stopped.set()
+        thread.join()
+        controller.cleanup()
+        return controller.drivers.signals / elapsed, received[0] / elapsed, reader.missed
+
+    def gps_throughput(self):
+        """a 100 Hz receiver at 100x, through the gps reader, kalman filter and its listeners
+
+        returns:
+            float (fixes per second)
+        """
+        controller = self._controller({'gps': {'pattern': 'route', 'rate': 100.0}}, speed=100.0)
+        estimates = [0]
+        controller.position_estimator.add_listener(lambda estimate: estimates.__setitem__(0, estimates[0] + 1))
+        start = time.time()
+        time.sleep(self.SECONDS)
+        elapsed = time.time() - start
+        controller.cleanup()
+        return estimates[0] / elapsed
+
+
+def main():
+    logging.getLogger('securityclientpy').setLevel(logging.WARNING)
+    benchmark = driversBenchmark()
+    latencies = sorted(benchmark.edge_latency())
+    percentile = lambda q: latencies[int(q * (len(latencies) - 1))]
+    print('{0:<40} {1:>10d}'.format('motion edges timed', len(latencies)))
+    print('{0:<40} {1:>10.1f}'.format('edge to reader p50 (microseconds)', 1e6 * percentile(0.5)))
+    print('{0:<40} {1:>10.1f}'.format('edge to reader p99 (microseconds)', 1e6 * percentile(0.99)))
+    produced, rate, missed = benchmark.event_throughput()
+    print('{0:<40} {1:>10.0f}'.format('sensor events produced per second', produced))
+    print('{0:<40} {1:>10.0f}'.format('sensor events read per second', rate))
+    print('{0:<40} {1:>10d}'.format('sensor events missed', missed))
+    print('{0:<40} {1:>10.0f}'.format('gps fixes filtered per second', benchmark.gps_throughput()))
+
+
+if __name__ == '__main__':
+    main()
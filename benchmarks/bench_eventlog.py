@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+#
+# benchmark for the sensor event log: recording cost and size of hours of sensor data, and how much faster
+# than real time the log replays through the sensor bus, gps reader, kalman filter and armed breach logic
+#
+# run from the repository root:
+#   python -m benchmarks.bench_eventlog
+#
+
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from securityclientpy.eventlog import EventRecorder, EventReplayer, VirtualClock, read_events
+from securityclientpy.drivers import SimulatedDrivers, QUIET_PATTERNS
+from securityclientpy.hwcontroller import HardwareController
+from securityclientpy.statemachine import SecurityStatus, ARMING, ARMED, DISARMED
+
+
+class eventLogBenchmark(object):
+
+    HOURS = 8
+    # Driving the first half, parked and armed the second half
+    START = 1577836800.0
+
+    def controller(self, clock):
+        """a hardware controller on silent simulated drivers, timed by a virtual clock"""
+        return HardwareController(False, None, drivers=SimulatedDrivers(QUIET_PATTERNS), clock=clock)
+
+    def record(self, root, seed=0):
+        """logs hours of readings through a controller: gps every second while driving, temperature every
+        5 s, and sensor noise while parked and armed
+
+        returns:
+            EventRecorder
+        """
+        generator = random.Random(seed)
+        clock = VirtualClock(self.START)
+        controller = self.controller(clock)
+        recorder = EventRecorder(root, clock=clock)
+        recorder.attach(controller)
+        drive = self.HOURS * 3600 // 2
+        latitude, longitude = 33.749, -84.388
+        for second in range(self.HOURS * 3600):
+            clock.advance_to(self.START + second)
+            if second < drive:
+                latitude += 0.0002
+                controller.gps_reader.update({'class': 'TPV', 'mode': 3, 'lat': latitude, 'lon': longitude,
+                                              'alt': 300.0, 'speed': 22.0, 'track': 0.0, 'epx': 5.0, 'epy': 5.0,
+                                              'eps': 0.5})
+            elif second == drive:
+                # Armed with nobody inside, after the exit delay and occupancy check
+                recorder.record_state(SecurityStatus(ARMING, 1, 1, clock(), False))
+                clock.sleep(8.0)
+                recorder.record_state(SecurityStatus(ARMED, 1, 2, clock(), False))
+            elif generator.random() < 20.0 / 3600:
+                source = generator.choice(['motion', 'camera', 'vibration'])
+                controller.sensor_bus.publish(source, True)
+                clock.sleep(generator.uniform(0.05, 1.5))
+                controller.sensor_bus.publish(source, False)
+            if second % 5 == 0:
+                recorder.record('temperature', 25.0 + generator.gauss(0, 0.2))
+        clock.sleep(1.0)
+        recorder.record_state(SecurityStatus(DISARMED, 1, 3, clock(), False))
+        recorder.close()
+        controller.cleanup()
+        return recorder
+
+
+def main():
+    logging.getLogger('securityclientpy').setLevel(logging.WARNING)
+    benchmark = eventLogBenchmark()
+    directory = tempfile.mkdtemp()
+    try:
+        root = os.path.join(directory, 'events')
+        start = time.time()
+        recorder = benchmark.record(root)
+        readings = recorder.records
+        record_seconds = time.time() - start
+        size = sum(os.path.getsize(segment) for segment in recorder.segments())
+
+        start = time.time()
+        events = list(read_events(root))
+        read_seconds = time.time() - start
+        clock = VirtualClock()
+        controller = benchmark.controller(clock)
+        replayer = EventReplayer(controller, clock)
+        start = time.time()
+        breaches = replayer.run(events)
+        replay_seconds = time.time() - start
+        controller.cleanup()
+    finally:
+        shutil.rmtree(directory)
+
+    print('{0} hours of sensor data, {1} readings'.format(benchmark.HOURS, readings))
+    print('{0:<36} {1:>10.2f}'.format('microseconds to produce and record', 1e6 * record_seconds / readings))
+    print('{0:<36} {1:>10.1f}'.format('bytes per reading', size / float(readings)))
+    print('{0:<36} {1:>10.1f}'.format('log size (KiB)', size / 1024.0))
+    print('{0:<36} {1:>10.2f}'.format('seconds to read the log', read_seconds))
+    print('{0:<36} {1:>10.2f}'.format('seconds to replay the log', replay_seconds))
+    print('{0:<36} {1:>10.0f}'.format('times faster than real time', benchmark.HOURS * 3600 / replay_seconds))
+    print('{0:<36} {1:>10d}'.format('breaches while armed', len(breaches)))
+
+
+if __name__ == '__main__':
+    main()
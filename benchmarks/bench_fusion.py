@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+#
+# benchmark for breach fusion: false alarms over days of benign sensor events, detection latency on
+# synthetic break ins, and replay throughput, against the old any-vibration / sustained-motion rule
+#
+# run from the repository root:
+#   python -m benchmarks.bench_fusion
+#
+
+import logging
+import random
+import time
+
+from securityclientpy.fusion import replay
+from securityclientpy.sensorbus import SensorEvent
+
+
+class fusionBenchmark(object):
+
+    DAYS = 7
+    INTRUSIONS = 200
+    # The armed loop stops at a breach, count breaches this close together as one alarm
+    REARM_SECONDS = 60.0
+    MOTION_BREACH_SECONDS = 2.1
+
+    def _pulse(self, events, t, source, length):
+        events.append(SensorEvent(0, t, source, True))
+        events.append(SensorEvent(0, t + length, source, False))
+
+    def _knock(self, events, generator, t):
+        """a vibration switch closing once, with a few bounces"""
+        for _ in range(generator.randint(1, 4)):
+            self._pulse(events, t, 'vibration', 0.005)
+            t += generator.uniform(0.01, 0.05)
+
+    def benign(self, seed=0):
+        """a parked car: passing trucks and doors slamming nearby (single knocks), clouds and headlights
+        (camera motion of 0.5-3 s), and the PIR sensor twitching with heat currents (0.1-1.5 s)"""
+        generator = random.Random(seed)
+        events = []
+        end = self.DAYS * 86400.0
+        for source, per_hour in (('vibration', 6.0), ('camera', 8.0), ('motion', 3.0)):
+            t = 0.0
+            while True:
+                t += generator.expovariate(per_hour / 3600.0)
+                if t >= end:
+                    break
+                if source == 'vibration':
+                    self._knock(events, generator, t)
+                elif source == 'camera':
+                    self._pulse(events, t, 'camera', generator.uniform(0.5, 3.0))
+                else:
+                    self._pulse(events, t, 'motion', generator.uniform(0.1, 1.5))
+        return sorted(events, key=lambda event: event.timestamp)
+
+    def intrusions(self, seed=1):
+        """break ins: prying at a door (2-6 knocks over a few seconds) with the intruder showing on the
+        camera, then reaching into the cabin in front of the PIR sensor
+
+        returns:
+            [[SensorEvent]] (each starting at 0.0, the first sign of the intruder)
+        """
+        generator = random.Random(seed)
+        intrusions = []
+        for _ in range(self.INTRUSIONS):
+            events = []
+            t = 0.0
+            for _ in range(generator.randint(2, 6)):
+                self._knock(events, generator, t)
+                t += generator.uniform(0.5, 2.0)
+            self._pulse(events, generator.uniform(0.0, 1.0), 'camera', generator.uniform(2.0, 8.0))
+            self._pulse(events, t + generator.uniform(1.0, 4.0), 'motion', generator.uniform(3.0, 10.0))
+            intrusions.append(sorted(events, key=lambda event: event.timestamp))
+        return intrusions
+
+    def old_rule(self, events):
+        """the armed loop before fusion: any vibration, or motion / camera held for 2.1 s
+
+        returns:
+            [float] (breach times)
+        """
+        breaches = []
+        motion_since = {}
+        now = None
+        for event in events:
+            if now is None:
+                now = event.timestamp
+            while motion_since and min(motion_since.values()) + self.MOTION_BREACH_SECONDS <= event.timestamp:
+                breaches.append(min(motion_since.values()) + self.MOTION_BREACH_SECONDS)
+                motion_since = {}
+            now = event.timestamp
+            if event.source == 'vibration' and event.value:
+                breaches.append(now)
+            elif event.source in ('motion', 'camera'):
+                if event.value:
+                    motion_since.setdefault(event.source, now)
+                else:
+                    motion_since.pop(event.source, None)
+        return breaches
+
+    def alarms(self, breaches):
+        """merges breaches raised while the first one would still be going on"""
+        alarms = []
+        for breach in breaches:
+            if not alarms or breach - alarms[-1] >= self.REARM_SECONDS:
+                alarms.append(breach)
+        return alarms
+
+    def fused(self, events):
+        return [breach.time for breach in replay(events)]
+
+
+def main():
+    # Breaches are logged, keep that out of the timings
+    logging.getLogger('securityclientpy').setLevel(logging.WARNING)
+    benchmark = fusionBenchmark()
+    events = benchmark.benign()
+    old_alarms = len(benchmark.alarms(benchmark.old_rule(events)))
+    start = time.time()
+    fused_alarms = len(benchmark.alarms(benchmark.fused(events)))
+    elapsed = time.time() - start
+    print('{0} days of benign sensor events ({1} events), {2} synthetic break ins'.format(
+        benchmark.DAYS, len(events), benchmark.INTRUSIONS))
+    print('{0:<36} {1:>10} {2:>10}'.format('', 'old rule', 'fusion'))
+    print('{0:<36} {1:>10.1f} {2:>10.1f}'.format('false alarms per day', old_alarms / float(benchmark.DAYS),
+                                                 fused_alarms / float(benchmark.DAYS)))
+
+    old_latency = []
+    fused_latency = []
+    fused_missed = 0
+    for intrusion in benchmark.intrusions():
+        old_latency.append(benchmark.old_rule(intrusion)[0])
+        breaches = benchmark.fused(intrusion)
+        if breaches:
+            fused_latency.append(breaches[0])
+        else:
+            fused_missed += 1
+    mean = lambda values: sum(values) / len(values)
+    percentile = lambda values, q: sorted(values)[int(q * (len(values) - 1))]
+    print('{0:<36} {1:>10.2f} {2:>10.2f}'.format('break in: mean s to breach', mean(old_latency),
+                                                 mean(fused_latency)))
+    print('{0:<36} {1:>10.2f} {2:>10.2f}'.format('break in: 95th percentile s', percentile(old_latency, 0.95),
+                                                 percentile(fused_latency, 0.95)))
+    print('{0:<36} {1:>10d} {2:>10d}'.format('break ins missed', 0, fused_missed))
+    print('{0:<36} {1:>21.0f}'.format('replayed events per second', len(events) / elapsed))
+
+
+if __name__ == '__main__':
+    main()
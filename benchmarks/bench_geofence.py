@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+#
+# benchmark for geofence evaluation: cost per filtered fix with hundreds of fences, grid index vs a scan
+#
+# run from the repository root:
+#   python -m benchmarks.bench_geofence
+#
+
+import logging
+import math
+import random
+import time
+
+from securityclientpy.geofence import GeofenceIndex, GeofenceMonitor, parse_geofence
+from securityclientpy.kalman import Estimate
+
+
+class geofenceBenchmark(object):
+
+    ORIGIN = (33.749, -84.388)
+    # Fences spread over a metro area about 20 km across
+    SPAN_DEGREES = 0.18
+    FENCES = 500
+    FIXES = 20000
+
+    def fences(self, seed=0):
+        """circles (homes, depots) and polygons with 6-40 vertices (neighbourhoods, school zones), plus a few
+        large ones covering much of the area"""
+        generator = random.Random(seed)
+        fences = []
+        for i in range(self.FENCES):
+            latitude = self.ORIGIN[0] + generator.uniform(0, self.SPAN_DEGREES)
+            longitude = self.ORIGIN[1] + generator.uniform(0, self.SPAN_DEGREES)
+            if i % 2:
+                fences.append(parse_geofence({'id': i, 'center': [latitude, longitude],
+                                              'radius': generator.uniform(50, 1500), 'on_exit': ['alert']}))
+                continue
+            radius = generator.uniform(0.002, 0.06 if i % 50 == 0 else 0.015)
+            vertices = generator.randint(6, 40)
+            polygon = []
+            for vertex in range(vertices):
+                angle = 2 * math.pi * vertex / vertices
+                distance = radius * generator.uniform(0.6, 1.0)
+                polygon.append([latitude + distance * math.sin(angle), longitude + distance * math.cos(angle)])
+            fences.append(parse_geofence({'id': i, 'polygon': polygon, 'speed_limit': 25}))
+        return fences
+
+    def estimates(self, seed=1):
+        """a drive wandering across the area once a second"""
+        generator = random.Random(seed)
+        latitude, longitude = self.ORIGIN[0] + self.SPAN_DEGREES / 2, self.ORIGIN[1] + self.SPAN_DEGREES / 2
+        heading = 0.0
+        estimates = []
+        for t in range(self.FIXES):
+            heading += generator.gauss(0, 0.2)
+            latitude += 0.0002 * math.cos(heading)
+            longitude += 0.0002 * math.sin(heading)
+            # Bounce off the edges of the area
+            if not self.ORIGIN[0] <= latitude <= self.ORIGIN[0] + self.SPAN_DEGREES or \
+                    not self.ORIGIN[1] <= longitude <= self.ORIGIN[1] + self.SPAN_DEGREES:
+                heading += math.pi
+            estimates.append(Estimate(latitude, longitude, 20.0, 0.0, 4.0, 0.5, 0.0, float(t)))
+        return estimates
+
+    def scan(self, fences, estimates):
+        """the straightforward way: bounding box then containment test of every fence, for every fix
+
+        returns:
+            (microseconds per fix, worst microseconds, fixes inside some fence)
+        """
+        inside_count = 0
+        worst = 0.0
+        start = time.time()
+        for estimate in estimates:
+            before = time.time()
+            latitude, longitude = estimate.latitude, estimate.longitude
+            inside = []
+            for fence in fences:
+                south, west, north, east = fence.bbox
+                if not (south <= latitude <= north and west <= longitude <= east):
+                    continue
+                if fence.polygon is None:
+                    north_offset = (latitude - fence.center[0]) * 111320.0
+                    east_offset = (longitude - fence.center[1]) * 111320.0 * math.cos(math.radians(fence.center[0]))
+                    if math.hypot(north_offset, east_offset) <= fence.radius:
+                        inside.append(fence)
+                    continue
+                crossings = 0
+                vertices = fence.polygon.tolist()
+                for (first, first_longitude), (second, second_longitude) in zip(vertices, vertices[1:] + vertices[:1]):
+                    if (first > latitude) != (second > latitude) and longitude < first_longitude + (
+                            latitude - first) * (second_longitude - first_longitude) / (second - first):
+                        crossings += 1
+                if crossings % 2:
+                    inside.append(fence)
+            inside_count += bool(inside)
+            worst = max(worst, time.time() - before)
+        elapsed = time.time() - start
+        return 1e6 * elapsed / len(estimates), 1e6 * worst, inside_count
+
+    def run(self, fences, estimates):
+        """feeds the drive through a geofence monitor
+
+        returns:
+            (microseconds per fix, worst microseconds, fixes inside some fence, crossings)
+        """
+        monitor = GeofenceMonitor(fences)
+        inside_count = 0
+        worst = 0.0
+        start = time.time()
+        for estimate in estimates:
+            before = time.time()
+            monitor.update(estimate)
+            worst = max(worst, time.time() - before)
+            inside_count += bool(monitor._inside)
+        elapsed = time.time() - start
+        return 1e6 * elapsed / len(estimates), 1e6 * worst, inside_count, monitor.events
+
+
+def main():
+    # Crossings are logged, keep that out of the timings
+    logging.getLogger('securityclientpy').setLevel(logging.WARNING)
+    benchmark = geofenceBenchmark()
+    fences = benchmark.fences()
+    estimates = benchmark.estimates()
+    start = time.time()
+    GeofenceIndex(fences)
+    build_ms = 1e3 * (time.time() - start)
+    print('{0} fences, {1} fixes, index built in {2:.1f} ms'.format(len(fences), len(estimates), build_ms))
+    print('{0:<34} {1:>12} {2:>10} {3:>14}'.format('', 'us per fix', 'worst us', 'fixes in fence'))
+    mean, worst, inside = benchmark.scan(fences, estimates)
+    print('{0:<34} {1:>12.1f} {2:>10.1f} {3:>14d}'.format('scan every fence', mean, worst, inside))
+    mean, worst, inside, events = benchmark.run(fences, estimates)
+    print('{0:<34} {1:>12.1f} {2:>10.1f} {3:>14d}'.format('monitor (grid index, debounce)', mean, worst, inside))
+    print('{0} confirmed crossings'.format(events))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+#
+# benchmark for the gps position / speed estimator: accuracy on a synthetic noisy track and cost per update
+#
+# run from the repository root:
+#   python -m benchmarks.bench_kalman
+#
+
+import math
+import random
+import time
+
+from securityclientpy.gpsreader import GpsFix
+from securityclientpy.kalman import PositionEstimator
+
+
+class kalmanBenchmark(object):
+
+    METERS_PER_DEGREE = 111320.0
+    MPH_PER_METER_PER_SECOND = 2.23694
+    ORIGIN = (33.749, -84.388)
+    # 35 mph road driven at 43 mph: under the 10 mph grace, any alert is a false one
+    SPEED_LIMIT = 35.0
+    TRUE_SPEED = 43.0 / 2.23694
+    FIX_RATE = 1.0
+    SECONDS = 1800
+
+    def track(self, seed=0):
+        """a winding drive with stops, urban canyon stretches (noisy fixes) and dropouts
+
+        returns:
+            [(GpsFix or None, true east, true north, true speed)]
+        """
+        generator = random.Random(seed)
+        east = north = 0.0
+        heading = 0.0
+        samples = []
+        for step in range(int(self.SECONDS * self.FIX_RATE)):
+            t = step / self.FIX_RATE
+            phase = t % 300
+            # Stop at a light for 20 s every 5 minutes, braking and accelerating over 10 s
+            speed = self.TRUE_SPEED * max(0.0, min(1.0, (phase - 20) / 10.0, (300 - phase) / 10.0))
+            heading = (heading + 2.0 * math.sin(t / 40.0)) % 360.0
+            east += speed * math.sin(math.radians(heading)) / self.FIX_RATE
+            north += speed * math.cos(math.radians(heading)) / self.FIX_RATE
+
+            canyon = 600 <= t < 900
+            dropout = 1250 <= t < 1254
+            noise = 12.0 if canyon else 4.0
+            speed_noise = 2.5 if canyon else 0.8
+            fix = None
+            if not dropout:
+                latitude = self.ORIGIN[0] + (north + generator.gauss(0, noise)) / self.METERS_PER_DEGREE
+                longitude = self.ORIGIN[1] + (east + generator.gauss(0, noise)) / (
+                    self.METERS_PER_DEGREE * math.cos(math.radians(self.ORIGIN[0])))
+                measured_speed = abs(speed + generator.gauss(0, speed_noise))
+                track = (heading + generator.gauss(0, 3.0 if speed > 2 else 90.0)) % 360.0
+                fix = GpsFix(3, None, latitude, longitude, 300.0, measured_speed, 0.0, track, 1.96 * noise,
+                             1.96 * noise, 20.0, 1.96 * speed_noise, t)
+            samples.append((t, fix, east, north, speed))
+        return samples
+
+    def run(self, samples):
+        """feeds the track through the estimator
+
+        returns:
+            dict
+        """
+        estimator = PositionEstimator()
+        raw_speed_errors = []
+        speed_errors = []
+        position_errors = []
+        raw_position_errors = []
+        dropout_errors = []
+        raw_alerts = alerts = 0
+        update_seconds = 0.0
+        last_fix = None
+        scale = self.METERS_PER_DEGREE * math.cos(math.radians(self.ORIGIN[0]))
+
+        for t, fix, east, north, speed in samples:
+            if fix is not None:
+                start = time.time()
+                estimator.add_fix(fix)
+                update_seconds += time.time() - start
+                last_fix = fix
+            estimate = estimator.estimate_at(t)
+            if estimate is None:
+                continue
+
+            error = math.hypot((estimate.longitude - self.ORIGIN[1]) * scale - east,
+                               (estimate.latitude - self.ORIGIN[0]) * self.METERS_PER_DEGREE - north)
+            raw_error = math.hypot((last_fix.longitude - self.ORIGIN[1]) * scale - east,
+                                   (last_fix.latitude - self.ORIGIN[0]) * self.METERS_PER_DEGREE - north)
+            if fix is None:
+                dropout_errors.append((error, raw_error))
+                continue
+            position_errors.append(error)
+            raw_position_errors.append(raw_error)
+            speed_errors.append(estimate.speed - speed)
+            raw_speed_errors.append(fix.speed - speed)
+            limit = self.SPEED_LIMIT + 10.0
+            raw_alerts += fix.speed * self.MPH_PER_METER_PER_SECOND > limit
+            alerts += estimate.speed * self.MPH_PER_METER_PER_SECOND > limit
+
+        rms = lambda values: math.sqrt(sum(v * v for v in values) / len(values))
+        return {
+            'fixes': len(speed_errors),
+            'speed_rms': (rms(raw_speed_errors), rms(speed_errors)),
+            'position_rms': (rms(raw_position_errors), rms(position_errors)),
+            'dropout_position': (max(e[1] for e in dropout_errors), max(e[0] for e in dropout_errors)),
+            'over_limit_samples': (raw_alerts, alerts),
+            'microseconds_per_update': 1e6 * update_seconds / len(speed_errors),
+        }
+
+
+def main():
+    benchmark = kalmanBenchmark()
+    results = benchmark.run(benchmark.track())
+    print('{0} fixes over a {1:.0f} minute drive'.format(results['fixes'], benchmark.SECONDS / 60.0))
+    print('{0:<34} {1:>10} {2:>10}'.format('', 'raw gps', 'filtered'))
+    print('{0:<34} {1:>10.2f} {2:>10.2f}'.format('speed rms error (m/s)', *results['speed_rms']))
+    print('{0:<34} {1:>10.2f} {2:>10.2f}'.format('position rms error (m)', *results['position_rms']))
+    print('{0:<34} {1:>10.2f} {2:>10.2f}'.format('worst position in 4 s dropout (m)', *results['dropout_position']))
+    print('{0:<34} {1:>10d} {2:>10d}'.format('samples over limit + 10 mph', *results['over_limit_samples']))
+    print('{0:<34} {1:>21.1f}'.format('microseconds per update', results['microseconds_per_update']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# benchmark for location reads (the work behind /system/location): per-call geoip vs the location provider
+#
+# run from the repository root:
+#   python -m benchmarks.bench_location
+#
+
+import time
+
+import requests
+
+from securityclientpy.fakegps import FakeGpsSession
+from securityclientpy.gpsreader import GpsReader
+from securityclientpy.location import LocationProvider
+from tests.stub_server import StubServer
+
+
+class locationBenchmark(object):
+
+    READS = 100
+    # Round trip to a geoip service over a cellular link
+    GEOIP_DELAY = 0.08
+
+    def __init__(self, server):
+        self.server = server
+        self.url = 'http://{0}:{1}/json'.format(server.host, server.port)
+
+    def read_geoip(self):
+        """the old read: a geoip request before every location"""
+        json_data = requests.get(self.url, timeout=(3.05, 5.0)).json()
+        return {'latitude': float(json_data['latitude']), 'longitude': float(json_data['longitude'])}
+
+    def run(self, read):
+        """returns milliseconds per read and the number of reads without a location"""
+        failures = 0
+        start = time.time()
+        for i in range(self.READS):
+            try:
+                if not read():
+                    failures += 1
+            except requests.exceptions.RequestException:
+                failures += 1
+        return 1000.0 * (time.time() - start) / self.READS, failures
+
+
+def main():
+    server = StubServer(delay=locationBenchmark.GEOIP_DELAY,
+                        responses={'json': {'latitude': 40.7128, 'longitude': -74.006}}).start()
+    benchmark = locationBenchmark(server)
+
+    gps_reader = GpsReader(lambda: FakeGpsSession())
+    gps_reader.update({'class': 'TPV', 'mode': 3, 'lat': 33.749, 'lon': -84.388})
+    with_fix = LocationProvider(gps_reader, benchmark.url)
+    without_fix = LocationProvider(None, benchmark.url)
+    without_fix.location()
+    without_fix.wait_for_geoip()
+
+    results = [
+        ('geoip per call', benchmark.run(benchmark.read_geoip)),
+        ('provider, gps fix', benchmark.run(with_fix.location)),
+        ('provider, no gps', benchmark.run(without_fix.location)),
+    ]
+    server.stop()
+    results += [
+        ('geoip per call, offline', benchmark.run(benchmark.read_geoip)),
+        ('provider, no gps, offline', benchmark.run(without_fix.location)),
+    ]
+
+    for name, (milliseconds, failures) in results:
+        print('{0:<28} {1:9.3f} ms/read  {2:3d} reads without a location'.format(name, milliseconds, failures))
+
+
+if __name__ == '__main__':
+    main()
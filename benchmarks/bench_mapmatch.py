@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#
+# benchmark for road matching: time to snap a fix to the nearest road on growing synthetic road networks
+#
+# run from the repository root:
+#   python -m benchmarks.bench_mapmatch
+#
+
+import math
+import random
+import time
+
+import numpy
+
+from securityclientpy.mapmatch import RoadMatcher
+
+
+class mapMatchBenchmark(object):
+
+    FIXES = 200
+    NETWORK_SIZES = [10, 100, 1000, 10000]
+    NODES_PER_ROAD = 8
+
+    def network(self, roads):
+        """builds random winding roads around a point, nodes stored as the speed limit store returns them
+
+        returns:
+            [{name, speed_limit, nodes}]
+        """
+        generator = random.Random(roads)
+        network = []
+        for index in range(roads):
+            latitude = 33.0 + generator.uniform(-0.01, 0.01)
+            longitude = -84.0 + generator.uniform(-0.01, 0.01)
+            nodes = [(latitude, longitude)]
+            for i in range(self.NODES_PER_ROAD - 1):
+                latitude += generator.uniform(-0.0005, 0.0005)
+                longitude += generator.uniform(-0.0005, 0.0005)
+                nodes.append((latitude, longitude))
+            network.append({'name': 'road {0}'.format(index), 'speed_limit': '35 mph', 'nodes': numpy.array(nodes)})
+        return network
+
+    @staticmethod
+    def nearest_python(latitude, longitude, roads):
+        """the same point to segment search in plain python, for comparison"""
+        scale = math.cos(math.radians(latitude))
+        best = None
+        for road in roads:
+            nodes = road['python_nodes']
+            for (lat_a, lon_a), (lat_b, lon_b) in zip(nodes[:-1], nodes[1:]):
+                ax, ay = (lat_a - latitude) * 111320.0, (lon_a - longitude) * 111320.0 * scale
+                dx, dy = (lat_b - lat_a) * 111320.0, (lon_b - lon_a) * 111320.0 * scale
+                length_squared = dx * dx + dy * dy
+                t = max(0.0, min(1.0, -(ax * dx + ay * dy) / length_squared)) if length_squared else 0.0
+                distance = math.hypot(ax + dx * t, ay + dy * t)
+                if best is None or distance < best[0]:
+                    best = (distance, road)
+        return best
+
+    def run(self, roads, fn):
+        """returns milliseconds per fix"""
+        generator = random.Random(0)
+        fixes = [(33.0 + generator.uniform(-0.01, 0.01), -84.0 + generator.uniform(-0.01, 0.01))
+                 for i in range(self.FIXES)]
+        start = time.time()
+        for latitude, longitude in fixes:
+            fn(latitude, longitude, roads)
+        return 1000.0 * (time.time() - start) / self.FIXES
+
+
+def main():
+    benchmark = mapMatchBenchmark()
+    matcher = RoadMatcher(max_distance=float('inf'))
+    print('{0:>8}  {1:>10}  {2:>16}  {3:>16}  {4:>16}'.format(
+        'roads', 'segments', 'new roads', 'same roads', 'python loop'))
+    for roads in benchmark.NETWORK_SIZES:
+        network = benchmark.network(roads)
+        for road in network:
+            road['python_nodes'] = road['nodes'].tolist()
+        # A new set of roads has to be flattened first, the same roads again (same tiles) reuse the arrays
+        cold = benchmark.run(network, lambda lat, lon, roads: RoadMatcher(float('inf')).match(lat, lon, roads, 90.0))
+        cached = benchmark.run(network, lambda lat, lon, roads: matcher.match(lat, lon, roads, 90.0))
+        python = benchmark.run(network, benchmark.nearest_python)
+        print('{0:>8}  {1:>10}  {2:>10.3f} ms/fix  {3:>10.3f} ms/fix  {4:>10.3f} ms/fix'.format(
+            roads, roads * (benchmark.NODES_PER_ROAD - 1), cold, cached, python))
+
+
+if __name__ == '__main__':
+    main()
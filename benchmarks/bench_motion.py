@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+#
+# benchmark for camera motion detection: processing time per frame at several camera resolutions
+#
+# run from the repository root:
+#   python -m benchmarks.bench_motion
+#
+
+import time
+
+from securityclientpy.motion import MotionDetector
+from securityclientpy.videostreamer import SyntheticFrameSource
+
+
+class motionBenchmark(object):
+
+    FRAMES = 200
+    RESOLUTIONS = [(320, 240), (640, 480), (1280, 720), (1920, 1080)]
+    PROCESS_WIDTHS = [160, 320, 640]
+
+    def run(self, width, height, process_width):
+        """runs the detector over synthetic frames
+
+        returns:
+            float, int (milliseconds per frame, frames with motion)
+        """
+        source = SyntheticFrameSource(width, height, realtime=False)
+        frames = [source.read()[1] for i in range(20)]
+        detector = MotionDetector(process_width=process_width)
+        detector.update(frames[0])
+
+        detections = 0
+        start = time.time()
+        for i in range(self.FRAMES):
+            motion, area = detector.update(frames[i % len(frames)])
+            detections += motion
+        return 1000.0 * (time.time() - start) / self.FRAMES, detections
+
+
+def main():
+    benchmark = motionBenchmark()
+    print('{0:>10}  {1}'.format('camera', '  '.join('process {0:>4}px'.format(w) for w in benchmark.PROCESS_WIDTHS)))
+    for width, height in benchmark.RESOLUTIONS:
+        results = [benchmark.run(width, height, process_width) for process_width in benchmark.PROCESS_WIDTHS]
+        print('{0:>10}  {1}'.format('{0}x{1}'.format(width, height),
+                                    '  '.join('{0:9.3f} ms/frame'.format(ms) for ms, detections in results)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+#
+# benchmark for breach recording: the old unbounded spin loop vs the paced BreachRecorder
+#
+# run from the repository root:
+#   python -m benchmarks.bench_recorder
+#
+
+import os
+import shutil
+import tempfile
+import time
+
+import cv2
+
+from securityclientpy.recorder import BreachRecorder, fourcc
+from securityclientpy.storage import RecordingStore
+from securityclientpy.videostreamer import SyntheticFrameSource, VideoStreamer
+
+
+class recorderBenchmark(object):
+
+    SECONDS = 5.0
+    WIDTH = 640
+    HEIGHT = 480
+    FPS = 15.0
+
+    def __init__(self):
+        self.directory = tempfile.mkdtemp()
+        self.videostream = VideoStreamer(0, no_video=False, source=SyntheticFrameSource(self.WIDTH, self.HEIGHT, self.FPS))
+        self.videostream.start()
+
+    def cleanup(self):
+        self.videostream.release_stream()
+        shutil.rmtree(self.directory)
+
+    def run_spin_loop(self):
+        """writes the latest frame as fast as possible, hardcoded to 20 fps like the old _breached
+
+        returns:
+            int, float (frames written, cpu seconds)
+        """
+        writer = cv2.VideoWriter(os.path.join(self.directory, 'spin.avi'), fourcc('MJPG'), 20, (self.WIDTH, self.HEIGHT))
+        frames = 0
+        cpu_start = sum(os.times()[:2])
+        end = time.time() + self.SECONDS
+        while time.time() < end:
+            status, frame = self.videostream.get_frame()
+            if status:
+                writer.write(frame)
+                frames += 1
+        writer.release()
+        return frames, sum(os.times()[:2]) - cpu_start
+
+    def run_recorder(self):
+        """records through BreachRecorder
+
+        returns:
+            dict
+        """
+        recorder = BreachRecorder(self.videostream, RecordingStore(os.path.join(self.directory, 'paced')), codec='MJPG')
+        recorder.start()
+        time.sleep(self.SECONDS)
+        recorder.stop()
+        return recorder.stats()
+
+
+def main():
+    benchmark = recorderBenchmark()
+    expected = int(benchmark.SECONDS * benchmark.FPS)
+    frames, cpu_seconds = benchmark.run_spin_loop()
+    print('spin loop  frames {0:>5} (expected {1}, plays back {2:5.1f}x too long)  cpu {3:5.1f}%'.format(
+        frames, expected, frames / 20.0 / benchmark.SECONDS, 100.0 * cpu_seconds / benchmark.SECONDS))
+    stats = benchmark.run_recorder()
+    print('recorder   frames {0:>5} (expected {1}, repeated {2}, skipped {3}, dropped {4})  cpu {5:5.1f}%'.format(
+        stats['frames_written'], expected, stats['frames_repeated'], stats['frames_skipped'], stats['frames_dropped'],
+        100.0 * stats['cpu_seconds'] / benchmark.SECONDS))
+    benchmark.cleanup()
+
+
+if __name__ == '__main__':
+    main()
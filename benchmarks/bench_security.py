@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+#
+# benchmark for arm / disarm response latency: how long the /security routes take to return, and how
+# long the armed thread takes to notice a disarm during the exit delay and once armed, on simulated
+# drivers
+#
+# run from the repository root:
+#   python -m benchmarks.bench_security
+#
+
+import logging
+import shutil
+import tempfile
+import time
+
+from securityclientpy.drivers import SimulatedDrivers, QUIET_PATTERNS
+from securityclientpy.hwcontroller import HardwareController
+from securityclientpy.routes import app
+from securityclientpy.routes.security import Security
+from securityclientpy.statemachine import ARMED, DISARMED
+
+
+class securityBenchmark(object):
+
+    CYCLES = 50
+    SYSTEM_ID = 'BENCH'
+
+    def __init__(self):
+        self.directory = tempfile.mkdtemp()
+        self.hwcontroller = HardwareController(False, None, drivers=SimulatedDrivers(QUIET_PATTERNS))
+        self.security = Security(False, True, self.SYSTEM_ID, self.hwcontroller, None, data_dir=self.directory)
+        self.threads = self.security.security_threads
+        self.client = app.test_client()
+
+    def close(self):
+        self.threads.quit_successfully()
+        shutil.rmtree(self.directory)
+
+    def _post(self, path):
+        """posts to a security route
+
+        returns:
+            float (seconds until the response came back)
+        """
+        start = time.time()
+        response = self.client.post('/security/{0}'.format(path), json={'system_id': self.SYSTEM_ID})
+        elapsed = time.time() - start
+        assert response.get_json()['code'] == 201
+        return elapsed
+
+    def _disarmed(self):
+        """disarms and times how long the armed thread keeps running afterwards
+
+        returns:
+            float, float (route seconds, seconds until the armed thread ended)
+        """
+        start = time.time()
+        route = self._post('disarm')
+        self.threads.armed_thread.join()
+        return route, time.time() - start
+
+    def during_exit_delay(self):
+        """arm, then disarm straight away while the 5 s exit delay runs
+
+        returns:
+            {arm, disarm, armed_thread}: [float] (seconds)
+        """
+        results = {'arm': [], 'disarm': [], 'armed_thread': []}
+        for i in range(self.CYCLES):
+            results['arm'].append(self._post('arm'))
+            route, thread = self._disarmed()
+            results['disarm'].append(route)
+            results['armed_thread'].append(thread)
+        return results
+
+    def once_armed(self):
+        """arm, wait for the armed loop, then disarm
+
+        returns:
+            {disarm, armed_thread}: [float] (seconds)
+        """
+        self.threads._ARMING_DELAY_SECONDS = 0.01
+        self.threads._INITIAL_MOTION_SECONDS = 0.01
+        results = {'disarm': [], 'armed_thread': []}
+        for i in range(self.CYCLES):
+            self._post('arm')
+            status = self.threads.status
+            while status.state != ARMED:
+                status = self.threads.state.wait(status.version)
+            route, thread = self._disarmed()
+            results['disarm'].append(route)
+            results['armed_thread'].append(thread)
+        assert self.threads.status.state == DISARMED
+        return results
+
+
+def _report(name, latencies):
+    latencies = sorted(latencies)
+    print('{0:<40} {1:>10.2f} {2:>10.2f}'.format(
+        name, 1e3 * latencies[len(latencies) // 2], 1e3 * latencies[int(0.99 * (len(latencies) - 1))]))
+
+
+def main():
+    logging.getLogger('securityclientpy').setLevel(logging.WARNING)
+    benchmark = securityBenchmark()
+    try:
+        print('{0:<40} {1:>10} {2:>10}'.format('milliseconds', 'p50', 'p99'))
+        results = benchmark.during_exit_delay()
+        _report('arm route', results['arm'])
+        _report('disarm route (exit delay)', results['disarm'])
+        _report('armed thread ended (exit delay)', results['armed_thread'])
+        results = benchmark.once_armed()
+        _report('disarm route (armed)', results['disarm'])
+        _report('armed thread ended (armed)', results['armed_thread'])
+    finally:
+        benchmark.close()
+
+
+if __name__ == '__main__':
+    main()
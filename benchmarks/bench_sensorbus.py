@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+#
+# benchmark for sensor edge detection latency: 0.3 s polling vs the sensor event bus
+#
+# run from the repository root:
+#   python -m benchmarks.bench_sensorbus
+#
+
+import random
+import threading
+import time
+
+from securityclientpy.fakegpio import FakeGPIO
+from securityclientpy.sensorbus import SensorEventBus
+
+
+class sensorBusBenchmark(object):
+
+    VIBRATION_PIN = 27
+    POLL_SECONDS = 0.3
+
+    def __init__(self, pulses=40, min_width=0.005, max_width=0.08, min_gap=0.05, max_gap=0.25):
+        self.gpio = FakeGPIO()
+        self.gpio.setup(self.VIBRATION_PIN, self.gpio.IN, pull_up_down=self.gpio.PUD_DOWN)
+        self.pulses = pulses
+        self.widths = (min_width, max_width)
+        self.gaps = (min_gap, max_gap)
+        self.pulse_times = []
+        self.running = True
+
+    def generate_pulses(self):
+        """drives short random pulses on the vibration pin"""
+        rng = random.Random(1)
+        for i in range(self.pulses):
+            time.sleep(rng.uniform(*self.gaps))
+            self.pulse_times.append(time.time())
+            self.gpio.set_input(self.VIBRATION_PIN, True)
+            time.sleep(rng.uniform(*self.widths))
+            self.gpio.set_input(self.VIBRATION_PIN, False)
+        time.sleep(self.POLL_SECONDS)
+        self.running = False
+
+    def run_polling(self):
+        """samples the pin every POLL_SECONDS like the old armed loop
+
+        returns:
+            int, [float] (pulses detected, detection latencies)
+        """
+        detected = []
+        was_high = False
+        while self.running:
+            high = self.gpio.input(self.VIBRATION_PIN)
+            if high and not was_high:
+                detected.append(time.time())
+            was_high = high
+            time.sleep(self.POLL_SECONDS)
+        return detected
+
+    def run_event_bus(self):
+        """consumes rising edges from the sensor event bus
+
+        returns:
+            [float], int (detection times, missed events)
+        """
+        bus = SensorEventBus(self.gpio, {'vibration': self.VIBRATION_PIN})
+        bus.start()
+        reader = bus.subscribe()
+        detected = []
+        while self.running:
+            for event in reader.wait(0.1):
+                if event.value:
+                    detected.append(time.time())
+        bus.stop()
+        return detected, reader.missed
+
+
+def _latencies(pulse_times, detected):
+    latencies = []
+    for detection in detected:
+        earlier = [t for t in pulse_times if t <= detection]
+        if earlier:
+            latencies.append(detection - earlier[-1])
+    return latencies
+
+
+def _report(name, pulses, detected, latencies):
+    latencies = sorted(latencies) or [0.0]
+    print('{0:<10} detected {1:>3}/{2:<3} ({3:5.1f}% missed)  latency mean {4:7.2f} ms  p99 {5:7.2f} ms'.format(
+        name, len(detected), pulses, 100.0 * (pulses - min(len(detected), pulses)) / pulses,
+        1000.0 * sum(latencies) / len(latencies), 1000.0 * latencies[int(0.99 * (len(latencies) - 1))]))
+
+
+def main():
+    for mode in ('polling', 'event bus'):
+        benchmark = sensorBusBenchmark()
+        result = {}
+
+        def consume():
+            if mode == 'polling':
+                result['detected'] = benchmark.run_polling()
+            else:
+                result['detected'], result['missed'] = benchmark.run_event_bus()
+
+        consumer = threading.Thread(target=consume)
+        consumer.start()
+        time.sleep(0.05)
+        benchmark.generate_pulses()
+        consumer.join()
+        _report(mode, benchmark.pulses, result['detected'], _latencies(benchmark.pulse_times, result['detected']))
+
+
+if __name__ == '__main__':
+    main()
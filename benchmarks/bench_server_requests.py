@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+# benchmark for alert round-trip latency: bare requests.post vs the pooled keep-alive transport
+#
+# run from the repository root:
+#   python -m benchmarks.bench_server_requests
+#
+
+import time
+
+import requests
+
+from securityclientpy.server_requests import ServerRequests
+from tests.stub_server import StubServer
+
+
+class serverRequestsBenchmark(object):
+
+    ALERTS = 200
+
+    def __init__(self, server):
+        self.server = server
+        self.url = 'http://{0}:{1}/security/panic'.format(server.host, server.port)
+
+    def run_bare_post(self):
+        """sends alerts the old way, one connection per request
+
+        returns:
+            [float]
+        """
+        latencies = []
+        for i in range(self.ALERTS):
+            start = time.time()
+            response = requests.post(self.url, json={'system_id': 'BENCH'})
+            if not response.json():
+                continue
+            response.json()
+            latencies.append(time.time() - start)
+        return latencies
+
+    def run_pooled(self):
+        """sends alerts through ServerRequests and its keep-alive transport
+
+        returns:
+            [float], dict
+        """
+        server_requests = ServerRequests(self.server.host, 'BENCH', port=self.server.port)
+        latencies = []
+        for i in range(self.ALERTS):
+            start = time.time()
+            server_requests.send_panic_alert()
+            latencies.append(time.time() - start)
+        stats = server_requests.stats()
+        server_requests.close()
+        return latencies, stats
+
+
+def _report(name, latencies):
+    latencies = sorted(latencies)
+    print('{0:<8} mean {1:6.3f} ms  p50 {2:6.3f} ms  p99 {3:6.3f} ms'.format(
+        name, 1000.0 * sum(latencies) / len(latencies), 1000.0 * latencies[len(latencies) // 2],
+        1000.0 * latencies[int(0.99 * (len(latencies) - 1))]))
+
+
+def main():
+    server = StubServer().start()
+    benchmark = serverRequestsBenchmark(server)
+    _report('before', benchmark.run_bare_post())
+    latencies, stats = benchmark.run_pooled()
+    _report('after', latencies)
+    print('connections opened {0}, reused {1}'.format(stats['connections'], stats['reused_connections']))
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
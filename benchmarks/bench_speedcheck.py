@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#
+# benchmark for speed check scheduling: fixed 30 s checks vs the adaptive scheduler over a simulated day
+#
+# run from the repository root:
+#   python -m benchmarks.bench_speedcheck
+#
+
+from securityclientpy.mapmatch import RoadMatcher
+from securityclientpy.speedcheck import SpeedCheckScheduler
+
+
+class speedCheckBenchmark(object):
+
+    METERS_PER_DEGREE = 111320.0
+    FIXED_INTERVAL = 30.0
+    WAY_LENGTH = 1000.0
+    # (name, seconds, speed mph, speed limit mph): parked, a commute with a speeding stretch, parked again
+    DRIVE = [
+        ('parked', 4 * 3600, 0.0, 25.0),
+        ('city', 15 * 60, 30.0, 35.0),
+        ('city, speeding', 5 * 60, 48.0, 35.0),
+        ('highway', 40 * 60, 68.0, 65.0),
+        ('highway, speeding', 10 * 60, 80.0, 65.0),
+        ('highway', 20 * 60, 68.0, 65.0),
+        ('parked', 8 * 3600, 0.0, 25.0),
+    ]
+
+    def __init__(self):
+        self.time = 0.0
+        self.lookups = 0
+
+    def position(self, t):
+        """returns the position (meters driven north), speed and limit at a time"""
+        start = 0.0
+        distance = 0.0
+        for name, seconds, speed, limit in self.DRIVE:
+            if t < start + seconds:
+                return distance + (t - start) * speed * 0.44704, speed, limit
+            start += seconds
+            distance += seconds * speed * 0.44704
+        return distance, 0.0, self.DRIVE[-1][3]
+
+    def roads(self, north, limit):
+        """the ways around a position: the road split into 1 km ways, plus a cross street"""
+        index = int(north // self.WAY_LENGTH)
+        south_end = index * self.WAY_LENGTH / self.METERS_PER_DEGREE
+        north_end = (index + 1) * self.WAY_LENGTH / self.METERS_PER_DEGREE
+        latitude = north / self.METERS_PER_DEGREE
+        self.lookups += 1
+        return [
+            {'name': 'way {0}'.format(index), 'speed_limit': '{0} mph'.format(int(limit)),
+             'nodes': [(south_end, 0.0), (north_end, 0.0)]},
+            {'name': 'cross', 'speed_limit': '25 mph', 'nodes': [(latitude, -0.001), (latitude, 0.001)]},
+        ]
+
+    @property
+    def duration(self):
+        return sum(phase[1] for phase in self.DRIVE)
+
+    def run_fixed(self):
+        """the old loop: look up and compare every 30 s, alert on every check over the limit"""
+        matcher = RoadMatcher()
+        self.lookups = 0
+        checks = alerts = 0
+        speeding_since = None
+        delays = []
+        t = 0.0
+        while t < self.duration:
+            north, speed, limit = self.position(t)
+            road = matcher.match(north / self.METERS_PER_DEGREE, 0.0, self.roads(north, limit), 0.0)
+            checks += 1
+            if speed > road.speed_limit + 10.0:
+                alerts += 1
+                if speeding_since is None:
+                    speeding_since = t
+                    delays.append(self.FIXED_INTERVAL)
+            else:
+                speeding_since = None
+            t += self.FIXED_INTERVAL
+        return checks, self.lookups, alerts, delays
+
+    def run_adaptive(self):
+        """the scheduler driving the same loop"""
+        clock = lambda: self.time
+        self.time = 0.0
+        self.lookups = 0
+        scheduler = SpeedCheckScheduler(RoadMatcher(), clock=clock)
+        while self.time < self.duration:
+            north, speed, limit = self.position(self.time)
+            heading = 0.0 if speed >= 5.0 else None
+            road = scheduler.match(north / self.METERS_PER_DEGREE, 0.0, heading, lambda: self.roads(north, limit))
+            scheduler.check(road is not None and speed > road.speed_limit + 10.0)
+            self.time += scheduler.next_interval(speed)
+        stats = scheduler.stats()
+        return stats['checks'], self.lookups, stats['alerts'], stats
+
+
+def main():
+    benchmark = speedCheckBenchmark()
+    hours = benchmark.duration / 3600.0
+    checks, lookups, alerts, delays = benchmark.run_fixed()
+    print('{0:<10} {1:>12} {2:>14} {3:>8} {4:>22}'.format('', 'checks/hour', 'lookups/hour', 'alerts', 'detection delay (max)'))
+    print('{0:<10} {1:>12.1f} {2:>14.1f} {3:>8d} {4:>20.1f} s'.format(
+        'fixed 30 s', checks / hours, lookups / hours, alerts, max(delays)))
+    checks, lookups, alerts, stats = benchmark.run_adaptive()
+    print('{0:<10} {1:>12.1f} {2:>14.1f} {3:>8d} {4:>20.1f} s'.format(
+        'adaptive', stats['checks_per_hour'], lookups / hours, alerts, stats['max_detection_delay']))
+    print('{0:.1f} hour day, {1:.1f} hours driving'.format(
+        hours, sum(phase[1] for phase in benchmark.DRIVE if phase[2]) / 3600.0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+#
+# benchmark for the offline speed limit store: lookup time near a position for growing road networks
+#
+# run from the repository root:
+#   python -m benchmarks.bench_speedlimits
+#
+
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from securityclientpy.speedlimits import SpeedLimitStore
+
+
+class speedLimitsBenchmark(object):
+
+    LOOKUPS = 1000
+    NETWORK_SIZES = [1000, 10000, 50000]
+    AREA_DEGREES = 0.5
+    ORIGIN = (33.5, -84.6)
+
+    def build(self, path, ways):
+        """fills a store with random short roads over the benchmark area
+
+        returns:
+            SpeedLimitStore, float (seconds spent importing)
+        """
+        generator = random.Random(ways)
+        roads = []
+        for way_id in range(ways):
+            latitude = self.ORIGIN[0] + generator.random() * self.AREA_DEGREES
+            longitude = self.ORIGIN[1] + generator.random() * self.AREA_DEGREES
+            nodes = [(latitude, longitude)]
+            for i in range(4):
+                latitude += generator.uniform(-0.002, 0.002)
+                longitude += generator.uniform(-0.002, 0.002)
+                nodes.append((latitude, longitude))
+            roads.append({'id': way_id, 'name': 'road', 'maxspeed': '35 mph', 'nodes': nodes})
+
+        store = SpeedLimitStore(path)
+        start = time.time()
+        store.import_ways(roads)
+        return store, time.time() - start
+
+    def run(self, store, drive):
+        """looks up roads along a drive (consecutive positions reuse cached tiles)
+
+        returns:
+            float, float (milliseconds per lookup, roads found per lookup)
+        """
+        found = 0
+        start = time.time()
+        for latitude, longitude in drive:
+            found += len(store.nearby(latitude, longitude, 100.0))
+        return 1000.0 * (time.time() - start) / len(drive), float(found) / len(drive)
+
+
+def main():
+    benchmark = speedLimitsBenchmark()
+    directory = tempfile.mkdtemp()
+    try:
+        # A drive across the area sampled every ~30 m, and positions scattered at random
+        drive = [(benchmark.ORIGIN[0] + 0.25, benchmark.ORIGIN[1] + 0.5 * i / benchmark.LOOKUPS * benchmark.AREA_DEGREES)
+                 for i in range(benchmark.LOOKUPS)]
+        generator = random.Random(0)
+        scattered = [(benchmark.ORIGIN[0] + generator.random() * benchmark.AREA_DEGREES,
+                      benchmark.ORIGIN[1] + generator.random() * benchmark.AREA_DEGREES)
+                     for i in range(benchmark.LOOKUPS)]
+
+        print('{0:>8}  {1:>10}  {2:>20}  {3:>20}'.format('ways', 'import', 'driving lookup', 'scattered lookup'))
+        for ways in benchmark.NETWORK_SIZES:
+            path = os.path.join(directory, 'speedlimits-{0}.db'.format(ways))
+            store, import_seconds = benchmark.build(path, ways)
+            drive_ms, drive_found = benchmark.run(store, drive)
+            scattered_ms, scattered_found = benchmark.run(store, scattered)
+            print('{0:>8}  {1:>8.2f} s  {2:>8.3f} ms ({3:4.1f} roads)  {4:>8.3f} ms ({5:4.1f} roads)'.format(
+                ways, import_seconds, drive_ms, drive_found, scattered_ms, scattered_found))
+            print('{0:>8}  cache hits {1}, misses {2}'.format('', store.cache_hits, store.cache_misses))
+            store.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
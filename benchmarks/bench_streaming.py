@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+# benchmark for the mjpeg live stream: frames per second and cpu cost per additional viewer
+#
+# run from the repository root:
+#   python -m benchmarks.bench_streaming
+#
+
+import os
+import threading
+import time
+
+from securityclientpy.streaming import MjpegBroadcaster
+from securityclientpy.videostreamer import SyntheticFrameSource, VideoStreamer
+
+
+class streamingBenchmark(object):
+
+    SECONDS = 3.0
+    WIDTH = 640
+    HEIGHT = 480
+    FPS = 30.0
+
+    def __init__(self):
+        self.videostream = VideoStreamer(0, no_video=False, source=SyntheticFrameSource(self.WIDTH, self.HEIGHT, self.FPS))
+        self.videostream.start()
+
+    def cleanup(self):
+        self.videostream.release_stream()
+
+    def run(self, viewers):
+        """streams to a number of viewers that read frames as fast as they arrive
+
+        returns:
+            float, float (mean frames per second per viewer, process cpu percent)
+        """
+        broadcaster = MjpegBroadcaster(self.videostream, max_fps=self.FPS)
+        subscribers = [broadcaster.subscribe() for i in range(viewers)]
+        running = [True]
+
+        def watch(subscriber):
+            while running[0]:
+                subscriber.next_frame(0.5)
+
+        threads = [threading.Thread(target=watch, args=(subscriber,)) for subscriber in subscribers]
+        cpu_start = sum(os.times()[:2])
+        for thread in threads:
+            thread.start()
+        time.sleep(self.SECONDS)
+        running[0] = False
+        for thread in threads:
+            thread.join()
+        cpu_seconds = sum(os.times()[:2]) - cpu_start
+        for subscriber in subscribers:
+            subscriber.close()
+
+        fps = sum(subscriber.frames_sent for subscriber in subscribers) / float(viewers) / self.SECONDS
+        return fps, 100.0 * cpu_seconds / self.SECONDS
+
+
+def main():
+    benchmark = streamingBenchmark()
+    baseline = None
+    for viewers in (1, 2, 4, 8, 16):
+        fps, cpu = benchmark.run(viewers)
+        baseline = cpu if baseline is None else baseline
+        print('{0:>2} viewers  {1:5.1f} fps each  cpu {2:5.1f}%  (+{3:4.2f}% per extra viewer)'.format(
+            viewers, fps, cpu, (cpu - baseline) / max(1, viewers - 1)))
+    benchmark.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+#
+# benchmark for temperature alerting: false alerts on a week of benign readings, detection time in hot cars,
+# and cost per sample
+#
+# run from the repository root:
+#   python -m benchmarks.bench_thermal
+#
+
+import logging
+import math
+import random
+import time
+
+from securityclientpy.thermal import TemperatureMonitor, TemperatureSample
+
+
+class thermalBenchmark(object):
+
+    INTERVAL = 5.0
+    THRESHOLD = 85.0
+    DAYS = 7
+    # Share of readings that pass the CRC but are way off (electrical noise on a long 1-Wire run)
+    GLITCH_RATE = 0.002
+
+    def _sample(self, t, fahrenheit):
+        return TemperatureSample(round((fahrenheit - 32.0) * 5.0 / 9.0, 1), round(fahrenheit, 1), t)
+
+    def benign(self, seed=0):
+        """a week parked in the shade: daily cycle peaking a little under the threshold, sensor noise, glitches"""
+        generator = random.Random(seed)
+        samples = []
+        for step in range(int(self.DAYS * 86400 / self.INTERVAL)):
+            t = step * self.INTERVAL
+            fahrenheit = 72.0 + 11.0 * math.sin(2 * math.pi * (t / 86400.0 - 0.375)) + generator.gauss(0, 0.4)
+            if generator.random() < self.GLITCH_RATE:
+                fahrenheit += generator.uniform(10.0, 40.0)
+            samples.append(self._sample(t, fahrenheit))
+        return samples
+
+    def hot_cars(self, count=20, seed=1):
+        """cabins heating in the sun from 72-84F at 0.5-3F a minute towards 130F
+
+        returns:
+            [(samples, seconds until the true temperature reaches the threshold)]
+        """
+        generator = random.Random(seed)
+        cars = []
+        for _ in range(count):
+            start = generator.uniform(72.0, 84.0)
+            rate = generator.uniform(0.5, 3.0) / 60.0
+            samples = []
+            crossed = None
+            for step in range(int(3600 / self.INTERVAL)):
+                t = step * self.INTERVAL
+                true = min(130.0, start + rate * t)
+                if crossed is None and true >= self.THRESHOLD:
+                    crossed = t
+                samples.append(self._sample(t, true + generator.gauss(0, 0.4)))
+            cars.append((samples, crossed))
+        return cars
+
+    def raw(self, samples):
+        """the armed loop's check: every reading at or over the threshold, one alert per crossing
+
+        returns:
+            (alerts, time of the first alert)
+        """
+        alerts = 0
+        first = None
+        hot = False
+        for sample in samples:
+            over = sample.fahrenheit >= self.THRESHOLD
+            if over and not hot:
+                alerts += 1
+                first = sample.time if first is None else first
+            hot = over
+        return alerts, first
+
+    def monitored(self, samples):
+        """the monitor's alerts
+
+        returns:
+            (alerts, time of the first alert, time of the first over temperature alert, seconds per sample)
+        """
+        monitor = TemperatureMonitor(threshold=self.THRESHOLD)
+        alerts = []
+        start = time.time()
+        for sample in samples:
+            alerts.extend(monitor.add_sample(sample))
+        elapsed = time.time() - start
+        first = alerts[0].time if alerts else None
+        over = [alert.time for alert in alerts if alert.kind == TemperatureMonitor.OVER_TEMPERATURE]
+        return len(alerts), first, over[0] if over else None, elapsed / len(samples)
+
+
+def main():
+    # Alerts are logged, keep that out of the timings
+    logging.getLogger('securityclientpy').setLevel(logging.WARNING)
+    benchmark = thermalBenchmark()
+    samples = benchmark.benign()
+    raw_alerts, _ = benchmark.raw(samples)
+    alerts, _, _, seconds = benchmark.monitored(samples)
+    print('{0} days of benign readings every {1:.0f} s ({2} samples, {3:.1f}% glitched)'.format(
+        benchmark.DAYS, benchmark.INTERVAL, len(samples), 100 * benchmark.GLITCH_RATE))
+    print('{0:<36} {1:>10} {2:>10}'.format('', 'raw check', 'monitor'))
+    print('{0:<36} {1:>10.1f} {2:>10.1f}'.format('false alerts per day', raw_alerts / float(benchmark.DAYS),
+                                                 alerts / float(benchmark.DAYS)))
+
+    raw_delays = []
+    first_delays = []
+    over_delays = []
+    missed = 0
+    for car, crossed in benchmark.hot_cars():
+        _, raw_first = benchmark.raw(car)
+        _, first, over, _ = benchmark.monitored(car)
+        if first is None:
+            missed += 1
+            continue
+        raw_delays.append(raw_first - crossed)
+        first_delays.append(first - crossed)
+        over_delays.append(over - crossed)
+    mean = lambda values: sum(values) / len(values)
+    print('{0:<36} {1:>10.0f} {2:>10.0f}'.format('hot car: mean s from 85F to alert', mean(raw_delays),
+                                                 mean(first_delays)))
+    print('{0:<36} {1:>10} {2:>10.0f}'.format('  (over temperature alert only)', '', mean(over_delays)))
+    print('{0:<36} {1:>10} {2:>10d}'.format('hot cars missed', '', missed))
+    print('{0:<36} {1:>21.2f}'.format('microseconds per sample', 1e6 * seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+#
+# benchmark for the gps trip log: disk and memory footprint of days of 1 Hz fixes, query and export cost
+#
+# run from the repository root:
+#   python -m benchmarks.bench_triplog
+#
+
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from securityclientpy.gpsreader import GpsFix
+from securityclientpy.triplog import TripLog
+
+
+class tripLogBenchmark(object):
+
+    METERS_PER_DEGREE = 111320.0
+    ORIGIN = (33.749, -84.388)
+    DAYS = 3
+    # 2020-01-01 00:00 UTC
+    START = 1577836800.0
+    # Driving windows each day (seconds after midnight, seconds)
+    DRIVES = [(7 * 3600, 3600), (12 * 3600, 1800), (17 * 3600, 5400)]
+
+    def fixes(self, seed=0):
+        """one fix a second for days: a few drives a day along winding roads, parked with jitter otherwise"""
+        generator = random.Random(seed)
+        east = north = 0.0
+        heading = 0.0
+        scale = self.METERS_PER_DEGREE * math.cos(math.radians(self.ORIGIN[0]))
+        for second in range(self.DAYS * 86400):
+            t = self.START + second
+            of_day = second % 86400
+            driving = any(start <= of_day < start + length for start, length in self.DRIVES)
+            speed = 0.0
+            if driving:
+                speed = 15.0 + 5.0 * math.sin(second / 90.0)
+                # Straight stretches with a turn every couple of minutes
+                if second % 120 < 10:
+                    heading = (heading + 9.0) % 360.0
+                east += speed * math.sin(math.radians(heading))
+                north += speed * math.cos(math.radians(heading))
+            yield GpsFix(3, None, self.ORIGIN[0] + (north + generator.gauss(0, 2.0)) / self.METERS_PER_DEGREE,
+                         self.ORIGIN[1] + (east + generator.gauss(0, 2.0)) / scale, 300.0, speed, 0.0, heading,
+                         8.0, 8.0, 20.0, 1.0, t)
+
+    def run(self, root):
+        trip_log = TripLog(root)
+        start = time.time()
+        fixes = 0
+        for fix in self.fixes():
+            trip_log.add_fix(fix)
+            fixes += 1
+        write_seconds = time.time() - start
+        trip_log.close()
+        disk_bytes = sum(os.path.getsize(trip_log.day_path(day)) for day in trip_log.days())
+
+        day_end = self.START + 86400.0
+        start = time.time()
+        trips = trip_log.trips(self.START, day_end, tolerance=5.0)
+        geojson = json.dumps(TripLog.to_geojson(trips))
+        query_seconds = time.time() - start
+
+        # Same query again, traced (tracing slows it down too much to time it)
+        tracemalloc.start()
+        json.dumps(TripLog.to_geojson(trip_log.trips(self.START, day_end, tolerance=5.0)))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        start = time.time()
+        hour = trip_log.points(self.START + 7 * 3600, self.START + 8 * 3600)
+        hour_seconds = time.time() - start
+
+        logged = trip_log.points(self.START, day_end)
+        return {
+            'fixes': fixes,
+            'records': trip_log.records,
+            'disk_bytes': disk_bytes,
+            'microseconds_per_fix': 1e6 * write_seconds / fixes,
+            'trips': len(trips),
+            'day_points': len(logged),
+            'day_points_simplified': sum(len(trip['points']) for trip in trips),
+            'geojson_bytes': len(geojson),
+            'day_query_ms': 1e3 * query_seconds,
+            'day_query_peak_bytes': peak,
+            'hour_query_ms': 1e3 * hour_seconds,
+            'hour_points': len(hour),
+        }
+
+
+def main():
+    benchmark = tripLogBenchmark()
+    root = tempfile.mkdtemp()
+    try:
+        results = benchmark.run(os.path.join(root, 'trips'))
+    finally:
+        shutil.rmtree(root)
+    print('{0} fixes over {1} days, {2} logged ({3:.1f} KB on disk, {4:.1f} us per fix)'.format(
+        results['fixes'], benchmark.DAYS, results['records'], results['disk_bytes'] / 1024.0,
+        results['microseconds_per_fix']))
+    print('one day: {0} trips, {1} points downsampled to {2} at 5 m, {3:.1f} KB of GeoJSON'.format(
+        results['trips'], results['day_points'], results['day_points_simplified'], results['geojson_bytes'] / 1024.0))
+    print('day query + export: {0:.1f} ms, peak {1:.1f} KB allocated'.format(
+        results['day_query_ms'], results['day_query_peak_bytes'] / 1024.0))
+    print('one hour range query: {0} points in {1:.2f} ms'.format(results['hour_points'], results['hour_query_ms']))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,28 +3,57 @@
 # client module
 #
 
+import os
+
 from securityclientpy import _logger, get_mac_address, port
 from securityclientpy.server_requests import ServerRequests
 from securityclientpy.routes.security import Security
 from securityclientpy.routes.system import System
+from securityclientpy.routes.video import Video
 from securityclientpy.hwcontroller import HardwareController
+from securityclientpy.drivers import SimulatedDrivers, load_patterns
+from securityclientpy.triplog import TripLog
+from securityclientpy.eventlog import EventRecorder
 from securityclientpy.routes import app
 
 
 class Client(object):
     """security client class"""
 
-    def __init__(self, host, serverhost, no_hardware=False, no_video=False, dev=False, testing=False):
-        """constructor method"""
+    _OUTBOX_FILENAME = 'outbox.db'
+    _TRIPS_DIRNAME = 'trips'
+    _EVENTS_DIRNAME = 'events'
+
+    def __init__(self, host, serverhost, no_hardware=False, no_video=False, dev=False, testing=False, data_dir='.',
+                 simulation='quiet'):
+        """constructor method
+
+        args:
+            simulation: str (simulated sensors with no_hardware, see drivers.load_patterns)
+        """
         self.host = host
+        self.data_dir = data_dir
         self.system_id = self.get_device_id(dev, testing)
         _logger.info('System ID = {0}'.format(self.system_id))
-        self.server_requests = ServerRequests(serverhost, self.system_id)
-        self.hwcontroller = HardwareController(no_hardware, self.server_requests)
+        if not os.path.isdir(self.data_dir):
+            os.makedirs(self.data_dir)
+        self.server_requests = ServerRequests(
+            serverhost, self.system_id, outbox_path=os.path.join(self.data_dir, self._OUTBOX_FILENAME)
+        )
+        drivers = SimulatedDrivers(load_patterns(simulation)) if no_hardware else None
+        self.hwcontroller = HardwareController(no_hardware, self.server_requests, drivers=drivers)
+        self.trip_log = TripLog(os.path.join(self.data_dir, self._TRIPS_DIRNAME), self.hwcontroller.gps_reader)
+        # Every sensor reading and armed state change, to reproduce false alarms offline
+        self.event_recorder = EventRecorder(os.path.join(self.data_dir, self._EVENTS_DIRNAME))
+        self.event_recorder.attach(self.hwcontroller)
 
         # Routes
-        self.security = Security(no_hardware, no_video, self.system_id, self.hwcontroller, self.server_requests)
-        self.system = System(self.system_id, self.hwcontroller)
+        self.security = Security(
+            no_hardware, no_video, self.system_id, self.hwcontroller, self.server_requests, data_dir=self.data_dir
+        )
+        self.system = System(self.system_id, self.hwcontroller, self.trip_log)
+        self.video = Video(self.system_id, None if no_video else self.security.security_threads.videostream)
+        self.security.security_threads.add_listener(self.event_recorder.record_state)
 
         # Initialize system with server
         self._initialize_client()
@@ -41,8 +70,7 @@ class Client(object):
             if not config: return
 
             # Update local security configs
-            self.security.security_threads.system_armed = config['system_armed']
-            self.security.security_threads.system_breached = config['system_breached']
+            self.security.security_threads.restore_state(config['system_armed'], config['system_breached'])
         else:
             if not self.server_requests.add_connection(self.host, port): return
             if not self.server_requests.add_security_config(): return
@@ -58,6 +86,9 @@ class Client(object):
 
         _logger.info('Saving security session.')
         self.security.security_threads.quit_successfully()
+        self.trip_log.close()
+        self.event_recorder.close()
+        self.server_requests.close()
 
     def get_device_id(self, dev, testing):
         """method to get particular device id for different development levels
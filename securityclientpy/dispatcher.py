@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+#
+# alert dispatcher module
+#
+
+from concurrent.futures import Future
+import heapq
+import itertools
+import threading
+import time
+
+from securityclientpy import _logger
+
+
+class DispatchQueueFull(Exception):
+    """raised on a future whose request was rejected or evicted from a full dispatch queue"""
+
+
+class AlertDispatcher(object):
+    """runs server requests on worker threads from a bounded priority queue
+
+    Callers (gpio callbacks, the armed loop) submit a request and get a future back immediately, so
+    they never wait on the network. Lower priority values run first; when the queue is full a new
+    request evicts the newest request of the lowest priority if it outranks it, otherwise it is rejected.
+    """
+
+    PRIORITY_PANIC = 0
+    PRIORITY_BREACH = 1
+    PRIORITY_ALERT = 2
+    PRIORITY_TELEMETRY = 3
+
+    _WORKERS = 2
+    _MAX_QUEUE_SIZE = 64
+
+    def __init__(self, workers=_WORKERS, max_queue_size=_MAX_QUEUE_SIZE):
+        """constructor method
+
+        args:
+            workers: int
+            max_queue_size: int
+        """
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self._queue = []
+        self._condition = threading.Condition()
+        self._sequence = itertools.count()
+        self._threads = []
+        self._running = False
+
+        self._submitted = 0
+        self._dispatched = 0
+        self._dropped = 0
+        self._max_depth = 0
+        self._total_wait = 0.0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+
+    def start(self):
+        with self._condition:
+            if self._running: return
+            self._running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_thread)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5.0):
+        """stops the workers once the queued requests have been sent
+
+        args:
+            timeout: float
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, priority, function, *args, **kwargs):
+        """queues a request
+
+        args:
+            priority: int
+            function: callable
+
+        returns:
+            concurrent.futures.Future
+        """
+        future = Future()
+        entry = (priority, next(self._sequence), time.time(), future, function, args, kwargs)
+        rejected = None
+        with self._condition:
+            self._submitted += 1
+            if len(self._queue) >= self.max_queue_size:
+                worst = max(self._queue)
+                if entry[:2] < worst[:2]:
+                    self._queue.remove(worst)
+                    heapq.heapify(self._queue)
+                    rejected = worst[3]
+                else:
+                    rejected = future
+                self._dropped += 1
+
+            if rejected is not future:
+                heapq.heappush(self._queue, entry)
+                self._max_depth = max(self._max_depth, len(self._queue))
+                self._condition.notify()
+
+        if rejected is not None:
+            _logger.info('Dispatch queue full, dropped a request')
+            rejected.set_exception(DispatchQueueFull('dispatch queue full'))
+        return future
+
+    def stats(self):
+        """returns queue depth and dispatch latency counters
+
+        returns:
+            {queue_depth, max_queue_depth, submitted, dispatched, dropped, mean_queue_wait, mean_latency, max_latency}
+        """
+        with self._condition:
+            dispatched = self._dispatched
+            return {
+                'queue_depth': len(self._queue),
+                'max_queue_depth': self._max_depth,
+                'submitted': self._submitted,
+                'dispatched': dispatched,
+                'dropped': self._dropped,
+                'mean_queue_wait': self._total_wait / dispatched if dispatched else 0.0,
+                'mean_latency': self._total_latency / dispatched if dispatched else 0.0,
+                'max_latency': self._max_latency,
+            }
+
+    def _worker_thread(self):
+        """pops the most urgent request and runs it until stopped and drained"""
+        while True:
+            with self._condition:
+                while not self._queue and self._running:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                priority, sequence, queued, future, function, args, kwargs = heapq.heappop(self._queue)
+
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            started = time.time()
+            try:
+                future.set_result(function(*args, **kwargs))
+            except Exception as exception:
+                _logger.info('Dispatched request failed [{0}]'.format(exception))
+                future.set_exception(exception)
+
+            finished = time.time()
+            with self._condition:
+                self._dispatched += 1
+                self._total_wait += started - queued
+                self._total_latency += finished - queued
+                self._max_latency = max(self._max_latency, finished - queued)
@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+#
+# hardware drivers module
+#
+
+from abc import ABCMeta, abstractmethod
+import heapq
+import math
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+import yaml
+
+from securityclientpy import _logger
+from securityclientpy.fakegpio import FakeGPIO
+from securityclientpy.fakegps import FakeGpsSession
+from securityclientpy.fakethermal import FakeW1Bus
+
+
+# Abstract base class on both Python 2 and 3
+_Abstract = ABCMeta('_Abstract', (object,), {})
+
+
+class Drivers(_Abstract):
+    """the backends behind the hardware controller: gpio, 1-Wire, gpsd and camera
+
+    One set is chosen at startup and everything above it runs unchanged on any of them:
+    - RealDrivers: RPi.GPIO, the kernel's w1-therm sysfs, the local gpsd and the usb camera
+    - SimulatedDrivers: in-memory fakes driven by configurable signal patterns, so the whole client runs
+      on a normal Linux host
+    - RecordedDrivers: the same fakes driven by a recorded event log at its original pace
+    """
+
+    def __init__(self, gpio, thermal_base_dir):
+        """constructor method
+
+        args:
+            gpio: RPi.GPIO compatible module or object
+            thermal_base_dir: str (directory holding the 1-Wire devices)
+        """
+        self.gpio = gpio
+        self.thermal_base_dir = thermal_base_dir
+
+    def start(self, pins):
+        """brings the backends up once the controller has set up its pins
+
+        args:
+            pins: {name: int} (the controller's gpio pin map)
+        """
+        pass
+
+    def stop(self):
+        pass
+
+    @abstractmethod
+    def connect_gps(self):
+        """opens a gpsd compatible session streaming reports
+
+        returns:
+            gps.gps compatible session
+        """
+
+    @abstractmethod
+    def open_camera(self, camera):
+        """opens a frame source
+
+        args:
+            camera: int
+
+        returns:
+            cv2.VideoCapture compatible frame source
+        """
+
+
+class RealDrivers(Drivers):
+    """the Raspberry Pi's own hardware
+
+    RPi.GPIO, gps and cv2 are imported here rather than at module load, so nothing but these drivers
+    needs them installed.
+    """
+
+    _THERMAL_BASE_DIR = '/sys/bus/w1/devices/'
+
+    def __init__(self):
+        """constructor method"""
+        import RPi.GPIO as GPIO
+        super(RealDrivers, self).__init__(GPIO, self._THERMAL_BASE_DIR)
+
+    def start(self, pins):
+        # Load the 1-Wire kernel modules so the temperature sensor shows up in sysfs
+        os.system('modprobe w1-gpio')
+        os.system('modprobe w1-therm')
+
+    def connect_gps(self):
+        # GPS module will only be installed in virtualenv on raspberry pi system
+        import gps
+
+        # Listen on port 2947 (gpsd) of localhost
+        session = gps.gps("localhost", "2947")
+        session.stream(gps.WATCH_ENABLE | gps.WATCH_NEWSTYLE)
+        return session
+
+    def open_camera(self, camera):
+        import cv2
+        return cv2.VideoCapture(camera)
+
+
+# A parked car in the sun: someone walks past now and then, the odd knock, a slow daily temperature
+# cycle, and a gps receiver reporting a drive around town
+DEFAULT_PATTERNS = {
+    'motion': {'pattern': 'poisson', 'rate': 1.0, 'duration': [0.1, 1.5]},
+    'vibration': {'pattern': 'poisson', 'rate': 0.5, 'duration': [0.005, 0.02]},
+    'panic_button': {'pattern': 'off'},
+    'temperature': {'pattern': 'sine', 'mean': 24.0, 'amplitude': 6.0, 'period': 86400.0, 'noise': 0.2,
+                    'interval': 1.0},
+    'gps': {'pattern': 'route', 'origin': [33.749, -84.388], 'speed': 13.0, 'turn_rate': 2.0, 'rate': 1.0,
+            'error': 5.0},
+}
+# Every signal off: no fix, no pulses and the 1-Wire sensor's resting temperature, the development
+# default so nothing made up reaches the alerts
+QUIET_PATTERNS = {source: {'pattern': 'off'} for source in DEFAULT_PATTERNS}
+# Named pattern sets for load_patterns
+_NAMED_PATTERNS = {'quiet': QUIET_PATTERNS, 'busy': DEFAULT_PATTERNS}
+_GPIO_KINDS = ('off', 'periodic', 'poisson')
+_PATTERN_KINDS = {'motion': _GPIO_KINDS, 'vibration': _GPIO_KINDS, 'panic_button': _GPIO_KINDS,
+                  'temperature': ('off', 'sine'), 'gps': ('off', 'route')}
+
+
+def parse_patterns(patterns):
+    """validates simulated signal patterns, filling in the defaults
+
+    Every input pin (motion, vibration, panic_button) takes:
+        {pattern: 'off'}
+        {pattern: 'periodic', period: seconds, duration: seconds, offset: seconds (first pulse)}
+        {pattern: 'poisson', rate: pulses per minute, duration: [min, max] seconds}
+    temperature: {pattern: 'sine', mean, amplitude, period, noise (celcius, seconds), interval} or 'off'
+    gps: {pattern: 'route', origin: [lat, lon], speed (m/s), turn_rate (degrees/s), rate (fixes/s),
+          error (meters)} or 'off'
+
+    args:
+        patterns: {source: dict} (sources left out keep DEFAULT_PATTERNS)
+
+    returns:
+        {source: dict}
+
+    raises:
+        ValueError
+    """
+    parsed = {}
+    for source, default in DEFAULT_PATTERNS.items():
+        spec = dict(default)
+        try:
+            spec.update((patterns or {}).get(source, {}))
+        except (TypeError, ValueError, AttributeError):
+            raise ValueError('invalid pattern for [{0}]'.format(source))
+        kind = spec.get('pattern')
+        if kind not in _PATTERN_KINDS[source]:
+            raise ValueError('unknown pattern [{0}] for [{1}]'.format(kind, source))
+        parsed[source] = spec
+    unknown = set(patterns or {}) - set(DEFAULT_PATTERNS)
+    if unknown:
+        raise ValueError('unknown simulated sources [{0}]'.format(', '.join(sorted(unknown))))
+    return parsed
+
+
+def load_patterns(name):
+    """returns simulated signal patterns by name ('quiet' or 'busy'), or read from a YAML (or JSON) file
+
+    args:
+        name: str
+
+    returns:
+        {source: dict} (see parse_patterns)
+
+    raises:
+        IOError, ValueError
+    """
+    if name in _NAMED_PATTERNS:
+        return parse_patterns(_NAMED_PATTERNS[name])
+    with open(name) as fp:
+        try:
+            return parse_patterns(yaml.safe_load(fp))
+        except yaml.YAMLError as exception:
+            raise ValueError('invalid simulated patterns file [{0}]'.format(exception))
+
+
+class _FakeDrivers(Drivers):
+    """in-memory gpio, gpsd session and 1-Wire bus, plus a synthetic camera"""
+
+    _METERS_PER_DEGREE = 111320.0
+
+    def __init__(self, root=None, speed=1.0):
+        """constructor method
+
+        args:
+            root: str (directory for the fake 1-Wire bus, Default=a temporary directory removed on stop)
+            speed: float (times faster than real time signals are produced)
+        """
+        self._owns_root = root is None
+        self.root = root if root is not None else tempfile.mkdtemp(prefix='securityclient-')
+        self.w1_bus = FakeW1Bus(os.path.join(self.root, 'w1'))
+        self.w1_sensor = self.w1_bus.add_sensor()
+        self.gps_session = FakeGpsSession()
+        self.speed = speed
+        self.pins = {}
+        self._thread = None
+        self._stopped = threading.Event()
+        self.signals = 0
+        super(_FakeDrivers, self).__init__(FakeGPIO(), self.w1_bus.root)
+
+    def start(self, pins):
+        if self._thread is not None: return
+        self.pins = dict(pins)
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.gps_session.close()
+        if self._owns_root and os.path.isdir(self.root):
+            shutil.rmtree(self.root)
+
+    def connect_gps(self):
+        return self.gps_session
+
+    def open_camera(self, camera):
+        from securityclientpy.videostreamer import SyntheticFrameSource
+        return SyntheticFrameSource()
+
+    @abstractmethod
+    def _run(self):
+        """produces the signals on the drivers' thread until stopped"""
+
+    def _wait_until(self, start, offset):
+        """sleeps until `offset` signal seconds after the wall clock `start`
+
+        returns:
+            bool (False once stopped)
+        """
+        delay = start + offset / self.speed - time.time()
+        if delay > 0:
+            return not self._stopped.wait(delay)
+        return not self._stopped.is_set()
+
+    def _set_input(self, source, value):
+        pin = self.pins.get(source)
+        if pin is not None:
+            self.gpio.set_input(pin, value)
+            self.signals += 1
+
+    def _feed_gps(self, latitude, longitude, fix_time, speed, track, error=5.0, altitude=300.0):
+        self.gps_session.feed({
+            'class': 'TPV', 'mode': 3, 'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(fix_time)) + 'Z',
+            'lat': latitude, 'lon': longitude, 'alt': altitude, 'speed': speed, 'track': track, 'climb': 0.0,
+            'epx': error, 'epy': error, 'epv': 2 * error, 'eps': error / 10.0,
+        })
+        self.signals += 1
+
+
+class SimulatedDrivers(_FakeDrivers):
+    """fakes driven by synthetic signal patterns (see parse_patterns)
+
+    A single thread plays every pattern from one schedule, so a benchmark can crank `speed` up to push
+    events through the whole client far faster than real sensors would.
+    """
+
+    def __init__(self, patterns=None, root=None, speed=1.0, seed=None):
+        """constructor method
+
+        args:
+            patterns: {source: dict} (see parse_patterns)
+            root: str
+            speed: float
+            seed: int (repeatable signals)
+        """
+        self.patterns = parse_patterns(patterns)
+        self._random = random.Random(seed)
+        super(SimulatedDrivers, self).__init__(root, speed)
+
+    def _run(self):
+        start = time.time()
+        schedule = []
+        for source, spec in sorted(self.patterns.items()):
+            if spec['pattern'] != 'off':
+                heapq.heappush(schedule, (self._first(spec), source, None))
+        route = None
+        while schedule:
+            at, source, value = heapq.heappop(schedule)
+            if not self._wait_until(start, at):
+                break
+            spec = self.patterns[source]
+            if source == 'temperature':
+                celcius = spec['mean'] + spec['amplitude'] * math.sin(2 * math.pi * at / spec['period']) + \
+                    self._random.gauss(0, spec['noise'])
+                self.w1_bus.set_temperature(self.w1_sensor, celcius)
+                self.signals += 1
+                heapq.heappush(schedule, (at + spec['interval'], source, None))
+            elif source == 'gps':
+                route = self._drive(spec, route, at, start)
+                heapq.heappush(schedule, (at + 1.0 / spec['rate'], source, None))
+            elif value is None:
+                # Rising edge, then the falling edge after the pulse duration and the next pulse
+                self._set_input(source, True)
+                if spec['pattern'] == 'periodic':
+                    duration, following = spec['duration'], at + spec['period']
+                else:
+                    duration = self._random.uniform(*spec['duration'])
+                    following = at + duration + self._random.expovariate(spec['rate'] / 60.0)
+                heapq.heappush(schedule, (at + duration, source, False))
+                heapq.heappush(schedule, (following, source, None))
+            else:
+                self._set_input(source, False)
+        _logger.debug('Simulated drivers stopped after {0} signals'.format(self.signals))
+
+    def _first(self, spec):
+        """signal seconds until a pattern first fires"""
+        if spec['pattern'] == 'periodic':
+            return spec.get('offset', spec['period'])
+        if spec['pattern'] == 'poisson':
+            return self._random.expovariate(spec['rate'] / 60.0)
+        return 0.0
+
+    def _drive(self, spec, route, at, start):
+        """moves the simulated vehicle along a meandering route and reports a fix
+
+        returns:
+            [east, north, heading] (meters from the origin, degrees)
+        """
+        if route is None:
+            route = [0.0, 0.0, 0.0]
+        else:
+            interval = 1.0 / spec['rate']
+            route[2] = (route[2] + self._random.gauss(0, spec['turn_rate']) * interval) % 360.0
+            route[0] += spec['speed'] * interval * math.sin(math.radians(route[2]))
+            route[1] += spec['speed'] * interval * math.cos(math.radians(route[2]))
+        latitude = spec['origin'][0] + route[1] / self._METERS_PER_DEGREE
+        longitude = spec['origin'][1] + route[0] / (self._METERS_PER_DEGREE * math.cos(math.radians(latitude)))
+        self._feed_gps(latitude, longitude, start + at, spec['speed'], route[2], spec['error'])
+        return route
+
+
+class RecordedDrivers(_FakeDrivers):
+    """fakes driven by a recorded event log (see eventlog.EventRecorder), at the pace it was recorded
+
+    Motion / vibration edges become gpio levels, gps fixes gpsd reports and temperatures 1-Wire
+    readings, so a field recording exercises the real sampling, filtering and edge detection paths.
+    Camera motion isn't replayed: it comes from frames, which aren't recorded.
+    """
+
+    def __init__(self, events, root=None, speed=1.0):
+        """constructor method
+
+        args:
+            events: iterable of eventlog.LoggedEvent (i.e. eventlog.read_events)
+            root: str
+            speed: float
+        """
+        self.events = events
+        self.finished = threading.Event()
+        super(RecordedDrivers, self).__init__(root, speed)
+
+    def _run(self):
+        start = time.time()
+        first = None
+        for event in self.events:
+            if first is None:
+                first = event.timestamp
+            if not self._wait_until(start, event.timestamp - first):
+                break
+            if event.source in ('motion', 'vibration'):
+                self._set_input(event.source, event.value)
+            elif event.source == 'gps':
+                report = event.value
+                self._feed_gps(report['lat'], report['lon'], event.timestamp, report.get('speed'),
+                               report.get('track'), report.get('epx') or 5.0, report.get('alt'))
+            elif event.source == 'temperature':
+                self.w1_bus.set_temperature(self.w1_sensor, event.value)
+                self.signals += 1
+        self.finished.set()
+        _logger.debug('Recorded drivers finished after {0} signals'.format(self.signals))
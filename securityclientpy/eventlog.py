@@ -0,0 +1,477 @@
+# -*- coding: utf-8 -*-
+#
+# sensor event log module
+#
+
+from collections import namedtuple
+import glob
+import json
+import math
+import os
+import struct
+import threading
+import time
+
+from securityclientpy import _logger
+from securityclientpy.fusion import ArmedSession
+from securityclientpy.statemachine import ARMING, ARMED, BREACHED, ACKNOWLEDGED, DISARMED
+from securityclientpy.thermal import TemperatureSample
+
+
+LoggedEvent = namedtuple('LoggedEvent', ['timestamp', 'source', 'value'])
+
+# gpsd TPV report keys stored as floats, in GpsFix field order
+_TPV_FLOAT_KEYS = ('alt', 'speed', 'climb', 'track', 'epx', 'epy', 'epv', 'eps')
+_NAN = float('nan')
+
+
+class EventRecorder(object):
+    """rolling binary log of every sensor reading and armed state transition
+
+    Records go to segment files `events-<n>.bin` of about `segment_bytes`; the oldest segments are deleted
+    once the log outgrows `max_bytes`, so the log always holds the most recent history. A record is a
+    '<dBB' header (timestamp, source id, value type) and a payload that depends on the type: nothing for
+    booleans and None, a double for numbers, length prefixed utf-8 for text and JSON, and 41 bytes for a
+    gps fix (mode, latitude / longitude in 1e-7 degrees, the rest as single floats with NaN for missing).
+    A source name is written once per segment, the first time it is used there, so every segment can be
+    read on its own and a motion edge costs 10 bytes.
+
+    Write errors (i.e. a full disk) never reach the sensor threads the recorder listens on: the buffered
+    records are dropped, the failure is logged once, and a new segment is tried with the next record.
+    """
+
+    _MAGIC = b'SCEV\x01'
+    _HEADER = struct.Struct('<dBB')
+    _FLOAT = struct.Struct('<d')
+    _LENGTH = struct.Struct('<H')
+    _FIX = struct.Struct('<Bii8f')
+    _DEFINE, _FALSE, _TRUE, _NONE, _NUMBER, _TEXT, _JSON, _GPS_FIX = range(8)
+    _SEGMENT_PATTERN = 'events-*.bin'
+    _SEGMENT_FORMAT = 'events-{0:08d}.bin'
+    _SEGMENT_BYTES = 256 * 1024
+    _MAX_BYTES = 16 * 1024 * 1024
+    _FLUSH_RECORDS = 64
+
+    def __init__(self, root, segment_bytes=_SEGMENT_BYTES, max_bytes=_MAX_BYTES, flush_records=_FLUSH_RECORDS,
+                 clock=time.time):
+        """constructor method
+
+        args:
+            root: str (directory of the segment files)
+            segment_bytes: int
+            max_bytes: int (whole segments are deleted, oldest first, to stay under this)
+            flush_records: int (records buffered before they are written out)
+            clock: callable returning float seconds (timestamps of records logged without one)
+        """
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.flush_records = flush_records
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._fp = None
+        self._segment = None
+        self._segment_size = 0
+        self._sources = {}
+        self.records = 0
+        self.bytes = 0
+        self.dropped_segments = 0
+        self.write_errors = 0
+        self._failing = False
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+        segments = self.segments()
+        self._next_segment = _segment_number(segments[-1]) + 1 if segments else 0
+
+    def segments(self):
+        """returns the segment files, oldest first
+
+        returns:
+            [str]
+        """
+        return sorted(glob.glob(os.path.join(self.root, self._SEGMENT_PATTERN)))
+
+    def attach(self, hwcontroller):
+        """logs everything the hardware controller's sensors report
+
+        args:
+            hwcontroller: HardwareController
+        """
+        hwcontroller.sensor_bus.add_listener(self._sensor_event)
+        hwcontroller.gps_reader.add_listener(self._gps_fix)
+        if hwcontroller.temperature_sampler is not None:
+            hwcontroller.temperature_sampler.add_listener(self._temperature_sample)
+
+    def _sensor_event(self, event):
+        self.record(event.source, event.value, event.timestamp)
+
+    def _gps_fix(self, fix):
+        values = [fix.altitude, fix.speed, fix.climb, fix.track, fix.epx, fix.epy, fix.epv, fix.eps]
+        payload = self._FIX.pack(fix.mode or 0, int(round(fix.latitude * 1e7)), int(round(fix.longitude * 1e7)),
+                                 *[_NAN if value is None else value for value in values])
+        self._write('gps', fix.received, self._GPS_FIX, payload)
+
+    def _temperature_sample(self, sample):
+        self.record('temperature', sample.celcius, sample.time)
+
+    def record_state(self, status):
+        """logs a security state transition under the 'state' source, with whether someone was inside the
+        vehicle under 'occupied' once it is armed
+
+        args:
+            status: statemachine.SecurityStatus
+        """
+        if status.state == ARMED:
+            self.record('occupied', status.occupied)
+        self.record('state', status.state)
+
+    def record(self, source, value, timestamp=None):
+        """logs a reading
+
+        args:
+            source: str
+            value: bool, None, int, float, str or anything JSON serializable
+            timestamp: float (Default=now)
+        """
+        if timestamp is None:
+            timestamp = self._clock()
+        if value is None:
+            kind, payload = self._NONE, b''
+        elif value is True or value is False:
+            kind, payload = self._TRUE if value else self._FALSE, b''
+        elif isinstance(value, (int, float)):
+            kind, payload = self._NUMBER, self._FLOAT.pack(value)
+        else:
+            if isinstance(value, str):
+                kind, text = self._TEXT, value
+            else:
+                kind, text = self._JSON, json.dumps(value, separators=(',', ':'))
+            data = text.encode('utf-8')
+            payload = self._LENGTH.pack(len(data)) + data
+        self._write(source, timestamp, kind, payload)
+
+    def _write(self, source, timestamp, kind, payload):
+        """appends an encoded record, rotating segments as needed"""
+        with self._lock:
+            if self._fp is None or self._segment_size >= self.segment_bytes:
+                if not self._rotate(): return
+            source_id = self._sources.get(source)
+            if source_id is None:
+                if len(self._sources) > 255:
+                    # Source ids are a byte, the next segment starts their numbering over
+                    if not self._rotate(): return
+                source_id = len(self._sources)
+                self._sources[source] = source_id
+                name = source.encode('utf-8')
+                self._append(self._HEADER.pack(timestamp, source_id, self._DEFINE) + struct.pack('<B', len(name)) +
+                             name)
+            self._append(self._HEADER.pack(timestamp, source_id, kind) + payload)
+            self.records += 1
+            if len(self._buffer) >= self.flush_records:
+                self._flush()
+
+    def _append(self, data):
+        self._buffer.append(data)
+        self._segment_size += len(data)
+        self.bytes += len(data)
+
+    def _rotate(self):
+        """starts a new segment and drops the oldest ones past the size limit
+
+        returns:
+            bool (False if the new segment couldn't be created)
+        """
+        self._flush()
+        self._close_segment()
+        self._segment = os.path.join(self.root, self._SEGMENT_FORMAT.format(self._next_segment))
+        self._next_segment += 1
+        try:
+            self._fp = open(self._segment, 'wb')
+            self._fp.write(self._MAGIC)
+        except (IOError, OSError) as exception:
+            self._write_failed(exception)
+            return False
+        self._segment_size = len(self._MAGIC)
+
+        try:
+            segments = self.segments()
+            total = sum(os.path.getsize(segment) for segment in segments) + self.segment_bytes
+            for segment in segments[:-1]:
+                if total <= self.max_bytes:
+                    break
+                total -= os.path.getsize(segment)
+                os.remove(segment)
+                self.dropped_segments += 1
+                _logger.debug('Dropped event log segment [{0}]'.format(segment))
+        except OSError as exception:
+            _logger.info('Failed to drop old event log segments [{0}]'.format(exception))
+        return True
+
+    def _flush(self):
+        if self._buffer and self._fp is not None:
+            try:
+                self._fp.write(b''.join(self._buffer))
+                self._fp.flush()
+            except (IOError, OSError) as exception:
+                self._write_failed(exception)
+                return
+            self._failing = False
+        self._buffer = []
+
+    def _close_segment(self):
+        if self._fp is not None:
+            try:
+                self._fp.close()
+            except (IOError, OSError):
+                pass
+            self._fp = None
+        self._sources = {}
+
+    def _write_failed(self, exception):
+        """drops the buffered records and the segment they were going to, logging only the first failure
+
+        The segment is given up on so the next one defines its sources again.
+        """
+        if not self._failing:
+            _logger.info('Failed to write event log [{0}]'.format(exception))
+        self._failing = True
+        self.write_errors += 1
+        self._buffer = []
+        self._close_segment()
+
+    def flush(self):
+        """writes out buffered records"""
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._close_segment()
+
+    def stats(self):
+        """returns record and size counters
+
+        returns:
+            {records, bytes, segments, dropped_segments, write_errors}
+        """
+        return {'records': self.records, 'bytes': self.bytes, 'segments': len(self.segments()),
+                'dropped_segments': self.dropped_segments, 'write_errors': self.write_errors}
+
+
+def _segment_number(path):
+    return int(os.path.basename(path)[len('events-'):-len('.bin')])
+
+
+def read_segment(path):
+    """reads the events of one segment file
+
+    A record cut short by a crash ends the segment.
+
+    args:
+        path: str
+
+    returns:
+        [LoggedEvent]
+    """
+    with open(path, 'rb') as fp:
+        data = fp.read()
+    if data[:len(EventRecorder._MAGIC)] != EventRecorder._MAGIC:
+        raise ValueError('not an event log segment [{0}]'.format(path))
+    header = EventRecorder._HEADER
+    events = []
+    sources = {}
+    offset = len(EventRecorder._MAGIC)
+    try:
+        while offset < len(data):
+            timestamp, source_id, kind = header.unpack_from(data, offset)
+            offset += header.size
+            if kind == EventRecorder._DEFINE:
+                length = struct.unpack_from('<B', data, offset)[0]
+                sources[source_id] = data[offset + 1:offset + 1 + length].decode('utf-8')
+                offset += 1 + length
+                continue
+            if kind == EventRecorder._FALSE or kind == EventRecorder._TRUE:
+                value = kind == EventRecorder._TRUE
+            elif kind == EventRecorder._NONE:
+                value = None
+            elif kind == EventRecorder._NUMBER:
+                value = EventRecorder._FLOAT.unpack_from(data, offset)[0]
+                offset += EventRecorder._FLOAT.size
+            elif kind == EventRecorder._GPS_FIX:
+                fields = EventRecorder._FIX.unpack_from(data, offset)
+                offset += EventRecorder._FIX.size
+                # As the gpsd TPV report the fix came from
+                value = {'mode': fields[0], 'lat': fields[1] / 1e7, 'lon': fields[2] / 1e7}
+                for key, field in zip(_TPV_FLOAT_KEYS, fields[3:]):
+                    value[key] = None if math.isnan(field) else field
+            else:
+                length = EventRecorder._LENGTH.unpack_from(data, offset)[0]
+                offset += EventRecorder._LENGTH.size
+                if offset + length > len(data):
+                    break
+                text = data[offset:offset + length].decode('utf-8')
+                offset += length
+                value = text if kind == EventRecorder._TEXT else json.loads(text)
+            events.append(LoggedEvent(timestamp, sources[source_id], value))
+    except struct.error:
+        _logger.debug('Event log segment [{0}] ends in a partial record'.format(path))
+    return events
+
+
+def read_events(root, start=None, end=None):
+    """reads the logged events in time order
+
+    args:
+        root: str
+        start: float (Default=from the beginning)
+        end: float (Default=to the end)
+
+    returns:
+        generator of LoggedEvent
+    """
+    for segment in sorted(glob.glob(os.path.join(root, EventRecorder._SEGMENT_PATTERN))):
+        for event in read_segment(segment):
+            if start is not None and event.timestamp < start:
+                continue
+            if end is not None and event.timestamp > end:
+                return
+            yield event
+
+
+class VirtualClock(object):
+    """clock that only moves when told to, for running recorded events faster than real time
+
+    Pass it wherever a `clock` callable is taken; `sleep` advances it instead of blocking.
+    """
+
+    def __init__(self, start=0.0):
+        """constructor method
+
+        args:
+            start: float
+        """
+        self._now = start
+
+    def __call__(self):
+        return self._now
+
+    def time(self):
+        return self._now
+
+    def sleep(self, seconds):
+        self._now += max(0.0, seconds)
+
+    def advance_to(self, timestamp):
+        """moves the clock forward, never back
+
+        args:
+            timestamp: float
+        """
+        if timestamp > self._now:
+            self._now = timestamp
+
+
+class EventReplayer(object):
+    """feeds a recorded event log back through a hardware controller and the armed breach decision
+
+    Sensor edges are published on the controller's sensor bus, gps fixes go through its gps reader (and on
+    to the position estimator and geofences) and temperatures through its temperature monitor, with the
+    virtual clock moved to each event's timestamp first. The controller should be built with that clock.
+    From the end of the exit delay after the log says the system was armed, the bus events are run
+    through the armed loop's own breach decision (fusion.ArmedSession), so a field false alarm can be
+    reproduced, and a policy tuned against it, offline.
+    """
+
+    def __init__(self, hwcontroller, clock, policy=None, exit_delay=ArmedSession.EXIT_DELAY_SECONDS):
+        """constructor method
+
+        args:
+            hwcontroller: HardwareController (built with `clock`)
+            clock: VirtualClock
+            policy: dict (fusion policy, Default=fusion.DEFAULT_POLICY)
+            exit_delay: float (seconds the armed loop waited after arming)
+        """
+        self.hwcontroller = hwcontroller
+        self.clock = clock
+        self.policy = policy
+        self.exit_delay = exit_delay
+        self.events = 0
+        self.recorded_breaches = []
+
+    def run(self, events, speed=None):
+        """replays events
+
+        args:
+            events: iterable of LoggedEvent (in time order)
+            speed: float (times faster than real time, Default=as fast as possible)
+
+        returns:
+            [Breach] (breaches the armed loop decides on)
+        """
+        reader = self.hwcontroller.sensor_bus.subscribe()
+        breaches = []
+        armed = None
+        listening = None
+        occupied = False
+        previous = None
+        try:
+            for event in events:
+                if speed is not None and previous is not None and event.timestamp > previous:
+                    time.sleep((event.timestamp - previous) / speed)
+                previous = event.timestamp
+                if listening is not None and event.timestamp >= listening:
+                    # The exit delay is over, the armed loop subscribes to the sensors
+                    armed = ArmedSession(self.policy)
+                    listening = None
+                if armed is not None:
+                    # The armed loop wakes up on its own when sustained motion crosses the threshold
+                    breach = armed.next_breach(self.clock(), event.timestamp)
+                    if breach is not None:
+                        breaches.append(breach)
+
+                self.clock.advance_to(event.timestamp)
+                self._dispatch(event)
+                self.events += 1
+                if armed is not None:
+                    breach = armed.update(reader.poll(), event.timestamp)
+                    if breach is not None:
+                        breaches.append(breach)
+                else:
+                    reader.poll()
+
+                if event.source == 'occupied':
+                    occupied = event.value
+                elif event.source == 'state':
+                    if event.value == ARMING:
+                        listening = event.timestamp + self.exit_delay
+                    elif event.value == ARMED:
+                        if armed is None:
+                            armed = ArmedSession(self.policy)
+                            listening = None
+                        breach = armed.ready(occupied, event.timestamp)
+                        if breach is not None:
+                            breaches.append(breach)
+                    elif event.value == BREACHED:
+                        self.recorded_breaches.append(event.timestamp)
+                    elif event.value in (ACKNOWLEDGED, DISARMED):
+                        armed = None
+                        listening = None
+        finally:
+            self.hwcontroller.sensor_bus.unsubscribe(reader)
+        _logger.debug('Replayed {0} events, {1} breaches ({2} recorded)'.format(
+            self.events, len(breaches), len(self.recorded_breaches)))
+        return breaches
+
+    def _dispatch(self, event):
+        """hands an event to the part of the controller that would have produced it"""
+        if event.source == 'gps':
+            report = dict(event.value)
+            report['class'] = 'TPV'
+            self.hwcontroller.gps_reader.update(report)
+        elif event.source == 'temperature':
+            self.hwcontroller.temperature_monitor.add_sample(TemperatureSample(
+                round(event.value, 1), round(event.value * 9.0 / 5.0 + 32.0, 1), event.timestamp))
+        elif event.source not in ('state', 'occupied'):
+            self.hwcontroller.sensor_bus.publish(event.source, event.value, event.timestamp)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# fake gpio backend module
+#
+
+import threading
+
+
+class FakeGPIO(object):
+    """in-memory stand-in for the RPi.GPIO module
+
+    Implements the subset of the RPi.GPIO api used by the client (setmode, setup, input, output,
+    add_event_detect, remove_event_detect, cleanup). Input levels are driven with `set_input`, which
+    fires any registered edge callbacks on the calling thread, the same way RPi.GPIO fires them on its
+    own callback thread.
+    """
+
+    BCM = 11
+    BOARD = 10
+    IN = 1
+    OUT = 0
+    LOW = 0
+    HIGH = 1
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def __init__(self):
+        """constructor method"""
+        self._lock = threading.Lock()
+        self._mode = None
+        self._levels = {}
+        self._directions = {}
+        self._callbacks = {}
+
+    def setmode(self, mode):
+        self._mode = mode
+
+    def setup(self, pin, direction, pull_up_down=None, initial=None):
+        with self._lock:
+            self._directions[pin] = direction
+            if initial is not None:
+                self._levels[pin] = initial
+            elif pull_up_down == self.PUD_UP:
+                self._levels[pin] = self.HIGH
+            else:
+                self._levels.setdefault(pin, self.LOW)
+
+    def input(self, pin):
+        return self._levels.get(pin, self.LOW)
+
+    def output(self, pin, value):
+        with self._lock:
+            self._levels[pin] = self.HIGH if value else self.LOW
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        with self._lock:
+            self._callbacks[pin] = (edge, callback)
+
+    def remove_event_detect(self, pin):
+        with self._lock:
+            self._callbacks.pop(pin, None)
+
+    def cleanup(self):
+        with self._lock:
+            self._levels = {}
+            self._directions = {}
+            self._callbacks = {}
+
+    def set_input(self, pin, value):
+        """drives an input pin to a new level, firing edge callbacks like the real hardware
+
+        args:
+            pin: int
+            value: bool
+        """
+        value = self.HIGH if value else self.LOW
+        with self._lock:
+            previous = self._levels.get(pin, self.LOW)
+            self._levels[pin] = value
+            edge, callback = self._callbacks.get(pin, (None, None))
+
+        if callback is None or previous == value:
+            return
+        rising = value == self.HIGH
+        if edge == self.BOTH or (edge == self.RISING and rising) or (edge == self.FALLING and not rising):
+            callback(pin)
+
+    def pulse(self, pin):
+        """drives a single high/low pulse on an input pin
+
+        args:
+            pin: int
+        """
+        self.set_input(pin, True)
+        self.set_input(pin, False)
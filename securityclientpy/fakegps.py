@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+#
+# fake gpsd session module
+#
+
+from collections import deque
+import json
+import threading
+
+
+_METERS_PER_SECOND_PER_KNOT = 0.514444
+
+
+class GpsReport(dict):
+    """gpsd report readable by key or attribute, like the gps module's dictwrapper"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+def _nmea_degrees(value, hemisphere):
+    """converts an NMEA ddmm.mmmm / dddmm.mmmm field to signed decimal degrees"""
+    if not value:
+        return None
+    whole = int(float(value) / 100)
+    degrees = whole + (float(value) - whole * 100) / 60.0
+    return -degrees if hemisphere in ('S', 'W') else degrees
+
+
+def nmea_to_reports(sentences):
+    """converts NMEA RMC / GGA sentences to the TPV reports gpsd would send for them
+
+    Only the fields the client uses are filled in. Altitude from a GGA sentence is carried into the
+    next RMC report, the way gpsd merges a receiver's sentences into one fix.
+
+    args:
+        sentences: [str]
+
+    returns:
+        [GpsReport]
+    """
+    reports = []
+    altitude = None
+    for sentence in sentences:
+        fields = sentence.strip().split('*')[0].split(',')
+        kind = fields[0][-3:]
+        if kind == 'GGA' and len(fields) > 9:
+            altitude = float(fields[9]) if fields[9] else None
+        elif kind == 'RMC' and len(fields) > 9:
+            report = GpsReport({'class': 'TPV', 'mode': 1})
+            if fields[2] == 'A':
+                report.update({
+                    'mode': 3 if altitude is not None else 2,
+                    'time': '20{0}-{1}-{2}T{3}:{4}:{5}Z'.format(
+                        fields[9][4:6], fields[9][2:4], fields[9][0:2], fields[1][0:2], fields[1][2:4], fields[1][4:]
+                    ),
+                    'lat': _nmea_degrees(fields[3], fields[4]),
+                    'lon': _nmea_degrees(fields[5], fields[6]),
+                    'speed': float(fields[7] or 0) * _METERS_PER_SECOND_PER_KNOT,
+                    'track': float(fields[8]) if fields[8] else None,
+                })
+                if altitude is not None:
+                    report['alt'] = altitude
+            reports.append(report)
+    return reports
+
+
+class FakeGpsSession(object):
+    """in-memory stand-in for a gps.gps session
+
+    Reports are queued with `feed` (gpsd JSON lines, NMEA sentences or dicts) and returned by `next`,
+    which blocks until one is available like reading the gpsd socket does. Closing the session or
+    calling `disconnect` makes `next` raise StopIteration, the way the gps module reports a dropped
+    connection.
+    """
+
+    def __init__(self, reports=()):
+        """constructor method
+
+        args:
+            reports: [dict]
+        """
+        self._reports = deque(GpsReport(report) for report in reports)
+        self._condition = threading.Condition()
+        self._closed = False
+        self.stream_flags = None
+
+    def stream(self, flags=0):
+        self.stream_flags = flags
+
+    def feed(self, report):
+        """queues a report
+
+        args:
+            report: dict
+        """
+        with self._condition:
+            self._reports.append(GpsReport(report))
+            self._condition.notify()
+
+    def feed_json(self, lines):
+        """queues gpsd protocol JSON lines
+
+        args:
+            lines: [str]
+        """
+        for line in lines:
+            if line.strip():
+                self.feed(json.loads(line))
+
+    def feed_nmea(self, sentences):
+        """queues the TPV reports gpsd would produce for NMEA sentences
+
+        args:
+            sentences: [str]
+        """
+        for report in nmea_to_reports(sentences):
+            self.feed(report)
+
+    def next(self):
+        with self._condition:
+            while not self._reports and not self._closed:
+                self._condition.wait()
+            if not self._reports:
+                raise StopIteration
+            return self._reports.popleft()
+
+    __next__ = next
+
+    def __iter__(self):
+        return self
+
+    def disconnect(self):
+        """drops the connection once the queued reports are read"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            self._reports.clear()
+            self._closed = True
+            self._condition.notify_all()
+
+    @property
+    def pending(self):
+        return len(self._reports)
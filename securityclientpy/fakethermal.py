@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+#
+# fake 1-Wire sysfs module
+#
+
+import os
+
+
+class FakeW1Bus(object):
+    """directory tree laid out like /sys/bus/w1/devices with DS18B20 sensors in it
+
+    Each sensor is a `28-<serial>/w1_slave` file holding what the w1-therm driver would return, so the
+    temperature sampler runs against it unchanged. Readings can be written with a failed CRC, and a
+    sensor can be removed to look unplugged.
+    """
+
+    _W1_SLAVE_FORMAT = '{0} : crc=00 {1}\n{0} t={2}\n'
+    _RAW_BYTES = '50 05 4b 46 7f ff 0c 10 1c'
+
+    def __init__(self, root):
+        """constructor method
+
+        args:
+            root: str
+        """
+        self.root = root
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+        # Something that isn't a temperature sensor, like the real bus master entry
+        master = os.path.join(self.root, 'w1_bus_master1')
+        if not os.path.isdir(master):
+            os.makedirs(master)
+
+    def add_sensor(self, serial='000000000001', celcius=21.5):
+        """creates a sensor
+
+        args:
+            serial: str
+            celcius: float
+
+        returns:
+            str (w1_slave path)
+        """
+        directory = os.path.join(self.root, '28-{0}'.format(serial))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        path = os.path.join(directory, 'w1_slave')
+        self.set_temperature(path, celcius)
+        return path
+
+    def set_temperature(self, path, celcius, crc_ok=True):
+        """writes a reading
+
+        args:
+            path: str (w1_slave path)
+            celcius: float
+            crc_ok: bool
+        """
+        with open(path, 'w') as fp:
+            fp.write(self._W1_SLAVE_FORMAT.format(self._RAW_BYTES, 'YES' if crc_ok else 'NO',
+                                                  int(round(celcius * 1000))))
+
+    def remove_sensor(self, path):
+        """makes a sensor disappear from the bus, as when it is unplugged"""
+        os.remove(path)
@@ -0,0 +1,422 @@
+# -*- coding: utf-8 -*-
+#
+# breach sensor fusion module
+#
+
+from collections import deque, namedtuple
+
+import yaml
+
+from securityclientpy import _logger
+
+
+# Score at the time of the breach and each sensor's share of it
+Breach = namedtuple('Breach', ['time', 'score', 'contributions'])
+
+LEVEL = 'level'
+PULSE = 'pulse'
+# Rounding slack on the threshold, so waiting exactly time_to_breach() lands on a breach
+_EPSILON = 1e-9
+
+# PIR motion held for 2.1 s breaches on its own, as it always has. Camera motion (lighting changes) and
+# vibration (passing trucks, a bump) are noisier: it takes 4 s of camera motion or 4 separate knocks on
+# their own, while 2 s of camera motion plus a couple of knocks, or a short PIR trigger plus either, breach.
+DEFAULT_POLICY = {
+    'window': 10.0,
+    'threshold': 1.0,
+    'sensors': {
+        'motion': {'kind': LEVEL, 'weight': 1.0, 'sustain': 2.1, 'debounce': 0.2},
+        'camera': {'kind': LEVEL, 'weight': 0.5, 'sustain': 2.0, 'debounce': 0.4, 'max': 1.0},
+        'vibration': {'kind': PULSE, 'weight': 0.5, 'count': 2, 'debounce': 0.25, 'max': 1.0},
+    },
+}
+
+
+def parse_policy(policy):
+    """validates a fusion policy and fills in defaults
+
+    A policy has a sliding `window` (seconds of evidence considered), a score `threshold` and a
+    `sensors` map from event source to:
+        kind: 'level' (on while active, i.e. PIR or camera motion) or 'pulse' (each rising edge is a hit,
+              i.e. a vibration switch)
+        weight: score for full evidence: `sustain` seconds active in the window for a level sensor,
+                `count` debounced pulses for a pulse sensor
+        debounce: seconds; level activity shorter than this is ignored, pulses closer together than this
+                  count once
+        max: highest score the sensor can add on its own (Default=weight)
+
+    args:
+        policy: dict
+
+    returns:
+        dict
+
+    raises:
+        ValueError
+    """
+    try:
+        parsed = {'window': float(policy['window']), 'threshold': float(policy['threshold']), 'sensors': {}}
+        for source, sensor in policy['sensors'].items():
+            kind = sensor.get('kind', LEVEL)
+            if kind not in (LEVEL, PULSE):
+                raise ValueError('unknown sensor kind [{0}]'.format(kind))
+            weight = float(sensor['weight'])
+            parsed_sensor = {
+                'kind': kind,
+                'weight': weight,
+                'debounce': float(sensor.get('debounce', 0.0)),
+                'max': float(sensor.get('max', weight)),
+            }
+            if kind == LEVEL:
+                parsed_sensor['sustain'] = float(sensor['sustain'])
+                if parsed_sensor['sustain'] <= 0:
+                    raise ValueError('sustain must be positive')
+            else:
+                parsed_sensor['count'] = int(sensor['count'])
+                if parsed_sensor['count'] <= 0:
+                    raise ValueError('count must be positive')
+            parsed['sensors'][str(source)] = parsed_sensor
+    except (KeyError, TypeError, AttributeError) as exception:
+        raise ValueError('invalid fusion policy [{0}]'.format(exception))
+    if parsed['window'] <= 0 or parsed['threshold'] <= 0:
+        raise ValueError('window and threshold must be positive')
+    return parsed
+
+
+def load_policy(path):
+    """reads a fusion policy from a YAML (or JSON) file
+
+    args:
+        path: str
+
+    returns:
+        dict
+
+    raises:
+        IOError, ValueError
+    """
+    with open(path) as fp:
+        try:
+            return parse_policy(yaml.safe_load(fp))
+        except yaml.YAMLError as exception:
+            raise ValueError('invalid fusion policy file [{0}]'.format(exception))
+
+
+class _LevelSensor(object):
+    """active intervals of a level sensor within the window"""
+
+    def __init__(self, config):
+        self.config = config
+        self.intervals = deque()
+        self.active_since = None
+
+    def add(self, timestamp, value):
+        if value and self.active_since is None:
+            self.active_since = timestamp
+        elif not value and self.active_since is not None:
+            if timestamp - self.active_since >= self.config['debounce']:
+                self.intervals.append((self.active_since, timestamp))
+            self.active_since = None
+
+    def evidence(self, now, window_start, pending=False):
+        """returns the fraction of full evidence seen in the window
+
+        args:
+            now: float
+            window_start: float
+            pending: bool (count activity that hasn't outlasted the debounce yet)
+        """
+        while self.intervals and self.intervals[0][1] <= window_start:
+            self.intervals.popleft()
+        active = 0.0
+        for start, end in self.intervals:
+            active += end - max(start, window_start)
+        if self.active_since is not None and (pending or now - self.active_since >= self.config['debounce']):
+            active += now - max(self.active_since, window_start)
+        return active / self.config['sustain']
+
+    def rate(self):
+        """returns the evidence gained per second while the sensor stays as it is"""
+        return 0.0 if self.active_since is None else 1.0 / self.config['sustain']
+
+    def settling(self, now):
+        """returns the seconds until the current activity outlasts the debounce"""
+        if self.active_since is None:
+            return 0.0
+        return max(0.0, self.active_since + self.config['debounce'] - now)
+
+
+class _PulseSensor(object):
+    """debounced rising edges of a pulse sensor within the window"""
+
+    def __init__(self, config):
+        self.config = config
+        self.pulses = deque()
+        self.last = None
+
+    def add(self, timestamp, value):
+        if not value:
+            return
+        if self.last is None or timestamp - self.last >= self.config['debounce']:
+            self.pulses.append(timestamp)
+        # Contact bounce keeps extending the debounce period
+        self.last = timestamp
+
+    def evidence(self, now, window_start, pending=False):
+        while self.pulses and self.pulses[0] <= window_start:
+            self.pulses.popleft()
+        return len(self.pulses) / float(self.config['count'])
+
+    def rate(self):
+        return 0.0
+
+    def settling(self, now):
+        return 0.0
+
+
+class FusionEngine(object):
+    """decides a breach from the timestamped events of every sensor
+
+    Each sensor's events are debounced and reduced to evidence within a sliding window: seconds active
+    for level sensors, pulses for pulse sensors. The evidence is weighted and capped as the policy says,
+    and a breach is declared once the summed score reaches the threshold. The engine is driven only by
+    event timestamps and the `now` it is evaluated at, so recorded events replay offline exactly as they
+    ran live (see `replay`).
+    """
+
+    def __init__(self, policy=None, ignored=()):
+        """constructor method
+
+        args:
+            policy: dict (see parse_policy, Default=DEFAULT_POLICY)
+            ignored: [str] (sources whose events are dropped, i.e. motion with someone inside the vehicle)
+        """
+        self.policy = parse_policy(policy if policy is not None else DEFAULT_POLICY)
+        self.ignored = frozenset(ignored)
+        self.reset()
+
+    def reset(self):
+        """forgets all evidence"""
+        self._sensors = {}
+        for source, config in self.policy['sensors'].items():
+            if source in self.ignored:
+                continue
+            self._sensors[source] = _LevelSensor(config) if config['kind'] == LEVEL else _PulseSensor(config)
+        self.events = 0
+
+    def add(self, event):
+        """feeds a sensor event
+
+        args:
+            event: SensorEvent
+        """
+        sensor = self._sensors.get(event.source)
+        if sensor is not None:
+            sensor.add(event.timestamp, event.value)
+            self.events += 1
+
+    def contributions(self, now, pending=False):
+        """returns each sensor's share of the score
+
+        args:
+            now: float
+            pending: bool (include activity still within its debounce)
+
+        returns:
+            {source: float}
+        """
+        window_start = now - self.policy['window']
+        contributions = {}
+        for source, sensor in self._sensors.items():
+            config = sensor.config
+            contributions[source] = min(config['max'], config['weight'] * sensor.evidence(now, window_start, pending))
+        return contributions
+
+    def evaluate(self, now):
+        """checks whether the evidence adds up to a breach
+
+        args:
+            now: float
+
+        returns:
+            Breach (None below the threshold)
+        """
+        contributions = self.contributions(now)
+        score = sum(contributions.values())
+        if score >= self.policy['threshold'] - _EPSILON:
+            return Breach(now, score, contributions)
+        return None
+
+    def update(self, events, now):
+        """feeds events and evaluates
+
+        args:
+            events: [SensorEvent]
+            now: float
+
+        returns:
+            Breach (None below the threshold)
+        """
+        for event in events:
+            self.add(event)
+        return self.evaluate(now)
+
+    def time_to_breach(self, now):
+        """returns how long until a breach if the active level sensors stay active
+
+        Lets a caller wait exactly as long as needed for the next evaluation instead of polling.
+
+        args:
+            now: float
+
+        returns:
+            float (seconds, None if no sensor is building up evidence)
+        """
+        contributions = self.contributions(now, pending=True)
+        deficit = self.policy['threshold'] - sum(contributions.values())
+        rate = 0.0
+        settling = 0.0
+        for source, sensor in self._sensors.items():
+            if contributions[source] < sensor.config['max']:
+                rate += sensor.config['weight'] * sensor.rate()
+            settling = max(settling, sensor.settling(now))
+        if deficit <= _EPSILON:
+            return settling
+        if rate <= 0:
+            return None
+        return max(settling, deficit / rate)
+
+    def next_breach(self, now, until):
+        """finds the breach evidence already in would reach before the next event
+
+        Evaluates at the moments `time_to_breach` predicts, which is when the armed loop wakes up; the
+        idle polls in between can't change the outcome, so they are skipped.
+
+        args:
+            now: float (time of the last evaluation)
+            until: float (time of the next event)
+
+        returns:
+            Breach (None if there is none by `until`)
+        """
+        remaining = self.time_to_breach(now)
+        while remaining is not None and now + remaining <= until:
+            now += remaining
+            breach = self.evaluate(now)
+            if breach is not None:
+                return breach
+            remaining = self.time_to_breach(now)
+        return None
+
+
+def replay(events, policy=None, ignored=()):
+    """runs recorded events through a fusion engine the way the armed loop would
+
+    The engine is evaluated at every event and, between events, when the armed loop would wake up on
+    its own (see `FusionEngine.next_breach`). The engine is reset after each breach.
+
+    args:
+        events: [SensorEvent] (in time order)
+        policy: dict
+        ignored: [str]
+
+    returns:
+        [Breach]
+    """
+    engine = FusionEngine(policy, ignored)
+    breaches = []
+    now = None
+    for event in events:
+        if now is not None:
+            breach = engine.next_breach(now, event.timestamp)
+            while breach is not None:
+                breaches.append(breach)
+                engine.reset()
+                breach = engine.next_breach(breach.time, event.timestamp)
+        now = event.timestamp
+        engine.add(event)
+        breach = engine.evaluate(now)
+        if breach is not None:
+            breaches.append(breach)
+            engine.reset()
+    _logger.debug('Replayed {0} events, {1} breaches'.format(engine.events, len(breaches)))
+    return breaches
+
+
+class ArmedSession(object):
+    """the breach decision of one arming of the system
+
+    Holds the events seen while the armed loop checks whether someone is inside the vehicle, then fuses
+    them and everything after into a single breach; motion and camera are ignored when someone is. Driven
+    only by event timestamps and the `now` it is given, so the armed loop and an offline replay of its
+    event log decide exactly alike.
+    """
+
+    OCCUPIED_IGNORED = ('motion', 'camera')
+    # The armed loop starts listening to the sensors this long after the system is asked to arm
+    EXIT_DELAY_SECONDS = 5.0
+
+    def __init__(self, policy=None):
+        """constructor method
+
+        args:
+            policy: dict (see parse_policy, Default=DEFAULT_POLICY)
+        """
+        self.policy = policy
+        self.engine = None
+        self.breach = None
+        self._pending = []
+
+    def ready(self, occupied, now):
+        """ends the occupancy check, the events held meanwhile are evaluated
+
+        args:
+            occupied: bool
+            now: float
+
+        returns:
+            Breach (None below the threshold)
+        """
+        # Someone left inside the vehicle keeps moving, only vibration can tell a break in then
+        self.engine = FusionEngine(self.policy, ignored=self.OCCUPIED_IGNORED if occupied else ())
+        pending, self._pending = self._pending, None
+        return self.update(pending, now)
+
+    def update(self, events, now):
+        """feeds events, held until ready
+
+        args:
+            events: [SensorEvent]
+            now: float
+
+        returns:
+            Breach (only the first one, None after it)
+        """
+        if self.engine is None:
+            self._pending.extend(events)
+            return None
+        if self.breach is not None:
+            return None
+        self.breach = self.engine.update(events, now)
+        return self.breach
+
+    def time_to_breach(self, now):
+        """see FusionEngine.time_to_breach
+
+        returns:
+            float (seconds, None before ready, after the breach or with no evidence building up)
+        """
+        if self.engine is None or self.breach is not None:
+            return None
+        return self.engine.time_to_breach(now)
+
+    def next_breach(self, now, until):
+        """see FusionEngine.next_breach
+
+        returns:
+            Breach (None if there is none by `until`, before ready or after the breach)
+        """
+        if self.engine is None or self.breach is not None:
+            return None
+        self.breach = self.engine.next_breach(now, until)
+        return self.breach
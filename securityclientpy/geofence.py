@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+#
+# geofence module
+#
+
+from collections import namedtuple
+import functools
+import math
+import threading
+import time
+
+import numpy
+
+from securityclientpy import _logger
+
+
+_METERS_PER_DEGREE = 111320.0
+_ACTIONS = ('arm', 'disarm', 'alert')
+
+# Circles have a center and radius (meters), polygons a vertex array ([[latitude, longitude]]). The bounding
+# box is (south, west, north, east). Actions run on entering / leaving, the speed limit (mph) applies inside.
+Geofence = namedtuple('Geofence', [
+    'fence_id', 'name', 'center', 'radius', 'polygon', 'bbox', 'on_enter', 'on_exit', 'speed_limit',
+])
+GeofenceEvent = namedtuple('GeofenceEvent', ['fence', 'entered', 'latitude', 'longitude', 'time'])
+
+
+def parse_geofence(spec):
+    """builds a geofence from its server representation
+
+    args:
+        spec: {id, name, center: [latitude, longitude], radius} or {id, name, polygon: [[latitude, longitude]]},
+              plus optional on_enter / on_exit action lists ('arm', 'disarm', 'alert') and speed_limit (mph)
+
+    returns:
+        Geofence
+
+    raises:
+        ValueError
+    """
+    try:
+        fence_id = str(spec['id'])
+        on_enter = tuple(spec.get('on_enter') or ())
+        on_exit = tuple(spec.get('on_exit') or ())
+        speed_limit = float(spec['speed_limit']) if spec.get('speed_limit') is not None else None
+        if 'polygon' in spec:
+            polygon = numpy.asarray(spec['polygon'], dtype=numpy.float64)
+            if polygon.ndim != 2 or polygon.shape[1] != 2 or len(polygon) < 3:
+                raise ValueError('polygon needs at least 3 [latitude, longitude] vertices')
+            center = None
+            radius = None
+            bbox = (polygon[:, 0].min(), polygon[:, 1].min(), polygon[:, 0].max(), polygon[:, 1].max())
+        else:
+            polygon = None
+            center = (float(spec['center'][0]), float(spec['center'][1]))
+            radius = float(spec['radius'])
+            if radius <= 0:
+                raise ValueError('radius must be positive')
+            latitude_span = radius / _METERS_PER_DEGREE
+            longitude_span = latitude_span / max(math.cos(math.radians(center[0])), 1e-6)
+            bbox = (center[0] - latitude_span, center[1] - longitude_span,
+                    center[0] + latitude_span, center[1] + longitude_span)
+    except (KeyError, IndexError, TypeError) as exception:
+        raise ValueError('invalid geofence [{0}]'.format(exception))
+
+    for action in on_enter + on_exit:
+        if action not in _ACTIONS:
+            raise ValueError('unknown geofence action [{0}]'.format(action))
+    return Geofence(fence_id, spec.get('name', fence_id), center, radius, polygon,
+                    tuple(float(value) for value in bbox), on_enter, on_exit, speed_limit)
+
+
+def parse_geofences(specs):
+    """builds geofences from a list of server representations
+
+    args:
+        specs: [dict] (see parse_geofence)
+
+    returns:
+        [Geofence]
+
+    raises:
+        ValueError
+    """
+    fences = [parse_geofence(spec) for spec in specs]
+    ids = [fence.fence_id for fence in fences]
+    if len(set(ids)) != len(ids):
+        raise ValueError('duplicate geofence id')
+    return fences
+
+
+class _Shape(object):
+    """containment test for one fence with everything the test needs precomputed"""
+
+    def __init__(self, fence):
+        self.fence = fence
+        self.south, self.west, self.north, self.east = fence.bbox
+        if fence.polygon is None:
+            self.center_latitude, self.center_longitude = fence.center
+            self.longitude_scale = math.cos(math.radians(fence.center[0]))
+            self.radius_squared = (fence.radius / _METERS_PER_DEGREE) ** 2
+            self.contains = self._circle_contains
+        else:
+            # Edges from every vertex to the next, closing the ring
+            latitudes = fence.polygon[:, 0]
+            longitudes = fence.polygon[:, 1]
+            self.latitudes = latitudes
+            self.next_latitudes = numpy.roll(latitudes, -1)
+            self.longitudes = longitudes
+            rise = self.next_latitudes - latitudes
+            flat = rise == 0
+            # Longitude gained per degree of latitude along each edge (flat edges are never crossed)
+            run = numpy.roll(longitudes, -1) - longitudes
+            self.slopes = numpy.where(flat, 0.0, run / numpy.where(flat, 1.0, rise))
+            self.contains = self._polygon_contains
+
+    def _circle_contains(self, latitude, longitude):
+        north = latitude - self.center_latitude
+        east = (longitude - self.center_longitude) * self.longitude_scale
+        return north * north + east * east <= self.radius_squared
+
+    def _polygon_contains(self, latitude, longitude):
+        """even-odd ray casting towards the east, all edges at once"""
+        straddles = (self.latitudes > latitude) != (self.next_latitudes > latitude)
+        crossings = longitude < self.longitudes + (latitude - self.latitudes) * self.slopes
+        return bool(numpy.count_nonzero(straddles & crossings) & 1)
+
+
+def _ray_cast(edges, latitude, longitude):
+    """even-odd ray casting towards the east over a few (latitude, next latitude, longitude, slope) edges"""
+    inside = False
+    for first, second, longitude_at, slope in edges:
+        if (first > latitude) != (second > latitude) and longitude < longitude_at + (latitude - first) * slope:
+            inside = not inside
+    return inside
+
+
+class GeofenceIndex(object):
+    """uniform grid over latitude / longitude, precomputing where each fence is inside, outside or on an edge
+
+    When the index is built every cell a fence's bounding box touches is classified. Cells no fence edge
+    passes through are wholly inside or wholly outside the fence and need no test at all. In cells an edge
+    crosses, a ray cast east from the fix can only cross edges spanning the cell's band of latitude, so
+    just those few edges are kept for the cell. A lookup hashes the position to its cell: the cost per fix
+    depends on how many fence edges pass near that spot, not on how many fences exist or their size.
+    """
+
+    _CELL_DEGREES = 0.005
+
+    def __init__(self, fences, cell_degrees=_CELL_DEGREES):
+        """constructor method
+
+        args:
+            fences: [Geofence]
+            cell_degrees: float (grid cell size, about 500 m at the default)
+        """
+        self.cell_degrees = cell_degrees
+        self.fences = list(fences)
+        self.by_id = dict((fence.fence_id, fence) for fence in self.fences)
+        # (row, column) -> [(Geofence, containment test or None when the whole cell is inside)]
+        self._cells = {}
+        for fence in self.fences:
+            shape = _Shape(fence)
+            if fence.polygon is None:
+                cells = self._circle_cells(shape)
+            else:
+                cells = self._polygon_cells(shape)
+            for cell, test in cells:
+                self._cells.setdefault(cell, []).append((fence, test))
+
+    def _cell(self, degrees):
+        return int(math.floor(degrees / self.cell_degrees))
+
+    def _bbox_cells(self, south, west, north, east):
+        for row in range(self._cell(south), self._cell(north) + 1):
+            for column in range(self._cell(west), self._cell(east) + 1):
+                yield row, column
+
+    def _polygon_cells(self, shape):
+        """classifies the cells of a polygon's bounding box"""
+        edges = list(zip(shape.latitudes.tolist(), shape.next_latitudes.tolist(), shape.longitudes.tolist(),
+                         shape.slopes.tolist()))
+        # Every cell in an edge's bounding box counts as crossed, which can only over-test
+        crossed = set()
+        vertices = shape.fence.polygon.tolist()
+        for (first, first_longitude), (second, second_longitude) in zip(vertices, vertices[1:] + vertices[:1]):
+            crossed.update(self._bbox_cells(min(first, second), min(first_longitude, second_longitude),
+                                            max(first, second), max(first_longitude, second_longitude)))
+
+        cells = []
+        row_tests = {}
+        half = self.cell_degrees / 2.0
+        for row, column in self._bbox_cells(*shape.fence.bbox):
+            if (row, column) not in crossed:
+                if shape.contains(row * self.cell_degrees + half, column * self.cell_degrees + half):
+                    cells.append(((row, column), None))
+                continue
+            if row not in row_tests:
+                south = row * self.cell_degrees
+                north = south + self.cell_degrees
+                row_edges = tuple(edge for edge in edges if min(edge[0], edge[1]) <= north and
+                                  max(edge[0], edge[1]) >= south)
+                row_tests[row] = functools.partial(_ray_cast, row_edges)
+            cells.append(((row, column), row_tests[row]))
+        return cells
+
+    def _circle_cells(self, shape):
+        """classifies the cells of a circle's bounding box by their nearest and farthest points"""
+        cells = []
+        for row, column in self._bbox_cells(*shape.fence.bbox):
+            south = row * self.cell_degrees - shape.center_latitude
+            west = (column * self.cell_degrees - shape.center_longitude) * shape.longitude_scale
+            north = south + self.cell_degrees
+            east = west + self.cell_degrees * shape.longitude_scale
+            near_north = 0.0 if south <= 0.0 <= north else min(abs(south), abs(north))
+            near_east = 0.0 if west <= 0.0 <= east else min(abs(west), abs(east))
+            if near_north ** 2 + near_east ** 2 > shape.radius_squared:
+                continue
+            far = max(abs(south), abs(north)) ** 2 + max(abs(west), abs(east)) ** 2
+            cells.append(((row, column), shape.contains if far > shape.radius_squared else None))
+        return cells
+
+    def containing(self, latitude, longitude):
+        """returns the fences a position is inside
+
+        args:
+            latitude: float
+            longitude: float
+
+        returns:
+            [Geofence]
+        """
+        inside = []
+        for fence, test in self._cells.get((self._cell(latitude), self._cell(longitude)), ()):
+            if test is None or test(latitude, longitude):
+                inside.append(fence)
+        return inside
+
+    def __len__(self):
+        return len(self.fences)
+
+
+class GeofenceMonitor(object):
+    """tracks which geofences the vehicle is inside and reports crossings
+
+    Every filtered position estimate is checked against the fence index. A crossing is only reported
+    once `confirmations` estimates in a row agree, so a position wandering along a fence edge doesn't
+    flap in and out; estimates less accurate than `max_error` are ignored. The first estimate after
+    start up (or after a fence is added) sets the state silently, so booting inside a fence doesn't
+    look like entering it. Listeners receive a GeofenceEvent per confirmed crossing.
+    """
+
+    _CONFIRMATIONS = 2
+    _MAX_ERROR = 50.0
+
+    def __init__(self, fences=(), confirmations=_CONFIRMATIONS, max_error=_MAX_ERROR):
+        """constructor method
+
+        args:
+            fences: [Geofence]
+            confirmations: int (estimates in a row needed to confirm a crossing)
+            max_error: float (meters, estimates with a larger position error are skipped)
+        """
+        self.confirmations = confirmations
+        self.max_error = max_error
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._index = GeofenceIndex(fences)
+        # Fences confirmed inside, fences whose state is set by the next estimate, crossings seen so far
+        self._inside = set()
+        self._new = set(self._index.by_id)
+        self._pending = {}
+        self.updates = 0
+        self.skipped = 0
+        self.events = 0
+        self._update_seconds = 0.0
+        self._max_update_seconds = 0.0
+
+    def load(self, fences):
+        """replaces the fences, keeping the state of fences that are still there
+
+        args:
+            fences: [Geofence]
+        """
+        index = GeofenceIndex(fences)
+        with self._lock:
+            known = set(self._index.by_id) - self._new
+            self._index = index
+            self._inside &= set(index.by_id)
+            self._new = set(index.by_id) - known
+            self._pending = dict((key, value) for key, value in self._pending.items() if key in index.by_id)
+        _logger.info('Loaded {0} geofences'.format(len(index)))
+
+    def add_listener(self, listener):
+        """registers a callable run with every confirmed crossing
+
+        args:
+            listener: callable taking a GeofenceEvent
+        """
+        self._listeners = self._listeners + [listener]
+
+    def update(self, estimate):
+        """checks a position estimate against the fences
+
+        args:
+            estimate: Estimate (None while there's no position)
+
+        returns:
+            [GeofenceEvent]
+        """
+        if estimate is None:
+            return []
+        if estimate.position_error is not None and estimate.position_error > self.max_error:
+            self.skipped += 1
+            return []
+
+        start = time.time()
+        events = []
+        with self._lock:
+            index = self._index
+            inside = set(fence.fence_id for fence in index.containing(estimate.latitude, estimate.longitude))
+            if self._new:
+                self._inside |= inside & self._new
+                self._new = set()
+            # Only fences whose state differs from the confirmed one need looking at
+            crossing = inside ^ self._inside
+            for fence_id in list(self._pending):
+                if fence_id not in crossing:
+                    del self._pending[fence_id]
+            for fence_id in sorted(crossing):
+                count = self._pending.get(fence_id, 0) + 1
+                if count < self.confirmations:
+                    self._pending[fence_id] = count
+                    continue
+                self._pending.pop(fence_id, None)
+                entered = fence_id in inside
+                if entered:
+                    self._inside.add(fence_id)
+                else:
+                    self._inside.discard(fence_id)
+                events.append(GeofenceEvent(index.by_id[fence_id], entered, estimate.latitude, estimate.longitude,
+                                            estimate.time))
+            self.updates += 1
+            self.events += len(events)
+            elapsed = time.time() - start
+            self._update_seconds += elapsed
+            self._max_update_seconds = max(self._max_update_seconds, elapsed)
+
+        for event in events:
+            _logger.info('{0} geofence [{1}]'.format('Entered' if event.entered else 'Left', event.fence.name))
+            for listener in self._listeners:
+                listener(event)
+        return events
+
+    def inside(self):
+        """returns the fences the vehicle is confirmed to be inside
+
+        returns:
+            [Geofence]
+        """
+        with self._lock:
+            return [self._index.by_id[fence_id] for fence_id in self._inside]
+
+    def speed_limit(self):
+        """returns the lowest speed limit of the fences the vehicle is inside
+
+        returns:
+            float (mph, None if no fence sets one)
+        """
+        limits = [fence.speed_limit for fence in self.inside() if fence.speed_limit is not None]
+        return min(limits) if limits else None
+
+    def stats(self):
+        """returns update counters and evaluation time
+
+        returns:
+            {fences, updates, skipped, events, mean_update_microseconds, max_update_microseconds}
+        """
+        return {
+            'fences': len(self._index),
+            'updates': self.updates,
+            'skipped': self.skipped,
+            'events': self.events,
+            'mean_update_microseconds': 1e6 * self._update_seconds / self.updates if self.updates else 0.0,
+            'max_update_microseconds': 1e6 * self._max_update_seconds,
+        }
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+#
+# gps reader module
+#
+
+from collections import namedtuple
+import threading
+import time
+
+from securityclientpy import _logger
+
+
+# Units are gpsd's: degrees, meters, meters per second, degrees from true north
+GpsFix = namedtuple('GpsFix', [
+    'mode', 'time', 'latitude', 'longitude', 'altitude', 'speed', 'climb', 'track',
+    'epx', 'epy', 'epv', 'eps', 'received',
+])
+
+
+class GpsReader(object):
+    """background consumer of the gpsd report stream keeping the newest position fix
+
+    gpsd sends a report every time the receiver has something to say (TPV, SKY, DEVICE, ...), and the
+    session buffers them until they are read. A single thread drains the stream continuously and
+    replaces the current fix with each TPV report that has a position, so the fix is never older than
+    the receiver's last report. The fix is an immutable tuple swapped in with one assignment: any
+    number of threads read it without locking and never see half an update.
+    """
+
+    _MIN_RECONNECT_SECONDS = 1.0
+    _MAX_RECONNECT_SECONDS = 30.0
+    _MODE_2D = 2
+
+    def __init__(self, connect, clock=time.time):
+        """constructor method
+
+        args:
+            connect: callable returning a gps session (gps.gps or compatible, i.e. FakeGpsSession)
+            clock: callable returning float seconds (when fixes are received)
+        """
+        self._connect = connect
+        self._clock = clock
+        self._session = None
+        self._fix = None
+        self._running = False
+        self._thread = None
+        self._stopped = threading.Event()
+        self._listeners = []
+        self.reports = 0
+        self.fixes = 0
+        self.reconnects = 0
+
+    def start(self):
+        if self._running: return
+        self._running = True
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._read_thread)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._running = False
+        self._stopped.set()
+        session = self._session
+        if session is not None and hasattr(session, 'close'):
+            # Unblocks a read waiting on the socket
+            session.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _read_thread(self):
+        """reads reports until stopped, reconnecting with backoff when gpsd goes away"""
+        backoff = self._MIN_RECONNECT_SECONDS
+        while self._running:
+            if self._session is None:
+                try:
+                    self._session = self._connect()
+                except Exception as exception:
+                    _logger.debug('Could not connect to gpsd [{0}]'.format(exception))
+                    self._stopped.wait(backoff)
+                    backoff = min(backoff * 2, self._MAX_RECONNECT_SECONDS)
+                    continue
+                backoff = self._MIN_RECONNECT_SECONDS
+
+            try:
+                report = self._session.next()
+            except Exception as exception:
+                # StopIteration once the connection drops, socket errors while it does
+                if self._running:
+                    _logger.debug('gpsd stream ended [{0}]'.format(exception or type(exception).__name__))
+                    self.reconnects += 1
+                self._session = None
+                continue
+
+            self.reports += 1
+            if report.get('class') == 'TPV':
+                self.update(report)
+
+        _logger.debug('GPS reader stopped')
+
+    def update(self, report):
+        """replaces the current fix with a TPV report's position
+
+        Reports without a 2D fix (no satellites yet) are ignored, the previous fix stays and ages.
+
+        args:
+            report: dict (gpsd TPV report)
+
+        returns:
+            GpsFix (None if the report has no position)
+        """
+        if (report.get('mode') or 0) < self._MODE_2D or report.get('lat') is None or report.get('lon') is None:
+            return None
+        fix = GpsFix(
+            report.get('mode'), report.get('time'), report.get('lat'), report.get('lon'), report.get('alt'),
+            report.get('speed'), report.get('climb'), report.get('track'), report.get('epx'), report.get('epy'),
+            report.get('epv'), report.get('eps'), self._clock(),
+        )
+        self._fix = fix
+        self.fixes += 1
+        for listener in self._listeners:
+            listener(fix)
+        return fix
+
+    def add_listener(self, listener):
+        """registers a callable run on the reader thread with every new fix
+
+        args:
+            listener: callable taking a GpsFix
+        """
+        self._listeners = self._listeners + [listener]
+
+    @property
+    def fix(self):
+        """the newest fix, or None before the first one"""
+        return self._fix
+
+    def age(self, fix):
+        """returns seconds since a fix was received
+
+        args:
+            fix: GpsFix
+
+        returns:
+            float (None without a fix)
+        """
+        if fix is None:
+            return None
+        return max(0.0, self._clock() - fix.received)
+
+    @property
+    def running(self):
+        return self._running
@@ -3,180 +3,192 @@
 # hardware controller module
 #
 
-import RPi.GPIO as GPIO
-import os
-import glob
+import threading
 import time
-import requests
 
 from securityclientpy import _logger
 from securityclientpy.server_requests import ServerRequests
+from securityclientpy.sensorbus import SensorEventBus
+from securityclientpy.gpsreader import GpsReader
+from securityclientpy.location import LocationProvider
+from securityclientpy.kalman import PositionEstimator
+from securityclientpy.thermal import TemperatureSampler, TemperatureMonitor
+from securityclientpy.drivers import RealDrivers, SimulatedDrivers, QUIET_PATTERNS
 
 
 class HardwareController(object):
 
     _GPIO_PINS = {'panic_button': 6, 'vibration': 27, 'motion': 22, 'led': 17}
-    _THERMAL_SENSOR_BASE_DIR = '/sys/bus/w1/devices/'
     _GEOIP_HOSTNAME = "http://freegeoip.net/json"
-    _TEMPERATURE_SIMULATION_DATA = {'fahrenheit': 73.3, 'celcius': 32.0}
-    _SPEEDOMETER_SIMLUATION_DATA = {'speed': 75, 'altitude': 1024.6, 'climb': 117}
+    _MPH_PER_METER_PER_SECOND = 2.23694
+    _FLASH_SECONDS = 0.3
 
-    def __init__(self, no_hardware, server_request):
-        """set up GPIO and pins as inputs/outputs"""
+    def __init__(self, no_hardware, server_request, drivers=None, clock=time.time):
+        """set up GPIO and pins as inputs/outputs
+
+        args:
+            no_hardware: bool
+            server_request: ServerRequests
+            drivers: Drivers (Default=RealDrivers, or SimulatedDrivers with every signal off with no_hardware)
+            clock: callable returning float seconds, the time stamped on every reading (i.e.
+                   eventlog.VirtualClock to replay a recorded event log)
+        """
 
         self.no_hardware = no_hardware
         self.server_request = server_request
-
-        if not self.no_hardware:
-            # Import the GPS module (hardware config value should only be true if running on rapsberry pi)
-            # GPS module will only be installed in virtualenv on raspberry pi system
-            import gps
-
-            self.led_flashing = False
-
-            # Set up sensors and led
-            GPIO.setmode(GPIO.BCM)
-            GPIO.setup(self._GPIO_PINS['vibration'], GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
-            GPIO.setup(self._GPIO_PINS['motion'], GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
-            GPIO.setup(self._GPIO_PINS['led'], GPIO.OUT)
-
-            GPIO.setup(self._GPIO_PINS['panic_button'], GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
-            GPIO.add_event_detect(self._GPIO_PINS['panic_button'], GPIO.RISING, callback=self.panic_button_callback)
-
-            # Set up temperature sensor
-            os.system('modprobe w1-gpio')
-            os.system('modprobe w1-therm')
-            thermal_sensor_device_folder = glob.glob(self._THERMAL_SENSOR_BASE_DIR + '28*')[0]
-            self.thermal_sensor_device_file = thermal_sensor_device_folder + '/w1_slave'
-
-            # Listen on port 2947 (gpsd) of localhost
-            self.gps_session = gps.gps("localhost", "2947")
-            self.gps_session.stream(gps.WATCH_ENABLE | gps.WATCH_NEWSTYLE)
+        # The backends are chosen once here, nothing below branches on whether the hardware is real
+        if drivers is None:
+            drivers = SimulatedDrivers(QUIET_PATTERNS) if no_hardware else RealDrivers()
+        self.drivers = drivers
+        self.gpio = drivers.gpio
+        self.clock = clock
+        self.gps_reader = GpsReader(drivers.connect_gps, clock=clock)
+        self.location = LocationProvider(self.gps_reader, self._GEOIP_HOSTNAME, clock=clock)
+        self.position_estimator = PositionEstimator(self.gps_reader, clock=clock)
+        self.temperature_monitor = TemperatureMonitor()
+        self.led_flashing = False
+        self._led_lock = threading.Lock()
+        self._led_cancel = threading.Event()
+
+        # Motion and vibration edges are published here instead of being polled
+        self.sensor_bus = SensorEventBus(
+            self.gpio, {'motion': self._GPIO_PINS['motion'], 'vibration': self._GPIO_PINS['vibration']}, clock=clock
+        )
+
+        # Set up sensors and led
+        self.gpio.setmode(self.gpio.BCM)
+        self.gpio.setup(self._GPIO_PINS['vibration'], self.gpio.IN, pull_up_down=self.gpio.PUD_DOWN)
+        self.gpio.setup(self._GPIO_PINS['motion'], self.gpio.IN, pull_up_down=self.gpio.PUD_DOWN)
+        self.gpio.setup(self._GPIO_PINS['led'], self.gpio.OUT)
+
+        self.gpio.setup(self._GPIO_PINS['panic_button'], self.gpio.IN, pull_up_down=self.gpio.PUD_DOWN)
+        self.gpio.add_event_detect(self._GPIO_PINS['panic_button'], self.gpio.RISING, callback=self.panic_button_callback)
+        self.sensor_bus.start()
+        self.drivers.start(self._GPIO_PINS)
+
+        # Set up temperature sensor, sampled in the background since every read takes ~750 ms
+        device_file = TemperatureSampler.find_device(self.drivers.thermal_base_dir)
+        self.temperature_sampler = TemperatureSampler(device_file, clock=clock)
+        self.temperature_sampler.add_listener(self.temperature_monitor.add_sample)
+        self.temperature_sampler.start()
+
+        # Keep the latest gps fix from gpsd in the background
+        self.gps_reader.start()
+        self.position_estimator.start()
 
     def status_led_on(self):
-        """turn on status led
+        """turn on status led, ending any flashing
 
         before turning on, check if its already on or not
         """
-        if not self.no_hardware:
-            led_status = GPIO.input(self._GPIO_PINS['led'])
-            if not led_status:
-                GPIO.output(self._GPIO_PINS['led'], GPIO.HIGH)
+        with self._led_lock:
+            self._cancel_flash()
+            self._led_output(True)
 
     def status_led_off(self):
-        """turn off status led
+        """turn off status led, ending any flashing
 
         before turning off, check if its already off or not
         """
-        led_status = GPIO.input(self._GPIO_PINS['led'])
-        if led_status:
-            GPIO.output(self._GPIO_PINS['led'], GPIO.LOW)
+        with self._led_lock:
+            self._cancel_flash()
+            self._led_output(False)
 
-    def status_led_flash(self, flashes):
-        """flash led a number of times
+    def status_led_flash(self, flashes, then_on=False):
+        """flash led a number of times on a thread of its own, so the caller isn't held up
 
-        before starting the flash, check if its already on or not
+        A later call to any status_led_* method cuts the flashing short.
 
         args:
             flashes: int
-        """
-        if not self.no_hardware:
-            led_status = GPIO.input(self._GPIO_PINS['led'])
-            if led_status:
-                GPIO.output(self._GPIO_PINS['led'], GPIO.LOW)
+            then_on: bool (leave the led on once done, Default=off)
 
-            for i in range(flashes):
-                GPIO.output(self._GPIO_PINS['led'], GPIO.HIGH)
-                time.sleep(0.3)
-                GPIO.output(self._GPIO_PINS['led'], GPIO.LOW)
-                time.sleep(0.3)
+        returns:
+            threading.Thread (the flashing thread)
+        """
+        return self._start_flash(flashes, then_on)
 
     def status_led_flash_start(self):
-        """flash status led continuously
+        """flash status led continuously, until status_led_flash_stop
 
-        before starting the flash, check if its already on or not
-
-        args:
-            flashes: int
+        returns:
+            threading.Thread (the flashing thread)
         """
-        if not self.no_hardware:
-            self.led_flashing = True
-            led_status = GPIO.input(self._GPIO_PINS['led'])
-            if led_status:
-                GPIO.output(self._GPIO_PINS['led'], GPIO.LOW)
-
-            while self.led_flashing:
-                GPIO.output(self._GPIO_PINS['led'], GPIO.HIGH)
-                time.sleep(0.3)
-                GPIO.output(self._GPIO_PINS['led'], GPIO.LOW)
-                time.sleep(0.3)
+        self.led_flashing = True
+        return self._start_flash(None, False)
 
     def status_led_flash_stop(self):
         """stops status led flash"""
-        if not self.no_hardware:
-            self.led_flashing = False
-            led_status = GPIO.input(self._GPIO_PINS['led'])
-            if led_status:
-                GPIO.output(self._GPIO_PINS['led'], GPIO.LOW)
+        self.led_flashing = False
+        self.status_led_off()
+
+    def _start_flash(self, flashes, then_on):
+        with self._led_lock:
+            self._cancel_flash()
+            self._led_output(False)
+            thread = threading.Thread(target=self._flash_thread, args=(self._led_cancel, flashes, then_on))
+            thread.daemon = True
+            thread.start()
+        return thread
+
+    def _cancel_flash(self):
+        """stops the flashing thread from touching the led again, called with the led lock held"""
+        self._led_cancel.set()
+        self._led_cancel = threading.Event()
+
+    def _led_output(self, value):
+        """sets the led, called with the led lock held"""
+        if bool(self.gpio.input(self._GPIO_PINS['led'])) != value:
+            self.gpio.output(self._GPIO_PINS['led'], self.gpio.HIGH if value else self.gpio.LOW)
+
+    def _flash_thread(self, cancel, flashes, then_on):
+        """flashes the led until done or cancelled
 
-    def _read_thermal_sensor_raw(self):
-        """reads raw data from thermal sensor local file
-
-        returns:
-            str
+        args:
+            cancel: threading.Event
+            flashes: int (None for continuously)
+            then_on: bool
         """
-        data = None
-        try:
-            with open(self.thermal_sensor_device_file, 'r') as fp:
-                data = fp.readlines()
-        except IOError as exception:
-            _logger.debug('Could not read file [{0}]'.format(exception))
-
-        return data
+        count = 0
+        while flashes is None or count < flashes:
+            for value in (True, False):
+                with self._led_lock:
+                    if cancel.is_set(): return
+                    self._led_output(value)
+                if cancel.wait(self._FLASH_SECONDS): return
+            count += 1
+
+        with self._led_lock:
+            if not cancel.is_set():
+                self._led_output(then_on)
 
     def read_temperature_sensor(self):
-        """reads and processes the thermal sensor data from local file
-
-        After data is read from the file, it is converted into celcius and farenheit degrees
+        """returns the latest temperature sample without touching the sensor
 
         returns:
-            float, float
+            {fahrenheit, celcius, time, age, stale} (None before the first successful read)
         """
-        if self.no_hardware:
-            return self._TEMPERATURE_SIMULATION_DATA
-
-        ctemp = 0.0
-        ftemp = 0.0
-        data = self._read_thermal_sensor_raw()
-        if not data:
-            return None
+        return self.temperature_sampler.latest()
 
-        while data[0].strip()[-3:] != 'YES':
-            time.sleep(0.2)
-            data = self._read_thermal_sensor_raw()
+    def read_temperature_history(self):
+        """returns the temperature trend and its downsampled history
 
-        equal_pos = data[1].find('t=')
-        if equal_pos != -1:
-            data_string = data[1][equal_pos+2:]
-            ctemp = float(data_string) / 1000.0
-            ftemp = ctemp * 9.0 / 5.0 + 32.0
-
-        ctemp = float(str('%.1f' % ctemp))
-        ftemp = float(str('%.1f' % ftemp))
-
-        return {'fahrenheit': ftemp, 'celcius': ctemp}
+        returns:
+            {trend: {fahrenheit, rate, hot} (None before the first sample), history: [{time, min, max, mean}]}
+        """
+        return {'trend': self.temperature_monitor.trend(), 'history': self.temperature_monitor.history()}
 
     def panic_button_callback(self, channel):
         """callback method for panic push button edge changes
 
+        The alert is queued on the server request dispatcher so the gpio callback thread isn't blocked.
+
         returns:
-            bool
+            concurrent.futures.Future (None if no panic was initiated)
         """
-        if self.no_hardware:
-            return False
-        if GPIO.input(self._GPIO_PINS['panic_button']):
+        if self.gpio.input(self._GPIO_PINS['panic_button']):
             _logger.info('Panic initiated.')
-            return self.server_request.send_panic_alert()
+            return self.server_request.send_panic_alert_async()
 
     def read_vibration_sensor(self):
         """fetches the current status of the shock sensor via gpio pin
@@ -184,9 +196,7 @@ class HardwareController(object):
         returns:
             bool
         """
-        if self.no_hardware:
-            return False
-        return GPIO.input(self._GPIO_PINS['vibration'])
+        return self.gpio.input(self._GPIO_PINS['vibration'])
 
     def read_motion_sensor(self):
         """fetches the current status of the motion sensoe via gpio pin
@@ -194,63 +204,54 @@ class HardwareController(object):
         returns:
             bool
         """
-        if self.no_hardware:
-            return False
-        return GPIO.input(self._GPIO_PINS['motion'])
+        return self.gpio.input(self._GPIO_PINS['motion'])
 
     def read_speedometer_sensor(self):
-        """fetches the current speedometer sensor data via gps module
+        """fetches the current speedometer sensor data from the gps
+
+        Speed and heading come from the kalman filtered estimate, which smooths out gps jitter and carries
+        on across short dropouts; the raw fix is used only once the estimate has lapsed. gpsd reports
+        speed in meters per second, it is returned in miles per hour like speed limits are.
 
         returns:
-            {speed: int, altitude: float, heading: float, climb: float}
+            {speed: float (mph), speed_error: float (mph, None for a raw fix), altitude: float,
+             heading: float (degrees from north or None), climb: float, fix_age: float (seconds or None)}
         """
-        if self.no_hardware:
-            return self._SPEEDOMETER_SIMLUATION_DATA
-
-        speed = 0.0
-        alt = 0.0
-        climb = 0.0
-
-        try:
-            report = self.gps_session.next()
-            if report['class'] == 'TPV':
-                if hasattr(report, 'speed'): speed = report.speed
-                if hasattr(report, 'alt'): alt = report.alt
-                if hasattr(report, 'climb'): climb = report.climb
-
-        except KeyError: pass
-        except KeyboardInterrupt: pass
-        except StopIteration: self.gps_session = None
-
-        data = { 'speed': speed, 'altitude': alt, 'climb': climb }
+        fix = self.gps_reader.fix
+        if fix is None:
+            return {'speed': 0.0, 'speed_error': None, 'altitude': 0.0, 'heading': None, 'climb': 0.0,
+                    'fix_age': None}
+
+        estimate = self.position_estimator.estimate
+        if estimate is not None:
+            speed, speed_error, heading = estimate.speed, estimate.speed_error, estimate.heading
+        else:
+            speed, speed_error, heading = fix.speed or 0.0, None, fix.track
+
+        data = {
+            'speed': speed * self._MPH_PER_METER_PER_SECOND,
+            'speed_error': speed_error * self._MPH_PER_METER_PER_SECOND if speed_error is not None else None,
+            'altitude': fix.altitude or 0.0,
+            'heading': heading,
+            'climb': fix.climb or 0.0,
+            'fix_age': self.gps_reader.age(fix),
+        }
         return data
 
     def read_gps_sensor(self):
-        """fetches the current gps sensor data via gps module
+        """fetches the current location from the gps fix, the last known position or geoip, without blocking
 
         returns:
-            {latitude, longitude}
+            {latitude, longitude, source, age} (None while no location is known yet)
         """
-        geo = requests.get(self._GEOIP_HOSTNAME)
-        json_data = geo.json()
-        lat = float(json_data["latitude"])
-        lon = float(json_data["longitude"])
-
-        if not self.no_hardware:
-            try:
-                report = self.gps_session.next()
-                if report['class'] == 'TPV':
-                    if hasattr(report, 'lat'): lat = report.lat
-                    if hasattr(report, 'lon'): lon = report.lon
-
-            except KeyError: pass
-            except KeyboardInterrupt: pass
-            except StopIteration: self.gps_session = None
-
-        data = {'latitude': lat, 'longitude': lon}
-        return data
+        return self.location.location()
 
     def cleanup(self):
-        if not self.no_hardware:
-            GPIO.cleanup()
-            self.gps_session = None
\ No newline at end of file
+        with self._led_lock:
+            self._cancel_flash()
+        self.sensor_bus.stop()
+        self.gpio.cleanup()
+        self.position_estimator.stop()
+        self.gps_reader.stop()
+        self.temperature_sampler.stop()
+        self.drivers.stop()
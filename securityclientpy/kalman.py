@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+#
+# gps position / speed estimation module
+#
+
+from collections import namedtuple
+import math
+import threading
+import time
+
+import numpy
+
+from securityclientpy import _logger
+
+
+_METERS_PER_DEGREE = 111320.0
+
+# Speed in meters per second, heading in degrees from north (None while too slow to tell), errors are
+# one standard deviation in meters / meters per second
+Estimate = namedtuple('Estimate', [
+    'latitude', 'longitude', 'speed', 'heading', 'position_error', 'speed_error', 'fix_age', 'time',
+])
+
+
+class KalmanFilter(object):
+    """constant velocity kalman filter over a flat east / north plane
+
+    The state is position and velocity [east, north, v_east, v_north] in meters around an origin; the
+    state and covariance are fixed-size numpy arrays updated in place. Velocity changes are modelled as
+    white noise acceleration with spectral density `acceleration_noise`.
+    """
+
+    _ACCELERATION_NOISE = 0.5
+    _INITIAL_SPEED_VARIANCE = 100.0
+    _REANCHOR_DISTANCE = 10000.0
+
+    def __init__(self, acceleration_noise=_ACCELERATION_NOISE):
+        """constructor method
+
+        args:
+            acceleration_noise: float (m^2/s^3)
+        """
+        self.acceleration_noise = acceleration_noise
+        self.state = numpy.zeros(4)
+        self.covariance = numpy.zeros((4, 4))
+        self.origin = None
+        self.time = None
+        self._transition = numpy.eye(4)
+        self._noise = numpy.zeros((4, 4))
+
+    def to_local(self, latitude, longitude):
+        """projects a position to meters east / north of the origin"""
+        return ((longitude - self.origin[1]) * _METERS_PER_DEGREE * math.cos(math.radians(self.origin[0])),
+                (latitude - self.origin[0]) * _METERS_PER_DEGREE)
+
+    def to_global(self, east, north):
+        """projects meters east / north of the origin back to a position"""
+        return (self.origin[0] + north / _METERS_PER_DEGREE,
+                self.origin[1] + east / (_METERS_PER_DEGREE * math.cos(math.radians(self.origin[0]))))
+
+    def reset(self, latitude, longitude, timestamp, position_variance):
+        """starts tracking from a position with unknown velocity"""
+        self.origin = (latitude, longitude)
+        self.time = timestamp
+        self.state[:] = 0.0
+        self.covariance[:] = 0.0
+        self.covariance[0, 0] = self.covariance[1, 1] = position_variance
+        self.covariance[2, 2] = self.covariance[3, 3] = self._INITIAL_SPEED_VARIANCE
+
+    def _model(self, dt):
+        """fills in the transition and process noise matrices for a time step"""
+        q = self.acceleration_noise
+        self._transition[0, 2] = self._transition[1, 3] = dt
+        self._noise[0, 0] = self._noise[1, 1] = q * dt ** 3 / 3.0
+        self._noise[0, 2] = self._noise[2, 0] = self._noise[1, 3] = self._noise[3, 1] = q * dt ** 2 / 2.0
+        self._noise[2, 2] = self._noise[3, 3] = q * dt
+
+    def predicted(self, timestamp):
+        """returns the state and covariance extrapolated to a time, without changing the filter
+
+        returns:
+            numpy.ndarray, numpy.ndarray
+        """
+        dt = max(0.0, timestamp - self.time)
+        self._model(dt)
+        state = self._transition.dot(self.state)
+        covariance = self._transition.dot(self.covariance).dot(self._transition.T) + self._noise
+        return state, covariance
+
+    def update(self, latitude, longitude, timestamp, position_variance, velocity=None, velocity_variance=None):
+        """advances the filter to a measurement and corrects it
+
+        args:
+            latitude: float
+            longitude: float
+            timestamp: float
+            position_variance: float (m^2)
+            velocity: (float, float) (m/s east, north, None when the receiver doesn't report it)
+            velocity_variance: float ((m/s)^2)
+        """
+        if self.origin is None:
+            self.reset(latitude, longitude, timestamp, position_variance)
+        state, covariance = self.predicted(timestamp)
+        self.state[:] = state
+        self.covariance[:] = covariance
+        self.time = max(self.time, timestamp)
+
+        east, north = self.to_local(latitude, longitude)
+        if velocity is None:
+            measurement = numpy.array([east, north])
+            observed = slice(0, 2)
+            noise = numpy.diag([position_variance, position_variance])
+        else:
+            measurement = numpy.array([east, north, velocity[0], velocity[1]])
+            observed = slice(0, 4)
+            noise = numpy.diag([position_variance, position_variance, velocity_variance, velocity_variance])
+
+        # The measurement picks state components directly, so H x and H P H' are slices
+        innovation = measurement - self.state[observed]
+        innovation_covariance = self.covariance[observed, observed] + noise
+        gain = self.covariance[:, observed].dot(numpy.linalg.inv(innovation_covariance))
+        self.state += gain.dot(innovation)
+        self.covariance -= gain.dot(self.covariance[observed, :])
+
+        if math.hypot(self.state[0], self.state[1]) > self._REANCHOR_DISTANCE:
+            # Keep the flat projection accurate by moving the origin along with the vehicle
+            self.origin = self.to_global(self.state[0], self.state[1])
+            self.state[0] = self.state[1] = 0.0
+
+
+class PositionEstimator(object):
+    """smoothed position, speed and heading from the gps fix stream
+
+    Every fix the gps reader receives is fed to a constant velocity kalman filter, weighted by the
+    receiver's own error estimates. At `rate` times a second the filter is extrapolated to the current
+    time and published as an immutable Estimate, so readers get a current value between fixes and
+    across short dropouts. Once no fix has arrived for `max_dropout` seconds the estimate is withdrawn.
+    """
+
+    _RATE = 5.0
+    _MAX_DROPOUT = 5.0
+    _MIN_HEADING_SPEED = 1.0
+    _DEFAULT_POSITION_ERROR = 10.0
+    _DEFAULT_SPEED_ERROR = 1.0
+    _HEADING_ERROR_DEGREES = 5.0
+    # gpsd error estimates are 95% confidence, the filter wants one standard deviation
+    _CONFIDENCE_95 = 1.96
+
+    def __init__(self, gps_reader=None, rate=_RATE, max_dropout=_MAX_DROPOUT, kalman_filter=None, clock=time.time):
+        """constructor method
+
+        args:
+            gps_reader: GpsReader (fixes are fed with `add_fix` when None)
+            rate: float (estimates published per second)
+            max_dropout: float (seconds without a fix the estimate is extrapolated for)
+            kalman_filter: KalmanFilter
+            clock: callable returning float seconds
+        """
+        self.gps_reader = gps_reader
+        self._clock = clock
+        self.rate = rate
+        self.max_dropout = max_dropout
+        self.filter = kalman_filter if kalman_filter is not None else KalmanFilter()
+        self._lock = threading.Lock()
+        self._estimate = None
+        self._last_fix_time = None
+        self._running = False
+        self._thread = None
+        self._stopped = threading.Event()
+        self._listeners = []
+        self.updates = 0
+
+        if self.gps_reader is not None:
+            self.gps_reader.add_listener(self.add_fix)
+
+    def start(self):
+        if self._running: return
+        self._running = True
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._publish_thread)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def add_fix(self, fix):
+        """feeds a gps fix to the filter
+
+        args:
+            fix: GpsFix
+        """
+        position_error = max(fix.epx or 0.0, fix.epy or 0.0) / self._CONFIDENCE_95 or self._DEFAULT_POSITION_ERROR
+        velocity = None
+        velocity_variance = None
+        if fix.speed is not None and fix.track is not None:
+            track = math.radians(fix.track)
+            velocity = (fix.speed * math.sin(track), fix.speed * math.cos(track))
+            speed_error = (fix.eps or 0.0) / self._CONFIDENCE_95 or self._DEFAULT_SPEED_ERROR
+            # Uncertainty in the direction of travel grows with speed
+            velocity_variance = speed_error ** 2 + (fix.speed * math.radians(self._HEADING_ERROR_DEGREES)) ** 2
+
+        with self._lock:
+            self.filter.update(fix.latitude, fix.longitude, fix.received, position_error ** 2, velocity,
+                               velocity_variance)
+            self._last_fix_time = fix.received
+            self.updates += 1
+
+        if self._listeners:
+            estimate = self.estimate_at(fix.received)
+            for listener in self._listeners:
+                listener(estimate)
+
+    def add_listener(self, listener):
+        """registers a callable run with the filtered estimate after every fix
+
+        args:
+            listener: callable taking an Estimate
+        """
+        self._listeners = self._listeners + [listener]
+
+    def estimate_at(self, timestamp):
+        """extrapolates the filter to a time
+
+        args:
+            timestamp: float
+
+        returns:
+            Estimate (None without a fix in the last max_dropout seconds)
+        """
+        with self._lock:
+            if self._last_fix_time is None or timestamp - self._last_fix_time > self.max_dropout:
+                return None
+            state, covariance = self.filter.predicted(timestamp)
+            latitude, longitude = self.filter.to_global(state[0], state[1])
+            fix_age = max(0.0, timestamp - self._last_fix_time)
+
+        speed = math.hypot(state[2], state[3])
+        heading = math.degrees(math.atan2(state[2], state[3])) % 360.0 if speed >= self._MIN_HEADING_SPEED else None
+        return Estimate(latitude, longitude, speed, heading, math.sqrt(max(covariance[0, 0], covariance[1, 1])),
+                        math.sqrt(max(covariance[2, 2], covariance[3, 3])), fix_age, timestamp)
+
+    def _publish_thread(self):
+        """publishes an extrapolated estimate at the configured rate"""
+        interval = 1.0 / self.rate
+        while not self._stopped.wait(interval):
+            self._estimate = self.estimate_at(self._clock())
+        _logger.debug('Position estimator stopped')
+
+    @property
+    def estimate(self):
+        """the latest published estimate, or a fresh one while the publishing thread isn't running"""
+        if not self._running:
+            return self.estimate_at(self._clock())
+        return self._estimate
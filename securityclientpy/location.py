@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+#
+# location provider module
+#
+
+import threading
+import time
+
+import requests
+
+from securityclientpy import _logger
+
+
+class LocationProvider(object):
+    """answers "where is the vehicle" without waiting on the network
+
+    Locations come from the first tier that has one:
+
+    1. the gps reader's current fix, while it is fresh
+    2. the last known position (from gps or geoip), until its time to live runs out
+    3. ip geolocation, requested on a background thread at most once per `geoip_interval`; the answer
+       is cached as the last known position and served from the next call on
+
+    A call never blocks: without a usable position it starts a geoip lookup if one is due and returns
+    None. Ages are measured on the same clock the gps reader stamps its fixes with.
+    """
+
+    SOURCE_GPS = 'gps'
+    SOURCE_CACHED = 'cached'
+    SOURCE_GEOIP = 'geoip'
+
+    _MAX_FIX_AGE = 10.0
+    _CACHE_TTL = 60.0 * 60.0
+    _GEOIP_INTERVAL = 5.0 * 60.0
+    _GEOIP_TIMEOUT = (3.05, 5.0)
+
+    def __init__(self, gps_reader, geoip_url, max_fix_age=_MAX_FIX_AGE, cache_ttl=_CACHE_TTL,
+                 geoip_interval=_GEOIP_INTERVAL, clock=time.time):
+        """constructor method
+
+        args:
+            gps_reader: GpsReader (None without a gps receiver)
+            geoip_url: str
+            max_fix_age: float (seconds a gps fix counts as current)
+            cache_ttl: float (seconds the last known position is served for)
+            geoip_interval: float (minimum seconds between geoip lookups)
+            clock: callable returning float seconds (the gps reader's clock)
+        """
+        self.gps_reader = gps_reader
+        self.geoip_url = geoip_url
+        self.max_fix_age = max_fix_age
+        self.cache_ttl = cache_ttl
+        self.geoip_interval = geoip_interval
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._last_known = None
+        self._geoip_thread = None
+        self._last_geoip_request = None
+        self.geoip_requests = 0
+        self.geoip_failures = 0
+
+    def location(self):
+        """returns the best position available now
+
+        returns:
+            {latitude, longitude, source, age} (None without any usable position)
+        """
+        fix = self.gps_reader.fix if self.gps_reader is not None else None
+        if fix is not None:
+            age = self.gps_reader.age(fix)
+            if age <= self.max_fix_age:
+                self._last_known = (fix.latitude, fix.longitude, self.SOURCE_GPS, fix.received)
+                return {'latitude': fix.latitude, 'longitude': fix.longitude, 'source': self.SOURCE_GPS, 'age': age}
+
+        last_known = self._last_known
+        if last_known is not None:
+            latitude, longitude, source, received = last_known
+            age = max(0.0, self.clock() - received)
+            if age <= self.cache_ttl:
+                if source == self.SOURCE_GEOIP:
+                    # Keep an ip position fresh in the background while there is no gps
+                    self._request_geoip(age)
+                return {'latitude': latitude, 'longitude': longitude,
+                        'source': source if source == self.SOURCE_GEOIP else self.SOURCE_CACHED, 'age': age}
+
+        self._request_geoip()
+        return None
+
+    def _request_geoip(self, age=None):
+        """starts a background geoip lookup unless one is running, was made recently or isn't needed yet
+
+        args:
+            age: float (age of the cached geoip position, if there is one)
+        """
+        now = self.clock()
+        with self._lock:
+            if self._geoip_thread is not None:
+                return
+            if self._last_geoip_request is not None and now - self._last_geoip_request < self.geoip_interval:
+                return
+            if age is not None and age < self.geoip_interval:
+                return
+            self._last_geoip_request = now
+            self._geoip_thread = threading.Thread(target=self._geoip_lookup)
+            self._geoip_thread.daemon = True
+            self._geoip_thread.start()
+
+    def _geoip_lookup(self):
+        """fetches the ip position and caches it as the last known position"""
+        try:
+            self.geoip_requests += 1
+            response = requests.get(self.geoip_url, timeout=self._GEOIP_TIMEOUT)
+            json_data = response.json()
+            latitude = float(json_data['latitude'])
+            longitude = float(json_data['longitude'])
+            # A gps fix that arrived in the meantime is better than the ip position
+            now = self.clock()
+            if self._last_known is None or self._last_known[2] == self.SOURCE_GEOIP or \
+                    now - self._last_known[3] > self.max_fix_age:
+                self._last_known = (latitude, longitude, self.SOURCE_GEOIP, now)
+        except (requests.exceptions.RequestException, ValueError, KeyError, TypeError) as exception:
+            self.geoip_failures += 1
+            _logger.debug('GeoIP lookup failed [{0}]'.format(exception))
+        finally:
+            with self._lock:
+                self._geoip_thread = None
+
+    def wait_for_geoip(self, timeout=None):
+        """blocks until a running geoip lookup finishes
+
+        args:
+            timeout: float
+
+        returns:
+            bool (False if it is still running)
+        """
+        thread = self._geoip_thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    @property
+    def last_known(self):
+        return self._last_known
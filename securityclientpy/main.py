@@ -38,12 +38,19 @@ def _config_from_args():
     optional_argument_group.add_argument(
         '-d', '--dev', dest='dev', action='store_true', default=False, required=False,
         help='Will not attempt to use any hardware.')
+    optional_argument_group.add_argument(
+        '-sim', '--simulation', dest='simulation', default='quiet', required=False,
+        help='simulated sensors with --no_hardware: quiet, busy or a YAML file of signal patterns. ')
+    optional_argument_group.add_argument(
+        '-dd', '--data_dir', dest='data_dir', default='.', required=False,
+        help='directory for local client data. ')
 
     return parser.parse_args()
 
 # Make global so can be accessed when need to stop system, and safely save settings
 config = _config_from_args()
-client = Client(host=config.host, serverhost=config.serverhost, no_hardware=config.no_hardware, no_video=config.no_video, dev=config.dev)
+client = Client(host=config.host, serverhost=config.serverhost, no_hardware=config.no_hardware, no_video=config.no_video, dev=config.dev,
+                data_dir=config.data_dir, simulation=config.simulation)
 
 def main_thread():
     """main thread to start up the server"""
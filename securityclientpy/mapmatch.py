@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+#
+# road matching module
+#
+
+from collections import namedtuple
+import math
+import re
+
+import numpy
+
+
+_METERS_PER_DEGREE = 111320.0
+_MPH_PER_UNIT = {None: 0.621371, 'km/h': 0.621371, 'kmh': 0.621371, 'kph': 0.621371, 'mph': 1.0, 'knots': 1.15078}
+_MAXSPEED_PATTERN = re.compile(r'^\s*([0-9]+(?:\.[0-9]+)?)\s*(mph|km/h|kmh|kph|knots)?\s*$')
+
+RoadMatch = namedtuple('RoadMatch', ['road', 'speed_limit', 'distance', 'bearing'])
+
+
+def parse_maxspeed(value):
+    """converts an OSM maxspeed tag to miles per hour
+
+    Plain numbers are km/h as in OSM; "mph" and "knots" suffixes are honoured. When a tag lists several
+    limits (i.e. "50;30") the lowest is used. Symbolic values like "none", "signals" or "RU:urban"
+    have no number to compare with and give None.
+
+    args:
+        value: str
+
+    returns:
+        float (None if the tag has no usable limit)
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) * _MPH_PER_UNIT[None]
+
+    limits = []
+    for part in value.split(';'):
+        match = _MAXSPEED_PATTERN.match(part.lower())
+        if match:
+            limits.append(float(match.group(1)) * _MPH_PER_UNIT[match.group(2)])
+    return min(limits) if limits else None
+
+
+def road_segments(roads):
+    """flattens roads into segment start / end arrays and the index of the road each belongs to
+
+    args:
+        roads: [{nodes}]
+
+    returns:
+        numpy.ndarray, numpy.ndarray, numpy.ndarray (all None without any node)
+    """
+    arrays = [numpy.asarray(road['nodes'], dtype=numpy.float64).reshape(-1, 2) for road in roads]
+    counts = numpy.array([len(nodes) for nodes in arrays], dtype=numpy.intp)
+    if not counts.sum():
+        return None, None, None
+
+    nodes = numpy.concatenate(arrays)
+    node_owners = numpy.repeat(numpy.arange(len(roads)), counts)
+    # Consecutive nodes of the same road form a segment, a road with one node is a zero length one
+    same = node_owners[:-1] == node_owners[1:]
+    single = numpy.flatnonzero(counts == 1)
+    points = (numpy.cumsum(counts) - 1)[single]
+    return (
+        numpy.concatenate((nodes[:-1][same], nodes[points])),
+        numpy.concatenate((nodes[1:][same], nodes[points])),
+        numpy.concatenate((node_owners[:-1][same], single)),
+    )
+
+
+def segment_distances(latitude, longitude, segments):
+    """returns the distance from a position to every segment, and each segment's bearing
+
+    args:
+        latitude: float
+        longitude: float
+        segments: (starts, ends, owners) as returned by road_segments
+
+    returns:
+        numpy.ndarray, numpy.ndarray, numpy.ndarray (meters, degrees from north, road index per segment)
+    """
+    starts, ends, owners = segments
+    if starts is None:
+        empty = numpy.empty(0)
+        return empty, empty, numpy.empty(0, dtype=numpy.intp)
+
+    # Local equirectangular projection in meters with the fix at the origin
+    scale = numpy.array([_METERS_PER_DEGREE, _METERS_PER_DEGREE * math.cos(math.radians(latitude))])
+    a = (starts - (latitude, longitude)) * scale
+    b = (ends - (latitude, longitude)) * scale
+    d = b - a
+
+    length_squared = numpy.einsum('ij,ij->i', d, d)
+    t = -numpy.einsum('ij,ij->i', a, d) / numpy.where(length_squared > 0.0, length_squared, 1.0)
+    numpy.clip(t, 0.0, 1.0, out=t)
+    closest = a + d * t[:, numpy.newaxis]
+    distance = numpy.hypot(closest[:, 0], closest[:, 1])
+    bearing = numpy.degrees(numpy.arctan2(d[:, 1], d[:, 0])) % 360.0
+    return distance, bearing, owners
+
+
+class RoadMatcher(object):
+    """snaps a gps fix to the road being driven
+
+    Every segment of every candidate road is projected onto a local flat plane around the fix, and the
+    distance from the fix to each segment is computed in one pass over numpy arrays. When a heading is
+    known, segments running across the direction of travel are penalised, so at an overpass or a
+    junction the road the vehicle is moving along wins over a closer road crossing it.
+    """
+
+    _MAX_DISTANCE = 50.0
+    _HEADING_PENALTY = 30.0
+
+    def __init__(self, max_distance=_MAX_DISTANCE, heading_penalty=_HEADING_PENALTY):
+        """constructor method
+
+        args:
+            max_distance: float (meters, fixes further than this from every road match nothing)
+            heading_penalty: float (meters added for a segment at right angles to the heading)
+        """
+        self.max_distance = max_distance
+        self.heading_penalty = heading_penalty
+        self._cached = None
+
+    def _segments(self, roads):
+        """see road_segments
+
+        The arrays are kept for the last set of roads, which the speed limit store hands out again for
+        as long as the vehicle stays in the same tiles.
+        """
+        key = [id(road) for road in roads]
+        if self._cached is not None and self._cached[0] == key:
+            return self._cached[2]
+
+        segments = road_segments(roads)
+        self._cached = (key, roads, segments)
+        return segments
+
+    def distances(self, latitude, longitude, roads):
+        """returns the distance from a position to every segment of the roads, and each segment's bearing
+
+        args:
+            latitude: float
+            longitude: float
+            roads: [{nodes}]
+
+        returns:
+            numpy.ndarray, numpy.ndarray, numpy.ndarray (meters, degrees from north, road index per segment)
+        """
+        return segment_distances(latitude, longitude, self._segments(roads))
+
+    def match(self, latitude, longitude, roads, heading=None):
+        """returns the road the position is on
+
+        args:
+            latitude: float
+            longitude: float
+            roads: [{name, speed_limit, nodes}] (as returned by SpeedLimitStore.nearby)
+            heading: float (degrees from north, None when unknown or stationary)
+
+        returns:
+            RoadMatch (None if no road is within max_distance)
+        """
+        distance, bearing, owners = self.distances(latitude, longitude, roads)
+        if not len(distance):
+            return None
+
+        cost = distance.copy()
+        if heading is not None:
+            # Roads are two-way, so only the angle between the lines matters, not the direction
+            alignment = numpy.abs(numpy.cos(numpy.radians(bearing - heading)))
+            cost += self.heading_penalty * (1.0 - alignment)
+        cost[distance > self.max_distance] = numpy.inf
+
+        best = int(numpy.argmin(cost))
+        if not numpy.isfinite(cost[best]):
+            return None
+        road = roads[owners[best]]
+        return RoadMatch(road, parse_maxspeed(road.get('speed_limit')), float(distance[best]), float(bearing[best]))
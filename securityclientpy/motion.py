@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+#
+# camera motion detection module
+#
+
+import threading
+
+import cv2
+import imutils
+import numpy
+
+from securityclientpy import _logger
+from securityclientpy.videostreamer import VideoStreamer
+
+
+class MotionDetector(object):
+    """camera motion detection by differencing frames against a running-average background
+
+    Frames are downscaled to a fixed processing width, converted to blurred grayscale and compared with
+    an exponentially weighted background. Every step is a whole-array OpenCV operation writing into
+    buffers allocated once for the frame size, so nothing runs per pixel in python. Motion is reported
+    when a changed region covers at least `min_area` pixels measured at the camera's full resolution.
+    """
+
+    _PROCESS_WIDTH = 320
+    _BACKGROUND_ALPHA = 0.05
+    _DELTA_THRESHOLD = 25
+    _BLUR_SIZE = 11
+
+    def __init__(self, min_area=VideoStreamer._STREAM_MIN_AREA, process_width=_PROCESS_WIDTH,
+                 alpha=_BACKGROUND_ALPHA, threshold=_DELTA_THRESHOLD):
+        """constructor method
+
+        args:
+            min_area: int (pixels at full resolution)
+            process_width: int
+            alpha: float (background learning rate)
+            threshold: int (grayscale difference counted as change)
+        """
+        self.min_area = min_area
+        self.process_width = process_width
+        self.alpha = alpha
+        self.threshold = threshold
+        self._shape = None
+        self._background = None
+
+    def _allocate(self, frame):
+        """sizes the working buffers for a frame shape"""
+        height, width = frame.shape[:2]
+        scale = min(1.0, float(self.process_width) / width)
+        self._size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        self._area_scale = 1.0 / (scale * scale)
+        self._small = numpy.empty((self._size[1], self._size[0], 3), dtype=numpy.uint8)
+        self._gray = numpy.empty((self._size[1], self._size[0]), dtype=numpy.uint8)
+        self._delta = numpy.empty_like(self._gray)
+        self._mask = numpy.empty_like(self._gray)
+        self._background_gray = numpy.empty_like(self._gray)
+        self._background = None
+        self._shape = frame.shape
+
+    def update(self, frame):
+        """compares a frame with the background model, then folds it into the model
+
+        args:
+            frame: numpy.ndarray (bgr)
+
+        returns:
+            bool, float (motion detected, largest changed area in full resolution pixels)
+        """
+        if self._shape != frame.shape:
+            self._allocate(frame)
+
+        cv2.resize(frame, self._size, dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        cv2.GaussianBlur(self._gray, (self._BLUR_SIZE, self._BLUR_SIZE), 0, dst=self._gray)
+
+        if self._background is None:
+            self._background = self._gray.astype(numpy.float32)
+            return False, 0.0
+
+        cv2.convertScaleAbs(self._background, dst=self._background_gray)
+        cv2.absdiff(self._gray, self._background_gray, dst=self._delta)
+        cv2.accumulateWeighted(self._gray, self._background, self.alpha)
+        cv2.threshold(self._delta, self.threshold, 255, cv2.THRESH_BINARY, dst=self._mask)
+        cv2.dilate(self._mask, None, dst=self._mask, iterations=2)
+
+        contours = imutils.grab_contours(cv2.findContours(self._mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE))
+        largest = max([cv2.contourArea(contour) for contour in contours] or [0.0]) * self._area_scale
+        return largest >= self.min_area, largest
+
+    def reset(self):
+        self._background = None
+
+
+class CameraMotionMonitor(object):
+    """runs the motion detector on grabber frames and publishes camera motion to the sensor event bus
+
+    Events are published on changes only (motion started / stopped), the same way the PIR sensor's
+    edges reach the bus, so the armed loop treats both sources alike.
+    """
+
+    SOURCE = 'camera'
+    _SAMPLE_FPS = 5.0
+    _WAIT_SECONDS = 0.5
+
+    def __init__(self, videostream, sensor_bus, detector=None, sample_fps=_SAMPLE_FPS):
+        """constructor method
+
+        args:
+            videostream: VideoStreamer (capture thread must be running)
+            sensor_bus: SensorEventBus
+            detector: MotionDetector
+            sample_fps: float
+        """
+        self.videostream = videostream
+        self.sensor_bus = sensor_bus
+        self.detector = detector if detector is not None else MotionDetector()
+        self.sample_fps = sample_fps
+        self.motion = False
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._running: return
+        self._running = True
+        self._thread = threading.Thread(target=self._monitor_thread, args=(self.videostream.subscribe(),))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.motion:
+            self.motion = False
+            self.sensor_bus.publish(self.SOURCE, False)
+
+    def _monitor_thread(self, reader):
+        """samples frames and publishes motion state changes until stopped"""
+        interval = 1.0 / self.sample_fps
+        last = 0.0
+        self.detector.reset()
+        while self._running:
+            frames = reader.wait(self._WAIT_SECONDS)
+            if not frames or frames[-1][1] - last < interval:
+                continue
+            sequence, last, frame = frames[-1]
+
+            motion, area = self.detector.update(frame)
+            if motion != self.motion:
+                self.motion = motion
+                self.sensor_bus.publish(self.SOURCE, motion, last)
+                if motion:
+                    _logger.debug('Camera motion detected, area {0:.0f}'.format(area))
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+#
+# offline outbox module
+#
+
+import json
+import sqlite3
+import threading
+import time
+
+from securityclientpy import _logger
+
+
+class Outbox(object):
+    """append-only on-disk queue for server notifications that couldn't be delivered
+
+    Entries are stored in a SQLite database in WAL mode so an append is a single cheap write that
+    survives a power cut. The queue is bounded by entry count and payload bytes; once either bound is
+    hit the oldest entries are evicted, and the WAL is truncated whenever the queue drains.
+    """
+
+    _DEFAULT_MAX_ENTRIES = 1000
+    _DEFAULT_MAX_BYTES = 1024 * 1024
+    _JOURNAL_SIZE_LIMIT = 1024 * 1024
+
+    def __init__(self, path, max_entries=_DEFAULT_MAX_ENTRIES, max_bytes=_DEFAULT_MAX_BYTES):
+        """constructor method
+
+        args:
+            path: str
+            max_entries: int
+            max_bytes: int
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute('PRAGMA journal_size_limit={0}'.format(self._JOURNAL_SIZE_LIMIT))
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS outbox ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL, path TEXT, payload TEXT)'
+        )
+        self._count, self._bytes = self._connection.execute(
+            'SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM outbox'
+        ).fetchone()
+        self.evicted = 0
+
+    def append(self, path, data):
+        """stores a notification for later delivery
+
+        args:
+            path: str
+            data: dict
+        """
+        payload = json.dumps(data)
+        with self._lock:
+            self._connection.execute(
+                'INSERT INTO outbox (created, path, payload) VALUES (?, ?, ?)', (time.time(), path, payload)
+            )
+            self._count += 1
+            self._bytes += len(payload)
+            self._enforce_bounds()
+
+    def peek(self, limit):
+        """returns the oldest queued notifications without removing them
+
+        args:
+            limit: int
+
+        returns:
+            [(id, path, data)]
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT id, path, payload FROM outbox ORDER BY id LIMIT ?', (limit,)
+            ).fetchall()
+        return [(row_id, path, json.loads(payload)) for row_id, path, payload in rows]
+
+    def remove(self, ids):
+        """removes delivered notifications
+
+        args:
+            ids: [int]
+        """
+        if not ids: return
+        with self._lock:
+            self._connection.execute('BEGIN')
+            self._connection.executemany('DELETE FROM outbox WHERE id = ?', [(row_id,) for row_id in ids])
+            self._connection.execute('COMMIT')
+            self._refresh_counts()
+            if not self._count:
+                self._connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _enforce_bounds(self):
+        """evicts the oldest entries until the queue is back within its bounds"""
+        evicted = 0
+        while self._count > self.max_entries or (self._bytes > self.max_bytes and self._count > 1):
+            excess = max(1, self._count - self.max_entries)
+            self._connection.execute(
+                'DELETE FROM outbox WHERE id IN (SELECT id FROM outbox ORDER BY id LIMIT ?)', (excess,)
+            )
+            evicted += excess
+            self._refresh_counts()
+        if evicted:
+            self.evicted += evicted
+            _logger.info('Outbox full, evicted {0} oldest notifications'.format(evicted))
+
+    def _refresh_counts(self):
+        self._count, self._bytes = self._connection.execute(
+            'SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM outbox'
+        ).fetchone()
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+
+class OutboxFlusher(object):
+    """background thread replaying queued notifications once the server is reachable again
+
+    Queued entries are sent in batches over the pooled transport. The first failed delivery ends the
+    batch and the flusher backs off exponentially before trying again; any response from the server
+    (including a failure code or an error page that isn't json) counts as delivered so a rejected alert
+    isn't replayed forever, holding up the ones queued behind it.
+    """
+
+    _BATCH_SIZE = 50
+    _MIN_BACKOFF_SECONDS = 1.0
+    _MAX_BACKOFF_SECONDS = 300.0
+
+    def __init__(self, outbox, transport, batch_size=_BATCH_SIZE,
+                 min_backoff=_MIN_BACKOFF_SECONDS, max_backoff=_MAX_BACKOFF_SECONDS):
+        """constructor method
+
+        args:
+            outbox: Outbox
+            transport: HttpTransport
+            batch_size: int
+            min_backoff: float
+            max_backoff: float
+        """
+        self.outbox = outbox
+        self.transport = transport
+        self.batch_size = batch_size
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.backoff = min_backoff
+        self.delivered = 0
+        self.unreadable = 0
+
+        self._wakeup = threading.Event()
+        self._retry = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._running: return
+        self._running = True
+        self._retry.clear()
+        self._thread = threading.Thread(target=self._flush_thread)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._retry.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def wake(self):
+        """wakes an idle flusher after a new notification was queued"""
+        self._wakeup.set()
+
+    def link_restored(self):
+        """cuts the current backoff short once another request reached the server"""
+        self._retry.set()
+        self._wakeup.set()
+
+    def flush(self):
+        """sends one batch of queued notifications
+
+        returns:
+            bool (False if the server couldn't be reached)
+        """
+        delivered = []
+        reachable = True
+        for row_id, path, data in self.outbox.peek(self.batch_size):
+            reached, response = self.transport.send(path, data)
+            if not reached:
+                reachable = False
+                break
+            if response is None:
+                _logger.info('Dropped queued [{0}], the server\'s response could not be read'.format(path))
+                self.unreadable += 1
+            delivered.append(row_id)
+
+        self.outbox.remove(delivered)
+        self.delivered += len(delivered)
+        if delivered:
+            _logger.info('Replayed {0} queued notifications'.format(len(delivered)))
+        return reachable
+
+    def _flush_thread(self):
+        """replays the outbox until stopped, backing off while the server is unreachable"""
+        while self._running:
+            if not len(self.outbox):
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            if self.flush():
+                self.backoff = self.min_backoff
+                continue
+
+            _logger.debug('Server unreachable, retrying outbox in {0} secs'.format(self.backoff))
+            self._retry.wait(self.backoff)
+            if self._retry.is_set():
+                self._retry.clear()
+                self.backoff = self.min_backoff
+                continue
+            self.backoff = min(self.backoff * 2, self.max_backoff)
@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+#
+# breach recording module
+#
+
+from collections import deque
+import os
+import threading
+import time
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+import cv2
+import numpy
+
+from securityclientpy import _logger
+from securityclientpy.videostreamer import CAP_PROP_FPS
+
+
+def fourcc(codec):
+    """builds an opencv fourcc code from a four character codec name
+
+    args:
+        codec: str
+
+    returns:
+        int
+    """
+    if hasattr(cv2, 'VideoWriter_fourcc'):
+        return cv2.VideoWriter_fourcc(*codec)
+    return cv2.cv.CV_FOURCC(*codec)  # opencv 2
+
+
+class PrerollBuffer(object):
+    """rolling in-memory buffer of jpeg-encoded frames kept while the system is armed
+
+    Frames are sampled from the frame grabber at a reduced rate and jpeg-encoded so several seconds of
+    footage fit in a few megabytes. Frames older than the pre-roll length are discarded, and the oldest
+    frames are also discarded whenever the encoded total would exceed the hard memory cap.
+    """
+
+    _DEFAULT_SECONDS = 5.0
+    _DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+    _DEFAULT_FPS = 10.0
+    _JPEG_QUALITY = 70
+    _WAIT_SECONDS = 0.1
+
+    def __init__(self, videostream, seconds=_DEFAULT_SECONDS, max_bytes=_DEFAULT_MAX_BYTES,
+                 fps=_DEFAULT_FPS, quality=_JPEG_QUALITY):
+        """constructor method
+
+        args:
+            videostream: VideoStreamer (capture thread must be running)
+            seconds: float (pre-roll length)
+            max_bytes: int (hard cap on encoded frame bytes held)
+            fps: float (sampling rate)
+            quality: int (jpeg quality 0-100)
+        """
+        self.videostream = videostream
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.fps = fps
+        self.quality = quality
+
+        self._frames = deque()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._reader = None
+        self._running = False
+        self._thread = None
+        self.frames_evicted = 0
+
+    def start(self):
+        if self._running: return
+        self._reader = self.videostream.subscribe()
+        self._running = True
+        self._thread = threading.Thread(target=self._buffer_thread)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def add(self, frame, timestamp):
+        """encodes a frame and appends it, trimming the buffer to its length and memory cap
+
+        args:
+            frame: numpy.ndarray
+            timestamp: float
+        """
+        success, encoded = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
+        if not success: return
+        data = encoded.tobytes()
+        with self._lock:
+            self._frames.append((timestamp, data))
+            self._bytes += len(data)
+            while self._frames and (self._frames[0][0] < timestamp - self.seconds or self._bytes > self.max_bytes):
+                self._bytes -= len(self._frames.popleft()[1])
+                self.frames_evicted += 1
+
+    def snapshot(self):
+        """returns the buffered frames, oldest first
+
+        returns:
+            [(timestamp, bytes)]
+        """
+        with self._lock:
+            return list(self._frames)
+
+    def _buffer_thread(self):
+        """samples frames from the grabber into the buffer"""
+        interval = 1.0 / self.fps
+        last = 0.0
+        while self._running:
+            for sequence, timestamp, frame in self._reader.wait(self._WAIT_SECONDS):
+                if timestamp - last >= interval:
+                    self.add(frame, timestamp)
+                    last = timestamp
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    @staticmethod
+    def decode(data):
+        """decodes a buffered jpeg frame
+
+        args:
+            data: bytes
+
+        returns:
+            numpy.ndarray
+        """
+        return cv2.imdecode(numpy.frombuffer(data, dtype=numpy.uint8), cv2.IMREAD_COLOR)
+
+
+class BreachRecorder(object):
+    """records camera frames to a video file at the camera's own frame rate and resolution
+
+    A pacing thread consumes frames from the frame grabber and places each one at the output frame
+    slot given by its capture timestamp: frames arriving faster than the output rate are skipped and
+    gaps are filled by repeating the last frame, so the recording plays back in real time. Encoding and
+    disk writes happen on a separate writer thread behind a bounded queue; if the writer falls behind,
+    frames are dropped rather than stalling the pacing thread. When a pre-roll buffer is given, its
+    frames are written first and the recording's timeline starts at the oldest of them. Output is split
+    into segments of the store's segment length, each added to the store's index once it is closed.
+    """
+
+    _DEFAULT_CODEC = 'XVID'
+    _DEFAULT_FPS = 20.0
+    _QUEUE_SIZE = 32
+    _MAX_REPEATS = 30
+    _WAIT_SECONDS = 0.1
+
+    def __init__(self, videostream, store, codec=_DEFAULT_CODEC, fps=None, queue_size=_QUEUE_SIZE, preroll=None):
+        """constructor method
+
+        args:
+            videostream: VideoStreamer (capture thread must be running)
+            store: RecordingStore
+            codec: str (four character code, i.e. XVID or MJPG)
+            fps: float (Default=the camera's reported frame rate)
+            queue_size: int
+            preroll: PrerollBuffer (frames from before the breach to write first)
+        """
+        self.videostream = videostream
+        self.preroll = preroll
+        self.store = store
+        self.codec = codec
+        self.fps = fps
+        self.frame_size = None
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._preroll_frames = []
+        self._reader = None
+        self._running = False
+        self._pacing_thread = None
+        self._writer_thread = None
+        self._start_time = None
+        self._next_index = 0
+        self._cpu_start = None
+
+        self.frames_written = 0
+        self.frames_repeated = 0
+        self.frames_skipped = 0
+        self.frames_dropped = 0
+        self.preroll_frames = 0
+        self.cpu_seconds = 0.0
+        self.segments = []
+
+    def start(self, start_time=None):
+        """starts recording frames captured from now on
+
+        args:
+            start_time: float (Default=now)
+        """
+        if self._running: return
+        if self.fps is None:
+            self.fps = float(self.videostream.grabber.source.get(CAP_PROP_FPS) or 0) or self._DEFAULT_FPS
+
+        self._reader = self.videostream.subscribe()
+        self._start_time = start_time if start_time is not None else time.time()
+        if self.preroll is not None:
+            self._preroll_frames = self.preroll.snapshot()
+            if self._preroll_frames:
+                self._start_time = min(self._start_time, self._preroll_frames[0][0])
+        self._cpu_start = sum(os.times()[:2])
+        self._running = True
+
+        self._writer_thread = threading.Thread(target=self._write_thread)
+        self._writer_thread.daemon = True
+        self._writer_thread.start()
+        self._pacing_thread = threading.Thread(target=self._pace_thread)
+        self._pacing_thread.daemon = True
+        self._pacing_thread.start()
+        _logger.info('Recording to [{0}] at {1} fps'.format(self.store.root, self.fps))
+
+    def stop(self):
+        """stops recording and waits for queued frames to be written"""
+        if not self._running: return
+        self._running = False
+        self._pacing_thread.join()
+        self._queue.put(None)
+        self._writer_thread.join()
+        self.cpu_seconds = sum(os.times()[:2]) - self._cpu_start
+        _logger.info('Recording stopped, {0} frames written'.format(self.frames_written))
+
+    def submit(self, frame, timestamp, block=False):
+        """places a frame at the output slot for its capture timestamp
+
+        args:
+            frame: numpy.ndarray
+            timestamp: float
+            block: bool (wait for room in the writer queue instead of dropping the frame)
+
+        returns:
+            bool (False if the frame was skipped or dropped)
+        """
+        index = int(round((timestamp - self._start_time) * self.fps))
+        if index < self._next_index:
+            self.frames_skipped += 1
+            return False
+
+        repeats = min(index - self._next_index + 1, self._MAX_REPEATS)
+        try:
+            # The ring slot is reused by the camera, so the queued frame needs its own copy
+            self._queue.put((frame.copy(), index - repeats + 1, repeats), block)
+        except queue.Full:
+            self.frames_dropped += 1
+            return False
+
+        self._next_index = index + 1
+        return True
+
+    def _pace_thread(self):
+        """writes the pre-roll, then consumes frames from the grabber without spinning while recording"""
+        for timestamp, data in self._preroll_frames:
+            if self.submit(PrerollBuffer.decode(data), timestamp, block=True):
+                self.preroll_frames += 1
+        self._preroll_frames = []
+
+        while self._running:
+            frames = self._reader.wait(self._WAIT_SECONDS)
+            if not self._running:
+                break
+            for sequence, timestamp, frame in frames:
+                if timestamp >= self._start_time:
+                    self.submit(frame, timestamp)
+
+    def _write_thread(self):
+        """encodes queued frames to disk, starting a new segment every segment length"""
+        segment_frames = max(1, int(round(self.store.segment_seconds * self.fps)))
+        writer = None
+        segment = None
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            frame, first_index, repeats = item
+            for index in range(first_index, first_index + repeats):
+                if writer is not None and index >= segment[2] + segment_frames:
+                    writer.release()
+                    self._finish_segment(segment, index)
+                    writer = None
+                if writer is None:
+                    # Size the output from the frames the camera actually delivers
+                    self.frame_size = (frame.shape[1], frame.shape[0])
+                    start_index = index - index % segment_frames
+                    segment_id, path = self.store.new_segment(self._start_time + start_index / self.fps)
+                    segment = (segment_id, path, start_index)
+                    writer = cv2.VideoWriter(path, fourcc(self.codec), self.fps, self.frame_size)
+                writer.write(frame)
+            self.frames_written += repeats
+            self.frames_repeated += repeats - 1
+            last_index = first_index + repeats
+
+        if writer is not None:
+            writer.release()
+            self._finish_segment(segment, last_index)
+
+    def _finish_segment(self, segment, end_index):
+        """indexes a closed segment in the store
+
+        args:
+            segment: (segment id, path, first frame index)
+            end_index: int (index of the frame after the segment's last frame)
+        """
+        segment_id, path, start_index = segment
+        self.segments.append(self.store.finish_segment(
+            segment_id, self._start_time + start_index / self.fps, self._start_time + end_index / self.fps
+        ))
+
+    def stats(self):
+        """returns frame accounting for the recording
+
+        returns:
+            {fps, frame_size, frames_written, frames_repeated, frames_skipped, frames_dropped, dropped_by_reader,
+             preroll_frames, cpu_seconds}
+        """
+        return {
+            'preroll_frames': self.preroll_frames,
+            'fps': self.fps,
+            'frame_size': self.frame_size,
+            'cpu_seconds': self.cpu_seconds,
+            'frames_written': self.frames_written,
+            'frames_repeated': self.frames_repeated,
+            'frames_skipped': self.frames_skipped,
+            'frames_dropped': self.frames_dropped,
+            'dropped_by_reader': self._reader.dropped if self._reader is not None else 0,
+        }
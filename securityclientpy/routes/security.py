@@ -17,9 +17,9 @@ class Security(object):
     _DISARM_SYSTEM_KEY = 'disarm_system'
     _FALSE_ALARM_KEY = 'false_alarm'
 
-    def __init__(self, no_hardware, no_video, system_id, hwcontroller, server_requests):
+    def __init__(self, no_hardware, no_video, system_id, hwcontroller, server_requests, data_dir='.'):
         self.system_id = system_id
-        self.security_threads = SecurityThreads(no_hardware, no_video, hwcontroller, server_requests)
+        self.security_threads = SecurityThreads(no_hardware, no_video, hwcontroller, server_requests, data_dir=data_dir)
 
         # Use inner methods so self pointer can be accessed
 
@@ -67,3 +67,33 @@ class Security(object):
 
             self.security_threads.false_alarm()
             return success_response(request.path)
+
+        @app.route('{0}/status'.format(self._ROOT_PATH), methods=['POST'])
+        def status():
+            """get the security state
+
+            required data:
+                system_id: str
+            """
+            status, error = verify_request(request.json, self.system_id)
+            if not status: return error_response(error)
+
+            return success_response(request.path, data=self.security_threads.status.as_dict())
+
+        @app.route('{0}/geofences'.format(self._ROOT_PATH), methods=['POST'])
+        def geofences():
+            """replace the geofences
+
+            required data:
+                system_id: str
+                geofences: [{id, name, center, radius} or {id, name, polygon}, optional on_enter, on_exit, speed_limit]
+            """
+            status, error = verify_request(request.json, self.system_id)
+            if not status: return error_response(error)
+            if not isinstance(request.json.get('geofences'), list): return error_response('No geofences found in request')
+
+            try:
+                self.security_threads.set_geofences(request.json['geofences'])
+            except ValueError as exception:
+                return error_response(str(exception))
+            return success_response(request.path, data=len(request.json['geofences']))
@@ -3,7 +3,9 @@
 # systems module
 #
 
-from flask import request
+import time
+
+from flask import request, Response
 
 from securityclientpy.routes import app, verify_request, error_response, success_response
 from securityclientpy.hwcontroller import HardwareController
@@ -12,10 +14,14 @@ from securityclientpy.hwcontroller import HardwareController
 class System(object):
 
     _ROOT_PATH = '/system'
+    _TRIPS_DEFAULT_SECONDS = 24 * 3600
+    _TRIPS_DEFAULT_TOLERANCE = 5.0
+    _GPX_MIMETYPE = 'application/gpx+xml'
 
-    def __init__(self, system_id, hwcontroller):
+    def __init__(self, system_id, hwcontroller, trip_log=None):
         self.system_id = system_id
         self.hwcontroller = hwcontroller
+        self.trip_log = trip_log
 
         # Use inner methods so self pointer can be accessed
 
@@ -49,6 +55,18 @@ class System(object):
 
             return success_response(request.path, data=data)
 
+        @app.route('{0}/temperature_history'.format(self._ROOT_PATH), methods=['POST'])
+        def temperature_history():
+            """get the smoothed temperature trend and min / max / mean history
+
+            required data:
+                system_id: str
+            """
+            status, error = verify_request(request.json, self.system_id)
+            if not status: return error_response(error)
+
+            return success_response(request.path, data=self.hwcontroller.read_temperature_history())
+
         @app.route('{0}/speedometer'.format(self._ROOT_PATH), methods=['POST'])
         def speedometer():
             """get speedometer data
@@ -63,3 +81,34 @@ class System(object):
             if not data: return error_response('Unable to get speedometer data')
 
             return success_response(request.path, data=data)
+
+        @app.route('{0}/trips'.format(self._ROOT_PATH), methods=['POST'])
+        def trips():
+            """get logged trips in a time range
+
+            required data:
+                system_id: str
+
+            optional data:
+                start: float (Default=24 hours ago)
+                end: float (Default=now)
+                format: str ('geojson' or 'gpx', Default='geojson')
+                tolerance: float (meters the downsampled track may be off, Default=5)
+            """
+            status, error = verify_request(request.json, self.system_id)
+            if not status: return error_response(error)
+            if self.trip_log is None: return error_response('Trip log is disabled')
+
+            try:
+                end = float(request.json.get('end', time.time()))
+                start = float(request.json.get('start', end - self._TRIPS_DEFAULT_SECONDS))
+                tolerance = float(request.json.get('tolerance', self._TRIPS_DEFAULT_TOLERANCE))
+            except (TypeError, ValueError):
+                return error_response('Invalid trip range')
+            export = request.json.get('format', 'geojson')
+            if export not in ('geojson', 'gpx'): return error_response('Invalid trip format')
+
+            trips = self.trip_log.trips(start, end, tolerance)
+            if export == 'gpx':
+                return Response(self.trip_log.to_gpx(trips), mimetype=self._GPX_MIMETYPE)
+            return success_response(request.path, data=self.trip_log.to_geojson(trips))
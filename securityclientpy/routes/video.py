@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+#
+# video module
+#
+
+from flask import request, Response
+
+from securityclientpy.routes import app, verify_request, error_response
+from securityclientpy.streaming import MjpegBroadcaster
+
+
+class Video(object):
+
+    _ROOT_PATH = '/video'
+
+    def __init__(self, system_id, videostream):
+        self.system_id = system_id
+        self.broadcaster = MjpegBroadcaster(videostream) if videostream is not None else None
+
+        # Use inner methods so self pointer can be accessed
+
+        @app.route('{0}/stream'.format(self._ROOT_PATH), methods=['GET'])
+        def stream():
+            """live multipart mjpeg stream from the camera
+
+            required data (query string):
+                system_id: str
+            """
+            status, error = verify_request(request.args, self.system_id)
+            if not status: return error_response(error)
+            if self.broadcaster is None: return error_response('Video is disabled')
+
+            subscriber = self.broadcaster.subscribe()
+            return Response(self.broadcaster.stream(subscriber), mimetype=self.broadcaster.mimetype)
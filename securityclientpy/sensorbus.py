@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+#
+# sensor event bus module
+#
+
+from collections import namedtuple
+import itertools
+import threading
+import time
+
+from securityclientpy import _logger
+
+
+SensorEvent = namedtuple('SensorEvent', ['sequence', 'timestamp', 'source', 'value'])
+
+
+class EventRingBuffer(object):
+    """fixed-size ring buffer of timestamped sensor events
+
+    Producers reserve a sequence number from an atomic counter and store the event in its slot, only
+    moving the head forward is done under a lock so it never goes back. Readers never take a lock: each keeps its own cursor and uses the sequence number stored with the
+    event to tell a published slot from a stale or overwritten one. Events the producers overwrote
+    before a reader got to them are reported back as missed instead of being silently lost.
+    """
+
+    def __init__(self, capacity=256):
+        """constructor method"""
+        self._capacity = capacity
+        self._slots = [None] * capacity
+        self._counter = itertools.count()
+        self._head = 0
+        self._head_lock = threading.Lock()
+
+    def append(self, timestamp, source, value):
+        """stores a new event in the ring
+
+        args:
+            timestamp: float
+            source: str
+            value: bool
+
+        returns:
+            SensorEvent
+        """
+        sequence = next(self._counter)
+        event = SensorEvent(sequence, timestamp, source, value)
+        self._slots[sequence % self._capacity] = event
+        with self._head_lock:
+            if sequence >= self._head:
+                self._head = sequence + 1
+        return event
+
+    def read(self, cursor):
+        """reads every published event from the cursor onward
+
+        args:
+            cursor: int
+
+        returns:
+            [SensorEvent], int, int (events, next cursor, missed events)
+        """
+        head = self._head
+        missed = 0
+        if head - cursor > self._capacity:
+            missed = head - self._capacity - cursor
+            cursor = head - self._capacity
+
+        events = []
+        while cursor < head:
+            event = self._slots[cursor % self._capacity]
+            if event is None or event.sequence < cursor:
+                # Slot reserved by a producer that hasn't stored its event yet
+                break
+            if event.sequence > cursor:
+                missed += 1
+            else:
+                events.append(event)
+            cursor += 1
+
+        return events, cursor, missed
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def head(self):
+        return self._head
+
+
+class SensorEventReader(object):
+    """single consumer view of the sensor event bus"""
+
+    def __init__(self, ring):
+        """constructor method"""
+        self._ring = ring
+        self._cursor = ring.head
+        self._signal = threading.Event()
+        self.missed = 0
+
+    def notify(self):
+        self._signal.set()
+
+    def poll(self):
+        """returns any events published since the last read without blocking
+
+        returns:
+            [SensorEvent]
+        """
+        self._signal.clear()
+        events, self._cursor, missed = self._ring.read(self._cursor)
+        self.missed += missed
+        return events
+
+    def wait(self, timeout=None):
+        """blocks until new events are published or the timeout expires
+
+        args:
+            timeout: float
+
+        returns:
+            [SensorEvent]
+        """
+        events = self.poll()
+        if events:
+            return events
+        self._signal.wait(timeout)
+        return self.poll()
+
+
+class SensorEventBus(object):
+    """turns gpio edges into timestamped sensor events
+
+    Each configured pin is registered for both edges with `add_event_detect`, so every transition is
+    recorded with the time the callback fired instead of being sampled by a polling loop. Any gpio
+    backend exposing the RPi.GPIO api can be used, including `fakegpio.FakeGPIO` off-device.
+    """
+
+    _DEFAULT_CAPACITY = 256
+
+    def __init__(self, gpio, pins, capacity=_DEFAULT_CAPACITY, clock=time.time):
+        """constructor method
+
+        args:
+            gpio: RPi.GPIO compatible module or object
+            pins: {source: int}
+            capacity: int
+            clock: callable returning float seconds
+        """
+        self._gpio = gpio
+        self._pins = dict(pins)
+        self._sources = dict((pin, source) for source, pin in self._pins.items())
+        self._ring = EventRingBuffer(capacity)
+        self._clock = clock
+        self._readers = []
+        self._listeners = []
+        self._started = False
+
+    def start(self):
+        """registers edge callbacks for every sensor pin"""
+        if self._started: return
+        for source, pin in self._pins.items():
+            self._gpio.add_event_detect(pin, self._gpio.BOTH, callback=self._edge_callback)
+        self._started = True
+        _logger.debug('Sensor event bus started for [{0}]'.format(', '.join(sorted(self._pins))))
+
+    def stop(self):
+        """removes the edge callbacks"""
+        if not self._started: return
+        for pin in self._pins.values():
+            self._gpio.remove_event_detect(pin)
+        self._started = False
+
+    def subscribe(self):
+        """creates a reader that receives every event published from now on
+
+        returns:
+            SensorEventReader
+        """
+        reader = SensorEventReader(self._ring)
+        self._readers = self._readers + [reader]
+        return reader
+
+    def unsubscribe(self, reader):
+        self._readers = [r for r in self._readers if r is not reader]
+
+    def publish(self, source, value, timestamp=None):
+        """publishes an event that didn't come from a gpio edge (i.e. camera motion)
+
+        args:
+            source: str
+            value: bool
+            timestamp: float
+
+        returns:
+            SensorEvent
+        """
+        if timestamp is None:
+            timestamp = self._clock()
+        event = self._ring.append(timestamp, source, bool(value))
+        for reader in self._readers:
+            reader.notify()
+        for listener in self._listeners:
+            listener(event)
+        return event
+
+    def add_listener(self, listener):
+        """registers a callable run on the publishing thread with every event
+
+        args:
+            listener: callable taking a SensorEvent
+        """
+        self._listeners = self._listeners + [listener]
+
+    def _edge_callback(self, channel):
+        """gpio callback fired on every rising or falling edge of a sensor pin"""
+        timestamp = self._clock()
+        self.publish(self._sources[channel], self._gpio.input(channel), timestamp)
+
+    @property
+    def pins(self):
+        return dict(self._pins)
+
+    @property
+    def started(self):
+        return self._started
@@ -3,39 +3,108 @@
 # server requests module
 #
 
-import requests
-
 from securityclientpy import _logger, serverport
 from securityclientpy.routes import _FAILURE_CODE
+from securityclientpy.transport import HttpTransport
+from securityclientpy.outbox import Outbox, OutboxFlusher
+from securityclientpy.dispatcher import AlertDispatcher
 
 
 class ServerRequests(object):
     """module for handling api request made to server"""
 
-    def __init__(self, serverhost, system_id):
-        """constructor method"""
-        self.url = 'http://{0}:{1}'.format(serverhost, serverport)
+    # Alerts fail fast so a dead link doesn't hold up the caller, (connect, read) seconds
+    _TIMEOUTS = {
+        'security/panic': (1.5, 5.0),
+        'security/set_breach': (1.5, 5.0),
+        'notification': (1.5, 5.0),
+    }
+
+    def __init__(self, serverhost, system_id, port=serverport, outbox_path=None):
+        """constructor method
+
+        args:
+            serverhost: str
+            system_id: str
+            port: int
+            outbox_path: str (alerts are dropped when unreachable if not set)
+        """
+        self.url = 'http://{0}:{1}'.format(serverhost, port)
         self.data = {'system_id': system_id}
+        self.transport = HttpTransport(self.url, timeouts=self._TIMEOUTS)
+
+        # Alerts that can't be delivered are kept on disk and replayed once the server is back
+        self.outbox = None
+        self.flusher = None
+        if outbox_path:
+            self.outbox = Outbox(outbox_path)
+            self.flusher = OutboxFlusher(self.outbox, self.transport)
+            self.flusher.start()
 
-    def request(self, path, data={}):
+        # Alerts are sent from worker threads so gpio callbacks and the armed loop never wait on the network
+        self.dispatcher = AlertDispatcher()
+        self.dispatcher.start()
+
+    def request(self, path, data=None, durable=False):
         """method to send request to server and get the response
 
         args:
-            url: str
+            path: str
             data: dict
+            durable: bool (queue the request in the outbox if the server can't be reached)
+
+        returns:
+            dict (None if the server could not be reached or its response could not be read)
+        """
+        request_data = dict(self.data)
+        if data:
+            request_data.update(data)
+        reached, response = self.transport.send(path, request_data)
+
+        if self.outbox is not None:
+            if not reached and durable:
+                _logger.info('Server unreachable, queued [{0}] for replay'.format(path))
+                self.outbox.append(path, request_data)
+                self.flusher.wake()
+            elif reached and len(self.outbox):
+                self.flusher.link_restored()
+
+        return response or None
+
+    def _failed(self, response, action):
+        """checks a server response for failure and logs the reason
+
+        args:
+            response: dict
+            action: str
+
+        returns:
+            bool
+        """
+        if not response:
+            _logger.info('Failed to {0}: [no response from server]'.format(action))
+            return True
+        if response['code'] == _FAILURE_CODE:
+            _logger.info('Failed to {0}: [{1}]'.format(action, response.get('message')))
+            return True
+        return False
+
+    def stats(self):
+        """returns transport metrics (request counts, latency and connection reuse) and dispatcher counters
 
         returns:
             dict
         """
-        url = '{0}/{1}'.format(self.url, path)
-        request_data = self.data
-        for key, value in data.iteritems():
-            request_data[key] = value
-        response = requests.post(url, json=request_data)
-        if not response.json():
-            return None
+        stats = self.transport.stats()
+        stats['dispatcher'] = self.dispatcher.stats()
+        return stats
 
-        return response.json()
+    def close(self):
+        self.dispatcher.stop()
+        if self.flusher is not None:
+            self.flusher.stop()
+            self.outbox.close()
+        self.transport.close()
 
     def update_connection(self, host, port):
         """method to send server request for updating connection on the server
@@ -46,8 +115,7 @@ class ServerRequests(object):
         path = 'connections/update'
         data = {'host': host, 'port': port}
         response = self.request(path, data)
-        if response['code'] == _FAILURE_CODE:
-            _logger.info('Failed to update connection: [{0}]'.format(response['message']))
+        if self._failed(response, 'update connection'):
             return False
 
         return True
@@ -61,8 +129,7 @@ class ServerRequests(object):
         path = 'connections/add'
         data = {'host': host, 'port': port}
         response = self.request(path, data)
-        if response['code'] == _FAILURE_CODE:
-            _logger.info('Failed to add connection: [{0}]'.format(response['message']))
+        if self._failed(response, 'add connection'):
             return False
 
         return True
@@ -75,8 +142,7 @@ class ServerRequests(object):
         """
         path = 'connections/get'
         response = self.request(path)
-        if response['code'] == _FAILURE_CODE:
-            _logger.info('Failed to get connection: [{0}]'.format(response['message']))
+        if self._failed(response, 'get connection'):
             return None
 
         return response['data']
@@ -89,8 +155,7 @@ class ServerRequests(object):
         """
         path = 'security/get_config'
         response = self.request(path)
-        if response['code'] == _FAILURE_CODE:
-            _logger.info('Failed to get security config: [{0}]'.format(response['message']))
+        if self._failed(response, 'get security config'):
             return None
 
         return response['data']
@@ -103,8 +168,7 @@ class ServerRequests(object):
         """
         path = 'security/add_config'
         response = self.request(path)
-        if response['code'] == _FAILURE_CODE:
-            _logger.info('Failed to add security config: [{0}]'.format(response['message']))
+        if self._failed(response, 'add security config'):
             return False
 
         return True
@@ -118,9 +182,42 @@ class ServerRequests(object):
         path = 'notification'
         message = 'You are exceeding the speed limit'
         data = {'message': message}
-        response = self.request(path, data)
-        if response['code'] == _FAILURE_CODE:
-            _logger.info('Failed to send speed limit alert: [{0}]'.format(response['message']))
+        response = self.request(path, data, durable=True)
+        if self._failed(response, 'send speed limit alert'):
+            return False
+
+        return True
+
+    def send_geofence_alert(self, message):
+        """sends post request to server to alert for a geofence crossing (i.e. the vehicle moved while armed)
+
+        args:
+            message: str
+
+        returns:
+            bool
+        """
+        path = 'notification'
+        data = {'message': message}
+        response = self.request(path, data, durable=True)
+        if self._failed(response, 'send geofence alert'):
+            return False
+
+        return True
+
+    def send_temperature_alert(self, message):
+        """sends post request to server to alert for a dangerously hot cabin with someone inside
+
+        args:
+            message: str
+
+        returns:
+            bool
+        """
+        path = 'notification'
+        data = {'message': message}
+        response = self.request(path, data, durable=True)
+        if self._failed(response, 'send temperature alert'):
             return False
 
         return True
@@ -132,9 +229,8 @@ class ServerRequests(object):
             bool
         """
         path = 'security/panic'
-        response = self.request(path)
-        if response['code'] == _FAILURE_CODE:
-            _logger.info('Failed to send panic alert: [{0}]'.format(response['message']))
+        response = self.request(path, durable=True)
+        if self._failed(response, 'send panic alert'):
             return False
 
         return True
@@ -146,9 +242,55 @@ class ServerRequests(object):
             bool
         """
         path = 'security/set_breach'
-        response = self.request(path)
-        if response['code'] == _FAILURE_CODE:
-            _logger.info('Failed to send breach alert: [{0}]'.format(response['message']))
+        response = self.request(path, durable=True)
+        if self._failed(response, 'send breach alert'):
             return False
 
         return True
+
+
+    def send_speed_limit_alert_async(self):
+        """queues a speed limit alert on the dispatcher
+
+        returns:
+            concurrent.futures.Future (bool)
+        """
+        return self.dispatcher.submit(AlertDispatcher.PRIORITY_ALERT, self.send_speed_limit_alert)
+
+    def send_geofence_alert_async(self, message):
+        """queues a geofence alert on the dispatcher
+
+        args:
+            message: str
+
+        returns:
+            concurrent.futures.Future (bool)
+        """
+        return self.dispatcher.submit(AlertDispatcher.PRIORITY_ALERT, self.send_geofence_alert, message)
+
+    def send_temperature_alert_async(self, message):
+        """queues a temperature alert on the dispatcher
+
+        args:
+            message: str
+
+        returns:
+            concurrent.futures.Future (bool)
+        """
+        return self.dispatcher.submit(AlertDispatcher.PRIORITY_ALERT, self.send_temperature_alert, message)
+
+    def send_panic_alert_async(self):
+        """queues a panic alert on the dispatcher ahead of every other request
+
+        returns:
+            concurrent.futures.Future (bool)
+        """
+        return self.dispatcher.submit(AlertDispatcher.PRIORITY_PANIC, self.send_panic_alert)
+
+    def send_system_breach_notification_async(self):
+        """queues a system breach notification on the dispatcher
+
+        returns:
+            concurrent.futures.Future (bool)
+        """
+        return self.dispatcher.submit(AlertDispatcher.PRIORITY_BREACH, self.send_system_breach_notification)
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+#
+# speed check scheduling module
+#
+
+from collections import deque
+import math
+import threading
+import time
+
+import numpy
+
+from securityclientpy import _logger
+from securityclientpy.mapmatch import road_segments, segment_distances
+
+
+_METERS_PER_SECOND_PER_MPH = 0.44704
+
+
+class SpeedCheckScheduler(object):
+    """decides when the speed checking thread runs, and what work each check can skip
+
+    - the next check is due after the vehicle covers `check_distance` at its current speed, between
+      `min_interval` and `max_interval` seconds, so a parked car is checked rarely and a car on the
+      highway often
+    - while the vehicle is still within `same_road_distance` of the road matched last time (and moving
+      along it), the speed limit lookup and road matching are skipped and the same road is used
+    - an alert is sent when speeding starts, and repeated at most once every `alert_cooldown` seconds
+
+    Counters are kept so the check rate, the lookups saved and the alert latency can be tuned.
+    """
+
+    _MIN_INTERVAL = 2.0
+    _MAX_INTERVAL = 30.0
+    _CHECK_DISTANCE = 250.0
+    _SAME_ROAD_DISTANCE = 15.0
+    _SAME_ROAD_ALIGNMENT = 0.9
+    _ALERT_COOLDOWN = 300.0
+    _LATENCY_SAMPLES = 100
+
+    def __init__(self, road_matcher, min_interval=_MIN_INTERVAL, max_interval=_MAX_INTERVAL,
+                 check_distance=_CHECK_DISTANCE, same_road_distance=_SAME_ROAD_DISTANCE,
+                 alert_cooldown=_ALERT_COOLDOWN, clock=time.time):
+        """constructor method
+
+        args:
+            road_matcher: RoadMatcher
+            min_interval: float (seconds)
+            max_interval: float (seconds)
+            check_distance: float (meters travelled between checks)
+            same_road_distance: float (meters)
+            alert_cooldown: float (seconds between repeated alerts while speeding continues)
+            clock: callable returning the current time
+        """
+        self.road_matcher = road_matcher
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.check_distance = check_distance
+        self.same_road_distance = same_road_distance
+        self.alert_cooldown = alert_cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        self._road = None
+        self._road_segments = None
+        self._speeding_since = None
+        self._last_alert = None
+        self._last_check = None
+        self._started = clock()
+
+        self.checks = 0
+        self.lookups = 0
+        self.lookups_skipped = 0
+        self.alerts = 0
+        self.alerts_suppressed = 0
+        self.alerts_failed = 0
+        self._detection_delays = deque(maxlen=self._LATENCY_SAMPLES)
+        self._delivery_latencies = deque(maxlen=self._LATENCY_SAMPLES)
+
+    def match(self, latitude, longitude, heading, lookup):
+        """returns the road being driven, reusing the last one while the vehicle is still on it
+
+        args:
+            latitude: float
+            longitude: float
+            heading: float (degrees from north, None when unknown)
+            lookup: callable returning the candidate roads, only called when the road may have changed
+
+        returns:
+            RoadMatch (None if no road matches)
+        """
+        road = self._road
+        if road is not None and self._still_on(latitude, longitude, heading):
+            self.lookups_skipped += 1
+            return road
+
+        self.lookups += 1
+        road = self.road_matcher.match(latitude, longitude, lookup(), heading)
+        # The matched road's own segments, so the matcher keeps its arrays for the roads around it
+        self._road_segments = road_segments([road.road]) if road is not None else None
+        self._road = road
+        return road
+
+    def _still_on(self, latitude, longitude, heading):
+        """checks the position is close to (and moving along) the previously matched road"""
+        distance, bearing, owners = segment_distances(latitude, longitude, self._road_segments)
+        if not len(distance):
+            return False
+        nearest = int(numpy.argmin(distance))
+        if distance[nearest] > self.same_road_distance:
+            return False
+        if heading is not None:
+            alignment = abs(math.cos(math.radians(bearing[nearest] - heading)))
+            if alignment < self._SAME_ROAD_ALIGNMENT:
+                return False
+        return True
+
+    def check(self, speeding):
+        """records a check and decides whether it should alert
+
+        args:
+            speeding: bool
+
+        returns:
+            bool (send an alert)
+        """
+        now = self._clock()
+        with self._lock:
+            self.checks += 1
+            previous_check, self._last_check = self._last_check, now
+            if not speeding:
+                self._speeding_since = None
+                return False
+
+            if self._speeding_since is None:
+                # Speeding began somewhere between the previous check and this one
+                self._speeding_since = now
+                if previous_check is not None:
+                    self._detection_delays.append(now - previous_check)
+            # Also holds across episodes, so speed hovering around the threshold doesn't repeat alerts
+            if self._last_alert is not None and now - self._last_alert < self.alert_cooldown:
+                self.alerts_suppressed += 1
+                return False
+
+            self._last_alert = now
+            self.alerts += 1
+            return True
+
+    def alert_sent(self, notification):
+        """tracks delivery of an alert
+
+        args:
+            notification: concurrent.futures.Future
+        """
+        submitted = self._clock()
+
+        def done(future):
+            if future.cancelled() or future.exception() is not None or not future.result():
+                self.alerts_failed += 1
+                _logger.info('Failed to send speed limit alert.')
+            else:
+                self._delivery_latencies.append(self._clock() - submitted)
+
+        notification.add_done_callback(done)
+
+    def next_interval(self, speed):
+        """returns the seconds until the next check
+
+        args:
+            speed: float (mph)
+
+        returns:
+            float
+        """
+        meters_per_second = max(0.0, speed) * _METERS_PER_SECOND_PER_MPH
+        if meters_per_second <= 0.0:
+            return self.max_interval
+        return max(self.min_interval, min(self.max_interval, self.check_distance / meters_per_second))
+
+    def stats(self):
+        """returns check and alert counters
+
+        returns:
+            {checks, checks_per_hour, lookups, lookups_skipped, alerts, alerts_suppressed, alerts_failed,
+             mean_detection_delay, max_detection_delay, mean_delivery_latency}
+        """
+        hours = max(self._clock() - self._started, 1e-6) / 3600.0
+        detection = list(self._detection_delays)
+        delivery = list(self._delivery_latencies)
+        return {
+            'checks': self.checks,
+            'checks_per_hour': self.checks / hours,
+            'lookups': self.lookups,
+            'lookups_skipped': self.lookups_skipped,
+            'alerts': self.alerts,
+            'alerts_suppressed': self.alerts_suppressed,
+            'alerts_failed': self.alerts_failed,
+            'mean_detection_delay': sum(detection) / len(detection) if detection else 0.0,
+            'max_detection_delay': max(detection) if detection else 0.0,
+            'mean_delivery_latency': sum(delivery) / len(delivery) if delivery else 0.0,
+        }
@@ -0,0 +1,420 @@
+# -*- coding: utf-8 -*-
+#
+# offline speed limit store module
+#
+
+from collections import OrderedDict
+import math
+import sqlite3
+import threading
+import time
+
+import numpy
+import requests
+
+from securityclientpy import _logger
+
+
+_GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+_METERS_PER_DEGREE = 111320.0
+_OVERPASS_URL = 'https://overpass-api.de/api/interpreter'
+# (connect, read) seconds; the server is asked to give up a little before the read timeout
+_OVERPASS_TIMEOUT = (3.05, 30.0)
+
+
+def geohash(latitude, longitude, precision):
+    """encodes a position as a geohash of `precision` characters
+
+    args:
+        latitude: float
+        longitude: float
+        precision: int
+
+    returns:
+        str
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    characters = []
+    bits = 0
+    value = 0
+    even = True
+    while len(characters) < precision:
+        if even:
+            middle = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= middle:
+                value = value * 2 + 1
+                lon_range[0] = middle
+            else:
+                value = value * 2
+                lon_range[1] = middle
+        else:
+            middle = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= middle:
+                value = value * 2 + 1
+                lat_range[0] = middle
+            else:
+                value = value * 2
+                lat_range[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            characters.append(_GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+    return ''.join(characters)
+
+
+def geohash_bbox(tile):
+    """decodes a geohash to the bounding box it covers
+
+    args:
+        tile: str
+
+    returns:
+        float, float, float, float (south, west, north, east)
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for character in tile:
+        value = _GEOHASH_ALPHABET.index(character)
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            bounds = lon_range if even else lat_range
+            middle = (bounds[0] + bounds[1]) / 2
+            bounds[1 - bit] = middle
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+class SpeedLimitStore(object):
+    """on-disk store of OSM ways with a speed limit, indexed by geohash tile
+
+    Ways with a `maxspeed` tag are kept in a SQLite database with their nodes packed as little-endian
+    doubles, and listed under every geohash tile their polyline passes through. A lookup only reads the
+    handful of tiles around a position, and recently used tiles are kept decoded in an LRU cache, so
+    looking up the roads near the vehicle is a local query that doesn't touch the network. Tiles are
+    downloaded from the Overpass API ahead of time with `prefetch` while the network is up, or with
+    `prefetch_async` on a background thread so a caller never waits on the network.
+    """
+
+    _DEFAULT_PRECISION = 6
+    _DEFAULT_CACHE_TILES = 64
+    _DEFAULT_RADIUS = 100.0
+    _MAX_TILE_AGE_SECONDS = 30 * 24 * 60 * 60
+    _RETRY_SECONDS = 60.0
+    _PREFETCH_BATCH = 16
+
+    def __init__(self, path, precision=_DEFAULT_PRECISION, cache_tiles=_DEFAULT_CACHE_TILES, fetch=None):
+        """constructor method
+
+        args:
+            path: str
+            precision: int (geohash length of a tile, 6 is about 1.2 x 0.6 km)
+            cache_tiles: int (decoded tiles kept in memory)
+            fetch: callable taking [(south, west, north, east)] and returning ways as in `import_ways`
+                   (Default=query the Overpass API)
+        """
+        self.path = path
+        self.precision = precision
+        self.cache_tiles = cache_tiles
+        self._fetch = fetch if fetch is not None else overpass_fetch
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._retry_time = 0.0
+        self._prefetch_thread = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        lon_bits = (5 * precision + 1) // 2
+        lat_bits = 5 * precision // 2
+        self._tile_width = 360.0 / (1 << lon_bits)
+        self._tile_height = 180.0 / (1 << lat_bits)
+
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS ways ('
+            'way_id INTEGER PRIMARY KEY, name TEXT, maxspeed TEXT, '
+            'south REAL, west REAL, north REAL, east REAL, nodes BLOB)'
+        )
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS way_tiles (tile TEXT, way_id INTEGER, PRIMARY KEY (tile, way_id))'
+        )
+        self._connection.execute('CREATE TABLE IF NOT EXISTS tiles (tile TEXT PRIMARY KEY, fetched REAL)')
+        self._fetched = dict(self._connection.execute('SELECT tile, fetched FROM tiles').fetchall())
+
+    def tiles_around(self, latitude, longitude, radius):
+        """returns the tiles covering a circle
+
+        args:
+            latitude: float
+            longitude: float
+            radius: float (meters)
+
+        returns:
+            [str]
+        """
+        delta_lat = radius / _METERS_PER_DEGREE
+        delta_lon = radius / (_METERS_PER_DEGREE * max(0.01, math.cos(math.radians(latitude))))
+        tiles = []
+        for lat in self._steps(latitude - delta_lat, latitude + delta_lat, self._tile_height):
+            for lon in self._steps(longitude - delta_lon, longitude + delta_lon, self._tile_width):
+                tile = geohash(max(-90.0, min(90.0, lat)), (lon + 180.0) % 360.0 - 180.0, self.precision)
+                if tile not in tiles:
+                    tiles.append(tile)
+        return tiles
+
+    @staticmethod
+    def _steps(low, high, step):
+        """yields points from low to high no further apart than `step`, both ends included"""
+        value = low
+        while value < high:
+            yield value
+            value += step
+        yield high
+
+    def _way_tiles(self, nodes):
+        """returns the tiles a polyline passes through"""
+        tiles = set()
+        step = min(self._tile_width, self._tile_height) / 2
+        for index in range(len(nodes)):
+            lat, lon = nodes[index]
+            tiles.add(geohash(lat, lon, self.precision))
+            if index + 1 < len(nodes):
+                next_lat, next_lon = nodes[index + 1]
+                count = int(max(abs(next_lat - lat), abs(next_lon - lon)) / step)
+                for i in range(1, count + 1):
+                    fraction = float(i) / (count + 1)
+                    tiles.add(geohash(lat + (next_lat - lat) * fraction, lon + (next_lon - lon) * fraction,
+                                      self.precision))
+        return tiles
+
+    def import_ways(self, ways, tiles=()):
+        """stores ways and marks tiles as downloaded
+
+        args:
+            ways: iterable of {id: int, name: str, maxspeed: str, nodes: [(lat, lon)]}
+            tiles: [str] (tiles the ways were downloaded for, marked as complete)
+
+        returns:
+            int (number of ways stored)
+        """
+        now = time.time()
+        count = 0
+        touched = set(tiles)
+        with self._lock:
+            self._connection.execute('BEGIN')
+            for way in ways:
+                nodes = numpy.asarray(way['nodes'], dtype='<f8').reshape(-1, 2)
+                if not len(nodes):
+                    continue
+                south, west = nodes.min(axis=0)
+                north, east = nodes.max(axis=0)
+                self._connection.execute(
+                    'INSERT OR REPLACE INTO ways VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (way['id'], way.get('name'), way.get('maxspeed'), float(south), float(west), float(north),
+                     float(east), sqlite3.Binary(nodes.tobytes()))
+                )
+                way_tiles = self._way_tiles(nodes.tolist())
+                self._connection.executemany(
+                    'INSERT OR IGNORE INTO way_tiles VALUES (?, ?)', [(tile, way['id']) for tile in way_tiles]
+                )
+                touched.update(way_tiles)
+                count += 1
+            self._connection.executemany('INSERT OR REPLACE INTO tiles VALUES (?, ?)', [(tile, now) for tile in tiles])
+            self._connection.execute('COMMIT')
+            for tile in tiles:
+                self._fetched[tile] = now
+            for tile in touched:
+                self._cache.pop(tile, None)
+        return count
+
+    def _tile(self, tile):
+        """returns the decoded ways listed under a tile, from the LRU cache when possible
+
+        returns:
+            [(way_id, (south, west, north, east), road)]
+        """
+        ways = self._cache.pop(tile, None)
+        if ways is not None:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+            rows = self._connection.execute(
+                'SELECT ways.way_id, name, maxspeed, south, west, north, east, nodes FROM way_tiles '
+                'JOIN ways ON ways.way_id = way_tiles.way_id WHERE tile = ?', (tile,)
+            ).fetchall()
+            ways = []
+            for way_id, name, maxspeed, south, west, north, east, nodes in rows:
+                road = {
+                    'name': name or 'n/a',
+                    'speed_limit': maxspeed or 'n/a',
+                    'nodes': numpy.frombuffer(nodes, dtype='<f8').reshape(-1, 2),
+                }
+                ways.append((way_id, (south, west, north, east), road))
+            while len(self._cache) >= self.cache_tiles:
+                self._cache.popitem(last=False)
+        self._cache[tile] = ways
+        return ways
+
+    def nearby(self, latitude, longitude, radius=_DEFAULT_RADIUS):
+        """returns the stored roads whose bounding box comes within `radius` of a position
+
+        args:
+            latitude: float
+            longitude: float
+            radius: float (meters)
+
+        returns:
+            [{name, speed_limit, nodes}] (nodes is an n x 2 array of lat, lon; shared, don't modify)
+        """
+        delta_lat = radius / _METERS_PER_DEGREE
+        delta_lon = radius / (_METERS_PER_DEGREE * max(0.01, math.cos(math.radians(latitude))))
+        found = OrderedDict()
+        with self._lock:
+            for tile in self.tiles_around(latitude, longitude, radius):
+                for way_id, (south, west, north, east), road in self._tile(tile):
+                    if way_id in found:
+                        continue
+                    if south - delta_lat <= latitude <= north + delta_lat and \
+                            west - delta_lon <= longitude <= east + delta_lon:
+                        found[way_id] = road
+        return list(found.values())
+
+    def missing_tiles(self, points, radius=_DEFAULT_RADIUS):
+        """returns the tiles around a set of positions that haven't been downloaded or are out of date
+
+        args:
+            points: [(lat, lon)]
+            radius: float (meters)
+
+        returns:
+            [str]
+        """
+        oldest = time.time() - self._MAX_TILE_AGE_SECONDS
+        missing = []
+        for latitude, longitude in points:
+            for tile in self.tiles_around(latitude, longitude, radius):
+                if self._fetched.get(tile, 0.0) < oldest and tile not in missing:
+                    missing.append(tile)
+        return missing
+
+    def prefetch(self, points, radius=_DEFAULT_RADIUS):
+        """downloads the tiles around a position or along a route that aren't stored yet
+
+        Does nothing while the last download failure is recent, so an offline vehicle doesn't wait on the
+        network every cycle.
+
+        args:
+            points: [(lat, lon)]
+            radius: float (meters)
+
+        returns:
+            int (tiles downloaded)
+        """
+        missing = self.missing_tiles(points, radius)
+        if not missing or time.time() < self._retry_time:
+            return 0
+
+        downloaded = 0
+        for index in range(0, len(missing), self._PREFETCH_BATCH):
+            tiles = missing[index:index + self._PREFETCH_BATCH]
+            try:
+                ways = self._fetch([geohash_bbox(tile) for tile in tiles])
+            except Exception as exception:
+                self._retry_time = time.time() + self._RETRY_SECONDS
+                _logger.info('Could not download speed limits [{0}]'.format(exception))
+                break
+            self.import_ways(ways, tiles)
+            downloaded += len(tiles)
+
+        if downloaded:
+            _logger.debug('Downloaded speed limits for {0} tiles'.format(downloaded))
+        return downloaded
+
+    def prefetch_async(self, points, radius=_DEFAULT_RADIUS):
+        """starts `prefetch` on a background thread, unless one is running or there is nothing to download
+
+        args:
+            points: [(lat, lon)]
+            radius: float (meters)
+
+        returns:
+            bool (a download was started)
+        """
+        with self._lock:
+            if self._prefetch_thread is not None or time.time() < self._retry_time:
+                return False
+            if not self.missing_tiles(points, radius):
+                return False
+            self._prefetch_thread = threading.Thread(target=self._prefetch_thread_main, args=(points, radius))
+            self._prefetch_thread.daemon = True
+            self._prefetch_thread.start()
+        return True
+
+    def _prefetch_thread_main(self, points, radius):
+        try:
+            self.prefetch(points, radius)
+        except sqlite3.Error as exception:
+            # The store was closed while downloading
+            _logger.debug('Could not store speed limits [{0}]'.format(exception))
+        finally:
+            with self._lock:
+                self._prefetch_thread = None
+
+    def wait_for_prefetch(self, timeout=None):
+        """blocks until a running background download finishes
+
+        args:
+            timeout: float
+
+        returns:
+            bool (False if it is still running)
+        """
+        thread = self._prefetch_thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    @property
+    def tiles(self):
+        return len(self._fetched)
+
+
+def overpass_fetch(bboxes, url=_OVERPASS_URL, timeout=_OVERPASS_TIMEOUT):
+    """downloads the ways with a speed limit inside bounding boxes from the Overpass API
+
+    args:
+        bboxes: [(south, west, north, east)]
+        url: str
+        timeout: (float, float) (connect and read seconds)
+
+    returns:
+        [{id, name, maxspeed, nodes}]
+    """
+    # overpy is only needed when the vehicle is online and entering an area it has no data for
+    import overpy
+
+    query = '[out:json][timeout:{0}];({1}); (._;>;); out body;'.format(
+        max(1, int(timeout[1]) - 5), ''.join('way["maxspeed"]({0},{1},{2},{3});'.format(*bbox) for bbox in bboxes)
+    )
+    # overpy's own query has no timeout, a stalled connection would hold the download forever
+    response = requests.post(url, data=query.encode('utf-8'), timeout=timeout)
+    response.raise_for_status()
+    result = overpy.Overpass().parse_json(response.content)
+    ways = []
+    for way in result.ways:
+        ways.append({
+            'id': way.id,
+            'name': way.tags.get('name'),
+            'maxspeed': way.tags.get('maxspeed'),
+            'nodes': [(float(node.lat), float(node.lon)) for node in way.nodes],
+        })
+    return ways
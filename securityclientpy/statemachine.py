@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+#
+# security state machine module
+#
+
+from collections import deque, namedtuple
+from concurrent.futures import Future
+import threading
+import time
+
+from securityclientpy import _logger
+
+
+# States
+DISARMED = 'disarmed'
+ARMING = 'arming'
+ARMED = 'armed'
+BREACHED = 'breached'
+ACKNOWLEDGED = 'acknowledged'
+
+# Events
+ARM = 'arm'
+READY = 'ready'
+BREACH = 'breach'
+FALSE_ALARM = 'false_alarm'
+DISARM = 'disarm'
+RESET = 'reset'
+RESTORE = 'restore'
+
+_TRANSITIONS = {
+    (DISARMED, ARM): ARMING,
+    (DISARMED, RESTORE): BREACHED,
+    (ARMING, READY): ARMED,
+    (ARMING, DISARM): DISARMED,
+    (ARMED, BREACH): BREACHED,
+    (ARMED, DISARM): DISARMED,
+    (BREACHED, FALSE_ALARM): ACKNOWLEDGED,
+    (BREACHED, DISARM): ACKNOWLEDGED,
+    (ACKNOWLEDGED, RESET): DISARMED,
+}
+
+# Events that start a new arming session
+_SESSION_EVENTS = (ARM, RESTORE)
+
+
+class SecurityStatus(namedtuple('SecurityStatus', ['state', 'session', 'version', 'since', 'occupied'])):
+    """immutable snapshot of the security state
+
+    A new snapshot replaces the old one on every transition, so readers (flask routes, sensor threads)
+    just take the current reference and never see a half applied transition.
+
+    fields:
+        state: str (DISARMED, ARMING, ARMED, BREACHED or ACKNOWLEDGED)
+        session: int (bumped every time the system is armed)
+        version: int (bumped on every transition)
+        since: float (time of the transition)
+        occupied: bool (motion was detected while arming, someone is inside the vehicle)
+    """
+
+    __slots__ = ()
+
+    @property
+    def armed(self):
+        return self.state in (ARMING, ARMED, BREACHED)
+
+    @property
+    def breached(self):
+        return self.state == BREACHED
+
+    def as_dict(self):
+        return {'state': self.state, 'armed': self.armed, 'breached': self.breached, 'occupied': self.occupied,
+                'since': self.since}
+
+
+Transition = namedtuple('Transition', ['event', 'previous', 'current', 'data'])
+
+
+class SecurityStateMachine(object):
+    """disarmed / arming / armed / breached / acknowledged state machine owned by a single thread
+
+    Any thread may submit an event; the owner thread applies them one at a time in submission order,
+    publishes the new SecurityStatus and then runs the transition listeners, so listeners never run
+    concurrently and always see transitions in order. Events that aren't valid in the current state,
+    or that carry the session of an earlier arming (i.e. a late breach from an armed thread that was
+    already disarmed), are rejected without a transition.
+
+    Listeners run on the owner thread: they should hand long work to their own threads and must never
+    wait on a future from this state machine.
+    """
+
+    def __init__(self, clock=time.time):
+        """constructor method
+
+        args:
+            clock: callable returning float seconds
+        """
+        self.clock = clock
+        self._status = SecurityStatus(DISARMED, 0, 0, clock(), False)
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._listeners = []
+        self._thread = None
+        self._running = False
+
+        self.transitions = 0
+        self.rejected = 0
+
+    @property
+    def status(self):
+        """the current snapshot, read without a lock
+
+        returns:
+            SecurityStatus
+        """
+        return self._status
+
+    @property
+    def running(self):
+        return self._running
+
+    def add_listener(self, listener):
+        """registers a callable run on the owner thread after every transition
+
+        args:
+            listener: callable taking a Transition
+        """
+        self._listeners = self._listeners + [listener]
+
+    def start(self):
+        with self._condition:
+            if self._running: return
+            self._running = True
+        self._thread = threading.Thread(target=self._owner_thread)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """stops the owner thread once the queued events have been applied
+
+        args:
+            timeout: float
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, event, session=None, **data):
+        """queues an event for the owner thread
+
+        args:
+            event: str (ARM, READY, BREACH, FALSE_ALARM, DISARM, RESET or RESTORE)
+            session: int (only apply the event within this arming session, Default=any)
+            data: extra values passed on to the listeners (READY takes occupied)
+
+        returns:
+            concurrent.futures.Future (resolves to the Transition once its listeners ran, None if rejected)
+        """
+        future = Future()
+        with self._condition:
+            if self._running:
+                self._queue.append((event, session, data, future))
+                self._condition.notify_all()
+                return future
+        future.set_result(None)
+        return future
+
+    def wait(self, version, timeout=None):
+        """blocks until the state moves on from a version
+
+        args:
+            version: int
+            timeout: float (Default=forever)
+
+        returns:
+            SecurityStatus (the current one, unchanged on timeout or once stopped)
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._condition:
+            while self._status.version == version and self._running:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return self._status
+
+    def _owner_thread(self):
+        """applies queued events until stopped and drained"""
+        while True:
+            with self._condition:
+                while not self._queue and self._running:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                event, session, data, future = self._queue.popleft()
+
+            transition = self._apply(event, session, data)
+            if transition is not None:
+                for listener in self._listeners:
+                    try:
+                        listener(transition)
+                    except Exception as exception:
+                        _logger.info('State listener failed on {0} [{1}]'.format(event, exception))
+            future.set_result(transition)
+
+    def _apply(self, event, session, data):
+        """moves to the event's next state and publishes the new snapshot
+
+        returns:
+            Transition (None if the event was rejected)
+        """
+        previous = self._status
+        state = _TRANSITIONS.get((previous.state, event))
+        if state is None or (session is not None and session != previous.session):
+            self.rejected += 1
+            _logger.debug('Rejected {0} while {1}'.format(event, previous.state))
+            return None
+
+        # Occupancy is found while arming and holds through the breach of the same session
+        occupied = False
+        if state == ARMED:
+            occupied = bool(data.get('occupied', False))
+        elif state == BREACHED:
+            occupied = previous.occupied
+        current = SecurityStatus(
+            state, previous.session + 1 if event in _SESSION_EVENTS else previous.session, previous.version + 1,
+            self.clock(), occupied
+        )
+        with self._condition:
+            self._status = current
+            self.transitions += 1
+            self._condition.notify_all()
+        _logger.info('Security state {0} -> {1} ({2})'.format(previous.state, state, event))
+        return Transition(event, previous, current, data)
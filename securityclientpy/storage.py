@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+#
+# recording storage module
+#
+
+from bisect import bisect_left
+from collections import namedtuple
+import os
+import struct
+import threading
+import time
+
+from securityclientpy import _logger
+
+
+Segment = namedtuple('Segment', ['segment_id', 'start', 'end', 'offset', 'size'])
+
+
+class RecordingStore(object):
+    """size-capped directory of fixed-duration recording segments with a compact binary index
+
+    Every finished segment gets a fixed-width record in `index.bin` with its start/end times, its byte
+    offset in the store's logical stream of footage and its size. Segments are ordered by time, so
+    looking up footage for a time range is a binary search over the in-memory copy of the index. When
+    the store grows past its quota, the oldest segments are deleted first.
+    """
+
+    _INDEX_FILENAME = 'index.bin'
+    _INDEX_RECORD = struct.Struct('<IddQQ')
+    _SEGMENT_EXTENSION = '.avi'
+    _DEFAULT_SEGMENT_SECONDS = 60.0
+    _DEFAULT_QUOTA_BYTES = 1024 * 1024 * 1024
+
+    def __init__(self, root, segment_seconds=_DEFAULT_SEGMENT_SECONDS, quota_bytes=_DEFAULT_QUOTA_BYTES):
+        """constructor method
+
+        args:
+            root: str
+            segment_seconds: float
+            quota_bytes: int
+        """
+        self.root = root
+        self.segment_seconds = segment_seconds
+        self.quota_bytes = quota_bytes
+        self._lock = threading.Lock()
+        self._segments = []
+        self._ends = []
+        self._total_bytes = 0
+
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+        self._index_path = os.path.join(self.root, self._INDEX_FILENAME)
+        self._load_index()
+        self._next_id = self._segments[-1].segment_id + 1 if self._segments else 0
+        self._next_offset = self._segments[-1].offset + self._segments[-1].size if self._segments else 0
+        self.evicted = 0
+
+    def _load_index(self):
+        """reads the index file, dropping trailing partial records and segments whose file is gone"""
+        if not os.path.exists(self._index_path):
+            return
+        with open(self._index_path, 'rb') as fp:
+            data = fp.read()
+        size = self._INDEX_RECORD.size
+        for position in range(0, len(data) - len(data) % size, size):
+            segment = Segment(*self._INDEX_RECORD.unpack_from(data, position))
+            if os.path.exists(self.segment_path(segment.segment_id, segment.start)):
+                self._segments.append(segment)
+        self._ends = [segment.end for segment in self._segments]
+        self._total_bytes = sum(segment.size for segment in self._segments)
+
+    def segment_path(self, segment_id, start):
+        """returns the file path for a segment
+
+        Names carry the UTC start time to the second plus the segment id, so they never collide.
+
+        args:
+            segment_id: int
+            start: float
+
+        returns:
+            str
+        """
+        name = 'breach-{0}-{1:08d}{2}'.format(
+            time.strftime('%Y%m%d-%H%M%S', time.gmtime(start)), segment_id, self._SEGMENT_EXTENSION
+        )
+        return os.path.join(self.root, name)
+
+    def new_segment(self, start):
+        """reserves the id and path for a new segment starting at `start`
+
+        args:
+            start: float
+
+        returns:
+            int, str (segment id, path)
+        """
+        with self._lock:
+            segment_id = self._next_id
+            self._next_id += 1
+        return segment_id, self.segment_path(segment_id, start)
+
+    def finish_segment(self, segment_id, start, end):
+        """adds a written segment to the index and enforces the disk quota
+
+        args:
+            segment_id: int
+            start: float
+            end: float
+
+        returns:
+            Segment
+        """
+        path = self.segment_path(segment_id, start)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        with self._lock:
+            segment = Segment(segment_id, start, end, self._next_offset, size)
+            self._next_offset += size
+            self._total_bytes += size
+            with open(self._index_path, 'ab') as fp:
+                fp.write(self._INDEX_RECORD.pack(*segment))
+            position = bisect_left(self._ends, end)
+            self._segments.insert(position, segment)
+            self._ends.insert(position, end)
+            self._enforce_quota()
+        return segment
+
+    def find(self, start, end):
+        """returns the segments overlapping a time range, oldest first
+
+        args:
+            start: float
+            end: float
+
+        returns:
+            [Segment]
+        """
+        with self._lock:
+            position = bisect_left(self._ends, start)
+            found = []
+            while position < len(self._segments) and self._segments[position].start <= end:
+                found.append(self._segments[position])
+                position += 1
+        return found
+
+    def _enforce_quota(self):
+        """deletes the oldest segments until the store fits its quota, then rewrites the index"""
+        evicted = 0
+        while self._total_bytes > self.quota_bytes and len(self._segments) > 1:
+            segment = self._segments.pop(0)
+            self._ends.pop(0)
+            self._total_bytes -= segment.size
+            try:
+                os.remove(self.segment_path(segment.segment_id, segment.start))
+            except OSError as exception:
+                _logger.debug('Could not remove segment [{0}]'.format(exception))
+            evicted += 1
+
+        if evicted:
+            self.evicted += evicted
+            _logger.info('Recording quota reached, evicted {0} oldest segments'.format(evicted))
+            temporary_path = self._index_path + '.tmp'
+            with open(temporary_path, 'wb') as fp:
+                fp.write(b''.join(self._INDEX_RECORD.pack(*segment) for segment in self._segments))
+            os.rename(temporary_path, self._index_path)
+
+    @property
+    def segments(self):
+        return list(self._segments)
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+#
+# mjpeg live stream module
+#
+
+import threading
+
+import cv2
+
+from securityclientpy import _logger
+
+
+class StreamSubscriber(object):
+    """one live stream client
+
+    Holds only the newest encoded frame: a frame the client hasn't taken yet is replaced (and counted as
+    dropped) when the next one arrives, so a slow client never queues frames. The client's quality tier
+    steps down while it keeps dropping frames and back up once it keeps up again.
+    """
+
+    _ADAPT_WINDOW = 30
+    _STEP_DOWN_DROP_RATIO = 0.3
+    _STEP_UP_DROP_RATIO = 0.05
+
+    def __init__(self, broadcaster, tier=0):
+        """constructor method"""
+        self._broadcaster = broadcaster
+        self._condition = threading.Condition()
+        self._frame = None
+        self._closed = False
+        self.tier = tier
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.bytes_sent = 0
+        self._window_sent = 0
+        self._window_dropped = 0
+
+    def deliver(self, frame):
+        """offers a newly encoded frame, replacing one the client hasn't taken yet
+
+        args:
+            frame: bytes
+        """
+        with self._condition:
+            if self._frame is not None:
+                self.frames_dropped += 1
+                self._window_dropped += 1
+            self._frame = frame
+            self._condition.notify()
+
+    def next_frame(self, timeout=None):
+        """blocks until a frame is available
+
+        args:
+            timeout: float
+
+        returns:
+            bytes (None on timeout or once closed)
+        """
+        with self._condition:
+            if self._frame is None and not self._closed:
+                self._condition.wait(timeout)
+            frame, self._frame = self._frame, None
+        if frame is not None:
+            self.frames_sent += 1
+            self.bytes_sent += len(frame)
+            self._window_sent += 1
+            self._adapt()
+        return frame
+
+    def _adapt(self):
+        """moves the client to a cheaper or better quality tier based on its recent drop ratio"""
+        total = self._window_sent + self._window_dropped
+        if total < self._ADAPT_WINDOW:
+            return
+        drop_ratio = float(self._window_dropped) / total
+        if drop_ratio > self._STEP_DOWN_DROP_RATIO:
+            self.tier = min(self.tier + 1, len(self._broadcaster.tiers) - 1)
+        elif drop_ratio < self._STEP_UP_DROP_RATIO:
+            self.tier = max(self.tier - 1, 0)
+        self._window_sent = 0
+        self._window_dropped = 0
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._broadcaster.unsubscribe(self)
+
+    @property
+    def closed(self):
+        return self._closed
+
+
+class MjpegBroadcaster(object):
+    """encodes frames from the frame grabber once and fans them out to every stream client
+
+    One encoding thread runs while anyone is watching. Each frame is encoded once per quality tier in
+    use (not once per client), capped at `max_fps`.
+    """
+
+    # (scale, jpeg quality), best first
+    TIERS = [(1.0, 80), (0.75, 65), (0.5, 50), (0.35, 40)]
+    BOUNDARY = 'frame'
+
+    _MAX_FPS = 15.0
+    _WAIT_SECONDS = 0.5
+
+    def __init__(self, videostream, max_fps=_MAX_FPS, tiers=None):
+        """constructor method
+
+        args:
+            videostream: VideoStreamer (capture thread must be running)
+            max_fps: float
+            tiers: [(float, int)]
+        """
+        self.videostream = videostream
+        self.max_fps = max_fps
+        self.tiers = tiers or self.TIERS
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self.frames_encoded = 0
+
+    def subscribe(self, tier=0):
+        """adds a stream client, starting the encoding thread if needed
+
+        args:
+            tier: int (starting quality tier)
+
+        returns:
+            StreamSubscriber
+        """
+        subscriber = StreamSubscriber(self, tier)
+        with self._lock:
+            self._subscribers = self._subscribers + [subscriber]
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._encode_thread)
+                self._thread.daemon = True
+                self._thread.start()
+        _logger.info('Stream client connected ({0} watching)'.format(len(self._subscribers)))
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s is not subscriber]
+
+    def encode(self, frame, tier):
+        """encodes a frame as a multipart mjpeg part for a quality tier
+
+        args:
+            frame: numpy.ndarray
+            tier: int
+
+        returns:
+            bytes
+        """
+        scale, quality = self.tiers[tier]
+        if scale != 1.0:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        success, encoded = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+        if not success:
+            return None
+        data = encoded.tobytes()
+        header = '--{0}\r\nContent-Type: image/jpeg\r\nContent-Length: {1}\r\n\r\n'.format(self.BOUNDARY, len(data))
+        return header.encode('ascii') + data + b'\r\n'
+
+    def _encode_thread(self):
+        """encodes the newest frame for every tier in use until the last client leaves"""
+        reader = self.videostream.subscribe()
+        # Allow for capture jitter so a camera running at max_fps isn't halved
+        interval = 0.75 / self.max_fps
+        last = 0.0
+        while True:
+            with self._lock:
+                subscribers = self._subscribers
+                if not subscribers:
+                    self._thread = None
+                    break
+
+            frames = reader.wait(self._WAIT_SECONDS)
+            if not frames or frames[-1][1] - last < interval:
+                continue
+            sequence, last, frame = frames[-1]
+
+            encoded = {}
+            for subscriber in subscribers:
+                if subscriber.tier not in encoded:
+                    encoded[subscriber.tier] = self.encode(frame, subscriber.tier)
+                    self.frames_encoded += 1
+                if encoded[subscriber.tier] is not None:
+                    subscriber.deliver(encoded[subscriber.tier])
+
+    def stream(self, subscriber):
+        """generator of multipart mjpeg parts for a flask streaming response
+
+        args:
+            subscriber: StreamSubscriber
+
+        returns:
+            generator of bytes
+        """
+        try:
+            while not subscriber.closed:
+                frame = subscriber.next_frame(self._WAIT_SECONDS)
+                if frame is not None:
+                    yield frame
+        finally:
+            subscriber.close()
+
+    @property
+    def mimetype(self):
+        return 'multipart/x-mixed-replace; boundary={0}'.format(self.BOUNDARY)
+
+    @property
+    def subscribers(self):
+        return len(self._subscribers)
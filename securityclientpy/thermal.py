@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+#
+# temperature sensor module
+#
+
+from collections import deque, namedtuple
+import glob
+import math
+import os
+import threading
+import time
+
+from securityclientpy import _logger
+
+
+TemperatureSample = namedtuple('TemperatureSample', ['celcius', 'fahrenheit', 'time'])
+# Smoothed temperature in fahrenheit, rate in fahrenheit per minute
+TemperatureAlert = namedtuple('TemperatureAlert', ['kind', 'fahrenheit', 'rate', 'time'])
+
+
+def parse_w1_slave(lines):
+    """parses the contents of a DS18B20 w1_slave file
+
+    The first line ends in YES when the conversion's CRC checked out, the second carries the temperature
+    in thousandths of a degree celcius after "t=".
+
+    args:
+        lines: [str]
+
+    returns:
+        float (celcius, None when the CRC failed or the file is incomplete)
+    """
+    if not lines or len(lines) < 2 or lines[0].strip()[-3:] != 'YES':
+        return None
+    position = lines[1].find('t=')
+    if position == -1:
+        return None
+    try:
+        return int(lines[1][position + 2:].strip()) / 1000.0
+    except ValueError:
+        return None
+
+
+class TemperatureSampler(object):
+    """background reader of a DS18B20 1-Wire temperature sensor
+
+    The kernel's w1-therm driver starts a conversion every time `w1_slave` is read and blocks for the
+    ~750 ms it takes, and a reading can fail its CRC. A single thread reads the sensor every `interval`
+    seconds, retrying a failed read at most `max_retries` times, and keeps the latest sample plus a
+    rolling history; readers get the latest sample without touching the sensor. A sample older than
+    `stale_after` seconds (the sensor stopped answering) is flagged stale.
+    """
+
+    _BASE_DIR = '/sys/bus/w1/devices/'
+    _DEVICE_PATTERN = '28*'
+    _DEVICE_FILENAME = 'w1_slave'
+    _INTERVAL = 5.0
+    _HISTORY = 120
+    _MAX_RETRIES = 3
+    _RETRY_SECONDS = 0.2
+    _STALE_SECONDS = 30.0
+    # The register value after power on, read back when a conversion didn't happen
+    _POWER_ON_CELCIUS = 85.0
+
+    def __init__(self, device_file, interval=_INTERVAL, history=_HISTORY, max_retries=_MAX_RETRIES,
+                 retry_seconds=_RETRY_SECONDS, stale_after=_STALE_SECONDS, clock=time.time):
+        """constructor method
+
+        args:
+            device_file: str (w1_slave path, None when no sensor was found)
+            interval: float (seconds between samples)
+            history: int (samples kept)
+            max_retries: int (extra reads after a failed one)
+            retry_seconds: float (wait between retries)
+            stale_after: float (seconds after which the latest sample is flagged stale)
+            clock: callable returning float seconds
+        """
+        self.device_file = device_file
+        self._clock = clock
+        self.interval = interval
+        self.max_retries = max_retries
+        self.retry_seconds = retry_seconds
+        self.stale_after = stale_after
+        self._latest = None
+        self._history = deque(maxlen=history)
+        self._running = False
+        self._thread = None
+        self._stopped = threading.Event()
+        self._listeners = []
+        self.samples = 0
+        self.failures = 0
+        self.retries = 0
+
+    @classmethod
+    def find_device(cls, base_dir=_BASE_DIR):
+        """returns the w1_slave file of the first DS18B20 on the bus
+
+        args:
+            base_dir: str
+
+        returns:
+            str (None when there is no sensor)
+        """
+        devices = sorted(glob.glob(os.path.join(base_dir, cls._DEVICE_PATTERN)))
+        if not devices:
+            _logger.info('No temperature sensor found in [{0}]'.format(base_dir))
+            return None
+        return os.path.join(devices[0], cls._DEVICE_FILENAME)
+
+    def start(self):
+        if self._running: return
+        self._running = True
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._sample_thread)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._running = False
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _read(self):
+        """reads the sensor file once
+
+        returns:
+            float (celcius, None on a failed read)
+        """
+        try:
+            with open(self.device_file, 'r') as fp:
+                lines = fp.readlines()
+        except (IOError, OSError) as exception:
+            _logger.debug('Could not read temperature sensor [{0}]'.format(exception))
+            return None
+        celcius = parse_w1_slave(lines)
+        if celcius == self._POWER_ON_CELCIUS:
+            return None
+        return celcius
+
+    def sample(self):
+        """reads the sensor, retrying a bounded number of times, and records the result
+
+        returns:
+            TemperatureSample (None when every attempt failed)
+        """
+        if self.device_file is None:
+            return None
+        celcius = self._read()
+        attempt = 0
+        while celcius is None and attempt < self.max_retries and not self._stopped.is_set():
+            attempt += 1
+            self.retries += 1
+            self._stopped.wait(self.retry_seconds)
+            celcius = self._read()
+        if celcius is None:
+            self.failures += 1
+            return None
+
+        sample = TemperatureSample(round(celcius, 1), round(celcius * 9.0 / 5.0 + 32.0, 1), self._clock())
+        self._history.append(sample)
+        self._latest = sample
+        self.samples += 1
+        for listener in self._listeners:
+            listener(sample)
+        return sample
+
+    def _sample_thread(self):
+        """samples the sensor every interval until stopped"""
+        while self._running:
+            self.sample()
+            self._stopped.wait(self.interval)
+        _logger.debug('Temperature sampler stopped')
+
+    def add_listener(self, listener):
+        """registers a callable run on the sampler thread with every new sample
+
+        args:
+            listener: callable taking a TemperatureSample
+        """
+        self._listeners = self._listeners + [listener]
+
+    def latest(self):
+        """returns the newest sample with its age
+
+        returns:
+            {fahrenheit, celcius, time, age, stale} (None before the first successful read)
+        """
+        sample = self._latest
+        if sample is None:
+            return None
+        age = max(0.0, self._clock() - sample.time)
+        return {'fahrenheit': sample.fahrenheit, 'celcius': sample.celcius, 'time': sample.time, 'age': age,
+                'stale': age > self.stale_after}
+
+    def history(self):
+        """returns the recent samples, oldest first
+
+        returns:
+            [TemperatureSample]
+        """
+        return list(self._history)
+
+    @property
+    def running(self):
+        return self._running
+
+
+class TemperatureMonitor(object):
+    """streaming analysis of the temperature samples, raising alerts for a dangerously hot cabin
+
+    Each sample updates, in constant time:
+    - a median of the last 3 readings, which drops an isolated glitched reading entirely
+    - an exponentially weighted moving average of that with time constant `smoothing_seconds`, weighted by
+      the time since the previous sample
+    - the rate of rise of that average in degrees fahrenheit per minute, itself smoothed the same way
+    - min / max / mean buckets of `bucket_seconds` for the history
+
+    An over temperature alert fires when the smoothed temperature reaches `threshold` and re-arms only once
+    it falls back to `clear_threshold` (hysteresis); while it stays hot the alert repeats every
+    `repeat_seconds`. A rapid rise alert fires when the cabin is above `rise_floor` and warming faster than
+    `rise_rate`, and re-arms once the rate falls under half of that.
+    """
+
+    OVER_TEMPERATURE = 'over_temperature'
+    RAPID_RISE = 'rapid_rise'
+
+    _THRESHOLD = 85.0
+    _CLEAR_THRESHOLD = 80.0
+    _RISE_RATE = 1.0
+    _RISE_FLOOR = 75.0
+    _SMOOTHING_SECONDS = 60.0
+    _REPEAT_SECONDS = 600.0
+    _BUCKET_SECONDS = 300.0
+    _BUCKETS = 288
+
+    def __init__(self, threshold=_THRESHOLD, clear_threshold=_CLEAR_THRESHOLD, rise_rate=_RISE_RATE,
+                 rise_floor=_RISE_FLOOR, smoothing_seconds=_SMOOTHING_SECONDS, repeat_seconds=_REPEAT_SECONDS,
+                 bucket_seconds=_BUCKET_SECONDS, buckets=_BUCKETS):
+        """constructor method
+
+        args:
+            threshold: float (fahrenheit)
+            clear_threshold: float (fahrenheit, the smoothed temperature must drop to this to re-arm)
+            rise_rate: float (fahrenheit per minute)
+            rise_floor: float (fahrenheit, rises below this temperature are harmless)
+            smoothing_seconds: float (time constant of the moving averages)
+            repeat_seconds: float (seconds between repeated over temperature alerts)
+            bucket_seconds: float (history resolution)
+            buckets: int (history length)
+        """
+        self.threshold = threshold
+        self.clear_threshold = clear_threshold
+        self.rise_rate = rise_rate
+        self.rise_floor = rise_floor
+        self.smoothing_seconds = smoothing_seconds
+        self.repeat_seconds = repeat_seconds
+        self.bucket_seconds = bucket_seconds
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._history = deque(maxlen=buckets)
+        self._recent = deque(maxlen=3)
+
+        self.smoothed = None
+        self.rate = 0.0
+        self._time = None
+        self._hot = False
+        self._rising = False
+        self._last_alert = None
+        self.samples = 0
+        self.alerts = 0
+        self._sample_seconds = 0.0
+
+    def add_listener(self, listener):
+        """registers a callable run with every alert
+
+        args:
+            listener: callable taking a TemperatureAlert
+        """
+        self._listeners = self._listeners + [listener]
+
+    def add_sample(self, sample):
+        """feeds a temperature sample
+
+        args:
+            sample: TemperatureSample
+
+        returns:
+            [TemperatureAlert]
+        """
+        start = time.time()
+        alerts = []
+        with self._lock:
+            if self._time is not None and sample.time <= self._time:
+                return alerts
+            self._bucket(sample)
+            self._recent.append(sample.fahrenheit)
+            fahrenheit = sorted(self._recent)[1] if len(self._recent) == 3 else sample.fahrenheit
+            if self.smoothed is None:
+                self.smoothed = fahrenheit
+            else:
+                dt = sample.time - self._time
+                weight = 1.0 - math.exp(-dt / self.smoothing_seconds)
+                previous = self.smoothed
+                self.smoothed += weight * (fahrenheit - previous)
+                self.rate += weight * ((self.smoothed - previous) * 60.0 / dt - self.rate)
+            self._time = sample.time
+            self.samples += 1
+
+            if self._hot and self.smoothed <= self.clear_threshold:
+                self._hot = False
+            if self.smoothed >= self.threshold and (
+                    not self._hot or sample.time - self._last_alert >= self.repeat_seconds):
+                self._hot = True
+                self._last_alert = sample.time
+                alerts.append(TemperatureAlert(self.OVER_TEMPERATURE, self.smoothed, self.rate, sample.time))
+
+            if self._rising and self.rate < self.rise_rate / 2.0:
+                self._rising = False
+            if not self._rising and not self._hot and self.rate >= self.rise_rate and \
+                    self.smoothed >= self.rise_floor:
+                self._rising = True
+                alerts.append(TemperatureAlert(self.RAPID_RISE, self.smoothed, self.rate, sample.time))
+            self.alerts += len(alerts)
+            self._sample_seconds += time.time() - start
+
+        for alert in alerts:
+            _logger.info('Temperature alert [{0}] {1:.1f}F rising {2:.2f}F/min'.format(
+                alert.kind, alert.fahrenheit, alert.rate))
+            for listener in self._listeners:
+                listener(alert)
+        return alerts
+
+    def _bucket(self, sample):
+        """adds a sample to its history bucket"""
+        start = sample.time - sample.time % self.bucket_seconds
+        if self._history and self._history[-1][0] == start:
+            bucket = self._history[-1]
+            bucket[1] = min(bucket[1], sample.fahrenheit)
+            bucket[2] = max(bucket[2], sample.fahrenheit)
+            bucket[3] += sample.fahrenheit
+            bucket[4] += 1
+        else:
+            self._history.append([start, sample.fahrenheit, sample.fahrenheit, sample.fahrenheit, 1])
+
+    def history(self):
+        """returns the downsampled history, oldest first
+
+        returns:
+            [{time, min, max, mean}] (fahrenheit, time is the start of the bucket)
+        """
+        with self._lock:
+            return [{'time': start, 'min': low, 'max': high, 'mean': round(total / count, 2)}
+                    for start, low, high, total, count in self._history]
+
+    def trend(self):
+        """returns the smoothed temperature and its rate of change
+
+        returns:
+            {fahrenheit, rate (fahrenheit per minute), hot} (None before the first sample)
+        """
+        if self.smoothed is None:
+            return None
+        return {'fahrenheit': round(self.smoothed, 2), 'rate': round(self.rate, 3), 'hot': self._hot}
+
+    def stats(self):
+        """returns sample and alert counters
+
+        returns:
+            {samples, alerts, mean_sample_microseconds}
+        """
+        return {
+            'samples': self.samples,
+            'alerts': self.alerts,
+            'mean_sample_microseconds': 1e6 * self._sample_seconds / self.samples if self.samples else 0.0,
+        }
@@ -3,205 +3,479 @@
 # security threads module
 #
 
-from threading import Thread
+from threading import Event, Thread
+import json
+import os
 import time
-import cv2
-import datetime
 
 from securityclientpy import _logger, host, port, serverport
 from securityclientpy.hwcontroller import HardwareController
 from securityclientpy.videostreamer import VideoStreamer
+from securityclientpy.recorder import BreachRecorder, PrerollBuffer
+from securityclientpy.storage import RecordingStore
+from securityclientpy.motion import CameraMotionMonitor
 from securityclientpy.server_requests import ServerRequests
+from securityclientpy.speedlimits import SpeedLimitStore
+from securityclientpy.mapmatch import RoadMatcher
+from securityclientpy.speedcheck import SpeedCheckScheduler
+from securityclientpy.geofence import GeofenceMonitor, parse_geofences
+from securityclientpy.thermal import TemperatureMonitor
+from securityclientpy.fusion import ArmedSession, DEFAULT_POLICY, load_policy
+from securityclientpy.statemachine import SecurityStateMachine, ARMING, ARMED, BREACHED, ARM, READY, BREACH, \
+    FALSE_ALARM, DISARM, RESET, RESTORE
 
 
 class SecurityThreads(object):
 
     # Constants
     _DEFAULT_CAMERA_ID = 0
-    _MAX_TEMP = 85.0
     _FLASH_SYSTEM_ARMED = 6
     _FLASH_SYSTEM_DISARMED = 3
     _FLASH_FALSE_ALARM = 2
-
-    def __init__(self, no_hardware, no_video, hwcontroller, server_requests):
+    _SENSOR_WAIT_SECONDS = 0.3
+    _ARMING_DELAY_SECONDS = ArmedSession.EXIT_DELAY_SECONDS
+    _INITIAL_MOTION_SECONDS = 3.0
+    _VIDEO_CODEC = 'XVID'
+    _PREROLL_SECONDS = 5.0
+    _PREROLL_MAX_BYTES = 4 * 1024 * 1024
+    _RECORDINGS_DIRECTORY = 'recordings'
+    _SEGMENT_SECONDS = 60.0
+    _RECORDINGS_QUOTA_BYTES = 1024 * 1024 * 1024
+    _SPEED_LIMITS_FILENAME = 'speedlimits.db'
+    _SPEED_LIMIT_RADIUS = 100.0
+    _SPEED_LIMIT_PREFETCH_RADIUS = 2000.0
+    _MIN_HEADING_SPEED = 5.0
+    _GEOFENCES_FILENAME = 'geofences.json'
+    _BREACH_POLICY_FILENAME = 'breach_policy.yaml'
+
+    def __init__(self, no_hardware, no_video, hwcontroller, server_requests, video_codec=_VIDEO_CODEC,
+                 preroll_seconds=_PREROLL_SECONDS, preroll_max_bytes=_PREROLL_MAX_BYTES, data_dir='.',
+                 segment_seconds=_SEGMENT_SECONDS, recordings_quota_bytes=_RECORDINGS_QUOTA_BYTES):
         """constructor method"""
-        self._system_armed = False
-        self._system_breached = False
         self.no_hardware = no_hardware
         self.no_video = no_video
         self.initial_motion_detected = False
         self.speed_checker_thread_running = False
         self.server_requests = server_requests
+        self.video_codec = video_codec
+        self.preroll_seconds = preroll_seconds
+        self.preroll_max_bytes = preroll_max_bytes
+        self._listeners = []
+        # The sensor reader of each arming session's armed thread, an old session's thread may still be
+        # winding down when the next one subscribes
+        self._sensor_events = {}
+        self.armed_thread = None
+
+        # Arming, breaches and disarming are applied one at a time by the state machine's own thread
+        self.state = SecurityStateMachine()
+        self.state.add_listener(self._transition)
+        self.state.start()
 
         # Create objects for different config/development levels
         self.hwcontroller = hwcontroller
+        self.speed_limits = SpeedLimitStore(os.path.join(data_dir, SecurityThreads._SPEED_LIMITS_FILENAME))
+        self.road_matcher = RoadMatcher()
+        self.speed_check_scheduler = SpeedCheckScheduler(self.road_matcher)
+        self._speed_checker_stopped = Event()
+
+        # Geofences are checked against every filtered position estimate
+        self.geofences_path = os.path.join(data_dir, SecurityThreads._GEOFENCES_FILENAME)
+        self.geofences = GeofenceMonitor(self._load_geofences())
+        self.geofences.add_listener(self._geofence_crossed)
+        self.hwcontroller.position_estimator.add_listener(self.geofences.update)
+        self.hwcontroller.temperature_monitor.add_listener(self._temperature_alert)
+
+        # How the sensors' events add up to a breach
+        self.breach_policy_path = os.path.join(data_dir, SecurityThreads._BREACH_POLICY_FILENAME)
+        self.breach_policy = self._load_breach_policy()
         if not self.no_video:
-            self.videostream = VideoStreamer(SecurityThreads._DEFAULT_CAMERA_ID, no_video)
+            self.videostream = VideoStreamer(SecurityThreads._DEFAULT_CAMERA_ID, no_video,
+                                             hwcontroller.drivers.open_camera(SecurityThreads._DEFAULT_CAMERA_ID))
+            self.videostream.start()
+            self.recordings = RecordingStore(
+                os.path.join(data_dir, SecurityThreads._RECORDINGS_DIRECTORY),
+                segment_seconds=segment_seconds, quota_bytes=recordings_quota_bytes
+            )
 
     def arm_system(self):
-        """method to arm system"""
-
-        if self._system_armed: return
-        self._system_armed = True
-        self.hwcontroller.status_led_flash(SecurityThreads._FLASH_SYSTEM_ARMED)
-        self.hwcontroller.status_led_on()
+        """method to arm system, the exit delay runs on the armed thread
 
-        # Start system armed thread
-        thread = Thread(target=self._armed)
-        thread.start()
+        returns:
+            concurrent.futures.Future (resolves to the Transition, None if the system wasn't disarmed)
+        """
+        return self.state.submit(ARM)
 
     def disarm_system(self):
-        """method to disarm system"""
+        """method to disarm system, acknowledging a breach in progress
 
-        if not self._system_armed: return
-        self._system_armed = False
+        The armed thread sees the disarm at once, even during the exit delay.
+        """
+
+        if self.state.submit(DISARM).result() is None: return
         self.hwcontroller.status_led_flash(SecurityThreads._FLASH_SYSTEM_DISARMED)
 
     def false_alarm(self):
         """method to set breach as false alarm"""
 
-        if not self._system_breached: return
-        self._system_breached = False
-        self._system_armed = False
+        if self.state.submit(FALSE_ALARM).result() is None: return
         self.hwcontroller.status_led_flash(SecurityThreads._FLASH_FALSE_ALARM)
 
-    def _armed(self):
-        """method to run when the system is armed"""
-        _logger.info('System will arm in 5 secs')
-        time.sleep(5)
+    def restore_state(self, armed, breached):
+        """picks up the state the server kept while the client was down
+
+        args:
+            armed: bool
+            breached: bool
+        """
+        if breached:
+            self.state.submit(RESTORE)
+        elif armed:
+            self.state.submit(ARM)
+
+    def _transition(self, transition):
+        """tells the listeners, and starts and stops the armed and breached threads and the led flashing as
+        the state changes
+
+        Runs on the state machine's thread, so nothing here may block. Led changes made here come before
+        any made by the caller of the event (i.e. the disarm flashes).
+
+        args:
+            transition: Transition
+        """
+        current = transition.current
+        self._state_changed(current)
+        if transition.previous.state in (ARMING, ARMED):
+            # Wake the armed thread up from its sensor wait, it checks the state before waiting again
+            sensor_events = self._sensor_events.get(transition.previous.session)
+            if sensor_events is not None:
+                sensor_events.notify()
+
+        if current.state == ARMING:
+            self.hwcontroller.status_led_flash(SecurityThreads._FLASH_SYSTEM_ARMED, then_on=True)
+            self.armed_thread = Thread(target=self._armed, args=(current.session,))
+            self.armed_thread.start()
+        elif current.state == BREACHED:
+            self.hwcontroller.status_led_flash_start()
+            if transition.event == BREACH:
+                notification = self.server_requests.send_system_breach_notification_async()
+                notification.add_done_callback(self._breach_notification_done)
+            Thread(target=self._breached, args=(current.session, transition.data.get('preroll'))).start()
+
+        if transition.previous.state == BREACHED:
+            self.hwcontroller.status_led_flash_stop()
+
+    def _in_state(self, session, state):
+        """checks the system is still in a state within an arming session
+
+        returns:
+            bool
+        """
+        status = self.state.status
+        return status.session == session and status.state == state
+
+    def _wait_in_state(self, session, state, seconds):
+        """waits out a delay, cut short as soon as the system leaves a state
+
+        args:
+            session: int
+            state: str
+            seconds: float
+
+        returns:
+            bool (still in the state once the delay is over)
+        """
+        deadline = time.time() + seconds
+        status = self.state.status
+        while status.session == session and status.state == state and self.state.running:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return True
+            status = self.state.wait(status.version, remaining)
+        return False
+
+    def add_listener(self, listener):
+        """registers a callable run with the new status on every state transition (i.e.
+        EventRecorder.record_state), on the state machine's thread
+
+        args:
+            listener: callable taking a SecurityStatus
+        """
+        self._listeners = self._listeners + [listener]
+
+    def _state_changed(self, state):
+        for listener in self._listeners:
+            listener(state)
+
+    def _load_breach_policy(self):
+        """reads the breach fusion policy, falling back to the default one
+
+        returns:
+            dict (see fusion.parse_policy)
+        """
+        if not os.path.exists(self.breach_policy_path):
+            return DEFAULT_POLICY
+        try:
+            return load_policy(self.breach_policy_path)
+        except (IOError, ValueError) as exception:
+            _logger.info('Failed to load breach policy [{0}]'.format(exception))
+            return DEFAULT_POLICY
+
+    def _load_geofences(self):
+        """reads the geofences saved from the server's last update
+
+        returns:
+            [Geofence]
+        """
+        if not os.path.exists(self.geofences_path):
+            return []
+        try:
+            with open(self.geofences_path) as fp:
+                return parse_geofences(json.load(fp))
+        except (IOError, ValueError) as exception:
+            _logger.info('Failed to load geofences [{0}]'.format(exception))
+            return []
+
+    def set_geofences(self, specs):
+        """replaces the geofences with those pushed by the server and saves them
+
+        args:
+            specs: [dict] (see geofence.parse_geofence)
+
+        raises:
+            ValueError
+        """
+        fences = parse_geofences(specs)
+        self.geofences.load(fences)
+        try:
+            with open(self.geofences_path, 'w') as fp:
+                json.dump(specs, fp)
+        except IOError as exception:
+            _logger.info('Failed to save geofences [{0}]'.format(exception))
+
+    def _geofence_crossed(self, event):
+        """runs a geofence's actions when the vehicle enters or leaves it
+
+        Called on the gps reader thread, arming and disarming only hand the change to the state machine.
+
+        args:
+            event: GeofenceEvent
+        """
+        actions = event.fence.on_enter if event.entered else event.fence.on_exit
+        for action in actions:
+            if action == 'arm':
+                self.arm_system()
+            elif action == 'disarm':
+                self.disarm_system()
+            elif action == 'alert' and self.state.status.armed:
+                message = 'Vehicle {0} {1} while armed'.format(
+                    'entered' if event.entered else 'left', event.fence.name)
+                self.server_requests.send_geofence_alert_async(message)
+
+    def _temperature_alert(self, alert):
+        """notifies the server of a dangerously hot cabin while someone is inside the armed vehicle
+
+        Motion detected when the system was armed means a child or pet was left in the vehicle.
+
+        args:
+            alert: TemperatureAlert
+        """
+        status = self.state.status
+        if not (status.armed and status.occupied):
+            return
+        if alert.kind == TemperatureMonitor.OVER_TEMPERATURE:
+            message = 'Vehicle is {0:.0f}F with someone inside'.format(alert.fahrenheit)
+        else:
+            message = 'Vehicle is heating up quickly ({0:.0f}F, +{1:.1f}F/min) with someone inside'.format(
+                alert.fahrenheit, alert.rate)
+        self.server_requests.send_temperature_alert_async(message)
+
+    def _armed(self, session):
+        """method to run when the system is armed
+
+        Motion, camera and vibration are consumed as timestamped edge events from the hardware controller's
+        sensor bus, so a pulse shorter than any polling interval still counts, and fused into a breach
+        decision by the breach policy (see fusion.ArmedSession, which replays of the event log run through
+        too). Events are timed by the hardware controller's clock. The thread ends once its arming session
+        is over, every wait is cut short by a disarm.
+
+        args:
+            session: int
+        """
+        _logger.info('System will arm in {0:.0f} secs'.format(self._ARMING_DELAY_SECONDS))
+        if not self._wait_in_state(session, ARMING, self._ARMING_DELAY_SECONDS): return
         _logger.info('System armed')
 
-        # Initialize variables in case they aren't used (so checking doesn't throw error)
-        temp = None
-        motion = None
-        noise = None
-
-        # Motion detection count attribute
-        breached = False
-        motion_count = 0
-
-        self.initial_motion_detected = self.initial_motion_is_detected()
-        while self._system_armed:
-            if not self.no_hardware:
-                if self.initial_motion_detected:
-                    temp = self.hwcontroller.read_thermal_sensor()
-                    temp = temp['fahrenheit']
-                    if temp and temp >= SecurityThreads._MAX_TEMP:
-                        # Notify server of dangerous temp
-                        pass
-
-                else:
-                    motion = self.hwcontroller.read_motion_sensor()
-                    if motion: motion_count = motion_count + 1
-                    elif motion_count > 0: motion_count = motion_count - 1
-
-                    if motion_count == 7:
-                        breached = True
-                        motion_count = 0
-
-                vibration = self.hwcontroller.read_vibration_sensor()
-                if vibration and not breached: breached = True
-
-                if breached:
-                    # Start breached thread
-                    self._system_breached = True
-                    if not self.server_requests.send_system_breach_notification():
-                        _logger.info('Failed to send system breach notification.')
-                    thread = Thread(target=self._breached)
-                    thread.start()
-                    self.hwcontroller.status_led_flash_start()
-                    break
-
-            time.sleep(0.3)
+        clock = self.hwcontroller.clock
+        armed = ArmedSession(self.breach_policy)
+        sensor_events = self.hwcontroller.sensor_bus.subscribe()
+        self._sensor_events[session] = sensor_events
 
+        # Keep the last few seconds of footage so the recording starts before the trigger, and watch the
+        # camera for motion alongside the PIR sensor
+        preroll = None
+        camera_motion = None
+        if not self.no_video:
+            preroll = PrerollBuffer(self.videostream, seconds=self.preroll_seconds, max_bytes=self.preroll_max_bytes)
+            preroll.start()
+            camera_motion = CameraMotionMonitor(self.videostream, self.hwcontroller.sensor_bus)
+            camera_motion.start()
+
+        self.initial_motion_detected, pending = self.initial_motion_is_detected(session, sensor_events)
+        armed.update(pending, clock())
+        breach = armed.ready(self.initial_motion_detected, clock())
+        self.state.submit(READY, session, occupied=self.initial_motion_detected).result()
+        while self._in_state(session, ARMED) and self.state.running:
+            if breach is None:
+                # Wake up exactly when sustained motion would cross the threshold
+                timeout = self._SENSOR_WAIT_SECONDS
+                remaining = armed.time_to_breach(clock())
+                if remaining is not None:
+                    timeout = max(0.0, min(timeout, remaining))
+                breach = armed.update(sensor_events.wait(timeout), clock())
+
+            if breach is not None:
+                _logger.info('Breach score {0:.2f} from {1}'.format(breach.score, breach.contributions))
+                # The breached thread takes over the preroll, unless the system was disarmed meanwhile
+                if self.state.submit(BREACH, session, preroll=preroll).result() is not None:
+                    preroll = None
+                break
+
+        if preroll is not None:
+            preroll.stop()
+        if camera_motion is not None:
+            camera_motion.stop()
+        self.hwcontroller.sensor_bus.unsubscribe(sensor_events)
+        self._sensor_events.pop(session, None)
+        if sensor_events.missed:
+            _logger.info('Sensor events missed while armed: {0}'.format(sensor_events.missed))
         _logger.info('System disarmed')
 
-    def _breached(self):
-        """method to run when system is breached"""
+    def _breach_notification_done(self, notification):
+        """logs a breach notification that couldn't be delivered
+
+        args:
+            notification: concurrent.futures.Future
+        """
+        if notification.cancelled() or notification.exception() is not None or not notification.result():
+            _logger.info('Failed to send system breach notification.')
+
+    def _breached(self, session, preroll=None):
+        """method to run when system is breached, until the breach is acknowledged
+
+        args:
+            session: int
+            preroll: PrerollBuffer (footage from before the breach, written ahead of the live frames)
+        """
         _logger.info('System breached.')
 
-        # Set up video file and start streaming
+        # Record at the camera's own resolution and frame rate while the breach lasts
+        recorder = None
         if not self.no_video:
-            fourcc = cv2.cv.CV_FOURCC(*'XVID')  # cv2.VideoWriter_fourcc() does not exist
-            video_writer = cv2.VideoWriter("system-breach-recording-{:%b %d, %Y %-I:%M %p}.avi".format(datetime.datetime.now()),
-                                       fourcc, 20, (680, 480))
-        while self._system_breached:
-            if not self.no_video:
-                status, frame_jpeg, frame = self.videostream.read()
-                if status:
-                    video_writer.write(frame)
-
-        self.hwcontroller.status_led_flash_stop()
+            recorder = BreachRecorder(self.videostream, self.recordings, codec=self.video_codec, preroll=preroll)
+            recorder.start()
+        if preroll is not None:
+            preroll.stop()
+
+        while self._in_state(session, BREACHED) and self.state.running:
+            self.state.wait(self.state.status.version)
+
+        if recorder is not None:
+            recorder.stop()
+            _logger.info('Breach recording stats: {0}'.format(recorder.stats()))
+        self.state.submit(RESET, session)
         _logger.info('System breach ended')
 
-    def initial_motion_is_detected(self):
+    def initial_motion_is_detected(self, session, sensor_events):
         """checks if motion is detected for a time of 3 seconds before arming system
 
+        Watches the motion sensor's edges rather than sampling it, and stops early on motion or a disarm.
+
+        args:
+            session: int
+            sensor_events: SensorEventReader
+
         returns:
-            bool
+            bool, [SensorEvent] (the events read meanwhile)
         """
-        motion_detected = False
-        if not self.no_hardware:
-            for x in range(3):
-                motion_detected = self.hwcontroller.read_motion_sensor()
-                if motion_detected: break
-                time.sleep(1)
-
-        return motion_detected
+        events = []
+        if self.hwcontroller.read_motion_sensor():
+            return True, events
+
+        clock = self.hwcontroller.clock
+        deadline = clock() + self._INITIAL_MOTION_SECONDS
+        while self._in_state(session, ARMING):
+            remaining = deadline - clock()
+            if remaining <= 0: break
+            new_events = sensor_events.wait(remaining)
+            events.extend(new_events)
+            if any(event.source == 'motion' and event.value for event in new_events):
+                return True, events
+
+        return False, events
 
     def start_speed_checking_thread(self):
         """method to start checking for speeding"""
 
+        self._speed_checker_stopped.clear()
+        self.speed_checker_thread_running = True
         thread = Thread(target=self.main_speed_checking_thread)
         thread.start()
-        self.speed_checker_thread_running = True
+
+    def stop_speed_checking_thread(self):
+        """method to stop checking for speeding without waiting for the next check"""
+
+        self.speed_checker_thread_running = False
+        self._speed_checker_stopped.set()
 
     def main_speed_checking_thread(self):
         """main thread for keeping up with the speed and speed limit
 
-        This thread will run and update the speeding status every 30 seconds
+        Checks run more often the faster the vehicle goes (see SpeedCheckScheduler). The speed limit is
+        only looked up again once the vehicle leaves the road it was matched to, and an alert is sent
+        once per speeding episode (repeated after a cooldown while it lasts).
         """
         _logger.debug('Speed checking thread started.')
+        scheduler = self.speed_check_scheduler
         while self.speed_checker_thread_running:
             # Check data
             coordinates = self.get_gps_coordinates()
-            speed_limits = self.get_speed_limits(coordinates)
-            speed = self.get_current_speed()
-            for speed_limit in speed_limits:
-                if self.is_over_speed_limit(speed, speed_limit):
-                    self.server_requests.send_speed_limit_alert()
-            time.sleep(SpeedLimit._SLEEP_SECONDS)
-
-        _logger.debug('Speed checking thread stopped.')
+            if coordinates is None:
+                # No location yet (no gps fix and no geoip answer)
+                self._speed_checker_stopped.wait(scheduler.max_interval)
+                continue
+            speedometer_data = self.hwcontroller.read_speedometer_sensor()
+            speed = speedometer_data['speed']
+
+            # Only the road being driven applies, heading is meaningless while (nearly) stationary
+            heading = speedometer_data.get('heading') if speed >= SecurityThreads._MIN_HEADING_SPEED else None
+            road = scheduler.match(coordinates['latitude'], coordinates['longitude'], heading,
+                                   lambda: self.get_speed_limits(coordinates))
+            # A geofence with its own limit (i.e. a school zone or a depot) overrides the road's
+            speed_limit = self.geofences.speed_limit()
+            if speed_limit is None and road is not None:
+                speed_limit = road.speed_limit
+            speeding = speed_limit is not None and self.is_over_speed_limit(speed, speed_limit)
+            if scheduler.check(speeding):
+                scheduler.alert_sent(self.server_requests.send_speed_limit_alert_async())
+            self._speed_checker_stopped.wait(scheduler.next_interval(speed))
+
+        _logger.debug('Speed checking thread stopped: {0}'.format(scheduler.stats()))
 
 
     def get_speed_limits(self, coordinates):
         """Get the speed limit within a certain radius of particular gps coordinates
 
+        Roads are looked up in the local speed limit store. When the vehicle enters an area the store
+        has no data for, the surrounding tiles are downloaded on a background thread (if the network is
+        up), and the roads already stored are used until they arrive.
+
         returns:
-            [{name, speed_limit}]
+            [{name, speed_limit, nodes}]
         """
         latitude = coordinates['latitude']
         longitude = coordinates['longitude']
-        api = overpy.Overpass()
-
-        # fetch all ways and nodes
-        result = api.query("""
-            way(around:""" + str(SpeedLimit._RADIUS) + """,""" + str(latitude) + """,""" + str(longitude)  + """) ["maxspeed"];
-                (._;>;);
-                    out body;
-                        """)
-        results_list = []
-        for way in result.ways:
-            road = {}
-            road["name"] = way.tags.get("name", "n/a")
-            road["speed_limit"] = way.tags.get("maxspeed", "n/a")
-            nodes = []
-            for node in way.nodes:
-                nodes.append((node.lat, node.lon))
-            road["nodes"] = nodes
-            results_list.append(road)
-        return results_list
+        self.speed_limits.prefetch_async([(latitude, longitude)], SecurityThreads._SPEED_LIMIT_PREFETCH_RADIUS)
+        return self.speed_limits.nearby(latitude, longitude, SecurityThreads._SPEED_LIMIT_RADIUS)
 
     def get_current_speed(self):
         """Gets the current speed from the GPS sensor in the hardware controller
@@ -217,7 +491,7 @@ class SecurityThreads(object):
         """Gets the gps current gps coordinates from the gps sensor in the hardware controller
 
         returns:
-            {latitude, longitude}
+            {latitude, longitude, source, age} (None while no location is known)
         """
         gps_data = self.hwcontroller.read_gps_sensor()
         return gps_data
@@ -229,8 +503,8 @@ class SecurityThreads(object):
         We increment the speed limit by 10 and then make the comparison
 
         args:
-            speed: float
-            speed_limit: float
+            speed: float (mph)
+            speed_limit: float (mph)
 
         returns:
             bool
@@ -240,20 +514,16 @@ class SecurityThreads(object):
     # ------------------------------------ GETTERS AND SETTERS  ------------------------------------ #
 
     @property
-    def system_armed(self):
-        return self._system_armed
+    def status(self):
+        return self.state.status
 
-    @system_armed.setter
-    def system_armed(self, value):
-        self._system_armed = value
+    @property
+    def system_armed(self):
+        return self.state.status.armed
 
     @property
     def system_breached(self):
-        return self._system_breached
-
-    @system_breached.setter
-    def system_breached(self, value):
-        self._system_breached = value
+        return self.state.status.breached
 
         # ------------------------------------ QUITTING METHODS  ------------------------------------ #
 
@@ -261,6 +531,8 @@ class SecurityThreads(object):
         """method to peacfully close all threads and videostreeams"""
         if not self.no_video:
             self.videostream.release_stream()
-        if not self.no_hardware:
-            self.speed_checker_thread_running = False
-            self.hwcontroller.cleanup()
\ No newline at end of file
+        # Simulated drivers run threads and keep a scratch directory too
+        self.stop_speed_checking_thread()
+        self.hwcontroller.cleanup()
+        self.state.stop()
+        self.speed_limits.close()
\ No newline at end of file
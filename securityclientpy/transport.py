@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+#
+# http transport module
+#
+
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from securityclientpy import _logger
+
+
+class HttpTransport(object):
+    """pooled keep-alive http transport used for every request to the server
+
+    A single `requests.Session` keeps connections to the server open between requests, so alerts don't
+    pay for a new tcp handshake. Timeouts can be set per path, and the response body is decoded once.
+    """
+
+    _DEFAULT_TIMEOUT = (3.05, 10.0)
+    _POOL_SIZE = 4
+
+    def __init__(self, base_url, timeouts=None, default_timeout=_DEFAULT_TIMEOUT, pool_size=_POOL_SIZE):
+        """constructor method
+
+        args:
+            base_url: str
+            timeouts: {path: (connect, read)}
+            default_timeout: (float, float)
+            pool_size: int
+        """
+        self.base_url = base_url
+        self.timeouts = dict(timeouts or {})
+        self.default_timeout = default_timeout
+
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self._session = requests.Session()
+        self._session.mount('http://', self._adapter)
+        self._session.mount('https://', self._adapter)
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._failures = 0
+        self._unreadable = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+
+    def post(self, path, data):
+        """posts json data to a server path and decodes the json response
+
+        args:
+            path: str
+            data: dict
+
+        returns:
+            dict (None when the server can't be reached or the response is empty or unreadable)
+        """
+        return self.send(path, data)[1] or None
+
+    def send(self, path, data):
+        """posts json data to a server path, telling an unreachable server from an unreadable answer
+
+        Only a connection failure or a timeout counts as unreachable. Any http response, even an error
+        page that isn't json (i.e. from a proxy), means the server was reached, and sending again won't
+        get a better answer.
+
+        args:
+            path: str
+            data: dict
+
+        returns:
+            bool, dict (reached the server, decoded response or None if it couldn't be decoded)
+        """
+        url = '{0}/{1}'.format(self.base_url, path)
+        timeout = self.timeouts.get(path, self.default_timeout)
+        start = time.time()
+        try:
+            response = self._session.post(url, json=data, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as exception:
+            _logger.debug('Request to [{0}] failed [{1}]'.format(path, exception))
+            with self._lock:
+                self._failures += 1
+            return False, None
+        except requests.RequestException as exception:
+            # Not the link (i.e. an invalid url or redirect loop), retrying fails the same way
+            _logger.info('Request to [{0}] failed [{1}]'.format(path, exception))
+            with self._lock:
+                self._failures += 1
+                self._unreadable += 1
+            return True, None
+
+        latency = time.time() - start
+        with self._lock:
+            self._requests += 1
+            self._total_latency += latency
+            self._max_latency = max(self._max_latency, latency)
+
+        try:
+            return True, response.json()
+        except ValueError:
+            _logger.info('Unreadable response from [{0}] [{1} {2}]'.format(
+                path, response.status_code, response.text[:80].strip()))
+            with self._lock:
+                self._unreadable += 1
+            return True, None
+
+    def stats(self):
+        """returns request counters and connection reuse metrics
+
+        returns:
+            {requests, failures, unreadable, connections, reused_connections, mean_latency, max_latency}
+        """
+        connections = 0
+        pool_requests = 0
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None: continue
+            connections += pool.num_connections
+            pool_requests += pool.num_requests
+
+        with self._lock:
+            return {
+                'requests': self._requests,
+                'failures': self._failures,
+                'unreadable': self._unreadable,
+                'connections': connections,
+                'reused_connections': max(0, pool_requests - connections),
+                'mean_latency': self._total_latency / self._requests if self._requests else 0.0,
+                'max_latency': self._max_latency,
+            }
+
+    def close(self):
+        self._session.close()
@@ -0,0 +1,447 @@
+# -*- coding: utf-8 -*-
+#
+# gps trip log module
+#
+
+import datetime
+import math
+import os
+import struct
+import threading
+import time
+from xml.sax.saxutils import quoteattr
+
+import numpy
+
+from securityclientpy import _logger
+
+
+_METERS_PER_DEGREE = 111320.0
+_DEGREES_SCALE = 1e7
+
+
+def simplify(latitudes, longitudes, tolerance):
+    """douglas-peucker line simplification
+
+    Runs with an explicit stack instead of recursion so a trip of any length is safe, and measures every
+    point of a span against its chord in one numpy operation.
+
+    args:
+        latitudes: numpy.ndarray
+        longitudes: numpy.ndarray
+        tolerance: float (meters a dropped point may be from the simplified line)
+
+    returns:
+        numpy.ndarray (indices of the points kept, in order)
+    """
+    count = len(latitudes)
+    if count < 3 or tolerance <= 0:
+        return numpy.arange(count)
+
+    # Flat projection around the middle of the line, accurate to well under the tolerance for a trip
+    scale = math.cos(math.radians(float(numpy.mean(latitudes))))
+    x = numpy.asarray(longitudes, dtype=float) * _METERS_PER_DEGREE * scale
+    y = numpy.asarray(latitudes, dtype=float) * _METERS_PER_DEGREE
+
+    keep = numpy.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        dx = x[last] - x[first]
+        dy = y[last] - y[first]
+        length = math.hypot(dx, dy)
+        if length > 0:
+            # Cross product against the chord: distance times the chord length
+            distance = numpy.abs((x[first + 1:last] - x[first]) * dy - (y[first + 1:last] - y[first]) * dx)
+            limit = tolerance * length
+        else:
+            distance = numpy.hypot(x[first + 1:last] - x[first], y[first + 1:last] - y[first])
+            limit = tolerance
+        farthest = int(distance.argmax())
+        if distance[farthest] > limit:
+            index = first + 1 + farthest
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return numpy.flatnonzero(keep)
+
+
+def path_length(latitudes, longitudes):
+    """returns the length of a line in meters"""
+    if len(latitudes) < 2:
+        return 0.0
+    latitudes = numpy.asarray(latitudes, dtype=float)
+    scale = numpy.cos(numpy.radians((latitudes[1:] + latitudes[:-1]) / 2.0))
+    east = numpy.diff(numpy.asarray(longitudes, dtype=float)) * scale
+    north = numpy.diff(latitudes)
+    return float(numpy.sum(numpy.hypot(east, north)) * _METERS_PER_DEGREE)
+
+
+class TripLog(object):
+    """append-only binary log of where the vehicle has been
+
+    Every moving gps fix at least `min_distance` from the last logged one is packed into a 22 byte
+    record (time, position in 1e-7 degrees, speed, track, altitude) and appended to a file per UTC day,
+    so a day at 1 Hz is under 2 MB and a parked vehicle writes nothing. Records are buffered and written
+    every `flush_interval` seconds. Records in a file are in time order: a range query binary searches
+    the file on disk and reads only the matching bytes straight into a numpy array, so memory grows with
+    the range asked for, not with the size of the log. Files older than `retention_days` are deleted.
+    While the files can't be written the buffer keeps the newest `max_buffer_records` records and drops
+    the oldest. A gps clock that steps back by more than `max_step_back` (i.e. after a bad fix stamped
+    far in the future) discards what was logged after the time it stepped back to, so logging carries
+    on in time order instead of skipping every fix until the bad time comes round.
+
+    Trips are runs of records without a gap longer than `trip_gap`, and are served downsampled with
+    douglas-peucker simplification as GPX or GeoJSON.
+    """
+
+    _RECORD = struct.Struct('<diiHHh')
+    _DTYPE = numpy.dtype([
+        ('time', '<f8'), ('latitude', '<i4'), ('longitude', '<i4'), ('speed', '<u2'), ('track', '<u2'),
+        ('altitude', '<i2'),
+    ])
+    _FILENAME_FORMAT = 'track-%Y%m%d.bin'
+    _SPEED_SCALE = 100.0
+    _TRACK_SCALE = 100.0
+    _MIN_DISTANCE = 10.0
+    _STATIONARY_SPEED = 0.5
+    _FLUSH_INTERVAL = 10.0
+    _TRIP_GAP = 300.0
+    _RETENTION_DAYS = 30
+    _MAX_BUFFER_RECORDS = 3600
+    _MAX_STEP_BACK = 3600.0
+    _SECONDS_PER_DAY = 86400
+
+    def __init__(self, root, gps_reader=None, min_distance=_MIN_DISTANCE, flush_interval=_FLUSH_INTERVAL,
+                 trip_gap=_TRIP_GAP, retention_days=_RETENTION_DAYS, max_buffer_records=_MAX_BUFFER_RECORDS,
+                 max_step_back=_MAX_STEP_BACK):
+        """constructor method
+
+        args:
+            root: str
+            gps_reader: GpsReader (fixes are fed with `add_fix` when None)
+            min_distance: float (meters moved before another fix is logged)
+            flush_interval: float (seconds records are buffered for)
+            trip_gap: float (seconds without a logged fix that end a trip)
+            retention_days: int
+            max_buffer_records: int (records kept while the files can't be written)
+            max_step_back: float (seconds the gps clock may go back before the later records are discarded)
+        """
+        self.root = root
+        self.min_distance = min_distance
+        self.flush_interval = flush_interval
+        self.trip_gap = trip_gap
+        self.retention_days = retention_days
+        self.max_buffer_records = max_buffer_records
+        self.max_step_back = max_step_back
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._buffer_day = None
+        self._buffer_started = None
+        self._last = None
+        self.records = 0
+        self.skipped = 0
+        self.dropped = 0
+
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+        self._load_last()
+
+        if gps_reader is not None:
+            gps_reader.add_listener(self.add_fix)
+
+    def _load_last(self):
+        """picks up the newest logged record so appends stay in time order across restarts"""
+        days = self.days()
+        if not days:
+            return
+        path = self.day_path(days[-1])
+        size = os.path.getsize(path)
+        size -= size % self._RECORD.size
+        if size:
+            with open(path, 'rb') as fp:
+                fp.seek(size - self._RECORD.size)
+                self._last = self._RECORD.unpack(fp.read(self._RECORD.size))
+
+    def day_path(self, day):
+        """returns the file for a UTC day
+
+        args:
+            day: int (days since the epoch)
+
+        returns:
+            str
+        """
+        name = time.strftime(self._FILENAME_FORMAT, time.gmtime(day * self._SECONDS_PER_DAY))
+        return os.path.join(self.root, name)
+
+    def days(self):
+        """returns the days with a log file, oldest first
+
+        returns:
+            [int]
+        """
+        days = []
+        for name in os.listdir(self.root):
+            try:
+                date = datetime.datetime.strptime(name, self._FILENAME_FORMAT)
+            except ValueError:
+                continue
+            days.append((date - datetime.datetime(1970, 1, 1)).days)
+        return sorted(days)
+
+    def add_fix(self, fix):
+        """logs a gps fix unless the vehicle hasn't moved since the last one
+
+        args:
+            fix: GpsFix
+
+        returns:
+            bool (logged)
+        """
+        record = (
+            fix.received,
+            int(round(fix.latitude * _DEGREES_SCALE)),
+            int(round(fix.longitude * _DEGREES_SCALE)),
+            int(min(max(fix.speed or 0.0, 0.0) * self._SPEED_SCALE, 0xffff)),
+            int(round((fix.track or 0.0) % 360.0 * self._TRACK_SCALE)) % 36000,
+            int(min(max(fix.altitude or 0.0, -0x8000), 0x7fff)),
+        )
+        with self._lock:
+            last = self._last
+            if last is not None and record[0] < last[0] - self.max_step_back:
+                _logger.info('GPS clock stepped back {0:.0f} secs, discarding the trip log after it'.format(
+                    last[0] - record[0]))
+                self._flush()
+                self._discard_after(record[0])
+                last = None
+            if last is not None:
+                # Position jitter while parked isn't movement
+                if record[0] <= last[0] or (fix.speed is not None and fix.speed < self._STATIONARY_SPEED):
+                    self.skipped += 1
+                    return False
+                north = (record[1] - last[1]) / _DEGREES_SCALE * _METERS_PER_DEGREE
+                east = (record[2] - last[2]) / _DEGREES_SCALE * _METERS_PER_DEGREE * math.cos(
+                    math.radians(fix.latitude))
+                if math.hypot(north, east) < self.min_distance:
+                    self.skipped += 1
+                    return False
+
+            day = int(record[0] // self._SECONDS_PER_DAY)
+            if self._buffer and day != self._buffer_day:
+                self._flush()
+            if not self._buffer:
+                self._buffer_started = record[0]
+            self._buffer_day = day
+            self._buffer.append(self._RECORD.pack(*record))
+            self._last = record
+            self.records += 1
+            if record[0] - self._buffer_started >= self.flush_interval:
+                self._flush()
+        return True
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        """appends buffered records to their day's file"""
+        if not self._buffer:
+            return
+        new_day = not os.path.exists(self.day_path(self._buffer_day))
+        try:
+            with open(self.day_path(self._buffer_day), 'ab') as fp:
+                fp.write(b''.join(self._buffer))
+        except (IOError, OSError) as exception:
+            _logger.info('Failed to write trip log [{0}]'.format(exception))
+            excess = len(self._buffer) - self.max_buffer_records
+            if excess > 0:
+                del self._buffer[:excess]
+                self.dropped += excess
+                _logger.warning('Trip log buffer full, dropped the oldest {0} records'.format(excess))
+            return
+        self._buffer = []
+        if new_day:
+            self._expire(self._buffer_day)
+
+    def _discard_after(self, timestamp):
+        """drops buffered and logged records from after a time, and forgets the last logged record
+
+        args:
+            timestamp: float
+        """
+        buffered = len(self._buffer)
+        self._buffer = [packed for packed in self._buffer if self._RECORD.unpack(packed)[0] <= timestamp]
+        discarded = buffered - len(self._buffer)
+
+        today = int(timestamp // self._SECONDS_PER_DAY)
+        for day in self.days():
+            if day < today:
+                continue
+            path = self.day_path(day)
+            try:
+                count = os.path.getsize(path) // self._RECORD.size
+                if day > today:
+                    os.remove(path)
+                    discarded += count
+                    continue
+                with open(path, 'r+b') as fp:
+                    kept = self._search(fp, count, timestamp, after=True)
+                    fp.truncate(kept * self._RECORD.size)
+                discarded += count - kept
+            except (IOError, OSError) as exception:
+                _logger.info('Failed to discard trip log records [{0}]'.format(exception))
+        self.dropped += discarded
+        self._last = None
+
+    def _expire(self, today):
+        """deletes day files past the retention period"""
+        for day in self.days():
+            if day > today - self.retention_days:
+                break
+            try:
+                os.remove(self.day_path(day))
+            except OSError:
+                pass
+
+    def close(self):
+        self.flush()
+
+    def _search(self, fp, count, timestamp, after=False):
+        """returns the index of the first record in a file at (or after, with `after`) a time"""
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            fp.seek(middle * self._RECORD.size)
+            record_time = struct.unpack('<d', fp.read(8))[0]
+            if record_time < timestamp or (after and record_time == timestamp):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def points(self, start, end):
+        """returns the logged records between two times
+
+        args:
+            start: float
+            end: float
+
+        returns:
+            numpy.ndarray (structured: time, latitude, longitude in degrees, speed m/s, track, altitude)
+        """
+        self.flush()
+        chunks = []
+        first_day = int(start // self._SECONDS_PER_DAY)
+        last_day = int(end // self._SECONDS_PER_DAY)
+        for day in self.days():
+            if day < first_day or day > last_day:
+                continue
+            path = self.day_path(day)
+            with open(path, 'rb') as fp:
+                count = os.path.getsize(path) // self._RECORD.size
+                begin = self._search(fp, count, start)
+                stop = self._search(fp, count, end, after=True)
+                if stop > begin:
+                    fp.seek(begin * self._RECORD.size)
+                    chunks.append(numpy.frombuffer(fp.read((stop - begin) * self._RECORD.size), dtype=self._DTYPE))
+
+        records = numpy.concatenate(chunks) if chunks else numpy.zeros(0, dtype=self._DTYPE)
+        points = numpy.zeros(len(records), dtype=[
+            ('time', 'f8'), ('latitude', 'f8'), ('longitude', 'f8'), ('speed', 'f4'), ('track', 'f4'),
+            ('altitude', 'f4'),
+        ])
+        points['time'] = records['time']
+        points['latitude'] = records['latitude'] / _DEGREES_SCALE
+        points['longitude'] = records['longitude'] / _DEGREES_SCALE
+        points['speed'] = records['speed'] / self._SPEED_SCALE
+        points['track'] = records['track'] / self._TRACK_SCALE
+        points['altitude'] = records['altitude']
+        return points
+
+    def trips(self, start, end, tolerance=0.0):
+        """splits the log between two times into trips
+
+        args:
+            start: float
+            end: float
+            tolerance: float (meters, simplification tolerance, 0 keeps every point)
+
+        returns:
+            [{start, end, distance (meters), points (numpy.ndarray, simplified)}]
+        """
+        points = self.points(start, end)
+        if not len(points):
+            return []
+        breaks = numpy.flatnonzero(numpy.diff(points['time']) > self.trip_gap) + 1
+        trips = []
+        for trip in numpy.split(points, breaks):
+            kept = simplify(trip['latitude'], trip['longitude'], tolerance)
+            trips.append({
+                'start': float(trip['time'][0]),
+                'end': float(trip['time'][-1]),
+                'distance': path_length(trip['latitude'], trip['longitude']),
+                'points': trip[kept],
+            })
+        return trips
+
+    @staticmethod
+    def to_geojson(trips):
+        """returns trips as a GeoJSON FeatureCollection of LineStrings
+
+        args:
+            trips: [dict] (from `trips`)
+
+        returns:
+            dict
+        """
+        features = []
+        for trip in trips:
+            points = trip['points']
+            features.append({
+                'type': 'Feature',
+                'geometry': {
+                    'type': 'LineString',
+                    'coordinates': [[float(point['longitude']), float(point['latitude'])] for point in points],
+                },
+                'properties': {
+                    'start': trip['start'],
+                    'end': trip['end'],
+                    'distance': trip['distance'],
+                    'times': [float(t) for t in points['time']],
+                    'speeds': [round(float(s), 2) for s in points['speed']],
+                },
+            })
+        return {'type': 'FeatureCollection', 'features': features}
+
+    @staticmethod
+    def to_gpx(trips):
+        """returns trips as a GPX 1.1 document with a track per trip
+
+        args:
+            trips: [dict] (from `trips`)
+
+        returns:
+            str
+        """
+        lines = [
+            '<?xml version="1.0" encoding="UTF-8"?>',
+            '<gpx version="1.1" creator="securityclientpy" xmlns="http://www.topografix.com/GPX/1/1">',
+        ]
+        for trip in trips:
+            lines.append('<trk><name>{0}</name><trkseg>'.format(_isoformat(trip['start'])))
+            for point in trip['points']:
+                lines.append('<trkpt lat={0} lon={1}><ele>{2:.0f}</ele><time>{3}</time></trkpt>'.format(
+                    quoteattr('{0:.7f}'.format(point['latitude'])), quoteattr('{0:.7f}'.format(point['longitude'])),
+                    float(point['altitude']), _isoformat(point['time'])))
+            lines.append('</trkseg></trk>')
+        lines.append('</gpx>')
+        return '\n'.join(lines)
+
+
+def _isoformat(timestamp):
+    """returns a UTC ISO 8601 time"""
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(float(timestamp)))
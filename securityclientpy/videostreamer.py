@@ -3,43 +3,332 @@
 # module for retrieving camera stream bytes to send from server to clients
 #
 
+import threading
+import time
+
 import cv2
+import numpy
 
 from securityclientpy import _logger
 
+# VideoCapture property ids, the same in opencv 2 (cv2.cv.CV_CAP_PROP_*) and opencv 3+ (cv2.CAP_PROP_*)
+CAP_PROP_FRAME_WIDTH = 3
+CAP_PROP_FRAME_HEIGHT = 4
+CAP_PROP_FPS = 5
+
+
+class SyntheticFrameSource(object):
+    """stand-in for cv2.VideoCapture producing a moving test pattern at a fixed frame rate
+
+    `read` blocks until the next frame is due like a real camera does, and fills the image passed in
+    when its shape matches, so it exercises the same zero-copy path as a real capture.
+    """
+
+    _SQUARE_SIZE = 40
+
+    def __init__(self, width=640, height=480, fps=30.0, realtime=True):
+        """constructor method
+
+        args:
+            width: int
+            height: int
+            fps: float
+            realtime: bool (pace frames at fps, otherwise return them as fast as possible)
+        """
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.realtime = realtime
+        self.frames_read = 0
+        self._opened = True
+        self._next_frame_time = None
+
+    def read(self, image=None):
+        """returns the next frame of the test pattern
+
+        args:
+            image: numpy.ndarray (filled in place when given with the right shape)
+
+        returns:
+            bool, numpy.ndarray
+        """
+        if not self._opened:
+            return False, None
+
+        if self.realtime:
+            now = time.time()
+            if self._next_frame_time is None:
+                self._next_frame_time = now
+            if self._next_frame_time > now:
+                time.sleep(self._next_frame_time - now)
+            self._next_frame_time += 1.0 / self.fps
+
+        shape = (self.height, self.width, 3)
+        if image is None or image.shape != shape or image.dtype != numpy.uint8:
+            image = numpy.empty(shape, dtype=numpy.uint8)
+
+        # Gray background with a white square bouncing across it
+        image.fill(64)
+        span_x = max(1, self.width - self._SQUARE_SIZE)
+        span_y = max(1, self.height - self._SQUARE_SIZE)
+        x = (self.frames_read * 7) % (2 * span_x)
+        y = (self.frames_read * 5) % (2 * span_y)
+        x = x if x < span_x else 2 * span_x - x
+        y = y if y < span_y else 2 * span_y - y
+        image[y:y + self._SQUARE_SIZE, x:x + self._SQUARE_SIZE] = 255
+        self.frames_read += 1
+        return True, image
+
+    def get(self, prop):
+        return {CAP_PROP_FRAME_WIDTH: self.width, CAP_PROP_FRAME_HEIGHT: self.height, CAP_PROP_FPS: self.fps}.get(prop, 0)
+
+    def isOpened(self):
+        return self._opened
+
+    def release(self):
+        self._opened = False
+
+
+class FrameReader(object):
+    """single consumer cursor over the frame grabber's ring"""
+
+    def __init__(self, grabber):
+        """constructor method"""
+        self._grabber = grabber
+        self._cursor = grabber.sequence
+        self.dropped = 0
+
+    def wait(self, timeout=None):
+        """blocks until frames newer than the last read are available
+
+        The frames are views into the grabber's ring (not copies), check `FrameGrabber.valid` before
+        relying on a frame that was held while other frames arrived.
+
+        args:
+            timeout: float
+
+        returns:
+            [(sequence, timestamp, numpy.ndarray)]
+        """
+        self._grabber.wait_for(self._cursor, timeout)
+        frames, self._cursor, dropped = self._grabber.frames_since(self._cursor)
+        self.dropped += dropped
+        return frames
+
+
+class FrameGrabber(object):
+    """capture thread filling a preallocated ring of reusable frame buffers
+
+    The newest frame is read into the ring slot after the current one, so readers can hold on to the
+    latest frame (and up to `ring_size - 2` frames before it) without copying and without blocking the
+    camera. Each slot records the sequence number of the frame it holds; a slot that is being written or
+    has been overwritten no longer matches, which is how readers account for dropped frames.
+    """
+
+    _RING_SIZE = 8
+
+    def __init__(self, source, ring_size=_RING_SIZE):
+        """constructor method
+
+        args:
+            source: cv2.VideoCapture or compatible (SyntheticFrameSource)
+            ring_size: int
+        """
+        self.source = source
+        self.ring_size = ring_size
+        self._frames = None
+        self._sequences = [-1] * ring_size
+        self._timestamps = [0.0] * ring_size
+        self._sequence = -1
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+        self.frames_captured = 0
+        self.read_failures = 0
+
+    def start(self):
+        if self._running: return
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_thread)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _capture_thread(self):
+        """reads frames from the source into the ring until stopped"""
+        while self._running:
+            sequence = self._sequence + 1
+            slot = sequence % self.ring_size
+            buffer = self._frames[slot] if self._frames is not None else None
+
+            # Invalidate the slot while the camera writes into it
+            self._sequences[slot] = -1
+            success, frame = self.source.read(buffer) if buffer is not None else self.source.read()
+            if not success or frame is None:
+                self.read_failures += 1
+                time.sleep(0.01)
+                continue
+
+            if self._frames is None or frame.shape != self._frames[0].shape:
+                self._allocate(frame)
+                buffer = self._frames[slot]
+            if frame is not buffer:
+                numpy.copyto(buffer, frame)
+
+            with self._condition:
+                self._timestamps[slot] = time.time()
+                self._sequences[slot] = sequence
+                self._sequence = sequence
+                self.frames_captured += 1
+                self._condition.notify_all()
+
+        _logger.debug('Frame grabber stopped')
+
+    def _allocate(self, frame):
+        """(re)allocates the ring buffers to match the camera's frame shape"""
+        _logger.debug('Allocating frame ring of {0} x {1}'.format(self.ring_size, frame.shape))
+        self._frames = [numpy.empty_like(frame) for i in range(self.ring_size)]
+        self._sequences = [-1] * self.ring_size
+
+    def latest(self):
+        """returns the newest frame without copying it
+
+        returns:
+            int, float, numpy.ndarray (sequence, timestamp, frame) or (-1, 0.0, None)
+        """
+        with self._condition:
+            sequence = self._sequence
+            if sequence < 0:
+                return -1, 0.0, None
+            slot = sequence % self.ring_size
+            return sequence, self._timestamps[slot], self._frames[slot]
+
+    def wait_for(self, sequence, timeout=None):
+        """blocks until a frame newer than `sequence` is captured
+
+        args:
+            sequence: int
+            timeout: float
+
+        returns:
+            bool
+        """
+        with self._condition:
+            if self._sequence <= sequence and self._running:
+                self._condition.wait(timeout)
+            return self._sequence > sequence
+
+    def frames_since(self, cursor):
+        """returns the frames captured after the cursor that are still in the ring
+
+        args:
+            cursor: int
+
+        returns:
+            [(sequence, timestamp, numpy.ndarray)], int, int (frames, next cursor, dropped frames)
+        """
+        frames = []
+        dropped = 0
+        with self._condition:
+            latest = self._sequence
+            first = max(cursor + 1, latest - self.ring_size + 1)
+            dropped = first - cursor - 1
+            for sequence in range(first, latest + 1):
+                slot = sequence % self.ring_size
+                if self._sequences[slot] != sequence:
+                    dropped += 1
+                    continue
+                frames.append((sequence, self._timestamps[slot], self._frames[slot]))
+        return frames, max(cursor, latest), dropped
+
+    def valid(self, sequence):
+        """checks that a frame handed out earlier hasn't been overwritten yet
+
+        args:
+            sequence: int
+
+        returns:
+            bool
+        """
+        return sequence >= 0 and self._sequences[sequence % self.ring_size] == sequence
+
+    def subscribe(self):
+        return FrameReader(self)
+
+    @property
+    def sequence(self):
+        return self._sequence
+
+    @property
+    def running(self):
+        return self._running
+
 
 class VideoStreamer(object):
     """manages and controls camera stream data"""
 
     _STREAM_MIN_AREA = 500
 
-    def __init__(self, camera, no_video):
+    def __init__(self, camera, no_video, source=None):
         """set the video object from the camera number
 
         Default camera # is 0. This simply enables usb camera to be used by openCV
+
+        args:
+            camera: int
+            no_video: bool
+            source: cv2.VideoCapture compatible frame source to use instead of the camera
         """
         self._camera = camera
         self._no_video = no_video
         self._stream = None
+        self.grabber = None
+
+        if not self._no_video:
+            self._stream = source if source is not None else cv2.VideoCapture(self._camera)
+            self.grabber = FrameGrabber(self._stream)
 
+    def start(self):
+        """starts the capture thread so consumers share the latest frames"""
         if not self._no_video:
-            self._stream = cv2.VideoCapture(self._camera)
+            self.grabber.start()
 
     def release_stream(self):
         if not self._no_video:
+            self.grabber.stop()
             self._stream.release()
 
     def get_frame(self):
-        """reads a frame from the camera stream and converts it to bytes to send
+        """returns the latest frame from the capture thread, or reads one directly if it isn't running
 
         returns:
-            bytes
+            bool, numpy.ndarray
         """
         if not self._no_video:
+            if self.grabber.running:
+                sequence, timestamp, image = self.grabber.latest()
+                return image is not None, image
             success, image = self._stream.read()
             return success, image
         return None, None
 
+    def subscribe(self):
+        """returns a reader over every frame the capture thread produces
+
+        returns:
+            FrameReader
+        """
+        if self._no_video:
+            return None
+        return self.grabber.subscribe()
+
     @property
     def camera(self):
         return self._camera
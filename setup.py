@@ -15,8 +15,10 @@ setup(
     install_requires=[
         'xmltodict',
         'requests',
+        'futures; python_version < "3.0"',
         'PyYAML',
         'imutils',
+        'numpy',
         'flask',
         'configparser',
     ],
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+#
+# shared helpers for tests running the client's background threads
+#
+
+import time
+
+
+def wait_until(condition, timeout=2.0):
+    """polls a condition until it holds or the timeout runs out
+
+    args:
+        condition: callable returning a bool
+        timeout: float
+
+    returns:
+        bool (the condition's last value)
+    """
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
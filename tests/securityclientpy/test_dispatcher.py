@@ -0,0 +1,65 @@
+import threading
+import unittest
+
+from securityclientpy.dispatcher import AlertDispatcher, DispatchQueueFull
+
+
+class TestAlertDispatcher(unittest.TestCase):
+    """set of test for dispatcher.AlertDispatcher"""
+
+    def setUp(self):
+        self.dispatcher = AlertDispatcher(workers=1, max_queue_size=3)
+        self.release = threading.Event()
+        self.order = []
+
+    def tearDown(self):
+        self.release.set()
+        self.dispatcher.stop()
+
+    def _block_worker(self):
+        started = threading.Event()
+
+        def blocker():
+            started.set()
+            self.release.wait()
+
+        self.dispatcher.start()
+        future = self.dispatcher.submit(AlertDispatcher.PRIORITY_TELEMETRY, blocker)
+        started.wait()
+        return future
+
+    def test_future_result(self):
+        self.dispatcher.start()
+        future = self.dispatcher.submit(AlertDispatcher.PRIORITY_ALERT, lambda: 42)
+        self.assertEqual(future.result(timeout=1), 42)
+        self.assertEqual(self.dispatcher.stats()['dispatched'], 1)
+
+    def test_panic_jumps_ahead(self):
+        self._block_worker()
+        futures = [
+            self.dispatcher.submit(AlertDispatcher.PRIORITY_TELEMETRY, self.order.append, 'telemetry'),
+            self.dispatcher.submit(AlertDispatcher.PRIORITY_BREACH, self.order.append, 'breach'),
+            self.dispatcher.submit(AlertDispatcher.PRIORITY_PANIC, self.order.append, 'panic'),
+        ]
+        self.assertEqual(self.dispatcher.stats()['queue_depth'], 3)
+        self.release.set()
+        for future in futures:
+            future.result(timeout=1)
+        self.assertEqual(self.order, ['panic', 'breach', 'telemetry'])
+
+    def test_full_queue_evicts_lowest_priority(self):
+        self._block_worker()
+        telemetry = [self.dispatcher.submit(AlertDispatcher.PRIORITY_TELEMETRY, self.order.append, i) for i in range(3)]
+        panic = self.dispatcher.submit(AlertDispatcher.PRIORITY_PANIC, self.order.append, 'panic')
+        rejected = self.dispatcher.submit(AlertDispatcher.PRIORITY_TELEMETRY, self.order.append, 'late')
+
+        self.assertRaises(DispatchQueueFull, telemetry[2].result, 1)
+        self.assertRaises(DispatchQueueFull, rejected.result, 1)
+        self.release.set()
+        panic.result(timeout=1)
+        self.assertEqual(self.dispatcher.stats()['dropped'], 2)
+
+    def test_exception_is_set_on_future(self):
+        self.dispatcher.start()
+        future = self.dispatcher.submit(AlertDispatcher.PRIORITY_ALERT, lambda: 1 / 0)
+        self.assertRaises(ZeroDivisionError, future.result, 1)
@@ -0,0 +1,146 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from securityclientpy.drivers import Drivers, RecordedDrivers, SimulatedDrivers, load_patterns, parse_patterns, \
+    DEFAULT_PATTERNS, QUIET_PATTERNS
+from securityclientpy.eventlog import LoggedEvent
+from securityclientpy.gpsreader import GpsReader
+from securityclientpy.sensorbus import SensorEventBus
+from securityclientpy.thermal import TemperatureSampler, parse_w1_slave
+from tests.helpers import wait_until
+
+_PINS = {'panic_button': 6, 'vibration': 27, 'motion': 22, 'led': 17}
+
+
+class TestParsePatterns(unittest.TestCase):
+    """set of test for drivers.parse_patterns"""
+
+    def test_defaults(self):
+        patterns = parse_patterns({'motion': {'pattern': 'periodic', 'period': 2.0, 'duration': 0.5}})
+        self.assertEqual(patterns['motion'], {'pattern': 'periodic', 'period': 2.0, 'duration': 0.5,
+                                              'rate': 1.0})
+        self.assertEqual(patterns['gps'], DEFAULT_PATTERNS['gps'])
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, parse_patterns, {'motion': {'pattern': 'sine'}})
+        self.assertRaises(ValueError, parse_patterns, {'door': {'pattern': 'off'}})
+        self.assertRaises(ValueError, parse_patterns, {'gps': 'route'})
+
+    def test_load_patterns(self):
+        self.assertEqual(set(spec['pattern'] for spec in load_patterns('quiet').values()), set(['off']))
+        self.assertEqual(load_patterns('busy'), parse_patterns(DEFAULT_PATTERNS))
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'patterns.yaml')
+            with open(path, 'w') as fp:
+                fp.write('vibration: {pattern: periodic, period: 10, duration: 0.01}\n')
+            self.assertEqual(load_patterns(path)['vibration']['period'], 10)
+            with open(path, 'w') as fp:
+                fp.write('vibration: [off\n')
+            self.assertRaises(ValueError, load_patterns, path)
+        finally:
+            shutil.rmtree(directory)
+
+
+class TestDrivers(unittest.TestCase):
+    """set of test for drivers.Drivers"""
+
+    def test_abstract(self):
+        # A backend has to provide the gps session and camera
+        self.assertRaises(TypeError, Drivers, None, '/sys/bus/w1/devices/')
+
+
+class TestSimulatedDrivers(unittest.TestCase):
+    """set of test for drivers.SimulatedDrivers"""
+
+    def _start(self, patterns, speed=1.0):
+        patterns = dict(QUIET_PATTERNS, **patterns)
+        drivers = SimulatedDrivers(patterns, speed=speed, seed=1)
+        self.addCleanup(drivers.stop)
+        bus = SensorEventBus(drivers.gpio, {'motion': _PINS['motion'], 'vibration': _PINS['vibration']})
+        bus.start()
+        reader = bus.subscribe()
+        drivers.start(_PINS)
+        return drivers, reader
+
+    def test_periodic_pulses(self):
+        drivers, reader = self._start({'motion': {'pattern': 'periodic', 'period': 1.0, 'duration': 0.5}}, speed=20)
+        events = []
+        self.assertTrue(wait_until(lambda: len(events.extend(reader.poll()) or events) >= 6))
+        self.assertEqual([event.value for event in events[:6]], [True, False] * 3)
+        self.assertTrue(all(event.source == 'motion' for event in events))
+        # 1 s apart at 20x
+        self.assertAlmostEqual(events[2].timestamp - events[0].timestamp, 0.05, delta=0.03)
+
+    def test_poisson_pulses(self):
+        drivers, reader = self._start({'vibration': {'pattern': 'poisson', 'rate': 600.0, 'duration': [0.01, 0.02]}})
+        events = []
+        self.assertTrue(wait_until(lambda: len(events.extend(reader.poll()) or events) >= 10))
+        self.assertEqual(set(event.source for event in events), set(['vibration']))
+
+    def test_gps_route(self):
+        drivers, reader = self._start({'gps': {'pattern': 'route', 'rate': 1.0, 'speed': 20.0}}, speed=50)
+        gps_reader = GpsReader(drivers.connect_gps)
+        gps_reader.start()
+        self.addCleanup(gps_reader.stop)
+        self.assertTrue(wait_until(lambda: gps_reader.fixes >= 5))
+        fix = gps_reader.fix
+        self.assertEqual(fix.mode, 3)
+        self.assertEqual(fix.speed, 20.0)
+        self.assertNotEqual(fix.latitude, DEFAULT_PATTERNS['gps']['origin'][0])
+
+    def test_temperature(self):
+        drivers, reader = self._start({'temperature': {'pattern': 'sine', 'mean': 30.0, 'amplitude': 0.0,
+                                                       'noise': 0.0, 'interval': 0.01}})
+        device = TemperatureSampler.find_device(drivers.thermal_base_dir)
+        self.assertEqual(device, drivers.w1_sensor)
+        self.assertTrue(wait_until(lambda: TemperatureSampler(device).sample().celcius == 30.0))
+
+    def test_stop_removes_root(self):
+        drivers = SimulatedDrivers(QUIET_PATTERNS)
+        drivers.start(_PINS)
+        drivers.stop()
+        self.assertFalse(os.path.exists(drivers.root))
+
+
+class TestRecordedDrivers(unittest.TestCase):
+    """set of test for drivers.RecordedDrivers"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_replays_into_fakes(self):
+        events = [
+            LoggedEvent(100.0, 'motion', True),
+            LoggedEvent(100.2, 'gps', {'mode': 3, 'lat': 33.5, 'lon': -84.25, 'speed': 3.0, 'track': 90.0}),
+            LoggedEvent(100.3, 'temperature', 41.0),
+            LoggedEvent(100.5, 'motion', False),
+            LoggedEvent(100.6, 'camera', True),
+        ]
+        drivers = RecordedDrivers(events, root=self.directory, speed=5.0)
+        bus = SensorEventBus(drivers.gpio, {'motion': _PINS['motion'], 'vibration': _PINS['vibration']})
+        bus.start()
+        reader = bus.subscribe()
+        start = time.time()
+        drivers.start(_PINS)
+        self.addCleanup(drivers.stop)
+        self.assertTrue(drivers.finished.wait(2.0))
+        # Paced at 5x the recording
+        self.assertGreaterEqual(time.time() - start, 0.1)
+
+        self.assertEqual([(event.source, event.value) for event in reader.poll()],
+                         [('motion', True), ('motion', False)])
+        report = drivers.gps_session.next()
+        self.assertEqual((report['lat'], report['lon'], report['speed']), (33.5, -84.25, 3.0))
+        with open(drivers.w1_sensor) as fp:
+            self.assertEqual(parse_w1_slave(fp.readlines()), 41.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
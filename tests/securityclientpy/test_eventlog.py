@@ -0,0 +1,222 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from securityclientpy.eventlog import EventRecorder, EventReplayer, LoggedEvent, VirtualClock, read_events, \
+    read_segment
+from securityclientpy.drivers import SimulatedDrivers, QUIET_PATTERNS
+from securityclientpy.hwcontroller import HardwareController
+from securityclientpy.statemachine import SecurityStatus, ARMING, ARMED, BREACHED, ACKNOWLEDGED, DISARMED
+
+
+def _controller(test, clock):
+    """a hardware controller on simulated drivers with every signal off, timed by a virtual clock"""
+    controller = HardwareController(False, None, drivers=SimulatedDrivers(QUIET_PATTERNS), clock=clock)
+    test.addCleanup(controller.cleanup)
+    return controller
+
+
+def _status(state, occupied=False):
+    return SecurityStatus(state, 1, 1, 0.0, occupied)
+
+
+class TestEventRecorder(unittest.TestCase):
+    """set of test for eventlog.EventRecorder"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.root = os.path.join(self.directory, 'events')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        recorder = EventRecorder(self.root)
+        recorder.record('motion', True, 100.0)
+        recorder.record('motion', False, 100.5)
+        recorder.record('temperature', 31.25, 101.0)
+        recorder.record('state', ARMED, 102.0)
+        recorder.record('gps', {'lat': 33.5, 'lon': -84.25, 'mode': 3}, 103.0)
+        recorder.record('camera', None, 104.0)
+        recorder.close()
+        self.assertEqual(list(read_events(self.root)), [
+            LoggedEvent(100.0, 'motion', True),
+            LoggedEvent(100.5, 'motion', False),
+            LoggedEvent(101.0, 'temperature', 31.25),
+            LoggedEvent(102.0, 'state', ARMED),
+            LoggedEvent(103.0, 'gps', {'lat': 33.5, 'lon': -84.25, 'mode': 3}),
+            LoggedEvent(104.0, 'camera', None),
+        ])
+        self.assertEqual([event.timestamp for event in read_events(self.root, 100.5, 102.0)], [100.5, 101.0, 102.0])
+
+    def test_compact_records(self):
+        recorder = EventRecorder(self.root)
+        for i in range(1000):
+            recorder.record('motion', i % 2 == 0, 100.0 + i)
+        recorder.close()
+        # Magic, one source definition, then 10 bytes an edge
+        self.assertEqual(os.path.getsize(recorder.segments()[0]), 5 + 10 + len('motion') + 1 + 1000 * 10)
+
+    def test_rolling_bound(self):
+        recorder = EventRecorder(self.root, segment_bytes=1024, max_bytes=4096)
+        for i in range(5000):
+            recorder.record('vibration', True, float(i))
+        recorder.close()
+        segments = recorder.segments()
+        self.assertLessEqual(sum(os.path.getsize(segment) for segment in segments), 4096 + 64)
+        self.assertGreater(recorder.dropped_segments, 0)
+        # The newest history is kept, and each segment reads on its own
+        events = list(read_events(self.root))
+        self.assertEqual(events[-1].timestamp, 4999.0)
+        self.assertEqual(events[0].source, 'vibration')
+        timestamps = [event.timestamp for event in events]
+        self.assertEqual(timestamps, sorted(timestamps))
+
+    def test_partial_record_and_reopen(self):
+        recorder = EventRecorder(self.root)
+        recorder.record('motion', True, 1.0)
+        recorder.record('temperature', 20.0, 2.0)
+        recorder.close()
+        segment = recorder.segments()[0]
+        with open(segment, 'r+b') as fp:
+            fp.truncate(os.path.getsize(segment) - 3)
+        self.assertEqual(read_segment(segment), [LoggedEvent(1.0, 'motion', True)])
+
+        reopened = EventRecorder(self.root)
+        reopened.record('motion', False, 3.0)
+        reopened.close()
+        self.assertEqual(len(reopened.segments()), 2)
+        self.assertEqual(list(read_events(self.root))[-1], LoggedEvent(3.0, 'motion', False))
+
+    @unittest.skipUnless(os.path.exists('/dev/full'), 'needs /dev/full')
+    def test_write_errors_dropped(self):
+        recorder = EventRecorder(self.root, flush_records=1)
+        recorder.record('motion', True, 1.0)
+        # The disk fills up under the open segment
+        recorder._fp.close()
+        recorder._fp = open('/dev/full', 'wb')
+        recorder.record('motion', False, 2.0)
+        recorder.record('motion', True, 3.0)
+        recorder.close()
+        self.assertEqual(recorder.stats()['write_errors'], 1)
+        # The next record starts a segment of its own that reads back
+        self.assertEqual(list(read_events(self.root)), [LoggedEvent(1.0, 'motion', True),
+                                                         LoggedEvent(3.0, 'motion', True)])
+
+    def test_many_sources(self):
+        recorder = EventRecorder(self.root)
+        for i in range(300):
+            recorder.record('source{0}'.format(i), i, float(i))
+        recorder.close()
+        self.assertEqual(len(recorder.segments()), 2)
+        self.assertEqual([event.source for event in read_events(self.root)][-1], 'source299')
+
+    def test_attach_records_controller(self):
+        clock = VirtualClock(50.0)
+        controller = _controller(self, clock)
+        recorder = EventRecorder(self.root, clock=clock)
+        recorder.attach(controller)
+        controller.sensor_bus.publish('vibration', True)
+        controller.gps_reader.update({'class': 'TPV', 'mode': 3, 'lat': 33.0, 'lon': -84.0, 'speed': 2.0})
+        recorder.record_state(_status(DISARMED))
+        recorder.close()
+        events = list(read_events(self.root))
+        self.assertEqual([(event.timestamp, event.source) for event in events],
+                         [(50.0, 'vibration'), (50.0, 'gps'), (50.0, 'state')])
+        self.assertEqual(events[1].value['lat'], 33.0)
+        self.assertEqual(events[1].value['speed'], 2.0)
+        self.assertIsNone(events[1].value['alt'])
+
+    def test_record_state(self):
+        clock = VirtualClock(10.0)
+        recorder = EventRecorder(self.root, clock=clock)
+        for state in (ARMING, ARMED):
+            recorder.record_state(_status(state, occupied=True))
+        recorder.close()
+        self.assertEqual(list(read_events(self.root)), [LoggedEvent(10.0, 'state', ARMING),
+                                                         LoggedEvent(10.0, 'occupied', True),
+                                                         LoggedEvent(10.0, 'state', ARMED)])
+
+
+class TestEventReplayer(unittest.TestCase):
+    """set of test for eventlog.EventReplayer"""
+
+    def setUp(self):
+        self.clock = VirtualClock()
+        self.controller = _controller(self, self.clock)
+        self.replayer = EventReplayer(self.controller, self.clock)
+
+    def _armed(self, occupied, events):
+        # The 5 s exit delay, then the occupancy check
+        return [LoggedEvent(0.0, 'state', ARMING), LoggedEvent(5.5, 'occupied', occupied),
+                LoggedEvent(5.5, 'state', ARMED)] + events
+
+    def test_sustained_motion_breaches(self):
+        events = self._armed(False, [
+            LoggedEvent(10.0, 'motion', True),
+            LoggedEvent(12.1, 'state', BREACHED),
+            LoggedEvent(20.0, 'motion', False),
+            LoggedEvent(30.0, 'state', ACKNOWLEDGED),
+            LoggedEvent(30.0, 'state', DISARMED),
+        ])
+        breaches = self.replayer.run(events)
+        self.assertEqual(len(breaches), 1)
+        self.assertAlmostEqual(breaches[0].time, 12.1)
+        self.assertEqual(self.replayer.recorded_breaches, [12.1])
+        self.assertEqual(self.clock(), 30.0)
+
+    def test_only_while_armed(self):
+        events = [LoggedEvent(1.0, 'motion', True), LoggedEvent(9.0, 'motion', False)]
+        self.assertEqual(self.replayer.run(events), [])
+        events = self._armed(False, [
+            LoggedEvent(10.0, 'state', DISARMED),
+            LoggedEvent(11.0, 'motion', True),
+            LoggedEvent(19.0, 'motion', False),
+        ])
+        self.assertEqual(self.replayer.run(events), [])
+
+    def test_occupied_ignores_motion(self):
+        events = self._armed(True, [
+            LoggedEvent(10.0, 'motion', True),
+            LoggedEvent(20.0, 'motion', False),
+        ])
+        self.assertEqual(self.replayer.run(events), [])
+
+    def _knocks(self, start):
+        events = []
+        for i in range(4):
+            events.append(LoggedEvent(start + i * 0.5, 'vibration', True))
+            events.append(LoggedEvent(start + i * 0.5 + 0.05, 'vibration', False))
+        return events
+
+    def test_exit_delay_ignored(self):
+        events = [LoggedEvent(0.0, 'state', ARMING)] + self._knocks(0.1)
+        events += [LoggedEvent(8.0, 'occupied', False), LoggedEvent(8.0, 'state', ARMED)]
+        self.assertEqual(self.replayer.run(events), [])
+
+    def test_events_while_arming_count(self):
+        # Knocks between subscribing and the occupancy check are consumed by the armed loop
+        events = [LoggedEvent(0.0, 'state', ARMING)] + self._knocks(5.1)
+        events += [LoggedEvent(8.0, 'occupied', False), LoggedEvent(8.0, 'state', ARMED)]
+        breaches = self.replayer.run(events)
+        self.assertEqual(len(breaches), 1)
+        self.assertEqual(breaches[0].time, 8.0)
+
+    def test_readings_reach_controller(self):
+        events = [
+            LoggedEvent(100.0, 'gps', {'mode': 3, 'lat': 33.0, 'lon': -84.0, 'speed': 10.0, 'track': 0.0}),
+            LoggedEvent(101.0, 'gps', {'mode': 3, 'lat': 33.0001, 'lon': -84.0, 'speed': 10.0, 'track': 0.0}),
+            LoggedEvent(101.5, 'temperature', 30.0),
+        ]
+        self.replayer.run(events)
+        fix = self.controller.gps_reader.fix
+        self.assertEqual((fix.latitude, fix.received), (33.0001, 101.0))
+        self.assertEqual(self.controller.gps_reader.age(fix), 0.5)
+        self.assertIsNotNone(self.controller.position_estimator.estimate_at(self.clock()))
+        # The controller's own (simulated) sensor is sampled alongside the replayed readings
+        self.assertEqual(self.controller.temperature_monitor.history()[-1]['max'], 86.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
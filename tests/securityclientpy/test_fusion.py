@@ -0,0 +1,143 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from securityclientpy.fusion import ArmedSession, FusionEngine, DEFAULT_POLICY, parse_policy, load_policy, replay
+from securityclientpy.sensorbus import SensorEvent
+
+
+def _event(timestamp, source, value):
+    return SensorEvent(0, timestamp, source, value)
+
+
+def _pulses(start, source, count, spacing):
+    events = []
+    for i in range(count):
+        events.append(_event(start + i * spacing, source, True))
+        events.append(_event(start + i * spacing + 0.05, source, False))
+    return events
+
+
+class TestParsePolicy(unittest.TestCase):
+    """set of test for fusion.parse_policy"""
+
+    def test_defaults(self):
+        policy = parse_policy({'window': 5, 'threshold': 1, 'sensors': {'door': {'weight': 1, 'sustain': 1}}})
+        self.assertEqual(policy['sensors']['door'], {'kind': 'level', 'weight': 1.0, 'debounce': 0.0,
+                                                     'max': 1.0, 'sustain': 1.0})
+
+    def test_invalid(self):
+        for policy in (None, {}, {'window': 5, 'threshold': 1, 'sensors': {'door': {'kind': 'latch', 'weight': 1}}},
+                       {'window': 5, 'threshold': 1, 'sensors': {'knock': {'kind': 'pulse', 'weight': 1, 'count': 0}}},
+                       {'window': 0, 'threshold': 1, 'sensors': {}}):
+            self.assertRaises(ValueError, parse_policy, policy)
+
+    def test_load_yaml(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'policy.yaml')
+            with open(path, 'w') as fp:
+                fp.write('window: 8\nthreshold: 2\nsensors:\n  vibration: {kind: pulse, weight: 1, count: 1}\n')
+            policy = load_policy(path)
+            self.assertEqual(policy['threshold'], 2.0)
+            self.assertEqual(policy['sensors']['vibration']['count'], 1)
+            with open(path, 'w') as fp:
+                fp.write('window: [8\n')
+            self.assertRaises(ValueError, load_policy, path)
+        finally:
+            shutil.rmtree(directory)
+
+
+class TestFusionEngine(unittest.TestCase):
+    """set of test for fusion.FusionEngine"""
+
+    def test_sustained_motion(self):
+        engine = FusionEngine()
+        self.assertIsNone(engine.update([_event(100.0, 'motion', True)], 100.0))
+        # Still within the debounce, but counted from the start once it outlasts it
+        self.assertAlmostEqual(engine.time_to_breach(100.0), 2.1)
+        self.assertIsNone(engine.evaluate(102.0))
+        self.assertAlmostEqual(engine.time_to_breach(102.0), 0.1)
+        breach = engine.evaluate(102.1)
+        self.assertIsNotNone(breach)
+        self.assertAlmostEqual(breach.contributions['motion'], 1.0)
+
+    def test_short_motion_debounced(self):
+        engine = FusionEngine()
+        for i in range(20):
+            # 0.1 s blips never count
+            engine.add(_event(100.0 + i * 0.5, 'motion', True))
+            engine.add(_event(100.1 + i * 0.5, 'motion', False))
+        self.assertEqual(engine.contributions(110.0)['motion'], 0.0)
+        self.assertIsNone(engine.time_to_breach(110.0))
+
+    def test_single_vibration_is_not_a_breach(self):
+        engine = FusionEngine()
+        self.assertIsNone(engine.update(_pulses(100.0, 'vibration', 1, 0.0), 100.1))
+        # Contact bounce is one pulse
+        self.assertIsNone(engine.update(_pulses(100.1, 'vibration', 5, 0.06), 100.5))
+        self.assertAlmostEqual(engine.contributions(100.5)['vibration'], 0.25)
+        breach = engine.update(_pulses(103.0, 'vibration', 3, 1.0), 105.0)
+        self.assertIsNotNone(breach)
+
+    def test_corroborated_sensors(self):
+        engine = FusionEngine()
+        engine.add(_event(100.0, 'camera', True))
+        self.assertIsNone(engine.evaluate(102.0))
+        breach = engine.update(_pulses(101.0, 'vibration', 2, 0.5), 102.0)
+        self.assertIsNotNone(breach)
+        self.assertAlmostEqual(breach.contributions['camera'], 0.5)
+        self.assertAlmostEqual(breach.contributions['vibration'], 0.5)
+
+    def test_window_expires_evidence(self):
+        engine = FusionEngine()
+        engine.update(_pulses(100.0, 'vibration', 3, 1.0), 103.0)
+        self.assertAlmostEqual(engine.contributions(103.0)['vibration'], 0.75)
+        self.assertAlmostEqual(engine.contributions(111.5)['vibration'], 0.25)
+        self.assertIsNone(engine.update(_pulses(115.0, 'vibration', 1, 0.0), 115.0))
+
+    def test_ignored_sources(self):
+        engine = FusionEngine(ignored=('motion', 'camera'))
+        self.assertIsNone(engine.update([_event(100.0, 'motion', True), _event(100.0, 'camera', True)], 110.0))
+        self.assertEqual(engine.events, 0)
+        self.assertIsNotNone(engine.update(_pulses(110.0, 'vibration', 4, 1.0), 114.0))
+
+    def test_replay(self):
+        events = [_event(100.0, 'motion', True), _event(101.0, 'motion', False)]
+        events += [_event(200.0, 'motion', True), _event(205.0, 'motion', False)]
+        events += _pulses(300.0, 'vibration', 1, 0.0)
+        breaches = replay(events)
+        self.assertEqual(len(breaches), 1)
+        # Detected between events, when the sustained motion crosses the threshold
+        self.assertAlmostEqual(breaches[0].time, 202.1)
+        # The policy passed in is left alone
+        policy = dict(DEFAULT_POLICY, threshold=0.25)
+        self.assertEqual(len(replay(events, policy)), 3)
+        self.assertEqual(DEFAULT_POLICY['threshold'], 1.0)
+
+
+
+class TestArmedSession(unittest.TestCase):
+    """set of test for fusion.ArmedSession"""
+
+    def test_held_until_ready(self):
+        session = ArmedSession()
+        self.assertIsNone(session.update(_pulses(0.0, 'vibration', 4, 0.5), 2.0))
+        self.assertIsNone(session.time_to_breach(2.0))
+        breach = session.ready(False, 3.0)
+        self.assertIsNotNone(breach)
+        # Only the first breach of an arming counts
+        self.assertIsNone(session.update(_pulses(10.0, 'vibration', 4, 0.5), 12.0))
+        self.assertIs(session.breach, breach)
+
+    def test_occupied_ignores_motion(self):
+        session = ArmedSession()
+        self.assertIsNone(session.ready(True, 0.0))
+        self.assertIsNone(session.update([_event(1.0, 'motion', True)], 1.0))
+        self.assertIsNone(session.next_breach(1.0, 20.0))
+        self.assertIsNotNone(session.update(_pulses(20.0, 'vibration', 4, 0.5), 22.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import random
+import unittest
+
+from securityclientpy.geofence import GeofenceIndex, GeofenceMonitor, parse_geofence, parse_geofences
+from securityclientpy.kalman import Estimate
+
+# About 11 m of latitude
+_LAT_STEP = 0.0001
+
+
+def _estimate(latitude, longitude, t=0.0, error=5.0):
+    return Estimate(latitude, longitude, 10.0, 0.0, error, 0.5, 0.0, t)
+
+
+def _circle(fence_id, latitude, longitude, radius, **kwargs):
+    spec = {'id': fence_id, 'center': [latitude, longitude], 'radius': radius}
+    spec.update(kwargs)
+    return parse_geofence(spec)
+
+
+def _square(fence_id, south, west, size, **kwargs):
+    spec = {'id': fence_id, 'polygon': [[south, west], [south, west + size], [south + size, west + size],
+                                        [south + size, west]]}
+    spec.update(kwargs)
+    return parse_geofence(spec)
+
+
+class TestGeofenceIndex(unittest.TestCase):
+    """set of test for geofence.GeofenceIndex"""
+
+    def test_circle(self):
+        # 100 m radius
+        index = GeofenceIndex([_circle('home', 33.0, -84.0, 100.0)])
+        self.assertEqual(len(index.containing(33.0 + 8 * _LAT_STEP, -84.0)), 1)
+        self.assertEqual(index.containing(33.0 + 10 * _LAT_STEP, -84.0), [])
+        # 90 m east, longitude degrees are shorter than latitude degrees
+        self.assertEqual(len(index.containing(33.0, -84.0 + 90.0 / 93360.0)), 1)
+
+    def test_concave_polygon(self):
+        # U shape: the notch between the arms is outside
+        fence = parse_geofence({'id': 'u', 'polygon': [
+            [33.0, -84.0], [33.0, -83.97], [33.03, -83.97], [33.03, -83.98], [33.01, -83.98], [33.01, -83.99],
+            [33.03, -83.99], [33.03, -84.0],
+        ]})
+        index = GeofenceIndex([fence])
+        self.assertEqual(len(index.containing(33.005, -83.985)), 1)
+        self.assertEqual(len(index.containing(33.02, -83.995)), 1)
+        self.assertEqual(index.containing(33.02, -83.985), [])
+        self.assertEqual(index.containing(32.99, -83.985), [])
+
+    def test_matches_brute_force(self):
+        generator = random.Random(0)
+        fences = []
+        for i in range(200):
+            latitude = 33.0 + generator.uniform(0, 0.2)
+            longitude = -84.0 + generator.uniform(0, 0.2)
+            if i % 2:
+                fences.append(_circle(str(i), latitude, longitude, generator.uniform(50, 2000)))
+            else:
+                fences.append(_square(str(i), latitude, longitude, generator.uniform(0.001, 0.03)))
+        index = GeofenceIndex(fences)
+        brute_force = GeofenceIndex(fences, cell_degrees=10.0)
+        for _ in range(2000):
+            latitude = 33.0 + generator.uniform(-0.01, 0.21)
+            longitude = -84.0 + generator.uniform(-0.01, 0.21)
+            self.assertEqual(sorted(f.fence_id for f in index.containing(latitude, longitude)),
+                             sorted(f.fence_id for f in brute_force.containing(latitude, longitude)))
+
+    def test_parse_errors(self):
+        self.assertRaises(ValueError, parse_geofence, {'id': 'a', 'polygon': [[33.0, -84.0], [33.1, -84.0]]})
+        self.assertRaises(ValueError, parse_geofence, {'id': 'a', 'center': [33.0, -84.0], 'radius': 0})
+        self.assertRaises(ValueError, parse_geofence, {'id': 'a'})
+        self.assertRaises(ValueError, parse_geofence, {'id': 'a', 'center': [33.0, -84.0], 'radius': 10,
+                                                       'on_enter': ['explode']})
+        spec = {'id': 'a', 'center': [33.0, -84.0], 'radius': 10}
+        self.assertRaises(ValueError, parse_geofences, [spec, spec])
+
+
+class TestGeofenceMonitor(unittest.TestCase):
+    """set of test for geofence.GeofenceMonitor"""
+
+    def setUp(self):
+        self.home = _circle('home', 33.0, -84.0, 100.0, name='Home', on_exit=['alert'])
+        self.school = _square('school', 33.01, -84.0, 0.01, speed_limit=25)
+        self.monitor = GeofenceMonitor([self.home, self.school])
+        self.events = []
+        self.monitor.add_listener(self.events.append)
+
+    def test_starting_inside_is_silent(self):
+        self.monitor.update(_estimate(33.0, -84.0))
+        self.assertEqual(self.events, [])
+        self.assertEqual([fence.fence_id for fence in self.monitor.inside()], ['home'])
+
+    def test_exit_confirmed(self):
+        self.monitor.update(_estimate(33.0, -84.0))
+        # One estimate outside isn't enough
+        self.monitor.update(_estimate(33.0 + 20 * _LAT_STEP, -84.0))
+        self.monitor.update(_estimate(33.0, -84.0))
+        self.assertEqual(self.events, [])
+
+        self.monitor.update(_estimate(33.0 + 20 * _LAT_STEP, -84.0, t=1.0))
+        self.monitor.update(_estimate(33.0 + 30 * _LAT_STEP, -84.0, t=2.0))
+        self.assertEqual(len(self.events), 1)
+        self.assertFalse(self.events[0].entered)
+        self.assertEqual(self.events[0].fence.name, 'Home')
+        self.assertEqual(self.events[0].time, 2.0)
+        self.assertEqual(self.monitor.inside(), [])
+
+    def test_inaccurate_estimates_ignored(self):
+        self.monitor.update(_estimate(33.0, -84.0))
+        for i in range(5):
+            self.monitor.update(_estimate(33.0 + 20 * _LAT_STEP, -84.0, error=80.0))
+        self.assertEqual(self.events, [])
+        self.assertEqual(self.monitor.skipped, 5)
+
+    def test_speed_limit_inside(self):
+        self.monitor.update(_estimate(33.0, -84.0))
+        self.assertIsNone(self.monitor.speed_limit())
+        for i in range(2):
+            self.monitor.update(_estimate(33.015, -83.995))
+        self.assertEqual([(event.fence.fence_id, event.entered) for event in self.events],
+                         [('home', False), ('school', True)])
+        self.assertEqual(self.monitor.speed_limit(), 25.0)
+
+    def test_reload_keeps_state(self):
+        self.monitor.update(_estimate(33.0, -84.0))
+        garage = _circle('garage', 33.0, -84.0, 20.0, on_enter=['arm'])
+        self.monitor.load([self.home, garage])
+        # Already inside the new fence: no enter event for it, home is still inside
+        self.monitor.update(_estimate(33.0, -84.0))
+        self.monitor.update(_estimate(33.0, -84.0))
+        self.assertEqual(self.events, [])
+        self.assertEqual(sorted(fence.fence_id for fence in self.monitor.inside()), ['garage', 'home'])
+
+        self.monitor.load([garage])
+        self.assertEqual([fence.fence_id for fence in self.monitor.inside()], ['garage'])
+
+
+if __name__ == '__main__':
+    unittest.main()
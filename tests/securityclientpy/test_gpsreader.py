@@ -0,0 +1,132 @@
+import threading
+import time
+import unittest
+
+from securityclientpy.fakegps import FakeGpsSession, nmea_to_reports
+from securityclientpy.gpsreader import GpsReader
+from tests.helpers import wait_until
+
+_TPV = '{"class":"TPV","device":"/dev/ttyAMA0","mode":3,"time":"2017-03-01T17:00:00.000Z","ept":0.005,' \
+       '"lat":33.749,"lon":-84.388,"alt":320.5,"epx":4.2,"epy":5.1,"epv":9.8,"track":91.5,"speed":26.8,' \
+       '"climb":0.1,"eps":10.2}'
+_SKY = '{"class":"SKY","device":"/dev/ttyAMA0","satellites":[]}'
+_NO_FIX = '{"class":"TPV","device":"/dev/ttyAMA0","mode":1}'
+
+
+class TestFakeGpsSession(unittest.TestCase):
+    """set of test for fakegps.FakeGpsSession"""
+
+    def test_nmea(self):
+        reports = nmea_to_reports([
+            '$GPGGA,170000.00,3344.9400,N,08423.2800,W,1,08,0.9,320.5,M,-31.0,M,,*47',
+            '$GPRMC,170000.00,A,3344.9400,N,08423.2800,W,52.1,91.5,010317,,,A*6C',
+            '$GPRMC,170001.00,V,,,,,,,010317,,,N*7C',
+        ])
+        self.assertEqual(len(reports), 2)
+        self.assertEqual(reports[0]['mode'], 3)
+        self.assertEqual(reports[0]['time'], '2017-03-01T17:00:00.00Z')
+        self.assertAlmostEqual(reports[0].lat, 33.749)
+        self.assertAlmostEqual(reports[0].lon, -84.388)
+        self.assertAlmostEqual(reports[0].speed, 26.80, places=2)
+        self.assertEqual(reports[0].alt, 320.5)
+        self.assertEqual(reports[1]['mode'], 1)
+
+    def test_disconnect(self):
+        session = FakeGpsSession()
+        session.feed_json([_SKY])
+        session.disconnect()
+        self.assertEqual(session.next()['class'], 'SKY')
+        self.assertRaises(StopIteration, session.next)
+
+
+class TestGpsReader(unittest.TestCase):
+    """set of test for gpsreader.GpsReader"""
+
+    def setUp(self):
+        self.sessions = []
+
+    def connect(self):
+        session = FakeGpsSession()
+        self.sessions.append(session)
+        return session
+
+    def test_keeps_latest_tpv(self):
+        reader = GpsReader(self.connect)
+        self.assertIsNone(reader.fix)
+        reader.start()
+        self.assertTrue(wait_until(lambda: self.sessions))
+        self.sessions[0].feed_json([_SKY, _TPV, _SKY])
+        self.assertTrue(wait_until(lambda: reader.reports == 3))
+
+        fix = reader.fix
+        self.assertEqual((fix.latitude, fix.longitude, fix.altitude), (33.749, -84.388, 320.5))
+        self.assertEqual((fix.speed, fix.track, fix.climb, fix.mode), (26.8, 91.5, 0.1, 3))
+        self.assertEqual((fix.epx, fix.epy, fix.epv, fix.eps), (4.2, 5.1, 9.8, 10.2))
+        self.assertEqual(fix.time, '2017-03-01T17:00:00.000Z')
+        self.assertLess(reader.age(fix), 1.0)
+        self.assertEqual(reader.fixes, 1)
+        reader.stop()
+        self.assertFalse(reader.running)
+
+    def test_report_without_fix_keeps_previous(self):
+        reader = GpsReader(self.connect)
+        reader.start()
+        self.assertTrue(wait_until(lambda: self.sessions))
+        self.sessions[0].feed_json([_TPV])
+        self.assertTrue(wait_until(lambda: reader.fix is not None))
+        fix = reader.fix
+
+        time.sleep(0.05)
+        self.sessions[0].feed_json([_NO_FIX])
+        self.assertTrue(wait_until(lambda: reader.reports == 2))
+        self.assertIs(reader.fix, fix)
+        self.assertGreaterEqual(reader.age(fix), 0.05)
+        reader.stop()
+
+    def test_reconnects(self):
+        reader = GpsReader(self.connect)
+        reader._MIN_RECONNECT_SECONDS = 0.01
+        reader.start()
+        self.assertTrue(wait_until(lambda: self.sessions))
+        self.sessions[0].disconnect()
+        self.assertTrue(wait_until(lambda: len(self.sessions) == 2))
+        self.sessions[1].feed_json([_TPV])
+        self.assertTrue(wait_until(lambda: reader.fix is not None))
+        self.assertEqual(reader.reconnects, 1)
+        reader.stop()
+
+    def test_stop_unblocks_read(self):
+        reader = GpsReader(self.connect)
+        reader.start()
+        self.assertTrue(wait_until(lambda: self.sessions))
+        start = time.time()
+        reader.stop()
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual(reader.reconnects, 0)
+
+    def test_concurrent_readers_see_whole_fixes(self):
+        session = FakeGpsSession()
+        reader = GpsReader(lambda: session)
+        reader.start()
+        torn = []
+
+        def read():
+            for i in range(20000):
+                fix = reader.fix
+                if fix is not None and fix.latitude != fix.longitude:
+                    torn.append(fix)
+
+        threads = [threading.Thread(target=read) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for i in range(2000):
+            session.feed({'class': 'TPV', 'mode': 2, 'lat': float(i), 'lon': float(i)})
+        for thread in threads:
+            thread.join()
+        self.assertTrue(wait_until(lambda: reader.fixes == 2000))
+        self.assertEqual(torn, [])
+        reader.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import time
+import unittest
+
+from securityclientpy.drivers import SimulatedDrivers, QUIET_PATTERNS
+from securityclientpy.hwcontroller import HardwareController
+from tests.helpers import wait_until
+
+
+class _ServerRequests(object):
+    """records the alerts the controller sends"""
+
+    def __init__(self):
+        self.panics = 0
+
+    def send_panic_alert_async(self):
+        self.panics += 1
+
+
+class TestHardwareController(unittest.TestCase):
+    """set of test for hwcontroller.HardwareController on simulated drivers"""
+
+    def _controller(self, patterns):
+        self.drivers = SimulatedDrivers(dict(QUIET_PATTERNS, **patterns), speed=20, seed=1)
+        self.server_requests = _ServerRequests()
+        controller = HardwareController(False, self.server_requests, drivers=self.drivers)
+        self.addCleanup(controller.cleanup)
+        return controller
+
+    def test_sensors(self):
+        controller = self._controller({})
+        reader = controller.sensor_bus.subscribe()
+        self.assertFalse(controller.read_motion_sensor())
+        self.drivers.gpio.set_input(HardwareController._GPIO_PINS['motion'], True)
+        self.assertTrue(controller.read_motion_sensor())
+        self.assertEqual([(event.source, event.value) for event in reader.poll()], [('motion', True)])
+
+        controller.status_led_on()
+        self.assertTrue(self.drivers.gpio.input(HardwareController._GPIO_PINS['led']))
+        controller.status_led_off()
+        self.assertFalse(self.drivers.gpio.input(HardwareController._GPIO_PINS['led']))
+
+    def test_led_flash(self):
+        controller = self._controller({})
+        controller._FLASH_SECONDS = 0.01
+        led = HardwareController._GPIO_PINS['led']
+        start = time.time()
+        thread = controller.status_led_flash(3, then_on=True)
+        self.assertLess(time.time() - start, 0.1)
+        thread.join(1.0)
+        self.assertTrue(self.drivers.gpio.input(led))
+
+        # Continuous flashing ends at once and leaves the led off
+        controller.status_led_flash_start()
+        self.assertTrue(wait_until(lambda: self.drivers.gpio.input(led)))
+        controller.status_led_flash_stop()
+        self.assertFalse(self.drivers.gpio.input(led))
+        time.sleep(0.05)
+        self.assertFalse(self.drivers.gpio.input(led))
+
+    def test_led_flash_cancelled(self):
+        controller = self._controller({})
+        thread = controller.status_led_flash(10)
+        controller.status_led_on()
+        thread.join(0.1)
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(self.drivers.gpio.input(HardwareController._GPIO_PINS['led']))
+
+    def test_panic_button(self):
+        self._controller({'panic_button': {'pattern': 'periodic', 'period': 1.0, 'duration': 0.5}})
+        self.assertTrue(wait_until(lambda: self.server_requests.panics >= 2))
+
+    def test_simulated_readings(self):
+        controller = self._controller({'gps': {'pattern': 'route', 'speed': 20.0}})
+        self.assertEqual(controller.read_temperature_sensor()['celcius'], 21.5)
+        self.assertTrue(wait_until(lambda: controller.gps_reader.fixes >= 3))
+        speedometer = controller.read_speedometer_sensor()
+        self.assertAlmostEqual(speedometer['speed'], 20.0 * 2.23694, delta=2.0)
+        self.assertEqual(controller.read_gps_sensor()['source'], 'gps')
+
+    def test_no_hardware_is_quiet(self):
+        controller = HardwareController(True, _ServerRequests())
+        self.addCleanup(controller.cleanup)
+        # No made up drive or temperature cycle reaches the speed and temperature checks
+        time.sleep(0.2)
+        self.assertEqual(controller.drivers.signals, 0)
+        self.assertEqual(controller.read_speedometer_sensor()['speed'], 0.0)
+        self.assertEqual(controller.read_temperature_sensor()['celcius'], 21.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import math
+import random
+import unittest
+
+from securityclientpy.gpsreader import GpsFix, GpsReader
+from securityclientpy.kalman import KalmanFilter, PositionEstimator
+
+_METERS_PER_DEGREE = 111320.0
+_ORIGIN = (33.749, -84.388)
+
+
+def _fix(timestamp, east, north, speed=None, track=None, error=5.0, speed_error=0.5):
+    """fix at meters east / north of the origin"""
+    latitude = _ORIGIN[0] + north / _METERS_PER_DEGREE
+    longitude = _ORIGIN[1] + east / (_METERS_PER_DEGREE * math.cos(math.radians(_ORIGIN[0])))
+    return GpsFix(3, None, latitude, longitude, 300.0, speed, 0.0, track, error, error, 10.0, speed_error, timestamp)
+
+
+def _drive(seconds, speed, track, noise=0.0, speed_noise=0.0, seed=0):
+    """fixes once a second for a straight drive, with error estimates matching the noise as a receiver's would"""
+    generator = random.Random(seed)
+    east_rate = speed * math.sin(math.radians(track))
+    north_rate = speed * math.cos(math.radians(track))
+    return [_fix(float(t), east_rate * t + generator.gauss(0, noise), north_rate * t + generator.gauss(0, noise),
+                 max(0.0, speed + generator.gauss(0, speed_noise)), track, error=max(1.0, 1.96 * noise),
+                 speed_error=max(0.1, 1.96 * speed_noise)) for t in range(seconds)]
+
+
+class TestKalmanFilter(unittest.TestCase):
+    """set of test for kalman.KalmanFilter"""
+
+    def test_learns_velocity_from_positions(self):
+        kalman_filter = KalmanFilter()
+        for t in range(20):
+            kalman_filter.update(_ORIGIN[0] + 10.0 * t / _METERS_PER_DEGREE, _ORIGIN[1], float(t), 1.0)
+        self.assertAlmostEqual(kalman_filter.state[3], 10.0, places=1)
+        self.assertAlmostEqual(kalman_filter.state[2], 0.0, places=1)
+
+    def test_reanchors_far_from_origin(self):
+        kalman_filter = KalmanFilter()
+        for t in range(60):
+            kalman_filter.update(_ORIGIN[0] + 300.0 * t / _METERS_PER_DEGREE, _ORIGIN[1], float(t), 1.0)
+        self.assertNotEqual(kalman_filter.origin, _ORIGIN)
+        latitude, longitude = kalman_filter.to_global(kalman_filter.state[0], kalman_filter.state[1])
+        self.assertAlmostEqual(latitude, _ORIGIN[0] + 300.0 * 59 / _METERS_PER_DEGREE, places=4)
+
+
+class TestPositionEstimator(unittest.TestCase):
+    """set of test for kalman.PositionEstimator"""
+
+    def test_smooths_speed(self):
+        estimator = PositionEstimator()
+        raw_errors = []
+        errors = []
+        for fix in _drive(120, 15.0, 45.0, noise=4.0, speed_noise=1.5):
+            estimator.add_fix(fix)
+            if fix.received >= 20:
+                raw_errors.append(fix.speed - 15.0)
+                errors.append(estimator.estimate_at(fix.received).speed - 15.0)
+        rms = lambda values: math.sqrt(sum(v * v for v in values) / len(values))
+        self.assertLess(rms(errors), rms(raw_errors) / 2)
+
+        estimate = estimator.estimate_at(119.0)
+        self.assertAlmostEqual(estimate.heading, 45.0, delta=3.0)
+        self.assertLess(estimate.position_error, 4.0)
+
+    def test_extrapolates_across_dropout(self):
+        estimator = PositionEstimator(max_dropout=5.0)
+        for fix in _drive(20, 20.0, 90.0):
+            estimator.add_fix(fix)
+
+        # Three seconds without a fix, the vehicle keeps going east
+        estimate = estimator.estimate_at(22.0)
+        expected = _fix(22.0, 20.0 * 22, 0.0)
+        self.assertAlmostEqual(estimate.longitude, expected.longitude, places=4)
+        self.assertAlmostEqual(estimate.speed, 20.0, delta=0.5)
+        self.assertAlmostEqual(estimate.fix_age, 3.0)
+        self.assertGreater(estimate.position_error, estimator.estimate_at(19.0).position_error)
+
+        self.assertIsNone(estimator.estimate_at(25.0))
+
+    def test_no_heading_when_stopped(self):
+        estimator = PositionEstimator()
+        for fix in _drive(20, 0.0, 0.0, noise=1.0):
+            estimator.add_fix(fix)
+        estimate = estimator.estimate_at(19.0)
+        self.assertLess(estimate.speed, 1.0)
+        self.assertIsNone(estimate.heading)
+
+    def test_fed_by_gps_reader(self):
+        gps_reader = GpsReader(lambda: None)
+        estimator = PositionEstimator(gps_reader)
+        self.assertIsNone(estimator.estimate)
+        gps_reader.update({'class': 'TPV', 'mode': 2, 'lat': _ORIGIN[0], 'lon': _ORIGIN[1], 'speed': 5.0,
+                           'track': 90.0})
+        self.assertEqual(estimator.updates, 1)
+        self.assertAlmostEqual(estimator.estimate.latitude, _ORIGIN[0], places=4)
+
+    def test_listeners_get_estimate_per_fix(self):
+        estimator = PositionEstimator()
+        estimates = []
+        estimator.add_listener(estimates.append)
+        for fix in _drive(5, 10.0, 0.0):
+            estimator.add_fix(fix)
+        self.assertEqual(len(estimates), 5)
+        self.assertEqual([estimate.time for estimate in estimates], [0.0, 1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(estimates[-1].fix_age, 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
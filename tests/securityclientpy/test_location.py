@@ -0,0 +1,99 @@
+import time
+import unittest
+
+from securityclientpy.eventlog import VirtualClock
+from securityclientpy.fakegps import FakeGpsSession
+from securityclientpy.gpsreader import GpsReader
+from securityclientpy.location import LocationProvider
+from tests.stub_server import StubServer
+
+_GEOIP = {'latitude': 40.7128, 'longitude': -74.006}
+_TPV = {'class': 'TPV', 'mode': 2, 'lat': 33.749, 'lon': -84.388}
+
+
+class TestLocationProvider(unittest.TestCase):
+    """set of test for location.LocationProvider"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StubServer(responses={'json': _GEOIP}).start()
+        cls.url = 'http://{0}:{1}/json'.format(cls.server.host, cls.server.port)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.received = []
+        self.gps_reader = GpsReader(lambda: FakeGpsSession())
+
+    def test_gps_fix_first(self):
+        self.gps_reader.update(_TPV)
+        provider = LocationProvider(self.gps_reader, self.url)
+        location = provider.location()
+        self.assertEqual((location['latitude'], location['longitude'], location['source']), (33.749, -84.388, 'gps'))
+        self.assertLess(location['age'], 1.0)
+        self.assertEqual(self.server.requests_for('json'), [])
+
+    def test_stale_fix_served_as_cached(self):
+        self.gps_reader.update(_TPV)
+        provider = LocationProvider(self.gps_reader, self.url, max_fix_age=0.05)
+        provider.location()
+        time.sleep(0.1)
+        location = provider.location()
+        self.assertEqual(location['source'], 'cached')
+        self.assertGreaterEqual(location['age'], 0.1)
+        self.assertEqual(self.server.requests_for('json'), [])
+
+    def test_geoip_fallback_is_async_and_cached(self):
+        provider = LocationProvider(self.gps_reader, self.url)
+        start = time.time()
+        self.assertIsNone(provider.location())
+        self.assertLess(time.time() - start, 0.05)
+        self.assertTrue(provider.wait_for_geoip(2.0))
+
+        for i in range(10):
+            location = provider.location()
+        self.assertEqual((location['latitude'], location['longitude'], location['source']),
+                         (40.7128, -74.006, 'geoip'))
+        self.assertEqual(len(self.server.requests_for('json')), 1)
+
+    def test_geoip_rate_limited_while_failing(self):
+        provider = LocationProvider(None, 'http://127.0.0.1:1/json', geoip_interval=60.0)
+        for i in range(5):
+            self.assertIsNone(provider.location())
+            provider.wait_for_geoip(2.0)
+        self.assertEqual(provider.geoip_requests, 1)
+        self.assertEqual(provider.geoip_failures, 1)
+
+    def test_expired_cache(self):
+        self.gps_reader.update(_TPV)
+        provider = LocationProvider(self.gps_reader, self.url, max_fix_age=0.05, cache_ttl=0.1)
+        self.assertEqual(provider.location()['source'], 'gps')
+        time.sleep(0.2)
+        self.assertIsNone(provider.location())
+        provider.wait_for_geoip(2.0)
+        self.assertEqual(provider.location()['source'], 'geoip')
+
+    def test_ages_on_gps_clock(self):
+        # A replayed log's clock is nowhere near the wall clock
+        clock = VirtualClock(1000.0)
+        gps_reader = GpsReader(lambda: FakeGpsSession(), clock=clock)
+        gps_reader.update(_TPV)
+        provider = LocationProvider(gps_reader, self.url, max_fix_age=10.0, cache_ttl=60.0, clock=clock)
+        self.assertEqual(provider.location()['age'], 0.0)
+
+        clock.sleep(30.0)
+        location = provider.location()
+        self.assertEqual((location['source'], location['age']), ('cached', 30.0))
+
+        clock.sleep(31.0)
+        self.assertIsNone(provider.location())
+        self.assertTrue(provider.wait_for_geoip(2.0))
+        self.assertEqual(provider.last_known[3], 1061.0)
+        location = provider.location()
+        self.assertEqual((location['source'], location['age']), ('geoip', 0.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
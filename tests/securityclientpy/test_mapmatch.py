@@ -0,0 +1,76 @@
+import unittest
+
+from securityclientpy.mapmatch import RoadMatcher, parse_maxspeed
+
+# About 11 m of latitude
+_LAT_STEP = 0.0001
+
+
+class TestParseMaxspeed(unittest.TestCase):
+    """set of test for mapmatch.parse_maxspeed"""
+
+    def test_units(self):
+        self.assertEqual(parse_maxspeed('45 mph'), 45.0)
+        self.assertEqual(parse_maxspeed('45mph'), 45.0)
+        self.assertAlmostEqual(parse_maxspeed('100'), 62.1371)
+        self.assertAlmostEqual(parse_maxspeed('100 km/h'), 62.1371)
+        self.assertAlmostEqual(parse_maxspeed('10 knots'), 11.5078)
+        self.assertAlmostEqual(parse_maxspeed(50), 31.06855)
+
+    def test_multiple_limits_use_lowest(self):
+        self.assertEqual(parse_maxspeed('35 mph;25 mph'), 25.0)
+
+    def test_symbolic_values(self):
+        for value in (None, 'n/a', 'none', 'signals', 'RU:urban', 'walk'):
+            self.assertIsNone(parse_maxspeed(value))
+
+
+class TestRoadMatcher(unittest.TestCase):
+    """set of test for mapmatch.RoadMatcher"""
+
+    def setUp(self):
+        self.matcher = RoadMatcher()
+        # An east-west highway through the origin and a north-south side street crossing it
+        self.highway = {'name': 'highway', 'speed_limit': '65 mph',
+                        'nodes': [(33.0, -84.01), (33.0, -84.0), (33.0, -83.99)]}
+        self.street = {'name': 'street', 'speed_limit': '25 mph',
+                       'nodes': [(32.99, -84.00005), (33.01, -84.00005)]}
+        self.far = {'name': 'far', 'speed_limit': '45 mph',
+                    'nodes': [(33.0 + 10 * _LAT_STEP, -84.01), (33.0 + 10 * _LAT_STEP, -83.99)]}
+
+    def test_nearest_road(self):
+        match = self.matcher.match(33.0 + 2 * _LAT_STEP, -84.005, [self.highway, self.far])
+        self.assertEqual(match.road['name'], 'highway')
+        self.assertEqual(match.speed_limit, 65.0)
+        self.assertAlmostEqual(match.distance, 22.26, places=1)
+
+    def test_distance_to_segment_interior(self):
+        # Far from every node, but on the line between two of them
+        road = {'name': 'long', 'speed_limit': '30', 'nodes': [(33.0, -84.1), (33.0, -83.9)]}
+        match = self.matcher.match(33.0, -84.0, [road])
+        self.assertAlmostEqual(match.distance, 0.0, places=3)
+
+    def test_heading_prefers_road_being_driven(self):
+        # The side street is nearer, but the vehicle is heading east along the highway
+        position = (33.0 + _LAT_STEP, -84.0)
+        self.assertEqual(self.matcher.match(position[0], position[1], [self.highway, self.street]).road['name'],
+                         'street')
+        self.assertEqual(self.matcher.match(position[0], position[1], [self.highway, self.street], 90.0).road['name'],
+                         'highway')
+        self.assertEqual(self.matcher.match(position[0], position[1], [self.highway, self.street], 270.0).road['name'],
+                         'highway')
+        self.assertEqual(self.matcher.match(position[0], position[1], [self.highway, self.street], 0.0).road['name'],
+                         'street')
+
+    def test_too_far(self):
+        self.assertIsNone(self.matcher.match(33.1, -84.0, [self.highway, self.street]))
+        self.assertIsNone(self.matcher.match(33.0, -84.0, []))
+
+    def test_single_node_road(self):
+        match = self.matcher.match(33.0, -84.0, [{'name': 'point', 'speed_limit': 'none', 'nodes': [(33.0, -84.0)]}])
+        self.assertEqual(match.road['name'], 'point')
+        self.assertIsNone(match.speed_limit)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+import numpy
+
+from securityclientpy.fakegpio import FakeGPIO
+from securityclientpy.motion import CameraMotionMonitor, MotionDetector
+from securityclientpy.sensorbus import SensorEventBus
+from securityclientpy.videostreamer import SyntheticFrameSource, VideoStreamer
+
+
+class TestMotionDetector(unittest.TestCase):
+    """set of test for motion.MotionDetector"""
+
+    def setUp(self):
+        self.detector = MotionDetector(min_area=500)
+        self.background = numpy.full((480, 640, 3), 64, dtype=numpy.uint8)
+
+    def _frame_with_square(self, x, y, size):
+        frame = self.background.copy()
+        frame[y:y + size, x:x + size] = 255
+        return frame
+
+    def test_static_scene(self):
+        for i in range(10):
+            motion, area = self.detector.update(self.background)
+            self.assertFalse(motion)
+        self.assertEqual(area, 0.0)
+
+    def test_moving_object(self):
+        self.detector.update(self.background)
+        motion, area = self.detector.update(self._frame_with_square(100, 100, 80))
+        self.assertTrue(motion)
+        self.assertGreater(area, 80 * 80 * 0.5)
+
+    def test_small_change_is_ignored(self):
+        self.detector.update(self.background)
+        motion, area = self.detector.update(self._frame_with_square(100, 100, 4))
+        self.assertFalse(motion)
+
+    def test_background_adapts(self):
+        scene = self._frame_with_square(100, 100, 80)
+        self.detector.update(self.background)
+        for i in range(200):
+            motion, area = self.detector.update(scene)
+        self.assertFalse(motion)
+
+
+class TestCameraMotionMonitor(unittest.TestCase):
+    """set of test for motion.CameraMotionMonitor"""
+
+    def test_publishes_camera_events(self):
+        videostream = VideoStreamer(0, no_video=False, source=SyntheticFrameSource(width=320, height=240, fps=30.0))
+        videostream.start()
+        bus = SensorEventBus(FakeGPIO(), {})
+        reader = bus.subscribe()
+        monitor = CameraMotionMonitor(videostream, bus, sample_fps=10.0)
+        monitor.start()
+
+        events = reader.wait(timeout=3.0)
+        monitor.stop()
+        videostream.release_stream()
+        self.assertTrue(events)
+        self.assertEqual((events[0].source, events[0].value), ('camera', True))
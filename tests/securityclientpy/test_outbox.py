@@ -0,0 +1,130 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from securityclientpy.outbox import Outbox, OutboxFlusher
+from securityclientpy.server_requests import ServerRequests
+from securityclientpy.transport import HttpTransport
+from tests.stub_server import StubServer
+
+
+class TestOutbox(unittest.TestCase):
+    """set of test for outbox.Outbox"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'outbox.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_append_is_durable(self):
+        outbox = Outbox(self.path)
+        outbox.append('security/panic', {'system_id': 'TESTING'})
+        outbox.close()
+
+        outbox = Outbox(self.path)
+        self.assertEqual(len(outbox), 1)
+        self.assertEqual(outbox.peek(10)[0][1:], ('security/panic', {'system_id': 'TESTING'}))
+        outbox.close()
+
+    def test_entry_bound_evicts_oldest(self):
+        outbox = Outbox(self.path, max_entries=3)
+        for i in range(5):
+            outbox.append('notification', {'index': i})
+        self.assertEqual(len(outbox), 3)
+        self.assertEqual(outbox.evicted, 2)
+        self.assertEqual([data['index'] for row_id, path, data in outbox.peek(10)], [2, 3, 4])
+        outbox.close()
+
+    def test_byte_bound(self):
+        outbox = Outbox(self.path, max_bytes=200)
+        for i in range(20):
+            outbox.append('notification', {'message': 'x' * 40})
+        self.assertLessEqual(outbox.size_bytes, 200)
+        outbox.close()
+
+    def test_remove(self):
+        outbox = Outbox(self.path)
+        outbox.append('notification', {})
+        outbox.append('notification', {})
+        outbox.remove([row_id for row_id, path, data in outbox.peek(1)])
+        self.assertEqual(len(outbox), 1)
+        outbox.close()
+
+
+class TestOutboxFlusher(unittest.TestCase):
+    """set of test for outbox.OutboxFlusher against a flapping server"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.server = StubServer().start()
+        self.server.stop()
+        self.server_requests = ServerRequests(
+            self.server.host, 'TESTING', port=self.server.port, outbox_path=os.path.join(self.directory, 'outbox.db')
+        )
+        self.server_requests.flusher.min_backoff = 0.05
+        self.server_requests.flusher.max_backoff = 0.2
+
+    def tearDown(self):
+        self.server_requests.close()
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def _wait_for_empty_outbox(self):
+        deadline = time.time() + 5.0
+        while len(self.server_requests.outbox) and time.time() < deadline:
+            time.sleep(0.02)
+
+    def test_alerts_replayed_when_server_returns(self):
+        self.assertFalse(self.server_requests.send_panic_alert())
+        self.assertFalse(self.server_requests.send_system_breach_notification())
+        self.assertEqual(len(self.server_requests.outbox), 2)
+
+        self.server.start()
+        self._wait_for_empty_outbox()
+        self.assertEqual(len(self.server_requests.outbox), 0)
+        self.assertEqual(len(self.server.requests_for('security/panic')), 1)
+        self.assertEqual(len(self.server.requests_for('security/set_breach')), 1)
+
+    def test_flapping_server(self):
+        for i in range(3):
+            self.server.stop()
+            self.server_requests.send_speed_limit_alert()
+            self.server.start()
+            self._wait_for_empty_outbox()
+        self.assertEqual(len(self.server.requests_for('notification')), 3)
+
+    def test_config_requests_are_not_queued(self):
+        self.assertIsNone(self.server_requests.get_connection())
+        self.assertEqual(len(self.server_requests.outbox), 0)
+
+    def test_flush_stops_at_first_failure(self):
+        transport = HttpTransport('http://{0}:{1}'.format(self.server.host, self.server.port))
+        self.server_requests.flusher.stop()
+        self.server_requests.send_panic_alert()
+        flusher = OutboxFlusher(self.server_requests.outbox, transport)
+        self.assertFalse(flusher.flush())
+        self.assertEqual(len(self.server_requests.outbox), 1)
+        transport.close()
+
+    def test_error_page_does_not_hold_up_queue(self):
+        self.server_requests.send_panic_alert()
+        self.server_requests.send_system_breach_notification()
+        self.server_requests.send_speed_limit_alert()
+        self.assertEqual(len(self.server_requests.outbox), 3)
+
+        # A proxy answers the panic with an html error page, the alerts queued behind it still go out
+        self.server.responses['security/panic'] = (500, '<html><body>500 Internal Server Error</body></html>')
+        self.server.start()
+        self._wait_for_empty_outbox()
+        self.assertEqual(len(self.server_requests.outbox), 0)
+        self.assertEqual(len(self.server.requests_for('security/panic')), 1)
+        self.assertEqual(len(self.server.requests_for('security/set_breach')), 1)
+        self.assertEqual(len(self.server.requests_for('notification')), 1)
+        self.assertEqual(self.server_requests.flusher.unreadable, 1)
+        # Nor is an error page taken for an unreachable server and queued again
+        self.assertFalse(self.server_requests.send_panic_alert())
+        self.assertEqual(len(self.server_requests.outbox), 0)
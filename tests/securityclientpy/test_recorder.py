@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import cv2
+
+from securityclientpy.recorder import BreachRecorder, PrerollBuffer
+from securityclientpy.storage import RecordingStore
+from securityclientpy.videostreamer import SyntheticFrameSource, VideoStreamer
+
+
+class TestBreachRecorder(unittest.TestCase):
+    """set of test for recorder.BreachRecorder using a synthetic frame source"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = RecordingStore(os.path.join(self.directory, 'recordings'))
+
+    def tearDown(self):
+        self.videostream.release_stream()
+        shutil.rmtree(self.directory)
+
+    def _record(self, source, seconds, fps=None, preroll_seconds=0):
+        self.videostream = VideoStreamer(0, no_video=False, source=source)
+        self.videostream.start()
+        preroll = None
+        if preroll_seconds:
+            preroll = PrerollBuffer(self.videostream, seconds=preroll_seconds)
+            preroll.start()
+            time.sleep(preroll_seconds)
+            preroll.stop()
+        recorder = BreachRecorder(self.videostream, self.store, codec='MJPG', fps=fps, preroll=preroll)
+        recorder.start()
+        time.sleep(seconds)
+        recorder.stop()
+        return recorder
+
+    def test_uses_camera_resolution_and_fps(self):
+        recorder = self._record(SyntheticFrameSource(width=160, height=120, fps=25.0), 0.5)
+        stats = recorder.stats()
+        self.assertEqual(stats['fps'], 25.0)
+        self.assertEqual(stats['frame_size'], (160, 120))
+
+        segment = self.store.segments[0]
+        capture = cv2.VideoCapture(self.store.segment_path(segment.segment_id, segment.start))
+        success, frame = capture.read()
+        capture.release()
+        self.assertTrue(success)
+        self.assertEqual(frame.shape[:2], (120, 160))
+
+    def test_output_is_paced_by_timestamps(self):
+        # Frames arrive as fast as the source can make them, the output keeps to 10 fps
+        recorder = self._record(SyntheticFrameSource(width=80, height=60, realtime=False), 1.0, fps=10.0)
+        stats = recorder.stats()
+        self.assertGreater(stats['frames_skipped'], 0)
+        self.assertTrue(8 <= stats['frames_written'] <= 12, stats)
+
+    def test_gaps_are_filled(self):
+        recorder = self._record(SyntheticFrameSource(width=80, height=60, fps=5.0), 1.0, fps=20.0)
+        stats = recorder.stats()
+        self.assertGreater(stats['frames_repeated'], 0)
+        self.assertTrue(14 <= stats['frames_written'] <= 22, stats)
+
+    def test_output_is_segmented(self):
+        self.store.segment_seconds = 0.5
+        recorder = self._record(SyntheticFrameSource(width=80, height=60, fps=20.0), 1.6, fps=10.0)
+        segments = self.store.segments
+        self.assertTrue(3 <= len(segments) <= 4, segments)
+        self.assertEqual(recorder.segments, segments)
+        for previous, segment in zip(segments, segments[1:]):
+            self.assertAlmostEqual(previous.end, segment.start)
+            self.assertEqual(previous.offset + previous.size, segment.offset)
+
+    def test_preroll_is_written_first(self):
+        recorder = self._record(SyntheticFrameSource(width=80, height=60, fps=20.0), 0.5, fps=10.0, preroll_seconds=1.0)
+        stats = recorder.stats()
+        self.assertGreater(stats['preroll_frames'], 5)
+        self.assertTrue(13 <= stats['frames_written'] <= 17, stats)
+
+
+class TestPrerollBuffer(unittest.TestCase):
+    """set of test for recorder.PrerollBuffer"""
+
+    def setUp(self):
+        self.source = SyntheticFrameSource(width=160, height=120, realtime=False)
+
+    def _frame(self):
+        success, frame = self.source.read()
+        return frame
+
+    def test_keeps_preroll_length(self):
+        preroll = PrerollBuffer(None, seconds=20.0)
+        for i in range(50):
+            preroll.add(self._frame(), float(i))
+        frames = preroll.snapshot()
+        self.assertEqual(frames[0][0], 29.0)
+        self.assertEqual(frames[-1][0], 49.0)
+
+    def test_memory_cap(self):
+        preroll = PrerollBuffer(None, seconds=60.0, max_bytes=5000)
+        for i in range(50):
+            preroll.add(self._frame(), i * 0.1)
+        self.assertLessEqual(preroll.size_bytes, 5000)
+        self.assertGreater(preroll.frames_evicted, 0)
+
+    def test_decode_round_trip(self):
+        preroll = PrerollBuffer(None)
+        preroll.add(self._frame(), 1.0)
+        timestamp, data = preroll.snapshot()[0]
+        self.assertEqual(PrerollBuffer.decode(data).shape, (120, 160, 3))
@@ -0,0 +1,116 @@
+import threading
+import time
+import unittest
+
+from securityclientpy.fakegpio import FakeGPIO
+from securityclientpy.sensorbus import EventRingBuffer, SensorEventBus
+
+
+class _YieldingRing(EventRingBuffer):
+    """lets other threads run between reading the head and acting on it, and keeps every head set"""
+
+    def __init__(self, capacity):
+        self.heads = []
+        super(_YieldingRing, self).__init__(capacity)
+
+    @property
+    def _head(self):
+        head = self._head_value
+        time.sleep(0.0001)
+        return head
+
+    @_head.setter
+    def _head(self, head):
+        self.heads.append(head)
+        self._head_value = head
+
+
+class TestEventRingBuffer(unittest.TestCase):
+    """set of test for sensorbus.EventRingBuffer"""
+
+    def setUp(self):
+        self.ring = EventRingBuffer(capacity=4)
+
+    def test_read_in_order(self):
+        self.ring.append(1.0, 'motion', True)
+        self.ring.append(2.0, 'motion', False)
+        events, cursor, missed = self.ring.read(0)
+        self.assertEqual([e.timestamp for e in events], [1.0, 2.0])
+        self.assertEqual(cursor, 2)
+        self.assertEqual(missed, 0)
+
+        events, cursor, missed = self.ring.read(cursor)
+        self.assertEqual(events, [])
+        self.assertEqual(cursor, 2)
+
+    def test_overrun_counts_missed(self):
+        for i in range(10):
+            self.ring.append(float(i), 'vibration', True)
+        events, cursor, missed = self.ring.read(0)
+        self.assertEqual(missed, 6)
+        self.assertEqual([e.sequence for e in events], [6, 7, 8, 9])
+        self.assertEqual(cursor, 10)
+
+    def test_head_never_goes_back_with_many_producers(self):
+        ring = _YieldingRing(capacity=64)
+        producers = [
+            threading.Thread(target=lambda: [ring.append(0.0, 'motion', True) for i in range(250)])
+            for j in range(4)
+        ]
+        for producer in producers:
+            producer.start()
+        for producer in producers:
+            producer.join()
+
+        self.assertEqual(ring.heads, sorted(ring.heads))
+        self.assertEqual(ring.head, 1000)
+        events, cursor, missed = ring.read(0)
+        self.assertEqual((len(events), missed, cursor), (64, 1000 - 64, 1000))
+
+
+class TestSensorEventBus(unittest.TestCase):
+    """set of test for sensorbus.SensorEventBus"""
+
+    def setUp(self):
+        self.gpio = FakeGPIO()
+        self.gpio.setup(22, self.gpio.IN, pull_up_down=self.gpio.PUD_DOWN)
+        self.gpio.setup(27, self.gpio.IN, pull_up_down=self.gpio.PUD_DOWN)
+        self.bus = SensorEventBus(self.gpio, {'motion': 22, 'vibration': 27})
+        self.bus.start()
+
+    def tearDown(self):
+        self.bus.stop()
+
+    def test_edges_are_published(self):
+        reader = self.bus.subscribe()
+        self.gpio.pulse(27)
+        self.gpio.set_input(22, True)
+
+        events = reader.wait(0)
+        self.assertEqual([(e.source, e.value) for e in events],
+                         [('vibration', True), ('vibration', False), ('motion', True)])
+
+    def test_wait_times_out_without_events(self):
+        reader = self.bus.subscribe()
+        self.assertEqual(reader.wait(0.01), [])
+
+    def test_readers_are_independent(self):
+        first = self.bus.subscribe()
+        second = self.bus.subscribe()
+        self.gpio.pulse(27)
+        self.assertEqual(len(first.poll()), 2)
+        self.assertEqual(len(second.poll()), 2)
+
+    def test_listeners_see_every_event(self):
+        events = []
+        self.bus.add_listener(events.append)
+        self.gpio.pulse(22)
+        self.bus.publish('camera', True, 5.0)
+        self.assertEqual([(e.source, e.value) for e in events], [('motion', True), ('motion', False), ('camera', True)])
+        self.assertEqual(events[-1].timestamp, 5.0)
+
+    def test_stop_removes_callbacks(self):
+        reader = self.bus.subscribe()
+        self.bus.stop()
+        self.gpio.pulse(22)
+        self.assertEqual(reader.poll(), [])
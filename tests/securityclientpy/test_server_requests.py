@@ -0,0 +1,46 @@
+import unittest
+
+from securityclientpy.server_requests import ServerRequests
+from tests.stub_server import StubServer
+
+
+class TestServerRequests(unittest.TestCase):
+    """set of test for server_requests.ServerRequests"""
+
+    def setUp(self):
+        self.server = StubServer().start()
+        self.server_requests = ServerRequests(self.server.host, 'TESTING', port=self.server.port)
+
+    def tearDown(self):
+        self.server_requests.close()
+        self.server.stop()
+
+    def test_request_adds_system_id(self):
+        self.assertTrue(self.server_requests.send_speed_limit_alert())
+        sent = self.server.requests_for('notification')
+        self.assertEqual(sent[0]['system_id'], 'TESTING')
+        self.assertIn('message', sent[0])
+        self.assertNotIn('message', self.server_requests.data)
+
+    def test_connections_are_reused(self):
+        for i in range(5):
+            self.assertTrue(self.server_requests.send_panic_alert())
+        stats = self.server_requests.stats()
+        self.assertEqual(stats['requests'], 5)
+        self.assertEqual(stats['connections'], 1)
+        self.assertEqual(stats['reused_connections'], 4)
+
+    def test_failure_code(self):
+        self.server.responses['security/panic'] = {'code': 404, 'message': 'error'}
+        self.assertFalse(self.server_requests.send_panic_alert())
+
+    def test_server_unreachable(self):
+        self.server.stop()
+        self.assertFalse(self.server_requests.send_system_breach_notification())
+        self.assertIsNone(self.server_requests.get_connection())
+        self.assertEqual(self.server_requests.stats()['failures'], 2)
+
+    def test_async_alert_returns_future(self):
+        future = self.server_requests.send_panic_alert_async()
+        self.assertTrue(future.result(timeout=5))
+        self.assertEqual(self.server_requests.stats()['dispatcher']['dispatched'], 1)
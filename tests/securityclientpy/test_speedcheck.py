@@ -0,0 +1,109 @@
+from concurrent.futures import Future
+import unittest
+
+from securityclientpy.mapmatch import RoadMatcher
+from securityclientpy.speedcheck import SpeedCheckScheduler
+
+# About 11 m of latitude
+_LAT_STEP = 0.0001
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSpeedCheckScheduler(unittest.TestCase):
+    """set of test for speedcheck.SpeedCheckScheduler"""
+
+    def setUp(self):
+        self.clock = _Clock()
+        self.scheduler = SpeedCheckScheduler(RoadMatcher(), clock=self.clock)
+        # North-south avenue and an east-west street crossing it
+        self.avenue = {'name': 'avenue', 'speed_limit': '45 mph', 'nodes': [(33.0, -84.0), (33.1, -84.0)]}
+        self.street = {'name': 'street', 'speed_limit': '25 mph', 'nodes': [(33.05, -84.01), (33.05, -83.99)]}
+        self.lookups = 0
+
+    def lookup(self):
+        self.lookups += 1
+        return [self.avenue, self.street]
+
+    def test_interval_follows_speed(self):
+        self.assertEqual(self.scheduler.next_interval(0.0), 30.0)
+        self.assertEqual(self.scheduler.next_interval(5.0), 30.0)
+        self.assertAlmostEqual(self.scheduler.next_interval(30.0), 250.0 / (30.0 * 0.44704))
+        self.assertEqual(self.scheduler.next_interval(300.0), 2.0)
+
+    def test_lookup_skipped_on_same_road(self):
+        road = self.scheduler.match(33.01, -84.0, 0.0, self.lookup)
+        self.assertEqual(road.road['name'], 'avenue')
+        for i in range(1, 10):
+            road = self.scheduler.match(33.01 + i * 10 * _LAT_STEP, -84.0, 180.0, self.lookup)
+            self.assertEqual(road.road['name'], 'avenue')
+        self.assertEqual(self.lookups, 1)
+        self.assertEqual(self.scheduler.lookups_skipped, 9)
+        # The matcher still holds the arrays for the roads around the vehicle
+        self.assertEqual(self.scheduler.road_matcher._cached[1], [self.avenue, self.street])
+
+    def test_lookup_when_road_changes(self):
+        self.scheduler.match(33.01, -84.0, 0.0, self.lookup)
+        # Turned onto the street: close to the avenue still, but heading across it
+        road = self.scheduler.match(33.05, -84.0001, 90.0, self.lookup)
+        self.assertEqual(road.road['name'], 'street')
+        # Left the avenue behind
+        road = self.scheduler.match(33.05, -84.005, 90.0, self.lookup)
+        self.assertEqual(road.road['name'], 'street')
+        self.assertEqual(self.lookups, 2)
+
+    def test_no_road(self):
+        self.assertIsNone(self.scheduler.match(34.0, -84.0, None, self.lookup))
+        self.assertIsNone(self.scheduler.match(34.0, -84.0, None, self.lookup))
+        self.assertEqual(self.lookups, 2)
+
+    def test_alert_cooldown(self):
+        alerts = []
+        for i in range(40):
+            alerts.append(self.scheduler.check(True))
+            self.clock.now += 10.0
+        # One alert when speeding starts, one more after the 300 s cooldown
+        self.assertEqual(alerts.count(True), 2)
+        self.assertTrue(alerts[0])
+        self.assertEqual(self.scheduler.alerts_suppressed, 38)
+
+        # Dropping under the limit and back doesn't repeat the alert within the cooldown
+        self.assertFalse(self.scheduler.check(False))
+        self.clock.now += 10.0
+        self.assertFalse(self.scheduler.check(True))
+        self.scheduler.check(False)
+        self.clock.now += 300.0
+        self.assertTrue(self.scheduler.check(True))
+
+    def test_stats(self):
+        self.scheduler.check(False)
+        self.clock.now += 6.0
+        self.scheduler.check(True)
+        notification = Future()
+        self.scheduler.alert_sent(notification)
+        self.clock.now += 0.25
+        notification.set_result({'code': 201})
+
+        failed = Future()
+        self.scheduler.alert_sent(failed)
+        failed.set_result(None)
+
+        self.clock.now = 1000.0 + 3600.0
+        stats = self.scheduler.stats()
+        self.assertEqual(stats['checks'], 2)
+        self.assertAlmostEqual(stats['checks_per_hour'], 2.0)
+        self.assertEqual(stats['alerts'], 1)
+        self.assertEqual(stats['alerts_failed'], 1)
+        self.assertEqual(stats['max_detection_delay'], 6.0)
+        self.assertAlmostEqual(stats['mean_delivery_latency'], 0.25)
+
+
+if __name__ == '__main__':
+    unittest.main()
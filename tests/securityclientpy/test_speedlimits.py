@@ -0,0 +1,143 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from securityclientpy.speedlimits import SpeedLimitStore, geohash, geohash_bbox
+
+
+def _street(way_id, latitude, west, east, maxspeed='25 mph', name=None):
+    """east-west street at a latitude"""
+    return {'id': way_id, 'name': name or 'street {0}'.format(way_id), 'maxspeed': maxspeed,
+            'nodes': [(latitude, west), (latitude, (west + east) / 2), (latitude, east)]}
+
+
+class TestGeohash(unittest.TestCase):
+    """set of test for speedlimits geohash helpers"""
+
+    def test_known_value(self):
+        self.assertEqual(geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+
+    def test_bbox_contains_point(self):
+        south, west, north, east = geohash_bbox(geohash(33.7490, -84.3880, 6))
+        self.assertTrue(south <= 33.7490 <= north)
+        self.assertTrue(west <= -84.3880 <= east)
+
+
+class TestSpeedLimitStore(unittest.TestCase):
+    """set of test for speedlimits.SpeedLimitStore"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'speedlimits.db')
+        self.fetches = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def fetch(self, bboxes):
+        self.fetches.append(bboxes)
+        ways = []
+        for south, west, north, east in bboxes:
+            ways.append(_street(len(ways) + 100 * len(self.fetches), (south + north) / 2, west, east))
+        return ways
+
+    def test_nearby(self):
+        store = SpeedLimitStore(self.path)
+        store.import_ways([_street(1, 33.7490, -84.40, -84.38), _street(2, 33.7600, -84.40, -84.38)])
+        roads = store.nearby(33.7491, -84.39, 100)
+        self.assertEqual([road['name'] for road in roads], ['street 1'])
+        self.assertEqual(roads[0]['speed_limit'], '25 mph')
+        self.assertEqual(roads[0]['nodes'].shape, (3, 2))
+        store.close()
+
+    def test_long_way_listed_in_every_tile(self):
+        store = SpeedLimitStore(self.path)
+        # Two nodes 5 km apart, more than a tile wide
+        store.import_ways([{'id': 1, 'name': 'highway', 'maxspeed': '65 mph',
+                            'nodes': [(33.7490, -84.45), (33.7490, -84.40)]}])
+        self.assertEqual(len(store.nearby(33.7490, -84.425, 50)), 1)
+        store.close()
+
+    def test_persistent(self):
+        store = SpeedLimitStore(self.path)
+        store.import_ways([_street(1, 33.7490, -84.40, -84.38)], ['dn5bpm'])
+        store.close()
+
+        store = SpeedLimitStore(self.path)
+        self.assertEqual(store.tiles, 1)
+        self.assertEqual(len(store.nearby(33.7490, -84.39)), 1)
+        store.close()
+
+    def test_lru_cache(self):
+        store = SpeedLimitStore(self.path, cache_tiles=4)
+        store.import_ways([_street(1, 33.7490, -84.40, -84.38)])
+        store.nearby(33.7490, -84.39, 10)
+        misses = store.cache_misses
+        store.nearby(33.7490, -84.39, 10)
+        self.assertEqual(store.cache_misses, misses)
+        self.assertGreater(store.cache_hits, 0)
+
+        # Visit enough other tiles to evict the first one
+        for i in range(8):
+            store.nearby(34.0 + i * 0.1, -84.0, 10)
+        store.nearby(33.7490, -84.39, 10)
+        self.assertGreater(store.cache_misses, misses + 8)
+        store.close()
+
+    def test_import_invalidates_cached_tile(self):
+        store = SpeedLimitStore(self.path)
+        store.import_ways([_street(1, 33.7490, -84.40, -84.38)])
+        self.assertEqual(len(store.nearby(33.7490, -84.39)), 1)
+        store.import_ways([_street(1, 33.7490, -84.40, -84.38, maxspeed='35 mph')])
+        self.assertEqual(store.nearby(33.7490, -84.39)[0]['speed_limit'], '35 mph')
+        store.close()
+
+    def test_prefetch_downloads_missing_tiles_once(self):
+        store = SpeedLimitStore(self.path, fetch=self.fetch)
+        downloaded = store.prefetch([(33.7490, -84.39)], 2000)
+        self.assertGreater(downloaded, 0)
+        self.assertEqual(store.missing_tiles([(33.7490, -84.39)], 2000), [])
+        self.assertGreater(len(store.nearby(33.7490, -84.39, 2000)), 0)
+
+        fetches = len(self.fetches)
+        self.assertEqual(store.prefetch([(33.7490, -84.39)], 2000), 0)
+        self.assertEqual(len(self.fetches), fetches)
+        store.close()
+
+    def test_prefetch_backs_off_when_offline(self):
+        calls = []
+
+        def offline(bboxes):
+            calls.append(bboxes)
+            raise IOError('network is unreachable')
+
+        store = SpeedLimitStore(self.path, fetch=offline)
+        self.assertEqual(store.prefetch([(33.7490, -84.39)]), 0)
+        self.assertEqual(store.prefetch([(33.7490, -84.39)]), 0)
+        self.assertEqual(len(calls), 1)
+        store.close()
+
+
+    def test_prefetch_async_does_not_wait(self):
+        release = threading.Event()
+
+        def slow(bboxes):
+            release.wait(2.0)
+            return self.fetch(bboxes)
+
+        store = SpeedLimitStore(self.path, fetch=slow)
+        self.assertTrue(store.prefetch_async([(33.7490, -84.39)], 2000))
+        # Only one download at a time, and the roads already stored are served meanwhile
+        self.assertFalse(store.prefetch_async([(33.7490, -84.39)], 2000))
+        self.assertEqual(store.nearby(33.7490, -84.39), [])
+        release.set()
+        self.assertTrue(store.wait_for_prefetch(2.0))
+        self.assertGreater(len(store.nearby(33.7490, -84.39, 2000)), 0)
+        self.assertFalse(store.prefetch_async([(33.7490, -84.39)], 2000))
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
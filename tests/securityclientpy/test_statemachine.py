@@ -0,0 +1,154 @@
+import random
+import threading
+import unittest
+
+from securityclientpy.statemachine import SecurityStateMachine, DISARMED, ARMING, ARMED, BREACHED, ACKNOWLEDGED, \
+    ARM, READY, BREACH, FALSE_ALARM, DISARM, RESET, RESTORE
+
+
+class TestSecurityStateMachine(unittest.TestCase):
+    """set of test for statemachine.SecurityStateMachine"""
+
+    def setUp(self):
+        self.machine = SecurityStateMachine()
+        self.transitions = []
+        self.machine.add_listener(self.transitions.append)
+        self.machine.start()
+
+    def tearDown(self):
+        self.machine.stop()
+
+    def _submit(self, event, session=None, **data):
+        return self.machine.submit(event, session, **data).result(timeout=1)
+
+    def test_breach_cycle(self):
+        self.assertEqual(self._submit(ARM).current.state, ARMING)
+        session = self.machine.status.session
+        self.assertEqual(self._submit(READY, session, occupied=True).current.state, ARMED)
+        self.assertTrue(self.machine.status.occupied)
+        self.assertEqual(self._submit(BREACH, session).current.state, BREACHED)
+        self.assertTrue(self.machine.status.armed and self.machine.status.breached)
+        self.assertEqual(self._submit(FALSE_ALARM).current.state, ACKNOWLEDGED)
+        self.assertFalse(self.machine.status.armed)
+        self.assertEqual(self._submit(RESET, session).current.state, DISARMED)
+        self.assertEqual([transition.event for transition in self.transitions],
+                         [ARM, READY, BREACH, FALSE_ALARM, RESET])
+        self.assertEqual(self.machine.status.version, 5)
+
+    def test_invalid_events_rejected(self):
+        self.assertIsNone(self._submit(DISARM))
+        self.assertIsNone(self._submit(FALSE_ALARM))
+        self._submit(ARM)
+        # A second arm can't start another armed thread
+        self.assertIsNone(self._submit(ARM))
+        self.assertIsNone(self._submit(BREACH))
+        self.assertEqual(self.machine.rejected, 4)
+        self.assertEqual(len(self.transitions), 1)
+
+    def test_stale_session_rejected(self):
+        self._submit(ARM)
+        stale = self.machine.status.session
+        self._submit(DISARM)
+        self._submit(ARM)
+        self.assertIsNone(self._submit(READY, stale))
+        self.assertEqual(self._submit(READY, stale + 1).current.state, ARMED)
+
+    def test_restore_breach(self):
+        transition = self._submit(RESTORE)
+        self.assertEqual((transition.previous.state, transition.current.state), (DISARMED, BREACHED))
+        self.assertEqual(self._submit(DISARM).current.state, ACKNOWLEDGED)
+
+    def test_snapshot_immutable(self):
+        status = self.machine.status
+        with self.assertRaises(AttributeError):
+            status.state = ARMED
+        self._submit(ARM)
+        self.assertEqual(status.state, DISARMED)
+        self.assertEqual(self.machine.status.as_dict()['state'], ARMING)
+
+    def test_wait(self):
+        version = self.machine.status.version
+        self.assertEqual(self.machine.wait(version, timeout=0.05).version, version)
+        threading.Timer(0.05, self.machine.submit, (ARM,)).start()
+        self.assertEqual(self.machine.wait(version, timeout=1).state, ARMING)
+
+    def test_stopped(self):
+        self.machine.stop()
+        self.assertIsNone(self._submit(ARM))
+        self.assertEqual(self.machine.wait(0).state, DISARMED)
+
+    def test_stress(self):
+        """hammers arm / disarm / false alarm, and the armed loop's own events, from many threads"""
+        active = [0]
+        overlaps = []
+        armed_threads = []
+        snapshots_bad = []
+        stopped = threading.Event()
+
+        def listener(transition):
+            active[0] += 1
+            if active[0] > 1:
+                overlaps.append(transition)
+            current = transition.current
+            if current.state == ARMING:
+                armed_threads.append(current.session)
+            # Occupancy comes from the arming's own READY, and a breach keeps it
+            if current.state == ARMED and current.occupied != bool(transition.data.get('occupied')):
+                snapshots_bad.append(current)
+            if current.state == BREACHED and transition.event == BREACH and \
+                    (current.session, current.occupied) != (transition.previous.session, transition.previous.occupied):
+                snapshots_bad.append(current)
+            active[0] -= 1
+
+        self.machine.add_listener(listener)
+
+        def reader():
+            last = self.machine.status
+            while not stopped.is_set():
+                status = self.machine.status
+                # Snapshots only move forward, and an older one never comes back
+                if status is not last and (status.version <= last.version or status.session < last.session):
+                    snapshots_bad.append(status)
+                if status.occupied and status.state not in (ARMED, BREACHED):
+                    snapshots_bad.append(status)
+                last = status
+
+        def hammer(seed):
+            rng = random.Random(seed)
+            for i in range(300):
+                event = rng.choice([ARM, DISARM, FALSE_ALARM, READY, BREACH, RESET])
+                # Half carry the session read just now, which a concurrent arming may already have replaced
+                session = None
+                if event in (READY, BREACH, RESET) and rng.random() < 0.5:
+                    session = self.machine.status.session
+                self.machine.submit(event, session, occupied=rng.random() < 0.5)
+
+        readers = [threading.Thread(target=reader) for i in range(2)]
+        hammers = [threading.Thread(target=hammer, args=(seed,)) for seed in range(16)]
+        for thread in readers + hammers:
+            thread.start()
+        for thread in hammers:
+            thread.join()
+        # Every queued event has been applied once this one is
+        self.machine.submit(DISARM).result(timeout=5)
+        stopped.set()
+        for thread in readers:
+            thread.join()
+
+        self.assertEqual(overlaps, [])
+        self.assertEqual(snapshots_bad, [])
+        self.assertEqual(self.machine.transitions + self.machine.rejected, 16 * 300 + 1)
+        self.assertEqual(self.machine.status.version, len(self.transitions))
+        # Transitions form a single chain, each starting where the last one ended
+        for before, after in zip(self.transitions, self.transitions[1:]):
+            self.assertIs(after.previous, before.current)
+        # Every state was gone through, so the checks above weren't vacuous
+        self.assertEqual(set(transition.current.state for transition in self.transitions),
+                         set([DISARMED, ARMING, ARMED, BREACHED, ACKNOWLEDGED]))
+        # One armed thread per arming session
+        self.assertEqual(armed_threads, sorted(set(armed_threads)))
+        self.assertEqual(len(armed_threads), self.machine.status.session)
+
+
+if __name__ == '__main__':
+    unittest.main()
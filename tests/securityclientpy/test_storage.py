@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from securityclientpy.storage import RecordingStore
+
+
+class TestRecordingStore(unittest.TestCase):
+    """set of test for storage.RecordingStore"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.root = os.path.join(self.directory, 'recordings')
+        self.store = RecordingStore(self.root, segment_seconds=10.0, quota_bytes=1000)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _add_segment(self, store, start, size=100):
+        segment_id, path = store.new_segment(start)
+        with open(path, 'wb') as fp:
+            fp.write(b'x' * size)
+        return store.finish_segment(segment_id, start, start + 10.0)
+
+    def test_names_do_not_collide(self):
+        first = self.store.new_segment(1000.0)
+        second = self.store.new_segment(1000.0)
+        self.assertNotEqual(first[1], second[1])
+
+    def test_offsets_and_find(self):
+        for i in range(5):
+            self._add_segment(self.store, 1000.0 + i * 10.0)
+        self.assertEqual([s.offset for s in self.store.segments], [0, 100, 200, 300, 400])
+        found = self.store.find(1015.0, 1025.0)
+        self.assertEqual([s.start for s in found], [1010.0, 1020.0])
+        self.assertEqual(self.store.find(900.0, 990.0), [])
+        self.assertEqual(len(self.store.find(0.0, 5000.0)), 5)
+
+    def test_quota_evicts_oldest(self):
+        for i in range(15):
+            self._add_segment(self.store, 1000.0 + i * 10.0)
+        self.assertLessEqual(self.store.total_bytes, 1000)
+        self.assertEqual(self.store.evicted, 5)
+        self.assertEqual(self.store.segments[0].start, 1050.0)
+        self.assertEqual(len([name for name in os.listdir(self.root) if name.endswith('.avi')]), 10)
+
+    def test_index_is_reloaded(self):
+        for i in range(12):
+            self._add_segment(self.store, 1000.0 + i * 10.0)
+        reloaded = RecordingStore(self.root, quota_bytes=1000)
+        self.assertEqual(reloaded.segments, self.store.segments)
+        segment = self._add_segment(reloaded, 2000.0)
+        self.assertEqual(segment.segment_id, 12)
+        self.assertEqual(segment.offset, 1200)
@@ -0,0 +1,87 @@
+import unittest
+
+from securityclientpy.routes import app
+from securityclientpy.routes.video import Video
+from securityclientpy.streaming import MjpegBroadcaster, StreamSubscriber
+from securityclientpy.videostreamer import SyntheticFrameSource, VideoStreamer
+
+
+class TestMjpegBroadcaster(unittest.TestCase):
+    """set of test for streaming.MjpegBroadcaster using a synthetic frame source"""
+
+    def setUp(self):
+        self.videostream = VideoStreamer(0, no_video=False, source=SyntheticFrameSource(width=160, height=120, fps=60.0))
+        self.videostream.start()
+        self.broadcaster = MjpegBroadcaster(self.videostream, max_fps=60.0)
+
+    def tearDown(self):
+        self.videostream.release_stream()
+
+    def test_frames_are_encoded_once_per_tier(self):
+        first = self.broadcaster.subscribe()
+        second = self.broadcaster.subscribe()
+        for i in range(10):
+            self.assertIsNotNone(first.next_frame(timeout=1.0))
+            second.next_frame(timeout=1.0)
+        first.close()
+        second.close()
+        self.assertLessEqual(self.broadcaster.frames_encoded, first.frames_sent + first.frames_dropped + 1)
+
+    def test_frame_is_multipart_jpeg(self):
+        success, frame = SyntheticFrameSource(width=160, height=120, realtime=False).read()
+        part = self.broadcaster.encode(frame, 0)
+        self.assertTrue(part.startswith(b'--frame\r\nContent-Type: image/jpeg\r\n'))
+        self.assertIn(b'\xff\xd8', part)
+        self.assertLess(len(self.broadcaster.encode(frame, 3)), len(part))
+
+    def test_slow_client_drops_and_steps_down(self):
+        subscriber = StreamSubscriber(self.broadcaster)
+        for i in range(StreamSubscriber._ADAPT_WINDOW):
+            subscriber.deliver(b'a')
+            subscriber.deliver(b'b')
+            self.assertEqual(subscriber.next_frame(timeout=0), b'b')
+        self.assertEqual(subscriber.frames_dropped, StreamSubscriber._ADAPT_WINDOW)
+        self.assertGreater(subscriber.tier, 0)
+
+    def test_fast_client_steps_up(self):
+        subscriber = StreamSubscriber(self.broadcaster, tier=2)
+        for i in range(StreamSubscriber._ADAPT_WINDOW):
+            subscriber.deliver(b'a')
+            subscriber.next_frame(timeout=0)
+        self.assertEqual(subscriber.tier, 1)
+
+    def test_encoding_thread_stops_without_clients(self):
+        subscriber = self.broadcaster.subscribe()
+        subscriber.next_frame(timeout=1.0)
+        subscriber.close()
+        self.assertEqual(self.broadcaster.subscribers, 0)
+
+
+class TestVideoRoute(unittest.TestCase):
+    """set of test for routes.video.Video"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.video = Video('TESTING', None)
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def test_requires_system_id(self):
+        response = self.client.get('/video/stream?system_id=WRONG')
+        self.assertEqual(response.get_json()['code'], 404)
+
+    def test_video_disabled(self):
+        self.video.broadcaster = None
+        response = self.client.get('/video/stream?system_id=TESTING')
+        self.assertEqual(response.get_json()['message'], 'Video is disabled')
+
+    def test_stream(self):
+        videostream = VideoStreamer(0, no_video=False, source=SyntheticFrameSource(width=160, height=120, fps=60.0))
+        videostream.start()
+        self.video.broadcaster = MjpegBroadcaster(videostream)
+        response = self.client.get('/video/stream?system_id=TESTING', buffered=False)
+        self.assertTrue(response.mimetype.startswith('multipart/x-mixed-replace'))
+        self.assertTrue(next(iter(response.response)).startswith(b'--frame'))
+        response.close()
+        videostream.release_stream()
@@ -0,0 +1,173 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from securityclientpy.fakethermal import FakeW1Bus
+from securityclientpy.thermal import TemperatureMonitor, TemperatureSample, TemperatureSampler, parse_w1_slave
+
+
+def _sample(t, fahrenheit):
+    return TemperatureSample(round((fahrenheit - 32.0) * 5.0 / 9.0, 1), fahrenheit, t)
+
+
+class TestParseW1Slave(unittest.TestCase):
+    """set of test for thermal.parse_w1_slave"""
+
+    def test_parse(self):
+        lines = ['72 01 4b 46 7f ff 0e 10 57 : crc=57 YES\n', '72 01 4b 46 7f ff 0e 10 57 t=23125\n']
+        self.assertEqual(parse_w1_slave(lines), 23.125)
+        self.assertEqual(parse_w1_slave([lines[0], 'ff ff t=-1500\n']), -1.5)
+
+    def test_bad_data(self):
+        self.assertIsNone(parse_w1_slave(['72 01 : crc=57 NO\n', '72 01 t=23125\n']))
+        self.assertIsNone(parse_w1_slave(['72 01 : crc=57 YES\n']))
+        self.assertIsNone(parse_w1_slave(['72 01 : crc=57 YES\n', '72 01\n']))
+        self.assertIsNone(parse_w1_slave([]))
+
+
+class TestTemperatureSampler(unittest.TestCase):
+    """set of test for thermal.TemperatureSampler"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.bus = FakeW1Bus(os.path.join(self.directory, 'devices'))
+        self.device = self.bus.add_sensor(celcius=21.5)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_find_device(self):
+        self.assertEqual(TemperatureSampler.find_device(self.bus.root), self.device)
+        self.assertIsNone(TemperatureSampler.find_device(os.path.join(self.directory, 'empty')))
+
+    def test_sample(self):
+        sampler = TemperatureSampler(self.device)
+        self.assertIsNone(sampler.latest())
+        sample = sampler.sample()
+        self.assertEqual(sample.celcius, 21.5)
+        self.assertEqual(sample.fahrenheit, 70.7)
+        latest = sampler.latest()
+        self.assertEqual(latest['celcius'], 21.5)
+        self.assertFalse(latest['stale'])
+
+    def test_bounded_retries(self):
+        sampler = TemperatureSampler(self.device, max_retries=2, retry_seconds=0.0)
+        sampler.sample()
+        self.bus.set_temperature(self.device, 30.0, crc_ok=False)
+        self.assertIsNone(sampler.sample())
+        self.assertEqual(sampler.retries, 2)
+        self.assertEqual(sampler.failures, 1)
+        # The last good sample is kept
+        self.assertEqual(sampler.latest()['celcius'], 21.5)
+
+        # The power on value means the conversion didn't run
+        self.bus.set_temperature(self.device, 85.0)
+        self.assertIsNone(sampler.sample())
+
+        self.bus.remove_sensor(self.device)
+        self.assertIsNone(sampler.sample())
+        self.assertEqual(sampler.failures, 3)
+
+    def test_stale(self):
+        sampler = TemperatureSampler(self.device, stale_after=0.05)
+        sampler.sample()
+        self.bus.remove_sensor(self.device)
+        time.sleep(0.1)
+        sampler.sample()
+        latest = sampler.latest()
+        self.assertTrue(latest['stale'])
+        self.assertGreater(latest['age'], 0.05)
+
+    def test_history(self):
+        sampler = TemperatureSampler(self.device, history=3)
+        for celcius in (20.0, 21.0, 22.0, 23.0):
+            self.bus.set_temperature(self.device, celcius)
+            sampler.sample()
+        self.assertEqual([sample.celcius for sample in sampler.history()], [21.0, 22.0, 23.0])
+
+    def test_background_sampling(self):
+        sampler = TemperatureSampler(self.device, interval=0.01)
+        samples = []
+        sampler.add_listener(samples.append)
+        sampler.start()
+        deadline = time.time() + 2.0
+        while len(samples) < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        sampler.stop()
+        self.assertFalse(sampler.running)
+        self.assertGreaterEqual(len(samples), 3)
+
+    def test_no_device(self):
+        sampler = TemperatureSampler(None)
+        self.assertIsNone(sampler.sample())
+        self.assertIsNone(sampler.latest())
+
+
+class TestTemperatureMonitor(unittest.TestCase):
+    """set of test for thermal.TemperatureMonitor"""
+
+    def setUp(self):
+        self.monitor = TemperatureMonitor(threshold=85.0, clear_threshold=80.0, rise_rate=1.0, rise_floor=75.0,
+                                          smoothing_seconds=60.0, repeat_seconds=600.0, bucket_seconds=60.0)
+        self.alerts = []
+        self.monitor.add_listener(self.alerts.append)
+
+    def test_smoothing_ignores_spike(self):
+        for t in range(0, 600, 5):
+            self.monitor.add_sample(_sample(float(t), 70.0))
+        self.monitor.add_sample(_sample(600.0, 120.0))
+        self.assertLess(self.monitor.smoothed, 75.0)
+        for t in range(605, 900, 5):
+            self.monitor.add_sample(_sample(float(t), 70.0))
+        self.assertEqual(self.alerts, [])
+        self.assertAlmostEqual(self.monitor.smoothed, 70.0, places=1)
+
+    def test_over_temperature_hysteresis(self):
+        self.monitor.repeat_seconds = 3600.0
+        t = 0.0
+        for fahrenheit in [80.0] * 20 + [90.0] * 60 + [83.0] * 60 + [90.0] * 60:
+            self.monitor.add_sample(_sample(t, fahrenheit))
+            t += 5.0
+        over = [alert for alert in self.alerts if alert.kind == TemperatureMonitor.OVER_TEMPERATURE]
+        # Dropping to 83F isn't cool enough to re-arm, so the second hot spell doesn't alert again
+        self.assertEqual(len(over), 1)
+        self.assertTrue(self.monitor.trend()['hot'])
+
+        for fahrenheit in [75.0] * 60 + [90.0] * 60:
+            self.monitor.add_sample(_sample(t, fahrenheit))
+            t += 5.0
+        over = [alert for alert in self.alerts if alert.kind == TemperatureMonitor.OVER_TEMPERATURE]
+        self.assertEqual(len(over), 2)
+
+    def test_repeats_while_hot(self):
+        for t in range(0, 1800, 5):
+            self.monitor.add_sample(_sample(float(t), 95.0 if t >= 60 else 70.0))
+        over = [alert for alert in self.alerts if alert.kind == TemperatureMonitor.OVER_TEMPERATURE]
+        self.assertEqual(len(over), 3)
+
+    def test_rapid_rise(self):
+        # Parked in the sun: 2F a minute from 70F
+        for t in range(0, 480, 5):
+            self.monitor.add_sample(_sample(float(t), 70.0 + 2.0 * t / 60.0))
+        self.assertEqual([alert.kind for alert in self.alerts], [TemperatureMonitor.RAPID_RISE])
+        self.assertGreaterEqual(self.alerts[0].fahrenheit, 75.0)
+        self.assertAlmostEqual(self.monitor.rate, 2.0, delta=0.2)
+
+    def test_history_buckets(self):
+        for t in range(0, 180, 10):
+            self.monitor.add_sample(_sample(1000.0 * 60 + t, 70.0 + t / 10.0))
+        history = self.monitor.history()
+        self.assertEqual(len(history), 3)
+        self.assertEqual(history[0], {'time': 60000.0, 'min': 70.0, 'max': 75.0, 'mean': 72.5})
+        self.assertEqual(history[2]['max'], 87.0)
+
+    def test_out_of_order_ignored(self):
+        self.monitor.add_sample(_sample(10.0, 70.0))
+        self.monitor.add_sample(_sample(5.0, 100.0))
+        self.assertEqual(self.monitor.samples, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from threading import Event
+from concurrent.futures import Future
+
+from securityclientpy.drivers import SimulatedDrivers, QUIET_PATTERNS
+from securityclientpy.hwcontroller import HardwareController
+from securityclientpy.statemachine import DISARMED, ARMING, ARMED, BREACHED, ACKNOWLEDGED
+from securityclientpy.threads import SecurityThreads
+from tests.helpers import wait_until
+
+
+class _ServerRequests(object):
+    """answers the breach notification right away"""
+
+    def __init__(self):
+        self.breaches = 0
+
+    def send_system_breach_notification_async(self):
+        self.breaches += 1
+        future = Future()
+        future.set_result(True)
+        return future
+
+
+class TestSecurityThreads(unittest.TestCase):
+    """set of test for threads.SecurityThreads on simulated drivers"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.drivers = SimulatedDrivers(QUIET_PATTERNS, seed=1)
+        self.server_requests = _ServerRequests()
+        self.hwcontroller = HardwareController(False, self.server_requests, drivers=self.drivers)
+        # Simulated hardware goes through the same armed logic as the real thing
+        self.threads = SecurityThreads(True, True, self.hwcontroller, self.server_requests, data_dir=self.directory)
+
+    def tearDown(self):
+        self.threads.quit_successfully()
+        shutil.rmtree(self.directory)
+
+    def test_disarm_during_arming_delay(self):
+        start = time.time()
+        self.assertEqual(self.threads.arm_system().result(timeout=1).current.state, ARMING)
+        self.threads.disarm_system()
+        self.assertLess(time.time() - start, 0.1)
+
+        # The armed thread leaves the 5 s exit delay right away
+        self.threads.armed_thread.join(0.5)
+        self.assertFalse(self.threads.armed_thread.is_alive())
+        self.assertEqual(self.threads.status.state, DISARMED)
+
+    def test_breach_and_false_alarm(self):
+        self.threads._ARMING_DELAY_SECONDS = 0.05
+        self.threads._INITIAL_MOTION_SECONDS = 0.05
+        statuses = []
+        self.threads.add_listener(statuses.append)
+        self.threads.arm_system()
+        self.assertTrue(wait_until(lambda: self.threads.status.state == ARMED))
+        self.assertFalse(self.threads.status.occupied)
+
+        vibration = HardwareController._GPIO_PINS['vibration']
+        # Four debounced knocks add up to a breach with the default policy
+        for i in range(4):
+            self.drivers.gpio.pulse(vibration)
+            time.sleep(0.3)
+        self.assertTrue(wait_until(lambda: self.threads.status.state == BREACHED))
+        self.assertEqual(self.server_requests.breaches, 1)
+        self.assertTrue(self.hwcontroller.led_flashing)
+
+        self.threads.false_alarm()
+        self.assertFalse(self.hwcontroller.led_flashing)
+        self.assertTrue(wait_until(lambda: self.threads.status.state == DISARMED))
+        self.threads.armed_thread.join(0.5)
+        self.assertFalse(self.threads.armed_thread.is_alive())
+        # Listeners (the event log) see the state machine's own states
+        self.assertTrue(wait_until(lambda: len(statuses) == 5))
+        self.assertEqual([status.state for status in statuses], [ARMING, ARMED, BREACHED, ACKNOWLEDGED, DISARMED])
+
+    def test_occupied_while_arming(self):
+        self.threads._ARMING_DELAY_SECONDS = 0.05
+        self.threads._INITIAL_MOTION_SECONDS = 1.0
+        self.threads.arm_system()
+        self.assertTrue(wait_until(lambda: self.threads._sensor_events))
+        self.drivers.gpio.set_input(HardwareController._GPIO_PINS['motion'], True)
+        # Motion ends the check at once rather than after the full second
+        self.assertTrue(wait_until(lambda: self.threads.status.state == ARMED, timeout=0.5))
+        self.assertTrue(self.threads.status.occupied)
+
+    def test_previous_session_ends_late(self):
+        self.threads._ARMING_DELAY_SECONDS = 0.05
+        self.threads._INITIAL_MOTION_SECONDS = 0.05
+        # Only a disarm could wake the armed thread in time
+        self.threads._SENSOR_WAIT_SECONDS = 5.0
+        sensor_bus = self.hwcontroller.sensor_bus
+        unsubscribe = sensor_bus.unsubscribe
+        rearmed = Event()
+
+        def late_unsubscribe(reader):
+            rearmed.wait(2.0)
+            unsubscribe(reader)
+        sensor_bus.unsubscribe = late_unsubscribe
+
+        self.threads.arm_system()
+        self.assertTrue(wait_until(lambda: self.threads.status.state == ARMED))
+        first = self.threads.armed_thread
+        self.threads.disarm_system()
+        self.threads.arm_system()
+        self.assertTrue(wait_until(lambda: self.threads.status.state == ARMED))
+        rearmed.set()
+        first.join(0.5)
+        self.assertFalse(first.is_alive())
+
+        # The first session's thread winding down leaves the second one's reader in place
+        self.assertIn(self.threads.status.session, self.threads._sensor_events)
+        self.threads.disarm_system()
+        self.threads.armed_thread.join(0.5)
+        self.assertFalse(self.threads.armed_thread.is_alive())
+
+    def test_quit_without_hardware(self):
+        hwcontroller = HardwareController(True, self.server_requests)
+        threads = SecurityThreads(True, True, hwcontroller, self.server_requests, data_dir=self.directory)
+        threads.quit_successfully()
+        self.assertFalse(os.path.exists(hwcontroller.drivers.root))
+        self.assertIsNone(hwcontroller.drivers._thread)
+        self.assertFalse(any(thread.is_alive() for thread in (
+            hwcontroller.gps_reader._thread, hwcontroller.temperature_sampler._thread,
+            hwcontroller.position_estimator._thread) if thread is not None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from securityclientpy.gpsreader import GpsFix
+from securityclientpy.triplog import TripLog, simplify, path_length
+
+# About 11 m of latitude
+_LAT_STEP = 0.0001
+# 2020-01-01 00:00 UTC
+_DAY_START = 1577836800.0
+
+
+def _fix(t, latitude, longitude=-84.0, speed=15.0, track=0.0):
+    return GpsFix(3, None, latitude, longitude, 300.0, speed, 0.0, track, 5.0, 5.0, 10.0, 0.5, t)
+
+
+class TestSimplify(unittest.TestCase):
+    """set of test for triplog.simplify"""
+
+    def test_straight_line(self):
+        latitudes = numpy.linspace(33.0, 33.01, 100)
+        longitudes = numpy.full(100, -84.0)
+        self.assertEqual(list(simplify(latitudes, longitudes, 1.0)), [0, 99])
+
+    def test_keeps_corners(self):
+        # North 50 points, then east 50 points
+        latitudes = numpy.concatenate([33.0 + numpy.arange(50) * _LAT_STEP, numpy.full(50, 33.0 + 49 * _LAT_STEP)])
+        longitudes = numpy.concatenate([numpy.full(50, -84.0), -84.0 + numpy.arange(1, 51) * _LAT_STEP])
+        self.assertEqual(list(simplify(latitudes, longitudes, 1.0)), [0, 49, 99])
+        self.assertEqual(len(simplify(latitudes, longitudes, 0.0)), 100)
+
+    def test_tolerance(self):
+        # Zig-zag 3 m either side of a straight line
+        latitudes = 33.0 + numpy.arange(100) * _LAT_STEP
+        longitudes = -84.0 + numpy.where(numpy.arange(100) % 2, 3.0, -3.0) / 93000.0
+        self.assertEqual(len(simplify(latitudes, longitudes, 10.0)), 2)
+        self.assertEqual(len(simplify(latitudes, longitudes, 1.0)), 100)
+
+    def test_path_length(self):
+        self.assertAlmostEqual(path_length([33.0, 33.0 + 10 * _LAT_STEP], [-84.0, -84.0]), 111.32, places=2)
+        self.assertEqual(path_length([33.0], [-84.0]), 0.0)
+
+
+class TestTripLog(unittest.TestCase):
+    """set of test for triplog.TripLog"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.root = os.path.join(self.directory, 'trips')
+        self.trip_log = TripLog(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _drive(self, trip_log, start, seconds, latitude=33.0):
+        """drives north at about 22 m/s, one fix a second"""
+        for i in range(seconds):
+            trip_log.add_fix(_fix(start + i, latitude + i * 2 * _LAT_STEP))
+
+    def test_record_round_trip(self):
+        self.assertTrue(self.trip_log.add_fix(_fix(_DAY_START + 10.0, 33.1234567, -84.7654321, 12.34, 271.5)))
+        points = self.trip_log.points(_DAY_START, _DAY_START + 100.0)
+        self.assertEqual(len(points), 1)
+        point = points[0]
+        self.assertEqual(point['time'], _DAY_START + 10.0)
+        self.assertAlmostEqual(point['latitude'], 33.1234567, places=7)
+        self.assertAlmostEqual(point['longitude'], -84.7654321, places=7)
+        self.assertAlmostEqual(point['speed'], 12.34, places=2)
+        self.assertAlmostEqual(point['track'], 271.5, places=2)
+        self.assertEqual(point['altitude'], 300.0)
+        self.assertEqual(os.path.getsize(self.trip_log.day_path(int(_DAY_START // 86400))), 22)
+
+    def test_parked_fixes_not_logged(self):
+        self.trip_log.add_fix(_fix(_DAY_START, 33.0))
+        for i in range(1, 100):
+            # Jitter of a few meters while parked
+            self.assertFalse(self.trip_log.add_fix(_fix(_DAY_START + i, 33.0 + (i % 3) * 0.00002, speed=0.0)))
+        self.assertEqual(self.trip_log.records, 1)
+        self.assertEqual(self.trip_log.skipped, 99)
+
+    def test_time_range_query(self):
+        self._drive(self.trip_log, _DAY_START + 1000.0, 600)
+        points = self.trip_log.points(_DAY_START + 1100.0, _DAY_START + 1199.0)
+        self.assertEqual(len(points), 100)
+        self.assertEqual(points['time'][0], _DAY_START + 1100.0)
+        self.assertEqual(points['time'][-1], _DAY_START + 1199.0)
+        self.assertEqual(len(self.trip_log.points(_DAY_START, _DAY_START + 999.0)), 0)
+
+    def test_query_spans_days(self):
+        self._drive(self.trip_log, _DAY_START + 86400.0 - 50.0, 100)
+        self.assertEqual(self.trip_log.days(), [int(_DAY_START // 86400), int(_DAY_START // 86400) + 1])
+        points = self.trip_log.points(_DAY_START, _DAY_START + 2 * 86400.0)
+        self.assertEqual(len(points), 100)
+        self.assertTrue(numpy.all(numpy.diff(points['time']) > 0))
+
+    def test_trips_split_on_gaps(self):
+        self._drive(self.trip_log, _DAY_START + 1000.0, 300)
+        self._drive(self.trip_log, _DAY_START + 5000.0, 300, latitude=33.1)
+        trips = self.trip_log.trips(_DAY_START, _DAY_START + 86400.0, tolerance=5.0)
+        self.assertEqual(len(trips), 2)
+        self.assertEqual(trips[0]['start'], _DAY_START + 1000.0)
+        self.assertEqual(trips[0]['end'], _DAY_START + 1299.0)
+        self.assertAlmostEqual(trips[0]['distance'], 299 * 2 * _LAT_STEP * 111320.0, delta=1.0)
+        # A straight drive downsamples to its end points
+        self.assertEqual(len(trips[0]['points']), 2)
+
+    def test_reopen_appends_in_order(self):
+        self._drive(self.trip_log, _DAY_START + 1000.0, 50)
+        self.trip_log.close()
+        reopened = TripLog(self.root)
+        # Older than the last logged record
+        self.assertFalse(reopened.add_fix(_fix(_DAY_START + 1010.0, 34.0)))
+        self.assertTrue(reopened.add_fix(_fix(_DAY_START + 1100.0, 34.0)))
+        self.assertEqual(len(reopened.points(_DAY_START, _DAY_START + 86400.0)), 51)
+
+    def test_clock_step_back(self):
+        self._drive(self.trip_log, _DAY_START + 1000.0, 50)
+        # Fixes stamped by a bad clock, later that day and days ahead
+        self.assertTrue(self.trip_log.add_fix(_fix(_DAY_START + 50000.0, 35.0)))
+        self.assertTrue(self.trip_log.add_fix(_fix(_DAY_START + 3 * 86400.0, 35.1)))
+        self.trip_log.flush()
+
+        self.assertTrue(self.trip_log.add_fix(_fix(_DAY_START + 1100.0, 34.0)))
+        self.assertEqual(self.trip_log.dropped, 2)
+        self.assertEqual(self.trip_log.days(), [int(_DAY_START // 86400)])
+        points = self.trip_log.points(_DAY_START, _DAY_START + 4 * 86400.0)
+        self.assertEqual(len(points), 51)
+        self.assertEqual(points['time'][-1], _DAY_START + 1100.0)
+
+    def test_unwritable_buffer_capped(self):
+        trip_log = TripLog(self.root, max_buffer_records=100)
+        # A file where the log directory should be makes every write fail
+        shutil.rmtree(self.root)
+        open(self.root, 'w').close()
+        self._drive(trip_log, _DAY_START + 1000.0, 300)
+        self.assertEqual(len(trip_log._buffer), 100)
+        self.assertEqual(trip_log.dropped, 200)
+
+        os.remove(self.root)
+        os.makedirs(self.root)
+        points = trip_log.points(_DAY_START, _DAY_START + 86400.0)
+        # The newest records are the ones kept
+        self.assertEqual(len(points), 100)
+        self.assertEqual(points['time'][0], _DAY_START + 1200.0)
+
+    def test_retention(self):
+        trip_log = TripLog(self.root, retention_days=2)
+        for day in range(5):
+            self._drive(trip_log, _DAY_START + day * 86400.0, 10)
+        trip_log.flush()
+        self.assertEqual(trip_log.days(), [int(_DAY_START // 86400) + 3, int(_DAY_START // 86400) + 4])
+
+    def test_exports(self):
+        self._drive(self.trip_log, _DAY_START + 1000.0, 60)
+        trips = self.trip_log.trips(_DAY_START, _DAY_START + 86400.0, tolerance=5.0)
+
+        geojson = json.loads(json.dumps(TripLog.to_geojson(trips)))
+        feature = geojson['features'][0]
+        self.assertEqual(feature['geometry']['type'], 'LineString')
+        self.assertEqual(feature['geometry']['coordinates'][0], [-84.0, 33.0])
+        self.assertEqual(len(feature['properties']['times']), 2)
+
+        gpx = TripLog.to_gpx(trips)
+        self.assertIn('<trkpt lat="33.0000000" lon="-84.0000000">', gpx)
+        self.assertIn('<time>2020-01-01T00:16:40Z</time>', gpx)
+        self.assertEqual(gpx.count('<trk>'), 1)
+        self.assertTrue(gpx.endswith('</gpx>'))
+
+
+if __name__ == '__main__':
+    unittest.main()
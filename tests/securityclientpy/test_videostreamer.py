@@ -1,6 +1,6 @@
 import unittest
 
-from securityclientpy.videostreamer import VideoStreamer
+from securityclientpy.videostreamer import FrameGrabber, SyntheticFrameSource, VideoStreamer
 
 
 class TestVideoStreamer(unittest.TestCase):
@@ -43,3 +43,51 @@ class TestVideoStreamer(unittest.TestCase):
         status, image = videostreamer.get_frame()
         self.assertFalse(status)
         self.assertIsNone(image)
+
+
+class TestFrameGrabber(unittest.TestCase):
+    """set of test for videostreamer.FrameGrabber using a synthetic frame source"""
+
+    def setUp(self):
+        self.source = SyntheticFrameSource(width=160, height=120, fps=200.0)
+        self.grabber = FrameGrabber(self.source, ring_size=4)
+
+    def tearDown(self):
+        self.grabber.stop()
+
+    def test_latest_frame_is_not_copied(self):
+        self.grabber.start()
+        self.assertTrue(self.grabber.wait_for(-1, timeout=1.0))
+        sequence, timestamp, frame = self.grabber.latest()
+        self.assertEqual(frame.shape, (120, 160, 3))
+        self.assertTrue(any(frame is buffer for buffer in self.grabber._frames))
+
+    def test_reader_sees_frames_in_order(self):
+        reader = self.grabber.subscribe()
+        self.grabber.start()
+        sequences = []
+        while len(sequences) < 10:
+            sequences.extend(sequence for sequence, timestamp, frame in reader.wait(timeout=1.0))
+        self.assertEqual(sequences, sorted(sequences))
+        self.assertEqual(len(sequences) + reader.dropped, sequences[-1] + 1)
+
+    def test_slow_reader_counts_dropped_frames(self):
+        reader = self.grabber.subscribe()
+        self.grabber.start()
+        while self.grabber.sequence < 20:
+            self.grabber.wait_for(self.grabber.sequence, timeout=1.0)
+        self.grabber.stop()
+
+        frames = reader.wait(timeout=0)
+        self.assertLessEqual(len(frames), 4)
+        self.assertEqual(len(frames) + reader.dropped, self.grabber.sequence + 1)
+        self.assertTrue(all(self.grabber.valid(sequence) for sequence, timestamp, frame in frames))
+
+    def test_videostreamer_get_frame_uses_grabber(self):
+        vs = VideoStreamer(0, no_video=False, source=SyntheticFrameSource(width=160, height=120, fps=200.0))
+        vs.start()
+        vs.grabber.wait_for(-1, timeout=1.0)
+        status, frame = vs.get_frame()
+        self.assertTrue(status)
+        self.assertEqual(frame.shape, (120, 160, 3))
+        vs.release_stream()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# local stand-in for the security server, used by tests and benchmarks
+#
+
+import json
+import socket
+import threading
+import time
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.stub._track(self.connection)
+
+    def finish(self):
+        try:
+            BaseHTTPRequestHandler.finish(self)
+        finally:
+            self.server.stub._untrack(self.connection)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else b''
+        data = json.loads(body.decode('utf-8')) if body else {}
+        self._reply(self.server.stub._handle(self.path.lstrip('/'), data))
+
+    def do_GET(self):
+        self._reply(self.server.stub._handle(self.path.lstrip('/'), {}))
+
+    def _reply(self, payload):
+        status, content_type = 200, 'application/json'
+        if isinstance(payload, tuple):
+            # An error page in place of the api's json, as a proxy in front of the server would send
+            (status, body), content_type = payload, 'text/html'
+            body = body.encode('utf-8')
+        else:
+            body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(object):
+    """threaded http server answering every path with a success response
+
+    The server can be taken down and brought back up on the same port to simulate a flapping link,
+    and each request can be delayed to simulate a slow server. Requests are recorded by path. A path's
+    response can be replaced with json, or with an (http status, html) error page.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, delay=0.0, responses=None):
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.responses = dict(responses or {})
+        self.received = []
+        self._lock = threading.Lock()
+        self._connections = set()
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        self._server = _ThreadingHTTPServer((self.host, self.port), _StubHandler)
+        self._server.stub = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05})
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """stops listening and drops every open keep-alive connection"""
+        if self._server is None: return
+        self._server.shutdown()
+        self._server.server_close()
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+        self._server = None
+
+    @property
+    def up(self):
+        return self._server is not None
+
+    def requests_for(self, path):
+        with self._lock:
+            return [data for received_path, data in self.received if received_path == path]
+
+    def _handle(self, path, data):
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            self.received.append((path, data))
+        return self.responses.get(path, {'code': 201, 'data': True})
+
+    def _track(self, connection):
+        with self._lock:
+            self._connections.add(connection)
+
+    def _untrack(self, connection):
+        with self._lock:
+            self._connections.discard(connection)